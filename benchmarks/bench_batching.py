@@ -0,0 +1,52 @@
+"""Measures the throughput of a stream of UPDATE messages from a producer to a consumer, putting every message on its
+own versus sending them through a MessageBatcher, for every transport"""
+import time
+
+from harness import Results, HIGHER, report
+from theater.core.batching import MessageBatcher
+from theater.core.constants import Signal, MsgType, Transport
+from theater.core.messages import Message, generatequeues
+
+_VARIANTS = {'pipe': {'transport': Transport.PIPE},
+             'pipe.encoded': {'transport': Transport.PIPE, 'encoded': True},
+             'shm': {'transport': Transport.SHAREDMEMORY, 'size': 1 << 24},
+             'shm.encoded': {'transport': Transport.SHAREDMEMORY, 'size': 1 << 24, 'encoded': True}}
+
+
+def _update(i: int) -> Message:
+    return Message(sender="Bench", signal=Signal.UPDATE, type=MsgType.MAP, body={'sequence': i, 'value': i * 0.5})
+
+
+def stream(queuekwargs: dict, count: int, maxsize: int) -> float:
+    """The messages per second going from producer to consumer, in batches of maxsize messages (1 puts every message
+    on its own)"""
+    producer, consumer = generatequeues(**queuekwargs)
+    messages = [_update(i) for i in range(count)]
+    start = time.perf_counter()
+    if maxsize == 1:
+        for msg in messages:
+            producer.put(msg)
+    else:
+        batcher = MessageBatcher(producer, maxsize=maxsize, maxdelay=60)
+        for msg in messages:
+            batcher.send(msg)
+        batcher.flush()
+    for _ in range(count):
+        consumer.get(True, 30.0)
+    elapsed = time.perf_counter() - start
+    producer.close()
+    consumer.close()
+    return count / elapsed
+
+
+def benchmarks(results: Results, quick: bool = False):
+    count = 5_000 if quick else 50_000
+    for name, queuekwargs in _VARIANTS.items():
+        for maxsize in (1, 16, 64):
+            results.add(f"batching.{name}.{maxsize}", stream(queuekwargs, count, maxsize), 'msg/s', HIGHER)
+
+
+if __name__ == '__main__':
+    out = Results()
+    benchmarks(out)
+    report(out.metrics)
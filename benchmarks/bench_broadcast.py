@@ -0,0 +1,59 @@
+"""Measures the cost of sending the same UPDATE to many subscribers, putting it on every queue in turn versus
+publishing it once on a topic, for the transports that serialize on put"""
+import time
+
+from harness import Results, report
+from theater.core.constants import Signal, MsgType, Transport
+from theater.core.messages import Message, generatequeues
+from theater.core.pubsub import Topics
+
+_VARIANTS = {'shm': {'transport': Transport.SHAREDMEMORY, 'size': 1 << 20},
+             'shm.encoded': {'transport': Transport.SHAREDMEMORY, 'size': 1 << 20, 'encoded': True}}
+
+
+def _update() -> Message:
+    return Message(sender="Bench", signal=Signal.UPDATE, type=MsgType.MAP,
+                   body={f"option{i}": f"value{i}" for i in range(32)})
+
+
+def _drain(consumers):
+    for consumer in consumers:
+        while not consumer.empty():
+            consumer.get_nowait()
+
+
+def fanout(queuekwargs: dict, subscribers: int, rounds: int) -> tuple:
+    """The best ns per subscriber of a put on every queue, and of a publish on a topic"""
+    pairs = [generatequeues(**queuekwargs) for _ in range(subscribers)]
+    consumers = [consumer for _, consumer in pairs]
+    topics = Topics()
+    for producer, _ in pairs:
+        topics.subscribe("config", producer)
+    msg = _update()
+    puts, publishes = [], []
+    for _ in range(rounds):
+        start = time.perf_counter_ns()
+        for producer, _ in pairs:
+            producer.put_nowait(msg)
+        puts.append(time.perf_counter_ns() - start)
+        _drain(consumers)
+        start = time.perf_counter_ns()
+        topics.publish("config", msg)
+        publishes.append(time.perf_counter_ns() - start)
+        _drain(consumers)
+    return min(puts) / subscribers, min(publishes) / subscribers
+
+
+def benchmarks(results: Results, quick: bool = False):
+    rounds = 5 if quick else 20
+    for name, queuekwargs in _VARIANTS.items():
+        for subscribers in ((10, 100) if quick else (10, 100, 500)):
+            put, publish = fanout(queuekwargs, subscribers, rounds)
+            results.add(f"broadcast.{name}.{subscribers}.put", put, 'ns')
+            results.add(f"broadcast.{name}.{subscribers}.publish", publish, 'ns')
+
+
+if __name__ == '__main__':
+    out = Results()
+    benchmarks(out)
+    report(out.metrics)
@@ -0,0 +1,80 @@
+"""Measures the construction rate and the per object memory of Message and Status, comparing validated, trusted and
+non slotted construction"""
+import gc
+import timeit
+import tracemalloc
+from datetime import datetime
+from typing import Optional
+
+import attr
+
+from harness import Results, HIGHER, report
+from theater.core.constants import Signal, MsgType
+from theater.core.messages import Message, Status
+
+
+@attr.s(kw_only=True, frozen=True)
+class DictStatus:
+    """Status as it was before slots=True, kept as a reference point"""
+    reqtime = attr.ib(type=Optional[datetime],
+                      validator=attr.validators.optional(attr.validators.instance_of(datetime)))
+    status = attr.ib(type=Optional[str],
+                     validator=attr.validators.optional(attr.validators.instance_of(str)))
+    time = attr.ib(type=Optional[datetime],
+                   validator=attr.validators.optional(attr.validators.instance_of(datetime)))
+    statustime = attr.ib(type=Optional[datetime],
+                         validator=attr.validators.optional(attr.validators.instance_of(datetime)))
+    statusmessage = attr.ib(type=Optional[str],
+                            validator=attr.validators.optional(attr.validators.instance_of(str)))
+
+
+def _heartbeat(now: datetime) -> Message:
+    return Message(sender="Musician", signal=Signal.BEAT, type=MsgType.STATUS,
+                   body=Status(reqtime=now, status="Running", time=now, statustime=now, statusmessage=None))
+
+
+def _trustedheartbeat(now: datetime) -> Message:
+    return Message.trusted(sender="Musician", signal=Signal.BEAT, type=MsgType.STATUS,
+                           body=Status.trusted(reqtime=now, status="Running", time=now, statustime=now,
+                                               statusmessage=None))
+
+
+def _dictstatus(now: datetime) -> DictStatus:
+    return DictStatus(reqtime=now, status="Running", time=now, statustime=now, statusmessage=None)
+
+
+def _slottedstatus(now: datetime) -> Status:
+    return Status(reqtime=now, status="Running", time=now, statustime=now, statusmessage=None)
+
+
+def _rate(factory, number: int) -> float:
+    now = datetime.now()
+    return number / min(timeit.repeat(lambda: factory(now), number=number, repeat=3))
+
+
+def _memory(factory, count: int) -> float:
+    now = datetime.now()
+    gc.collect()
+    tracemalloc.start()
+    objects = [factory(now) for _ in range(count)]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del objects
+    # The list holding the objects costs a pointer each
+    return size / count - 8
+
+
+def benchmarks(results: Results, quick: bool = False):
+    count = 100_000 if quick else 1_000_000
+    for name, factory in (("heartbeat.validated", _heartbeat),
+                          ("heartbeat.trusted", _trustedheartbeat),
+                          ("status.dict", _dictstatus),
+                          ("status.slotted", _slottedstatus)):
+        results.add(f"construction.{name}.rate", _rate(factory, count // 10), 'obj/s', HIGHER)
+        results.add(f"construction.{name}.memory", _memory(factory, count), 'B')
+
+
+if __name__ == '__main__':
+    out = Results()
+    benchmarks(out)
+    report(out.metrics)
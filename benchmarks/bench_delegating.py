@@ -0,0 +1,50 @@
+"""Measures the latency of a task delegated by a DelegatingMusician, from submission to result, for every executor
+kind"""
+import time
+
+from harness import Results, percentiles, report
+from theater.core.components.abc import DelegatingMusician
+from theater.core.components.constants import ExecutorKind
+from theater.core.messages import generatequeues
+
+
+class BenchMusician(DelegatingMusician):
+    def _onpauseend(self, executor=None, *args, **kwargs):
+        pass
+
+
+def _task(value: int) -> int:
+    return value
+
+
+def latency(kind: ExecutorKind, count: int, maxworkers: int = 1) -> tuple:
+    """The p50 and p99 in us of a trivial task, from submit to result"""
+    _, consumer = generatequeues()
+    conductorp, _ = generatequeues()
+    musician = BenchMusician("Bench", consumer, 1, conductorp, executorkind=kind, maxworkers=maxworkers)
+    executor = musician._openexecutor()
+    try:
+        for i in range(10):
+            executor.submit(_task, i).result()
+        samples = []
+        for i in range(count):
+            start = time.perf_counter()
+            executor.submit(_task, i).result()
+            samples.append((time.perf_counter() - start) * 1e6)
+    finally:
+        musician._closeexecutor()
+    return percentiles(samples, 0.5, 0.99)
+
+
+def benchmarks(results: Results, quick: bool = False):
+    count = 200 if quick else 2000
+    for kind in ExecutorKind:
+        p50, p99 = latency(kind, count)
+        results.add(f"delegating.{kind.name.lower()}.p50", p50, 'us')
+        results.add(f"delegating.{kind.name.lower()}.p99", p99, 'us')
+
+
+if __name__ == '__main__':
+    out = Results()
+    benchmarks(out)
+    report(out.metrics)
@@ -0,0 +1,56 @@
+"""Compares the dispatch table of BaseComponent._handlemessage with the if/elif chain it replaced, and measures the
+cost of the metrics recorded by every dispatch"""
+import timeit
+from typing import Union
+
+from harness import Results, percall
+
+from theater.core.components.abc import BaseComponent
+from theater.core.constants import Signal, MsgType
+from theater.core.messages import Message
+
+
+class BenchComponent(BaseComponent):
+    def _onpauseend(self, *args, **kwargs):
+        pass
+
+    def _chainhandlemessage(self, msg: Message) -> Union[Signal, None]:
+        msgsignal = msg.signal
+        if msgsignal is Signal.BEAT:
+            return self._handlebeat(msg)
+        elif msgsignal is Signal.TRIGGER:
+            return self._handletrigger(msg)
+        elif msgsignal is Signal.UPDATE:
+            return self._handleupdate(msg)
+        elif msgsignal is Signal.INTERRUPT:
+            return self._handleinterrupt(msg)
+        elif msgsignal is Signal.CREATE:
+            return self._handlecreate(msg)
+        elif msgsignal is Signal.KILL:
+            return self._handlekill(msg)
+        else:
+            return None
+
+
+def benchmarks(results: Results, quick: bool = False):
+    number = 20000 if quick else 200000
+    instrumented = BenchComponent("Bench", None, 1)
+    bare = BenchComponent("Bench", None, 1, metrics=False)
+    for signal in Signal:
+        msg = Message(sender="Bench", signal=signal, type=MsgType.NONE, body=None)
+        results.add(f"dispatch.{signal.name.lower()}", percall(lambda: instrumented._handlemessage(msg), number), 'ns')
+        results.add(f"dispatch.{signal.name.lower()}.nometrics", percall(lambda: bare._handlemessage(msg), number),
+                    'ns')
+
+
+def main(number: int = 200000):
+    component = BenchComponent("Bench", None, 1)
+    for signal in Signal:
+        msg = Message(sender="Bench", signal=signal, type=MsgType.NONE, body=None)
+        table = min(timeit.repeat(lambda: component._handlemessage(msg), number=number, repeat=5))
+        chain = min(timeit.repeat(lambda: component._chainhandlemessage(msg), number=number, repeat=5))
+        print(f"{signal.name:<10} table {table / number * 1e9:8.1f} ns/msg   chain {chain / number * 1e9:8.1f} ns/msg")
+
+
+if __name__ == '__main__':
+    main()
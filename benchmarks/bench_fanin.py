@@ -0,0 +1,58 @@
+"""Measures how long a Conductor takes to collect a heartbeat from every musician, at growing numbers of musicians"""
+import multiprocessing
+import os
+import statistics
+import time
+
+from harness import Results, report
+from theater.core.components.abc import BaseMusician
+from theater.core.components.constants import PauseMode
+from theater.core.constants import Signal
+from theater.manager.conductor import Conductor
+from theater.manager.constants import Hosting
+
+_CONTEXT = multiprocessing.get_context('fork')
+
+
+class IdleMusician(BaseMusician):
+    def _onpauseend(self, *args, **kwargs):
+        pass
+
+
+def _collectbeats(conductor: Conductor, count: int, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    beats = 0
+    while beats < count:
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"Only {beats} heartbeats out of {count}")
+        msg = conductor.poll(0.1)
+        if msg is not None and msg.signal is Signal.BEAT:
+            beats += 1
+
+
+def fanin(musicians: int, rounds: int, hosting: Hosting = Hosting.MULTIPLEX) -> float:
+    """The median ms between a broadcast BEAT and the last of the musicians' answers"""
+    conductor = Conductor("Bench", workers=min(os.cpu_count() or 1, 4), context=_CONTEXT, hosting=hosting)
+    for i in range(musicians):
+        conductor.register(f"Musician{i}", IdleMusician, 3600, pausemode=PauseMode.DEADLINE)
+    samples = []
+    with conductor:
+        conductor.beat()
+        _collectbeats(conductor, musicians)
+        for _ in range(rounds):
+            start = time.perf_counter()
+            conductor.beat()
+            _collectbeats(conductor, musicians)
+            samples.append((time.perf_counter() - start) * 1e3)
+    return statistics.median(samples)
+
+
+def benchmarks(results: Results, quick: bool = False):
+    for musicians in ((10, 100) if quick else (10, 100, 1000)):
+        results.add(f"fanin.{musicians}", fanin(musicians, 3 if quick else 10), 'ms')
+
+
+if __name__ == '__main__':
+    out = Results()
+    benchmarks(out)
+    report(out.metrics)
@@ -0,0 +1,65 @@
+"""Measures the cost of journaling a queue: the throughput of a stream of UPDATE messages from a producer to a consumer
+on a plain queue versus a journaled one, and the records per second a Journal appends and syncs"""
+import tempfile
+import time
+
+from harness import Results, HIGHER, report
+from theater.core.constants import Signal, MsgType
+from theater.core.journal import Journal
+from theater.core.messages import Message, generatequeues
+
+
+def _update(i: int) -> Message:
+    return Message(sender="Bench", signal=Signal.UPDATE, type=MsgType.MAP, body={'sequence': i, 'value': i * 0.5})
+
+
+def stream(count: int, encoded: bool, journaled: bool) -> float:
+    """The messages per second going from producer to consumer, acknowledged every 64 messages"""
+    with tempfile.TemporaryDirectory() as directory:
+        journal = Journal(directory) if journaled else None
+        producer, consumer = generatequeues(encoded=encoded, journal=journal)
+        messages = [_update(i) for i in range(count)]
+        start = time.perf_counter()
+        for msg in messages:
+            producer.put(msg)
+        for i in range(count):
+            consumer.get(True, 30.0)
+            if not i % 64:
+                consumer.acknowledge()
+        elapsed = time.perf_counter() - start
+        producer.close()
+        consumer.close()
+        if journal is not None:
+            journal.close()
+    return count / elapsed
+
+
+def append(count: int, sync: bool) -> float:
+    """The records per second appended to a journal, waiting for every record to be durable if sync"""
+    payload = b'x' * 128
+    with tempfile.TemporaryDirectory() as directory:
+        journal = Journal(directory)
+        start = time.perf_counter()
+        for _ in range(count):
+            journal.append(payload)
+            if sync:
+                journal.sync()
+        elapsed = time.perf_counter() - start
+        journal.close()
+    return count / elapsed
+
+
+def benchmarks(results: Results, quick: bool = False):
+    count = 5_000 if quick else 50_000
+    for encoded in (False, True):
+        name = 'encoded' if encoded else 'pickled'
+        results.add(f"journal.stream.{name}.plain", stream(count, encoded, False), 'msg/s', HIGHER)
+        results.add(f"journal.stream.{name}.journaled", stream(count, encoded, True), 'msg/s', HIGHER)
+    results.add("journal.append", append(count, False), 'rec/s', HIGHER)
+    results.add("journal.append.sync", append(count // 50, True), 'rec/s', HIGHER)
+
+
+if __name__ == '__main__':
+    out = Results()
+    benchmarks(out)
+    report(out.metrics)
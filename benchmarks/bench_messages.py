@@ -0,0 +1,49 @@
+"""Measures construction, pickling and wire encoding of a Message for every MsgType"""
+import pickle
+from datetime import datetime
+
+from harness import Results, percall, report
+from theater.core.constants import Signal, MsgType
+from theater.core.messages import Message, Status, encodemessage, decodemessage
+
+
+def _bodies() -> dict:
+    now = datetime.now()
+    return {MsgType.NONE: None,
+            MsgType.TEXT: "Some text of a reasonable length for a message",
+            MsgType.MAP: {'key': 'value', 'number': 42, 'list': [1, 2, 3]},
+            MsgType.STATUS: Status(reqtime=now, status="Running", time=now, statustime=now, statusmessage=None),
+            MsgType.BYTES: bytes(1024)}
+
+
+def benchmarks(results: Results, quick: bool = False):
+    number = 5000 if quick else 50000
+    for msgtype, body in _bodies().items():
+        name = msgtype.name.lower()
+        msg = Message(sender="Musician", signal=Signal.TRIGGER, type=msgtype, body=body)
+        results.add(f"message.{name}.construct",
+                    percall(lambda: Message(sender="Musician", signal=Signal.TRIGGER, type=msgtype, body=body), number),
+                    'ns')
+        results.add(f"message.{name}.trusted",
+                    percall(lambda: Message.trusted(sender="Musician", signal=Signal.TRIGGER, type=msgtype, body=body),
+                            number),
+                    'ns')
+        pickled = pickle.dumps(msg, pickle.HIGHEST_PROTOCOL)
+        results.add(f"message.{name}.pickle", percall(lambda: pickle.dumps(msg, pickle.HIGHEST_PROTOCOL), number), 'ns')
+        results.add(f"message.{name}.unpickle", percall(lambda: pickle.loads(pickled), number), 'ns')
+        results.add(f"message.{name}.pickledsize", len(pickled), 'B')
+        frame = encodemessage(msg)
+        results.add(f"message.{name}.encode", percall(lambda: encodemessage(msg), number), 'ns')
+        results.add(f"message.{name}.decode", percall(lambda: decodemessage(frame).tomessage(), number), 'ns')
+        results.add(f"message.{name}.encodedsize", len(frame), 'B')
+    now = datetime.now()
+    results.add("status.construct",
+                percall(lambda: Status(reqtime=now, status="Running", time=now, statustime=now, statusmessage=None),
+                        number),
+                'ns')
+
+
+if __name__ == '__main__':
+    out = Results()
+    benchmarks(out)
+    report(out.metrics)
@@ -0,0 +1,83 @@
+"""Measures ProducerQueue to ConsumerQueue round trip latency between two processes, and the throughput of a single
+consumer fed by 1 to N producer processes, for every transport"""
+import multiprocessing
+import time
+
+from harness import Results, HIGHER, percentiles, report
+from theater.core.constants import Signal, MsgType, Transport
+from theater.core.messages import Message, generatequeues
+
+_CONTEXT = multiprocessing.get_context('fork')
+_VARIANTS = {'pipe': {'transport': Transport.PIPE},
+             'pipe.encoded': {'transport': Transport.PIPE, 'encoded': True},
+             'shm': {'transport': Transport.SHAREDMEMORY},
+             'shm.encoded': {'transport': Transport.SHAREDMEMORY, 'encoded': True}}
+
+
+def _message(body: str = "Ping") -> Message:
+    return Message(sender="Bench", signal=Signal.TRIGGER, type=MsgType.TEXT, body=body)
+
+
+def _echo(inbox, outbox, count: int):
+    for _ in range(count):
+        outbox.put(inbox.get())
+
+
+def _produce(producer, count: int):
+    msg = _message("Payload")
+    for _ in range(count):
+        producer.put(msg)
+
+
+def roundtrip(queuekwargs: dict, count: int) -> tuple:
+    """The p50 and p99 in us of a message going to another process and back"""
+    pingp, pingc = generatequeues(**queuekwargs)
+    pongp, pongc = generatequeues(**queuekwargs)
+    echo = _CONTEXT.Process(target=_echo, args=(pingc, pongp, count + 10))
+    echo.start()
+    msg = _message()
+    for _ in range(10):
+        pingp.put(msg)
+        pongc.get()
+    samples = []
+    for _ in range(count):
+        start = time.perf_counter()
+        pingp.put(msg)
+        pongc.get()
+        samples.append((time.perf_counter() - start) * 1e6)
+    echo.join()
+    return percentiles(samples, 0.5, 0.99)
+
+
+def throughput(queuekwargs: dict, producers: int, count: int) -> float:
+    """The messages per second a single consumer reads while producers processes write count messages each"""
+    producer, consumer = generatequeues(**queuekwargs)
+    processes = [_CONTEXT.Process(target=_produce, args=(producer, count)) for _ in range(producers)]
+    start = time.perf_counter()
+    for process in processes:
+        process.start()
+    for _ in range(producers * count):
+        consumer.get()
+    elapsed = time.perf_counter() - start
+    for process in processes:
+        process.join()
+    return producers * count / elapsed
+
+
+def benchmarks(results: Results, quick: bool = False, maxproducers: int = 4):
+    count = 200 if quick else 2000
+    for name, queuekwargs in _VARIANTS.items():
+        p50, p99 = roundtrip(queuekwargs, count)
+        results.add(f"queue.{name}.roundtrip.p50", p50, 'us')
+        results.add(f"queue.{name}.roundtrip.p99", p99, 'us')
+        producers = 1
+        while producers <= maxproducers:
+            results.add(f"queue.{name}.throughput.{producers}p", throughput(queuekwargs, producers, count * 5),
+                        'msg/s', HIGHER)
+            producers *= 2
+
+
+if __name__ == '__main__':
+    out = Results()
+    benchmarks(out)
+    report(out.metrics)
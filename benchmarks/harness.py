@@ -0,0 +1,112 @@
+"""The machinery shared by the benchmark suite: timing helpers, machine readable results and the comparison with a
+saved baseline"""
+import json
+import os
+import platform
+import sys
+import time
+import timeit
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+LOWER = 'lower'
+HIGHER = 'higher'
+# Relative change tolerated before a result counts as a regression
+TOLERANCE = 0.2
+
+
+# --------------------
+# Timing helpers
+# --------------------
+
+
+def percall(func: Callable, number: int, repeat: int = 5) -> float:
+    """The best time in ns of a single call of func, over repeat runs of number calls each"""
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number * 1e9
+
+
+def percentiles(samples: List[float], *quantiles: float) -> Tuple[float, ...]:
+    ordered = sorted(samples)
+    return tuple(ordered[min(int(q * len(ordered)), len(ordered) - 1)] for q in quantiles)
+
+
+def waituntil(condition: Callable[[], bool], timeout: float = 30.0, step: float = 0.001):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise TimeoutError("The benchmark didn't complete in time")
+        time.sleep(step)
+
+
+# --------------------
+# Results
+# --------------------
+
+
+class Results:
+    """Collects the metrics of a run. Every metric has a unit and a direction, telling whether lower or higher values
+    are better"""
+    __slots__ = ('__metrics',)
+
+    def __init__(self):
+        self.__metrics: Dict[str, dict] = {}
+
+    @property
+    def metrics(self) -> Dict[str, dict]:
+        return dict(self.__metrics)
+
+    def add(self, name: str, value: float, unit: str, better: str = LOWER):
+        if better not in (LOWER, HIGHER):
+            raise ValueError(f"Unknown direction {better}")
+        self.__metrics[name] = {'value': value, 'unit': unit, 'better': better}
+
+    def todict(self, quick: bool) -> dict:
+        return {'meta': {'python': platform.python_version(),
+                         'implementation': platform.python_implementation(),
+                         'platform': platform.platform(),
+                         'cpus': os.cpu_count(),
+                         'date': datetime.now().isoformat(timespec='seconds'),
+                         'quick': quick},
+                'metrics': self.metrics}
+
+
+def compare(metrics: Dict[str, dict], baseline: Dict[str, dict], tolerance: float = TOLERANCE) -> List[dict]:
+    """Compares the metrics of a run with the baseline ones, returning a row for every metric found in both. A row
+    is a regression when the metric got worse by more than tolerance, relatively to the baseline"""
+    rows = []
+    for name, metric in metrics.items():
+        reference = baseline.get(name)
+        if reference is None or not reference['value']:
+            continue
+        change = (metric['value'] - reference['value']) / reference['value']
+        worsening = change if metric['better'] == LOWER else -change
+        rows.append({'name': name, 'value': metric['value'], 'baseline': reference['value'], 'unit': metric['unit'],
+                     'change': change, 'regression': worsening > tolerance})
+    return rows
+
+
+def load(path: str) -> dict:
+    with open(path) as file:
+        return json.load(file)
+
+
+def dump(data: dict, path: Optional[str]):
+    """Writes data as json to path, or to stdout if path is None or '-'"""
+    if path is None or path == '-':
+        json.dump(data, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+        return
+    with open(path, 'w') as file:
+        json.dump(data, file, indent=2)
+        file.write('\n')
+
+
+def report(metrics: Dict[str, dict], rows: Optional[List[dict]] = None, stream=sys.stderr):
+    """Prints a human readable table of the metrics, with their change against the baseline if rows are given"""
+    changes = {row['name']: row for row in rows or ()}
+    for name, metric in metrics.items():
+        line = f"{name:<48} {metric['value']:>14,.1f} {metric['unit']:<8}"
+        row = changes.get(name)
+        if row is not None:
+            line += f" {row['change']:+8.1%}{'  REGRESSION' if row['regression'] else ''}"
+        print(line, file=stream)
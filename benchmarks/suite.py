@@ -0,0 +1,69 @@
+"""Runs the benchmark suite, writes its results as json and compares them with a saved baseline.
+
+    PYTHONPATH=src python benchmarks/suite.py --output results.json
+    PYTHONPATH=src python benchmarks/suite.py --save-baseline benchmarks/baseline.json
+    PYTHONPATH=src python benchmarks/suite.py --baseline benchmarks/baseline.json
+
+With a baseline the exit status is 1 when a metric got worse than the tolerance allows. Baselines only make sense on
+the machine that recorded them"""
+import argparse
+import fnmatch
+import sys
+
+import bench_batching
+import bench_broadcast
+import bench_construction
+import bench_delegating
+import bench_dispatch
+import bench_fanin
+import bench_journal
+import bench_messages
+import bench_queues
+from harness import Results, TOLERANCE, compare, dump, load, report
+
+BENCHMARKS = {'messages': bench_messages.benchmarks,
+              'queues': bench_queues.benchmarks,
+              'dispatch': bench_dispatch.benchmarks,
+              'fanin': bench_fanin.benchmarks,
+              'broadcast': bench_broadcast.benchmarks,
+              'delegating': bench_delegating.benchmarks,
+              'batching': bench_batching.benchmarks,
+              'journal': bench_journal.benchmarks,
+              'construction': bench_construction.benchmarks}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--quick', action='store_true', help="fewer iterations and smaller fan-ins")
+    parser.add_argument('--only', default='*', help="glob of the benchmark groups to run, among: "
+                                                     + ', '.join(BENCHMARKS))
+    parser.add_argument('--output', help="where the json results are written, '-' for stdout")
+    parser.add_argument('--baseline', help="json results of a previous run to compare with")
+    parser.add_argument('--save-baseline', help="write the json results here, to be used as a baseline")
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE,
+                        help="relative worsening tolerated before a metric counts as a regression")
+    args = parser.parse_args(argv)
+    results = Results()
+    for name, benchmarks in BENCHMARKS.items():
+        if fnmatch.fnmatch(name, args.only):
+            print(f"Running {name}", file=sys.stderr)
+            benchmarks(results, quick=args.quick)
+    data = results.todict(args.quick)
+    if args.output:
+        dump(data, args.output)
+    if args.save_baseline:
+        dump(data, args.save_baseline)
+    if not args.baseline:
+        report(results.metrics)
+        return 0
+    rows = compare(results.metrics, load(args.baseline)['metrics'], args.tolerance)
+    report(results.metrics, rows)
+    regressions = [row['name'] for row in rows if row['regression']]
+    if regressions:
+        print(f"{len(regressions)} regressions: {', '.join(regressions)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,112 @@
+import time
+from typing import Optional, List
+
+from theater.core.constants import BATCH_MAXSIZE, BATCH_MAXDELAY
+from theater.core.errors import IllegalValueException
+from theater.core.messages import Message, MessageBatch, ProducerQueue, CONTROL_SIGNALS
+from theater.core.timers import TimerWheel, Timer
+
+__all__ = ['MessageBatcher']
+
+
+# --------------------
+# Module classes
+# --------------------
+
+
+class MessageBatcher:
+    """Sends messages on a ProducerQueue in MessageBatches, so that a high rate stream is pickled (or encoded) and
+    written once per batch instead of once per message. A batch is sent as soon as it holds maxsize messages, or once
+    its oldest message waited maxdelay seconds: that's checked at every send and, if the batcher has a TimerWheel
+    (e.g. the _timers of the component that sends), by a timer as well. A message with a control signal is never held:
+    the pending batch is sent before it, so that the order is kept. A batch of a single message travels as a plain
+    message. A batcher isn't thread safe: a single thread sends on it and advances its wheel"""
+    __slots__ = ('__queue', '__maxsize', '__maxdelay', '__timers', '__timeout', '__pending', '__oldest', '__timer',
+                 '__batches')
+
+    # --------------------
+    # MessageBatcher constructor
+    # --------------------
+
+    def __init__(self,
+                 queue: ProducerQueue,
+                 maxsize: int = BATCH_MAXSIZE,
+                 maxdelay: float = BATCH_MAXDELAY,
+                 timers: Optional[TimerWheel] = None,
+                 timeout: Optional[float] = None):
+        """
+        Builds a batcher with nothing pending
+        :param queue: The queue the batches are sent on
+        :param maxsize: The messages of a full batch
+        :param maxdelay: The seconds a message may wait for the others of its batch
+        :param timers: Where the batcher schedules the flush of a batch that doesn't fill up in time
+        :param timeout: The seconds a flush waits for room in the queue. None waits forever
+        """
+        if not isinstance(queue, ProducerQueue) or (timers is not None and not isinstance(timers, TimerWheel)):
+            raise TypeError()
+        if not isinstance(maxsize, int) or maxsize < 1:
+            raise IllegalValueException(f"A batch must hold at least a message, got {maxsize}")
+        if maxdelay < 0:
+            raise IllegalValueException(f"A delay can't be negative, got {maxdelay}")
+        self.__queue = queue
+        self.__maxsize = maxsize
+        self.__maxdelay = maxdelay
+        self.__timers = timers
+        self.__timeout = timeout
+        self.__pending: List[Message] = []
+        self.__oldest = 0.0
+        self.__timer: Optional[Timer] = None
+        self.__batches = 0
+
+    # --------------------
+    # MessageBatcher public properties
+    # --------------------
+
+    @property
+    def queue(self) -> ProducerQueue:
+        return self.__queue
+
+    @property
+    def pending(self) -> int:
+        """The messages waiting for their batch to be sent"""
+        return len(self.__pending)
+
+    @property
+    def batches(self) -> int:
+        """The MessageBatches sent so far, plain messages excluded"""
+        return self.__batches
+
+    # --------------------
+    # MessageBatcher public methods
+    # --------------------
+
+    def send(self, msg: Message):
+        """Adds msg to the pending batch, sending the batch if it's full or its oldest message waited enough"""
+        if msg.signal in CONTROL_SIGNALS:
+            self.flush()
+            self.__queue.put(msg, True, self.__timeout)
+            return
+        pending = self.__pending
+        pending.append(msg)
+        if len(pending) == 1:
+            self.__oldest = time.monotonic()
+            if self.__timers is not None:
+                self.__timer = self.__timers.schedule(self.__maxdelay, self.flush)
+        if len(pending) >= self.__maxsize or time.monotonic() - self.__oldest >= self.__maxdelay:
+            self.flush()
+
+    def flush(self) -> int:
+        """Sends the pending batch right away, returning how many messages it held"""
+        if self.__timer is not None:
+            self.__timer.cancel()
+            self.__timer = None
+        pending = self.__pending
+        if not pending:
+            return 0
+        self.__pending = []
+        if len(pending) == 1:
+            self.__queue.put(pending[0], True, self.__timeout)
+        else:
+            self.__queue.put(MessageBatch(pending), True, self.__timeout)
+            self.__batches += 1
+        return len(pending)
@@ -1,64 +1,29 @@
-import multiprocessing
+import math
 import time
 from abc import ABC, abstractmethod
-from concurrent.futures.thread import ThreadPoolExecutor
-from datetime import datetime
-from queue import Full, Empty
-from typing import Union
-
-import attr
-
-from theater.core.components.constants import INTERRUPTED_STATUS, IDLE_STATUS, MSGHANDLING_STATUS
+from concurrent.futures import Executor
+from datetime import datetime, timedelta
+from queue import Empty
+from time import perf_counter_ns
+from typing import Union, Optional, Iterator, Tuple
+
+from theater.core.components.constants import DELEGATING_STATUS, PauseMode, ExecutorKind, MusicianState
+from theater.core.components.executors import TrackingExecutor, buildexecutor
+from theater.core.components.skeleton import ComponentSkeleton, MusicianSkeleton, handles
+from theater.core.components.status import StatusTracker
 from theater.core.constants import Signal, MsgType
 from theater.core.errors import IllegalValueException, ScoreEnd
 from theater.core.messages import Message, Status, ProducerQueue, ConsumerQueue
 
-__all__ = ['BaseComponent', 'BaseMusician', 'DelegatingMusician']
-
-
-class BaseComponent(ABC):
-    """A component handles the execution of a recurring task that accepts external input in the form of Messages"""
-    __slots__ = ('__actorname', '__mq', '__pausetime')
+__all__ = ['BaseComponent', 'BaseMusician', 'DelegatingMusician', 'handles']
 
-    # --------------------
-    # BaseComponent Constructor
-    # --------------------
+# The tracked state of every status string that has one, for the DelegatingMusician._status setter
+_STATES = {state.value: state for state in MusicianState}
 
-    def __init__(self,
-                 name: str,
-                 mpq: ProducerQueue,
-                 pausetime: int,
-                 *args, **kwargs):
-        """
-        Builds the essential skeleton for a Component
-        :param name: The name assigned to this component. A None name raises an IllegalValueException
-        :param mpq: The multiprocessing.Queue from which the component receives messages
-        :param pausetime: The number of ticks in which the component sleeps while polling the internal queue. 1 tick
-        should be very close to 1 second
-        """
-        if not name:
-            raise IllegalValueException("Can't create an unnamed actor")
-        self.__actorname = name
-        if mpq and not isinstance(mpq, ProducerQueue):
-            raise TypeError()
-        self.__mq = mpq
-        self.__pausetime = pausetime
-
-    # --------------------
-    # BaseComponent protected properties
-    # --------------------
-
-    @property
-    def _actorname(self):
-        return self.__actorname
-
-    @property
-    def _mq(self):
-        return self.__mq
 
-    @property
-    def _pausetime(self):
-        return self.__pausetime
+class BaseComponent(ComponentSkeleton, ABC):
+    """A component handles the execution of a recurring task that accepts external input in the form of Messages"""
+    __slots__ = ()
 
     # --------------------
     # BaseComponent public methods
@@ -66,47 +31,54 @@ class BaseComponent(ABC):
 
     def run(self):
         """Pauses and executes custom code in an endless cycle, till an Exception interrupts it"""
-        while 1:
-            self._pause()
-            self._onpauseend()
+        self._startscore()
+        try:
+            while 1:
+                self._pause()
+                self._endpause()
+        finally:
+            self._endscore()
 
     # --------------------
     # BaseComponent protected methods
     # --------------------
 
     def _handlemessage(self, msg: Message) -> Union[Signal, None]:
-        """Reads a Signal in a message, than redirects the handling to a specialized method. Returns a Signal or None"""
-        msgsignal = msg.signal
-        if msgsignal is Signal.BEAT:
-            return self._handlebeat(msg)
-        elif msgsignal is Signal.TRIGGER:
-            return self._handletrigger(msg)
-        elif msgsignal is Signal.UPDATE:
-            return self._handleupdate(msg)
-        elif msgsignal is Signal.INTERRUPT:
-            return self._handleinterrupt(msg)
-        elif msgsignal is Signal.CREATE:
-            return self._handlecreate(msg)
-        elif msgsignal is Signal.KILL:
-            return self._handlekill(msg)
-        else:
+        """Reads a Signal in a message, than redirects the handling to the method registered for it in the class
+        dispatch table. Returns a Signal or None"""
+        handler = self._dispatchtable.get(msg.signal)
+        if handler is None:
             return None
+        metrics = self._metrics
+        if metrics is None:
+            return handler(self, msg)
+        start = perf_counter_ns()
+        try:
+            return handler(self, msg)
+        finally:
+            metrics.recordhandled(msg.signal, perf_counter_ns() - start)
 
+    @handles(Signal.BEAT)
     def _handlebeat(self, _: Message) -> Union[Signal, None]:
         return Signal.BEAT
 
+    @handles(Signal.TRIGGER)
     def _handletrigger(self, _: Message) -> Union[Signal, None]:
         return Signal.TRIGGER
 
+    @handles(Signal.UPDATE)
     def _handleupdate(self, _: Message) -> Union[Signal, None]:
         return Signal.UPDATE
 
+    @handles(Signal.INTERRUPT)
     def _handleinterrupt(self, _: Message) -> Union[Signal, None]:
         return Signal.INTERRUPT
 
+    @handles(Signal.CREATE)
     def _handlecreate(self, _: Message) -> Union[Signal, None]:
         return Signal.CREATE
 
+    @handles(Signal.KILL)
     def _handlekill(self, _: Message) -> Union[Signal, None]:
         return Signal.KILL
 
@@ -114,6 +86,20 @@ class BaseComponent(ABC):
         """Executes code right before an interruption caused by a Signal INTERRUPT returned by _handlemessage"""
         pass
 
+    def _endpause(self, *args, **kwargs):
+        """Called by whoever drives the component every time a pause ends. It samples the inbox depth, than runs
+        _onpauseend with the given arguments, timing it"""
+        metrics = self._metrics
+        if metrics is None:
+            self._onpauseend(*args, **kwargs)
+            return
+        self._recorddepth()
+        start = perf_counter_ns()
+        try:
+            self._onpauseend(*args, **kwargs)
+        finally:
+            metrics.recordpauseend(perf_counter_ns() - start)
+
     @abstractmethod
     def _onpauseend(self, *args, **kwargs):
         """Does something after the pause period, than gets scheduled again"""
@@ -123,61 +109,70 @@ class BaseComponent(ABC):
     # BaseComponent private methods
     # --------------------
 
-    def _poll(self) -> Union[Signal, None]:
-        """Polls the internal queue. If a message is found, it's handled. It returns a Signal on a succesful
-        message handling, or None if nothing have been processed/something went wrong"""
+    def _inbox(self, timeout: float = 0) -> Iterator[Message]:
+        """Yields up to _drainsize messages from the internal queue. Only the first one is waited for, for at most
+        timeout seconds; the others are yielded only if they are already queued. On a queue with lanes every message
+        is taken from the control lane first, so an INTERRUPT never waits behind a data backlog"""
         try:
-            msg = self._mq.get_nowait()
-            return self._handlemessage(msg)
+            yield self._mq.get(True, timeout) if timeout > 0 else self._mq.get_nowait()
+            drained = 1
+            while self._drainsize is None or drained < self._drainsize:
+                yield self._mq.get_nowait()
+                drained += 1
         except Empty:
-            return None
-
-    def _pause(self):
-        """The components polls the internal queue, than sleeps for 1 second. This happens for _pausetime ticks"""
-        for i in range(self._pausetime):
-            sig = self._poll()
+            return
+
+    def _poll(self, timeout: float = 0) -> Union[Signal, None]:
+        """Polls the internal queue. Every message found is handled in order, and an INTERRUPT stops the batch
+        right away. It returns the Signal of the last handled message, or None if nothing have been processed/something
+        went wrong. A positive timeout makes the poll block for at most timeout seconds while waiting for a message.
+        The handled messages are acknowledged to the journal of the queue, if it has one"""
+        sig = None
+        productive = False
+        for msg in self._inbox(timeout):
+            productive = True
+            sig = self._handlemessage(msg)
             if sig is Signal.INTERRUPT:
-                self._interrupthook()
-                raise ScoreEnd("Interrupted by INTERRUPT Message")
-            time.sleep(1)
+                break
+        self._recordpoll(productive)
+        return sig
 
-
-class BaseMusician(BaseComponent, ABC):
+    def _pause(self):
+        """Waits for _pausetime seconds while handling incoming messages, following the component's _pausemode. The
+        component's timers, if any, fire meanwhile: on time in DEADLINE and ADAPTIVE mode, once per tick in TICK
+        mode"""
+        if self._pausemode is not PauseMode.TICK:
+            self._pauseuntil(time.monotonic() + self._pausetime)
+        else:
+            for i in range(math.ceil(self._pausetime)):
+                self._checksignal(self._poll())
+                self._advancetimers()
+                time.sleep(1)
+
+    def _pauseuntil(self, deadline: float):
+        """Blocks on the internal queue till the deadline (a time.monotonic value), handling every message as soon
+        as it arrives and firing the timers as they're due. With a PollPolicy, a poll blocks for at most the wait it
+        tells"""
+        remaining = deadline - time.monotonic()
+        while remaining > 0:
+            sig = self._poll(self._nextwait(remaining))
+            self._recordwait()
+            self._checksignal(sig)
+            remaining = deadline - time.monotonic()
+        self._advancetimers()
+
+    def _checksignal(self, sig: Union[Signal, None]):
+        """Ends the score if the handled message was an INTERRUPT"""
+        if sig is Signal.INTERRUPT:
+            self._interrupthook()
+            raise ScoreEnd("Interrupted by INTERRUPT Message")
+
+
+class BaseMusician(BaseComponent, MusicianSkeleton, ABC):
     """A Musician is a "Conducted" component, meaning that he's able to send messages of it's own to it's manager.
-    It stores the time of its creation for detailed heartbeats"""
-    __slots__ = ('__conductorsq', '__starttime')
-
-    # --------------------
-    # BaseMusician constructor
-    # --------------------
-
-    def __init__(self,
-                 name: str,
-                 mpq: ProducerQueue,
-                 pausetime: int,
-                 conductorq: ConsumerQueue,
-                 *args, **kwargs):
-        """
-        extends theather.core.components.abc.BaseComponent
-        :param conductorq: The queue used by the Musician to send messages
-        """
-        super().__init__(name, mpq, pausetime, *args, **kwargs)
-        if conductorq and not isinstance(conductorq, ConsumerQueue):
-            raise TypeError()
-        self.__conductorsq = conductorq
-        self.__starttime = datetime.now()
-
-    # --------------------
-    # BaseMusician protected properties
-    # --------------------
-
-    @property
-    def _conductorsq(self):
-        return self.__conductorsq
-
-    @property
-    def _starttime(self):
-        return self.__starttime
+    It stores the time of its creation for detailed heartbeats. Messages that don't fit the conductor's queue are
+    handled by an Outbox, according to its overflow policy"""
+    __slots__ = ()
 
     # --------------------
     # BaseMusician protected methods
@@ -186,47 +181,26 @@ class BaseMusician(BaseComponent, ABC):
     def _handlebeat(self, msg: Message) -> Union[Signal, None]:
         """It sends a BEAT message using the _conductorq if the message body is NONE or STATUS. The answer
         depends on the body type of the incoming message"""
-        msgtype = msg.type
-        if msgtype is MsgType.NONE:
-            self._answerconductor(Signal.BEAT, MsgType.NONE, None)
-            return Signal.BEAT
-        elif msgtype is MsgType.STATUS:
-            newbody = attr.evolve(msg.body,
-                                  status="Running", time=datetime.now(),
-                                  statustime=self._starttime, statusmessage=None)
-            self._answerconductor(Signal.BEAT, MsgType.STATUS, newbody)
-            return Signal.BEAT
-        else:
-            return None
+        return self._answerbeat(msg)
 
-    def _catchsendexception(self, exc: Exception):
-        pass
+    def _poll(self, timeout: float = 0) -> Union[Signal, None]:
+        """extends BaseComponent._poll. It ships the messages left pending by the outbox before polling"""
+        self._flushoutbox()
+        return super()._poll(timeout)
 
     def _interrupthook(self):
         """Sends a detailed BEAT message, indicating that this Musician has been interrupted"""
-        self._answerconductor(Signal.BEAT, MsgType.STATUS, Status(reqtime=None,
-                                                                  status=INTERRUPTED_STATUS,
-                                                                  time=datetime.now(),
-                                                                  statustime=datetime.now(),
-                                                                  statusmessage="End of actors execution"))
-
-    def _answerconductor(self, msgsignal: Signal, msgtype: MsgType, msgbody):
-        """Handles creation and shipping of a message toward the Musician's _conductorsq"""
-        msg = Message(sender=self.__actorname,
-                      signal=msgsignal,
-                      type=msgtype,
-                      body=msgbody)
-        try:
-            self._conductorsq.put_nowait(msg)
-        except Full as e:
-            self._catchsendexception(e)
+        self._answerinterrupt()
 
 
 class DelegatingMusician(BaseMusician, ABC):
-    """A Musician that delegates his execution logic to a thread of its own. Since it's 'free' while executing
-    he's able to handle messages in every moment and it can also kill tasks. Also he retains a customized status,
-    an - optional - description of it and the time in which the status changed"""
-    __slots__ = ('__status', '__statusdetail', '__statustime')
+    """A Musician that delegates his execution logic to an executor: by default a thread of its own, but also a pool
+    of threads or processes, or an executor shared with other musicians. Since it's 'free' while executing he's able
+    to handle messages in every moment and it can also kill tasks. Also he retains a customized status,
+    an - optional - description of it and the time in which the status changed. They're kept by a StatusTracker and
+    rendered only when a STATUS beat asks for them"""
+    __slots__ = ('__tracker', '__executor', '__executorkind', '__maxworkers',
+                 '__sharedexecutor')
 
     # --------------------
     # DelegatingMusician Constructor
@@ -234,18 +208,32 @@ class DelegatingMusician(BaseMusician, ABC):
 
     def __init__(self,
                  name: str,
-                 mpq: ProducerQueue,
-                 pausetime: int,
-                 conductorq: ConsumerQueue,
+                 mpq: ConsumerQueue,
+                 pausetime: Union[int, float],
+                 conductorq: ProducerQueue,
                  *args,
+                 executor: Optional[Executor] = None,
+                 executorkind: ExecutorKind = ExecutorKind.THREAD,
+                 maxworkers: int = 1,
                  **kwargs):
         """
         extends theather.core.components.abc.BaseMusician
+        :param executor: An executor shared with others. It's never shut down by the musician
+        :param executorkind: The kind of executor built by the musician when no executor is given
+        :param maxworkers: The number of workers of the executor built by the musician
         """
         super().__init__(name, mpq, pausetime, conductorq, *args, **kwargs)
-        self.__status = None
-        self.__statusdetail = None
-        self.__statustime = None
+        self.__tracker = StatusTracker()
+        if executor is not None and not isinstance(executor, Executor):
+            raise TypeError()
+        if not isinstance(executorkind, ExecutorKind):
+            raise IllegalValueException(f"Unknown executor kind {executorkind}")
+        if not isinstance(maxworkers, int) or maxworkers < 1:
+            raise IllegalValueException(f"An executor needs at least a worker, got {maxworkers}")
+        self.__sharedexecutor = executor
+        self.__executorkind = executorkind
+        self.__maxworkers = maxworkers
+        self.__executor = None
 
     # --------------------
     # DelegatingMusician protected properties
@@ -253,77 +241,134 @@ class DelegatingMusician(BaseMusician, ABC):
 
     @property
     def _status(self) -> str:
-        return self.__status
+        return self.__tracker.status()
 
     @_status.setter
     def _status(self, value: str):
-        self.__status = value
+        self.__tracker.transition(_STATES.get(value, value))
 
     @property
     def _statusdetail(self) -> Union[str, None]:
-        return self.__statusdetail
+        detail = self.__tracker.detail
+        return f"Running since {self._starttime}" if detail is None else detail
 
     @_statusdetail.setter
     def _statusdetail(self, value: Union[str, None]):
-        self.__statusdetail = value
+        self.__tracker.detail = value
 
     @property
     def _statustime(self) -> datetime:
-        return self.__statustime
+        return self.__tracker.statustime()
 
     @_statustime.setter
     def _statustime(self, _: datetime):
-        self.__statustime = datetime.now()
+        self.__tracker.touch()
 
-    # --------------------
-    # DelegatingMusician public methods
-    # --------------------
+    @property
+    def _statustracker(self) -> StatusTracker:
+        return self.__tracker
 
-    def run(self):
-        with ThreadPoolExecutor(max_workers=1) as executor:
-            while 1:
-                # Status reset
-                self._status = IDLE_STATUS
-                self._statusdetail = f"Running since {super()._starttime}"
-                self._statustime = datetime.now()
-                # Execution
-                self._pause()
-                self._onpauseend(executor=executor)
+    @property
+    def _executor(self) -> Optional[TrackingExecutor]:
+        """The executor given to _onpauseend, while the musician runs"""
+        return self.__executor
 
     # --------------------
     # DelegatingMusician protected methods
     # --------------------
 
+    def _startscore(self):
+        """extends BaseComponent._startscore. It opens the executor and resets the status"""
+        self._openexecutor()
+        self._resetstatus()
+
+    def _endpause(self, *args, **kwargs):
+        """extends BaseComponent._endpause. It hands the executor to _onpauseend, than resets the status"""
+        super()._endpause(*args, executor=self._executor, **kwargs)
+        self._resetstatus()
+
+    def _metricssnapshot(self) -> Optional[dict]:
+        """extends BaseComponent._metricssnapshot. It adds the tasks in flight, their wait for a worker and the last
+        status transitions"""
+        snapshot = super()._metricssnapshot()
+        executor = self._executor
+        if snapshot is not None and executor is not None:
+            queuewait = executor.queuewait
+            snapshot['executor'] = {'inflight': executor.inflight,
+                                    'queuewait': None if queuewait is None else queuewait.snapshot()}
+        if snapshot is not None:
+            snapshot['status'] = self.__tracker.history()
+        return snapshot
+
+    def _endscore(self):
+        """extends BaseMusician._endscore. It closes the executor"""
+        self._closeexecutor()
+        super()._endscore()
+
+    def _resetstatus(self):
+        """Goes back to IDLE, dropping the custom detail. It costs nothing when the musician is idle already"""
+        tracker = self.__tracker
+        tracker.transition(MusicianState.IDLE)
+        tracker.detail = None
+
+    def _openexecutor(self) -> TrackingExecutor:
+        """Builds - or wraps the shared - executor, tracking every task submitted to it"""
+        if self.__sharedexecutor is not None:
+            self.__executor = TrackingExecutor(self.__sharedexecutor, owned=False)
+        else:
+            self.__executor = TrackingExecutor(buildexecutor(self.__executorkind, self.__maxworkers), owned=True)
+        return self.__executor
+
+    def _closeexecutor(self):
+        """Shuts the executor down, waiting for its tasks, unless it's a shared one"""
+        if self.__executor is not None:
+            self.__executor.shutdown(wait=True)
+            self.__executor = None
+
+    def _describestatus(self) -> Tuple[str, Optional[str]]:
+        """The status and detail sent with a STATUS beat. They account for the delegated tasks still in flight"""
+        status, detail = self._status, self._statusdetail
+        inflight = self.__executor.inflight if self.__executor is not None else 0
+        if inflight:
+            if self.__tracker.state is MusicianState.IDLE:
+                status = DELEGATING_STATUS
+            since = datetime.now() - timedelta(seconds=time.monotonic() - (self.__executor.oldest or time.monotonic()))
+            tasks = f"{inflight} tasks in flight, the oldest since {since}"
+            detail = f"{detail} ({tasks})" if detail else tasks
+        return status, detail
+
     def _handlebeat(self, msg: Message) -> Union[Signal, None]:
         """extends BaseMusician._handlebeat. It adds the status states to the STATUS beat"""
         msgtype = msg.type
         if msgtype is MsgType.NONE:
-            self._answerconductor(Signal.BEAT, MsgType.NONE, None)
+            self._reply(msg, Signal.BEAT, MsgType.NONE, None, trusted=True)
             return Signal.BEAT
         elif msgtype is MsgType.STATUS:
-            self._answerconductor(Signal.BEAT, MsgType.STATUS, Status(reqtime=None,
-                                                                      status=self._status,
-                                                                      time=datetime.now(),
-                                                                      statustime=self._statustime,
-                                                                      statusmessage=self._statusdetail))
+            status, detail = self._describestatus()
+            self._reply(msg, Signal.BEAT, MsgType.STATUS, Status.trusted(reqtime=msg.body.reqtime,
+                                                                         status=status,
+                                                                         time=datetime.now(),
+                                                                         statustime=self._statustime,
+                                                                         statusmessage=detail),
+                        trusted=True, extension=self._beatextension(msg))
             return Signal.BEAT
         else:
             return None
 
-    def _poll(self) -> Union[Signal, None]:
-        """extends BaseComponent._poll. It adds status handling to its process"""
+    def _inbox(self, timeout: float = 0) -> Iterator[Message]:
+        """extends BaseComponent._inbox. It marks the musician as busy with every message it yields"""
+        tracker = self.__tracker
+        for msg in super()._inbox(timeout):
+            tracker.transition(MusicianState.HANDLING)
+            yield msg
+
+    def _poll(self, timeout: float = 0) -> Union[Signal, None]:
+        """extends BaseMusician._poll. It resets the status once the messages are handled"""
         try:
-            msg = self._mq.get_nowait()
-            self._status = MSGHANDLING_STATUS
-            self._statustime = datetime.now()
-            return self._handlemessage(msg)
-        except Empty:
-            return None
+            return super()._poll(timeout)
         finally:
-            if self._status is not IDLE_STATUS:
-                self._status = IDLE_STATUS
-                self._statusdetail = f"Running since {super()._starttime}"
-                self._statustime = datetime.now()
+            if self.__tracker.state is not MusicianState.IDLE:
+                self._resetstatus()
 
     @abstractmethod
     def _onpauseend(self, executor=None, *args, **kwargs):
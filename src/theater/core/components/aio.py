@@ -0,0 +1,273 @@
+import asyncio
+import inspect
+import math
+from abc import ABC, abstractmethod
+from queue import Empty
+from time import perf_counter_ns
+from typing import Union, Optional, Iterable, List
+
+from theater.core.components.constants import ASYNC_MINWAIT, ASYNC_MAXWAIT, PauseMode
+from theater.core.components.skeleton import ComponentSkeleton, MusicianSkeleton, handles
+from theater.core.constants import Signal
+from theater.core.errors import ScoreEnd
+from theater.core.messages import Message, ConsumerQueue
+
+__all__ = ['AsyncConsumer', 'AsyncComponent', 'AsyncMusician', 'perform']
+
+
+# --------------------
+# Module classes
+# --------------------
+
+
+class AsyncConsumer:
+    """Reads a ConsumerQueue from an event loop. When the transport exposes waitable connections the loop watches
+    them, otherwise the queue is polled with growing sleeps. Only one AsyncConsumer may read a given queue"""
+    __slots__ = ('__queue',)
+
+    def __init__(self, queue: ConsumerQueue):
+        if not isinstance(queue, ConsumerQueue):
+            raise TypeError()
+        self.__queue = queue
+
+    async def get(self, timeout: Optional[float] = None):
+        """Returns the next item of the queue, waiting at most timeout seconds for it. Raises Empty on timeout"""
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        wait = ASYNC_MINWAIT
+        while 1:
+            try:
+                return self.__queue.get_nowait()
+            except Empty:
+                pass
+            remaining = None if deadline is None else deadline - loop.time()
+            if remaining is not None and remaining <= 0:
+                raise Empty
+            waitables = self.__queue.waitables
+            if waitables is not None:
+                await self.__readable(loop, [waitable.fileno() for waitable in waitables], remaining)
+            else:
+                await asyncio.sleep(wait if remaining is None else min(wait, remaining))
+                wait = min(wait * 2, ASYNC_MAXWAIT)
+
+    def get_nowait(self):
+        return self.__queue.get_nowait()
+
+    @staticmethod
+    async def __readable(loop: asyncio.AbstractEventLoop, fds: List[int], timeout: Optional[float]):
+        readable = loop.create_future()
+
+        def _setreadable():
+            if not readable.done():
+                readable.set_result(None)
+
+        for fd in fds:
+            loop.add_reader(fd, _setreadable)
+        try:
+            await asyncio.wait_for(readable, timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            for fd in fds:
+                loop.remove_reader(fd)
+
+
+class AsyncComponent(ComponentSkeleton, ABC):
+    """The asyncio counterpart of BaseComponent. Handlers, hooks and _onpauseend are coroutines (plain methods work
+    as handlers too), and the pause awaits the queue instead of blocking a thread, so that many components can share
+    a single event loop. Settings, metrics, timers and poll policy are the ones of BaseComponent"""
+    __slots__ = ()
+
+    # --------------------
+    # AsyncComponent Constructor
+    # --------------------
+
+    def __init__(self,
+                 name: str,
+                 mpq: ConsumerQueue,
+                 pausetime: Union[int, float],
+                 *args,
+                 pausemode: PauseMode = PauseMode.DEADLINE,
+                 **kwargs):
+        """
+        extends theather.core.components.skeleton.ComponentSkeleton
+        :param mpq: The queue from which the component receives messages. It's required
+        :param pausemode: How the pause is spent, DEADLINE by default: the pause awaits the queue, so it doesn't need
+        ticks to leave room to the other components of the loop
+        """
+        if not isinstance(mpq, ConsumerQueue):
+            raise TypeError()
+        super().__init__(name, mpq, pausetime, *args, pausemode=pausemode, **kwargs)
+
+    # --------------------
+    # AsyncComponent public methods
+    # --------------------
+
+    async def run(self):
+        """Pauses and executes custom code in an endless cycle, till an Exception interrupts it"""
+        self._startscore()
+        try:
+            while 1:
+                await self._pause()
+                await self._endpause()
+        finally:
+            self._endscore()
+
+    # --------------------
+    # AsyncComponent protected methods
+    # --------------------
+
+    async def _handlemessage(self, msg: Message) -> Union[Signal, None]:
+        """Redirects the handling of a message to the method registered for its Signal. Returns a Signal or None"""
+        handler = self._dispatchtable.get(msg.signal)
+        if handler is None:
+            return None
+        metrics = self._metrics
+        start = perf_counter_ns()
+        try:
+            out = handler(self, msg)
+            return await out if inspect.isawaitable(out) else out
+        finally:
+            if metrics is not None:
+                metrics.recordhandled(msg.signal, perf_counter_ns() - start)
+
+    @handles(Signal.BEAT)
+    async def _handlebeat(self, _: Message) -> Union[Signal, None]:
+        return Signal.BEAT
+
+    @handles(Signal.TRIGGER)
+    async def _handletrigger(self, _: Message) -> Union[Signal, None]:
+        return Signal.TRIGGER
+
+    @handles(Signal.UPDATE)
+    async def _handleupdate(self, _: Message) -> Union[Signal, None]:
+        return Signal.UPDATE
+
+    @handles(Signal.INTERRUPT)
+    async def _handleinterrupt(self, _: Message) -> Union[Signal, None]:
+        return Signal.INTERRUPT
+
+    @handles(Signal.CREATE)
+    async def _handlecreate(self, _: Message) -> Union[Signal, None]:
+        return Signal.CREATE
+
+    @handles(Signal.KILL)
+    async def _handlekill(self, _: Message) -> Union[Signal, None]:
+        return Signal.KILL
+
+    async def _interrupthook(self):
+        """Executes code right before an interruption caused by a Signal INTERRUPT returned by _handlemessage"""
+        pass
+
+    async def _endpause(self, *args, **kwargs):
+        """Awaited by run every time a pause ends. It samples the inbox depth, than awaits _onpauseend with the given
+        arguments, timing it"""
+        metrics = self._metrics
+        if metrics is None:
+            await self._onpauseend(*args, **kwargs)
+            return
+        self._recorddepth()
+        start = perf_counter_ns()
+        try:
+            await self._onpauseend(*args, **kwargs)
+        finally:
+            metrics.recordpauseend(perf_counter_ns() - start)
+
+    @abstractmethod
+    async def _onpauseend(self, *args, **kwargs):
+        """Does something after the pause period, than gets scheduled again"""
+        pass
+
+    async def _poll(self, timeout: float = 0) -> Union[Signal, None]:
+        """Awaits a message for at most timeout seconds, than handles it along with up to _drainsize - 1 messages
+        already queued. An INTERRUPT stops the batch. It returns the Signal of the last handled message, or None. The
+        handled messages are acknowledged to the journal of the queue, if it has one"""
+        reader = AsyncConsumer(self._mq)
+        try:
+            msg = await reader.get(timeout) if timeout > 0 else reader.get_nowait()
+        except Empty:
+            self._recordpoll(False)
+            return None
+        drained = 1
+        sig = await self._handlemessage(msg)
+        while sig is not Signal.INTERRUPT and (self._drainsize is None or drained < self._drainsize):
+            try:
+                msg = reader.get_nowait()
+            except Empty:
+                break
+            sig = await self._handlemessage(msg)
+            drained += 1
+        self._recordpoll(True)
+        return sig
+
+    async def _pause(self):
+        """Awaits messages for _pausetime seconds, following the component's _pausemode. TICK polls once per tick,
+        DEADLINE and ADAPTIVE handle every message as soon as it arrives. The component's timers, if any, fire
+        meanwhile, like in BaseComponent._pause"""
+        if self._pausemode is not PauseMode.TICK:
+            await self._pauseuntil(asyncio.get_running_loop().time() + self._pausetime)
+        else:
+            for i in range(math.ceil(self._pausetime)):
+                await self._checksignal(await self._poll())
+                self._advancetimers()
+                await asyncio.sleep(1)
+
+    async def _pauseuntil(self, deadline: float):
+        """Awaits the internal queue till the deadline (a loop.time value), handling every message as soon as it
+        arrives and firing the timers as they're due. With a PollPolicy, a poll awaits at most the wait it tells"""
+        loop = asyncio.get_running_loop()
+        remaining = deadline - loop.time()
+        while remaining > 0:
+            sig = await self._poll(self._nextwait(remaining))
+            self._recordwait()
+            await self._checksignal(sig)
+            remaining = deadline - loop.time()
+        self._advancetimers()
+
+    async def _checksignal(self, sig: Union[Signal, None]):
+        """Ends the score if the handled message was an INTERRUPT"""
+        if sig is Signal.INTERRUPT:
+            await self._interrupthook()
+            raise ScoreEnd("Interrupted by INTERRUPT Message")
+
+
+class AsyncMusician(AsyncComponent, MusicianSkeleton, ABC):
+    """The asyncio counterpart of BaseMusician: an AsyncComponent that answers its conductor, metrics included. An
+    Overflow.BLOCK outbox blocks the whole loop while the conductor's queue is full"""
+    __slots__ = ()
+
+    # --------------------
+    # AsyncMusician protected methods
+    # --------------------
+
+    async def _handlebeat(self, msg: Message) -> Union[Signal, None]:
+        """It sends a BEAT message using the _conductorq if the message body is NONE or STATUS"""
+        return self._answerbeat(msg)
+
+    async def _poll(self, timeout: float = 0) -> Union[Signal, None]:
+        """extends AsyncComponent._poll. It ships the messages left pending by the outbox before polling"""
+        self._flushoutbox()
+        return await super()._poll(timeout)
+
+    async def _interrupthook(self):
+        """Sends a detailed BEAT message, indicating that this Musician has been interrupted"""
+        self._answerinterrupt()
+
+
+# --------------------
+# Module functions
+# --------------------
+
+
+async def _perform(component: AsyncComponent):
+    try:
+        await component.run()
+    except ScoreEnd:
+        pass
+
+
+async def perform(components: Iterable[AsyncComponent]) -> List[BaseException]:
+    """Runs every component on the running loop till all of them end. A component ending with a ScoreEnd ends
+    quietly; other exceptions don't stop the others and are returned"""
+    results = await asyncio.gather(*(_perform(component) for component in components), return_exceptions=True)
+    return [result for result in results if isinstance(result, BaseException)]
@@ -1,3 +1,46 @@
+import enum
+
 INTERRUPTED_STATUS = 'Interrupted'
 IDLE_STATUS = 'Idle'
 MSGHANDLING_STATUS = 'Processing Message'
+DELEGATING_STATUS = 'Delegating'
+# Lower and upper bound in seconds of the sleeps used by async readers of queues that can't be waited on
+ASYNC_MINWAIT = 0.0005
+ASYNC_MAXWAIT = 0.05
+# Same bounds, for a MultiplexScheduler hosting components whose queues can't be waited on
+MULTIPLEX_MINWAIT = 0.0005
+MULTIPLEX_MAXWAIT = 0.05
+# Empty polls an AdaptivePollPolicy spins through after some activity, before it starts blocking
+ADAPTIVE_SPINS = 100
+# Shortest and longest blocking poll of an AdaptivePollPolicy. Past the longest one, polls block till the pause ends
+ADAPTIVE_MINWAIT = 0.0005
+ADAPTIVE_MAXWAIT = 0.05
+# Extension key of a STATUS BEAT asking for (and of the answer carrying) a metrics snapshot
+METRICS_KEY = 'metrics'
+# Power of two buckets of a latency histogram: the last one collects everything above 2 ** 46 ns (about 20 hours)
+HISTOGRAM_BUCKETS = 48
+# Inbox depth samples kept by a component, one per pause end
+DEPTH_SAMPLES = 64
+# Status transitions kept by a StatusTracker for diagnostics
+STATUS_HISTORY = 32
+
+
+class PauseMode(enum.Enum):
+    """Enum that contains the strategies a component can use to wait between two _onpauseend calls"""
+    TICK = 'Tick'
+    DEADLINE = 'Deadline'
+    ADAPTIVE = 'Adaptive'
+
+
+class MusicianState(enum.Enum):
+    """Enum that contains the states tracked by a StatusTracker. A value is the status sent with a STATUS beat"""
+    IDLE = IDLE_STATUS
+    HANDLING = MSGHANDLING_STATUS
+    DELEGATING = DELEGATING_STATUS
+    INTERRUPTED = INTERRUPTED_STATUS
+
+
+class ExecutorKind(enum.Enum):
+    """Enum that contains the executors a DelegatingMusician can build for its tasks"""
+    THREAD = 'Thread'
+    PROCESS = 'Process'
@@ -0,0 +1,113 @@
+import threading
+import time
+from concurrent.futures import Executor, Future, ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Optional
+
+from theater.core.components.constants import ExecutorKind
+from theater.core.components.metrics import Histogram
+from theater.core.errors import IllegalValueException
+
+__all__ = ['TrackingExecutor', 'buildexecutor']
+
+
+# --------------------
+# Module classes
+# --------------------
+
+
+class _StartProbe:
+    """Wraps a task to record when a worker thread starts it"""
+    __slots__ = ('fn', 'started')
+
+    def __init__(self, fn):
+        self.fn = fn
+        self.started = None
+
+    def __call__(self, *args, **kwargs):
+        self.started = time.monotonic_ns()
+        return self.fn(*args, **kwargs)
+
+
+class TrackingExecutor(Executor):
+    """Wraps an executor, keeping track of the futures submitted through it till they are done. Only an owned
+    executor is shut down with its wrapper, so that an executor shared among many musicians survives them.
+    On a thread pool it also measures how long the tasks wait in the executor's queue before a worker starts them"""
+    __slots__ = ('__executor', '__owned', '__inflight', '__lock', '__queuewait')
+
+    def __init__(self, executor: Executor, owned: bool):
+        if not isinstance(executor, Executor):
+            raise TypeError()
+        self.__executor = executor
+        self.__owned = owned
+        self.__inflight = {}
+        self.__lock = threading.Lock()
+        # A process pool runs the tasks elsewhere, where the start of a task can't be observed
+        self.__queuewait = Histogram() if isinstance(executor, ThreadPoolExecutor) else None
+
+    # --------------------
+    # TrackingExecutor public properties
+    # --------------------
+
+    @property
+    def executor(self) -> Executor:
+        return self.__executor
+
+    @property
+    def inflight(self) -> int:
+        """The number of submitted tasks not done yet"""
+        return len(self.__inflight)
+
+    @property
+    def oldest(self) -> Optional[float]:
+        """The time.monotonic at which the oldest task still in flight was submitted, or None"""
+        with self.__lock:
+            oldest = min((submitted for submitted, _ in self.__inflight.values()), default=None)
+        return None if oldest is None else oldest / 1e9
+
+    @property
+    def queuewait(self) -> Optional[Histogram]:
+        """The time the tasks waited for a worker, or None if the executor isn't a thread pool"""
+        return self.__queuewait
+
+    # --------------------
+    # TrackingExecutor public methods
+    # --------------------
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        probe = _StartProbe(fn) if self.__queuewait is not None else None
+        submitted = time.monotonic_ns()
+        future = self.__executor.submit(probe or fn, *args, **kwargs)
+        with self.__lock:
+            self.__inflight[future] = submitted, probe
+        future.add_done_callback(self.__done)
+        return future
+
+    def shutdown(self, wait: bool = True, **kwargs):
+        if self.__owned:
+            self.__executor.shutdown(wait, **kwargs)
+
+    # --------------------
+    # TrackingExecutor private methods
+    # --------------------
+
+    def __done(self, future: Future):
+        with self.__lock:
+            submitted, probe = self.__inflight.pop(future, (None, None))
+            if probe is not None and probe.started is not None:
+                self.__queuewait.record(max(probe.started - submitted, 0))
+
+
+# --------------------
+# Module functions
+# --------------------
+
+
+def buildexecutor(kind: ExecutorKind, maxworkers: int) -> Executor:
+    """Builds an executor of the given kind with maxworkers workers"""
+    if not isinstance(maxworkers, int) or maxworkers < 1:
+        raise IllegalValueException(f"An executor needs at least a worker, got {maxworkers}")
+    if kind is ExecutorKind.THREAD:
+        return ThreadPoolExecutor(max_workers=maxworkers)
+    elif kind is ExecutorKind.PROCESS:
+        return ProcessPoolExecutor(max_workers=maxworkers)
+    raise IllegalValueException(f"Unknown executor kind {kind}")
@@ -0,0 +1,147 @@
+import collections
+import time
+from typing import Optional, Dict, Tuple
+
+from theater.core.components.constants import HISTOGRAM_BUCKETS, DEPTH_SAMPLES
+from theater.core.constants import Signal
+
+__all__ = ['Histogram', 'ComponentMetrics']
+
+_LASTBUCKET = HISTOGRAM_BUCKETS - 1
+
+
+# --------------------
+# Module classes
+# --------------------
+
+
+class Histogram:
+    """Counts durations in nanoseconds in power of two buckets: the bucket i holds the durations shorter than 2 ** i
+    ns and not shorter than 2 ** (i - 1). Recording is a handful of integer operations, so it can stay always on"""
+    __slots__ = ('__buckets', '__total', '__max')
+
+    def __init__(self):
+        self.__buckets = [0] * HISTOGRAM_BUCKETS
+        self.__total = 0
+        self.__max = 0
+
+    # --------------------
+    # Histogram public properties
+    # --------------------
+
+    @property
+    def count(self) -> int:
+        return sum(self.__buckets)
+
+    @property
+    def total(self) -> int:
+        return self.__total
+
+    @property
+    def max(self) -> int:
+        return self.__max
+
+    # --------------------
+    # Histogram public methods
+    # --------------------
+
+    def record(self, ns: int):
+        bucket = ns.bit_length()
+        if bucket > _LASTBUCKET:
+            bucket = _LASTBUCKET
+        self.__buckets[bucket] += 1
+        self.__total += ns
+        if ns > self.__max:
+            self.__max = ns
+
+    def quantile(self, q: float) -> int:
+        """An upper bound in ns of the q quantile, 0 <= q <= 1. Never above the longest recorded duration"""
+        total = self.count
+        if not total:
+            return 0
+        threshold = q * total
+        seen = 0
+        for i, count in enumerate(self.__buckets):
+            seen += count
+            if count and seen >= threshold:
+                return min(1 << i, self.__max)
+        return self.__max
+
+    def snapshot(self) -> dict:
+        """A plain dict copy of the histogram. Buckets are keyed by their exclusive upper bound in ns"""
+        return {'count': self.count,
+                'total': self.__total,
+                'max': self.__max,
+                'p50': self.quantile(0.5),
+                'p99': self.quantile(0.99),
+                'buckets': {1 << i: count for i, count in enumerate(self.__buckets) if count}}
+
+
+class ComponentMetrics:
+    """The runtime metrics of a component: latency of the handlers per Signal, empty and productive polls, inbox depth
+    samples and duration of _onpauseend"""
+    __slots__ = ('__handled', '__emptypolls', '__productivepolls', '__depths', '__maxdepth', '__pauseends',
+                 '__created')
+
+    def __init__(self):
+        # Keyed by id(signal): hashing an Enum member runs Python code, while members are singletons anyway
+        self.__handled: Dict[int, Tuple[Signal, Histogram]] = {}
+        self.__emptypolls = 0
+        self.__productivepolls = 0
+        self.__depths = collections.deque(maxlen=DEPTH_SAMPLES)
+        self.__maxdepth = 0
+        self.__pauseends = Histogram()
+        self.__created = time.monotonic()
+
+    # --------------------
+    # ComponentMetrics public properties
+    # --------------------
+
+    @property
+    def emptypolls(self) -> int:
+        return self.__emptypolls
+
+    @property
+    def productivepolls(self) -> int:
+        return self.__productivepolls
+
+    @property
+    def pauseends(self) -> Histogram:
+        return self.__pauseends
+
+    def handled(self, signal: Signal) -> Optional[Histogram]:
+        """The latency histogram of the messages handled with signal, or None if there was none"""
+        entry = self.__handled.get(id(signal))
+        return None if entry is None else entry[1]
+
+    # --------------------
+    # ComponentMetrics public methods
+    # --------------------
+
+    def recordhandled(self, signal: Signal, ns: int):
+        entry = self.__handled.get(id(signal))
+        if entry is None:
+            entry = self.__handled[id(signal)] = signal, Histogram()
+        entry[1].record(ns)
+
+    def recordpoll(self, productive: bool):
+        if productive:
+            self.__productivepolls += 1
+        else:
+            self.__emptypolls += 1
+
+    def recorddepth(self, depth: int):
+        self.__depths.append((time.monotonic(), depth))
+        if depth > self.__maxdepth:
+            self.__maxdepth = depth
+
+    def recordpauseend(self, ns: int):
+        self.__pauseends.record(ns)
+
+    def snapshot(self) -> dict:
+        """A plain, picklable dict copy of the metrics, that can travel in a Message"""
+        return {'uptime': time.monotonic() - self.__created,
+                'handled': {signal.value: histogram.snapshot() for signal, histogram in self.__handled.values()},
+                'polls': {'empty': self.__emptypolls, 'productive': self.__productivepolls},
+                'depth': {'max': self.__maxdepth, 'samples': list(self.__depths)},
+                'pauseend': self.__pauseends.snapshot()}
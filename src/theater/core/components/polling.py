@@ -0,0 +1,79 @@
+from abc import ABC, abstractmethod
+from typing import Optional
+
+from theater.core.components.constants import ADAPTIVE_SPINS, ADAPTIVE_MINWAIT, ADAPTIVE_MAXWAIT
+from theater.core.errors import IllegalValueException
+
+__all__ = ['PollPolicy', 'AdaptivePollPolicy']
+
+
+# --------------------
+# Module classes
+# --------------------
+
+
+class PollPolicy(ABC):
+    """Decides how long a component in ADAPTIVE pause mode blocks on its queue at every poll, given how the previous
+    polls went. A policy keeps state, so every component needs its own"""
+    __slots__ = ()
+
+    @abstractmethod
+    def nextwait(self) -> Optional[float]:
+        """The seconds the next poll may block for. 0 polls without blocking, None blocks till the pause ends"""
+        pass
+
+    @abstractmethod
+    def record(self, productive: bool):
+        """Called after every poll, telling whether it handled something"""
+        pass
+
+
+class AdaptivePollPolicy(PollPolicy):
+    """Spins, then backs off to blocking waits. After a productive poll the component polls without blocking for
+    spins times, catching a burst with the lowest latency. If nothing arrives, it blocks for minwait, doubling the
+    wait at every empty poll. Once the wait would pass maxwait, every poll blocks till the pause ends, so an idle
+    component wakes up only for messages, timers and pause ends"""
+    __slots__ = ('__spins', '__minwait', '__steps', '__idle')
+
+    def __init__(self, spins: int = ADAPTIVE_SPINS, minwait: float = ADAPTIVE_MINWAIT,
+                 maxwait: float = ADAPTIVE_MAXWAIT):
+        """
+        :param spins: The empty polls that don't block, after a productive one
+        :param minwait: The seconds of the first blocking poll
+        :param maxwait: The seconds of the longest bounded poll
+        """
+        if not isinstance(spins, int) or spins < 0:
+            raise IllegalValueException(f"Spins can't be negative, got {spins}")
+        if not 0 < minwait <= maxwait:
+            raise IllegalValueException(f"Waits must be positive and ordered, got {minwait} and {maxwait}")
+        self.__spins = spins
+        self.__minwait = minwait
+        # The bounded waits are minwait * 2 ** step, for step in range(steps)
+        self.__steps = 1
+        while minwait * (1 << self.__steps) <= maxwait:
+            self.__steps += 1
+        self.__idle = 0
+
+    # --------------------
+    # AdaptivePollPolicy public properties
+    # --------------------
+
+    @property
+    def idle(self) -> int:
+        """The empty polls since the last productive one"""
+        return self.__idle
+
+    # --------------------
+    # AdaptivePollPolicy public methods
+    # --------------------
+
+    def nextwait(self) -> Optional[float]:
+        step = self.__idle - self.__spins
+        if step < 0:
+            return 0
+        if step < self.__steps:
+            return self.__minwait * (1 << step)
+        return None
+
+    def record(self, productive: bool):
+        self.__idle = 0 if productive else self.__idle + 1
@@ -0,0 +1,218 @@
+import itertools
+import time
+from multiprocessing.connection import wait
+from typing import Iterable, List, Tuple, Dict, Optional
+
+from theater.core.components.abc import BaseComponent
+from theater.core.components.constants import MULTIPLEX_MINWAIT, MULTIPLEX_MAXWAIT
+from theater.core.demux import Demultiplexer
+from theater.core.errors import ScoreEnd
+from theater.core.timers import TimerWheel, Timer
+
+__all__ = ['MultiplexScheduler']
+
+# The key the waitables of a Demultiplexer are tracked with, among the ones of the components
+_DEMUX = -1
+
+
+# --------------------
+# Module classes
+# --------------------
+
+
+class MultiplexScheduler:
+    """Hosts many unchanged BaseComponents in a single thread. Instead of running each component's own loop, a single
+    readiness loop waits on all their queues at once, polls the components whose queue became readable and ends the
+    pause of the components whose pausetime (in seconds) elapsed. Pause ends are periodic timers of a TimerWheel, that
+    the components share for their own timers too. Components whose queue can't be waited on are polled with growing
+    sleeps. The components reading a queue of a Demultiplexer are polled once it fed them, till their queue is empty"""
+    __slots__ = ('__wheel', '__pausetimers', '__components', '__counter', '__failures', '__pollwait', '__demux',
+                 '__demuxed', '__pending')
+
+    def __init__(self, components: Iterable[BaseComponent] = (), wheel: Optional[TimerWheel] = None,
+                 demux: Optional[Demultiplexer] = None):
+        """
+        :param components: The components hosted right away
+        :param wheel: The wheel shared by the hosted components. A new one by default
+        :param demux: The Demultiplexer of the inbox shared by the components, if any. It's dispatched whenever the
+        inbox is readable
+        """
+        if wheel is not None and not isinstance(wheel, TimerWheel):
+            raise TypeError()
+        if demux is not None and not isinstance(demux, Demultiplexer):
+            raise TypeError()
+        self.__wheel = wheel or TimerWheel()
+        self.__demux = demux
+        # The key of every component reading a queue of the demux, by the id of the queue
+        self.__demuxed: Dict[int, int] = {}
+        # The keys of the demuxed components with something queued, in the order they got it
+        self.__pending: Dict[int, None] = {}
+        self.__pausetimers: Dict[int, Timer] = {}
+        self.__components: Dict[int, BaseComponent] = {}
+        self.__counter = itertools.count()
+        self.__failures: List[Tuple[BaseComponent, BaseException]] = []
+        self.__pollwait = MULTIPLEX_MINWAIT
+        for component in components:
+            self.add(component)
+
+    # --------------------
+    # MultiplexScheduler public properties
+    # --------------------
+
+    @property
+    def components(self) -> Tuple[BaseComponent, ...]:
+        return tuple(self.__components.values())
+
+    @property
+    def timers(self) -> TimerWheel:
+        return self.__wheel
+
+    @property
+    def failures(self) -> List[Tuple[BaseComponent, BaseException]]:
+        """The components that ended with an exception other than ScoreEnd, with their exception"""
+        return list(self.__failures)
+
+    # --------------------
+    # MultiplexScheduler public methods
+    # --------------------
+
+    def add(self, component: BaseComponent):
+        """Starts hosting a component. Its first pause starts right away"""
+        if not isinstance(component, BaseComponent):
+            raise TypeError()
+        component._timers = self.__wheel
+        component._startscore()
+        key = next(self.__counter)
+        self.__components[key] = component
+        if self.__demux is not None and self.__demux.owns(component._mq):
+            self.__demuxed[id(component._mq)] = key
+        pausetime = max(component._pausetime, self.__wheel.resolution)
+        self.__pausetimers[key] = self.__wheel.schedule(pausetime, self.__endpause, key, period=pausetime)
+
+    def run(self) -> List[Tuple[BaseComponent, BaseException]]:
+        """Runs the hosted components till all of them end, then returns the failures"""
+        while self.__components:
+            self.step()
+        return self.failures
+
+    def step(self, maxwait: float = None):
+        """Runs a single iteration of the readiness loop, waiting at most till the nearest timer (or maxwait). The
+        timers due are fired after the wait, so that a step ends right after them"""
+        if not self.__components:
+            self.__wheel.advance()
+            return
+        timeout = self.__wheel.nexttimeout()
+        if timeout is None:
+            timeout = MULTIPLEX_MAXWAIT
+        if maxwait is not None:
+            timeout = min(timeout, maxwait)
+        waitables = {}
+        polled = []
+        demuxed = self.__demuxed
+        for key, component in self.__components.items():
+            mq = component._mq
+            if mq is not None and id(mq) in demuxed:
+                continue
+            connections = mq.waitables if mq else None
+            if connections is None:
+                polled.append(key)
+            else:
+                for connection in connections:
+                    waitables.setdefault(connection, []).append(key)
+        # The demux is dispatched when its inbox is readable or, if it can't be waited on or it holds a message
+        # waiting for room, at every step
+        dispatch = False
+        if demuxed:
+            connections = self.__demux.waitables
+            if connections is None or self.__demux.stalled:
+                dispatch = True
+            else:
+                for connection in connections:
+                    waitables.setdefault(connection, []).append(_DEMUX)
+        if polled or dispatch:
+            timeout = min(timeout, self.__pollwait)
+        if self.__pending:
+            timeout = 0
+        if waitables:
+            ready = wait(list(waitables), timeout)
+        else:
+            ready = []
+            time.sleep(timeout)
+        active = False
+        for key in dict.fromkeys(key for connection in ready for key in waitables[connection]):
+            if key == _DEMUX:
+                dispatch = True
+            else:
+                active |= self.__poll(key)
+        if dispatch:
+            active |= self.__dispatch()
+        elif self.__pending:
+            active |= self.__pollpending()
+        for key in polled:
+            active |= self.__poll(key)
+        self.__pollwait = MULTIPLEX_MINWAIT if active else min(self.__pollwait * 2, MULTIPLEX_MAXWAIT)
+        self.__wheel.advance()
+
+    # --------------------
+    # MultiplexScheduler private methods
+    # --------------------
+
+    def __poll(self, key: int) -> bool:
+        """Polls a single component. Returns whether something got handled"""
+        component = self.__components.get(key)
+        if component is None:
+            return False
+        try:
+            sig = component._poll()
+            component._checksignal(sig)
+            return sig is not None
+        except BaseException as e:
+            self.__end(key, e)
+            return True
+
+    def __dispatch(self) -> bool:
+        """Feeds the queues of the demuxed components, then polls the ones with something queued. Returns whether
+        something got handled"""
+        demuxed = self.__demuxed
+        pending = self.__pending
+        fed = self.__demux.dispatch()
+        for consumer in fed:
+            key = demuxed.get(id(consumer))
+            if key is not None:
+                pending[key] = None
+        return self.__pollpending() or bool(fed)
+
+    def __pollpending(self) -> bool:
+        """Polls the demuxed components with something queued, keeping the ones that didn't empty their queue (e.g.
+        because of their drainsize) for the next step"""
+        pending = self.__pending
+        active = False
+        for key in list(pending):
+            active |= self.__poll(key)
+            component = self.__components.get(key)
+            if component is None or component._mq.empty():
+                pending.pop(key, None)
+        return active
+
+    def __endpause(self, key: int):
+        component = self.__components.get(key)
+        if component is None:
+            return
+        try:
+            component._endpause()
+        except BaseException as e:
+            self.__end(key, e)
+
+    def __end(self, key: int, exc: BaseException):
+        self.__pausetimers.pop(key).cancel()
+        component = self.__components.pop(key)
+        self.__pending.pop(key, None)
+        if self.__demuxed.pop(id(component._mq), None) is not None:
+            self.__demux.remove(component._mq)
+        try:
+            component._endscore()
+        finally:
+            if not isinstance(exc, ScoreEnd):
+                self.__failures.append((component, exc))
+            if isinstance(exc, (KeyboardInterrupt, SystemExit)):
+                raise exc
@@ -0,0 +1,398 @@
+from datetime import datetime
+from queue import Full
+from typing import Union, Optional
+
+from theater.core.components.constants import INTERRUPTED_STATUS, METRICS_KEY, PauseMode
+from theater.core.components.metrics import ComponentMetrics
+from theater.core.components.polling import PollPolicy, AdaptivePollPolicy
+from theater.core.constants import Signal, MsgType, Overflow, OUTBOX_CAPACITY, MAX_ADDRESS, CORRELATION_KEY
+from theater.core.errors import IllegalValueException
+from theater.core.messages import Message, Status, ProducerQueue, ConsumerQueue
+from theater.core.outbox import Outbox
+from theater.core.timers import TimerWheel
+
+__all__ = ['ComponentSkeleton', 'MusicianSkeleton', 'handles', 'builddispatchtable']
+
+_ROUTES_ATTR = '_dispatchroutes'
+
+
+# --------------------
+# Module functions
+# --------------------
+
+
+def handles(*signals, msgtype: Optional[MsgType] = None):
+    """Registers the decorated method as the handler of the given signals. If msgtype is specified, the handler is
+    used only for messages with that body type, taking precedence over the handler registered for the whole signal"""
+    def decorator(func):
+        routes = getattr(func, _ROUTES_ATTR, ())
+        setattr(func, _ROUTES_ATTR, routes + tuple((signal, msgtype) for signal in signals))
+        return func
+    return decorator
+
+
+def _typeddispatcher(typedhandlers: dict, handler):
+    """Builds a handler that picks the one registered for the message's body type, falling back to handler"""
+    def dispatch(component, msg: Message):
+        typedhandler = typedhandlers.get(msg.type, handler)
+        return typedhandler(component, msg) if typedhandler else None
+    return dispatch
+
+
+def builddispatchtable(cls) -> dict:
+    """Maps every Signal to the handler registered by @handles in cls and its bases. Handlers are looked up by name,
+    so a plain override of a registered method keeps its routes. Signals with MsgType specific routes get a second
+    level of dispatch on the body type"""
+    routes = {}
+    for klass in reversed(cls.__mro__):
+        for attrname, value in vars(klass).items():
+            for route in getattr(value, _ROUTES_ATTR, ()):
+                routes[route] = attrname
+    handlers = {route: getattr(cls, attrname) for route, attrname in routes.items()}
+    table = {}
+    for signal in {route[0] for route in routes}:
+        typedhandlers = {msgtype: handler for (routesignal, msgtype), handler in handlers.items()
+                         if routesignal is signal and msgtype is not None}
+        handler = handlers.get((signal, None))
+        table[signal] = _typeddispatcher(typedhandlers, handler) if typedhandlers else handler
+    return table
+
+
+# --------------------
+# Module classes
+# --------------------
+
+
+class ComponentSkeleton:
+    """What BaseComponent and AsyncComponent share: the validated settings of a component, its dispatch table, its
+    metrics, timers and poll policy. Nothing here blocks or awaits: the pause and the polls are left to the subclasses,
+    that report to the skeleton through _recordpoll, _nextwait, _recordwait and _advancetimers"""
+    __slots__ = ('__actorname', '__address', '__mq', '__pausetime', '__pausemode', '__pollpolicy', '__drainsize',
+                 '__metrics', '__timers', '__productive')
+
+    _dispatchtable = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._dispatchtable = builddispatchtable(cls)
+
+    # --------------------
+    # ComponentSkeleton Constructor
+    # --------------------
+
+    def __init__(self,
+                 name: str,
+                 mpq: ConsumerQueue,
+                 pausetime: Union[int, float],
+                 *args,
+                 pausemode: PauseMode = PauseMode.TICK,
+                 pollpolicy: Optional[PollPolicy] = None,
+                 drainsize: Optional[int] = 1,
+                 address: Optional[int] = None,
+                 metrics: bool = True,
+                 **kwargs):
+        """
+        Builds the essential skeleton for a Component
+        :param name: The name assigned to this component. A None name raises an IllegalValueException
+        :param mpq: The multiprocessing.Queue from which the component receives messages
+        :param pausetime: The seconds, int or float, the component pauses between two _onpauseend. TICK mode polls
+        once per tick, 1 tick being very close to 1 second, so it rounds a fractional pause up to whole ticks
+        :param pausemode: How the pause is spent. TICK polls once per tick, DEADLINE blocks on the queue until a
+        message arrives or the pause window ends, ADAPTIVE is DEADLINE with the polls timed by a PollPolicy
+        :param pollpolicy: The PollPolicy of the ADAPTIVE mode. An AdaptivePollPolicy by default
+        :param drainsize: The maximum number of messages handled by a single poll. None drains everything queued
+        :param address: The int address of the component in the ActorRegistry of its score. If given, the messages
+        it sends carry the address instead of the name
+        :param metrics: Whether the component records its ComponentMetrics
+        """
+        if not name:
+            raise IllegalValueException("Can't create an unnamed actor")
+        self.__actorname = name
+        if address is not None and (address.__class__ is not int or not 0 <= address <= MAX_ADDRESS):
+            raise IllegalValueException(f"An address must be an unsigned 32 bit int, got {address}")
+        self.__address = address
+        if mpq and not isinstance(mpq, ConsumerQueue):
+            raise TypeError()
+        self.__mq = mpq
+        if not isinstance(pausemode, PauseMode):
+            raise IllegalValueException(f"Unknown pause mode {pausemode}")
+        if pausetime.__class__ not in (int, float) or pausetime < 0:
+            raise IllegalValueException(f"A pause can't last {pausetime}")
+        self.__pausetime = pausetime
+        self.__pausemode = pausemode
+        if pollpolicy is not None and (pausemode is not PauseMode.ADAPTIVE or not isinstance(pollpolicy, PollPolicy)):
+            raise IllegalValueException(f"A poll policy needs the ADAPTIVE pause mode, got {pausemode}")
+        if pausemode is PauseMode.ADAPTIVE and pollpolicy is None:
+            pollpolicy = AdaptivePollPolicy()
+        self.__pollpolicy = pollpolicy
+        if drainsize is not None and (not isinstance(drainsize, int) or drainsize < 1):
+            raise IllegalValueException(f"A poll must drain at least a message, got {drainsize}")
+        self.__drainsize = drainsize
+        self.__metrics = ComponentMetrics() if metrics else None
+        self.__timers = None
+        self.__productive = False
+
+    # --------------------
+    # ComponentSkeleton protected properties
+    # --------------------
+
+    @property
+    def _actorname(self):
+        return self.__actorname
+
+    @property
+    def _address(self) -> Optional[int]:
+        return self.__address
+
+    @property
+    def _sender(self) -> Union[str, int]:
+        """What the component's messages carry as sender: its address, or its name when it has none"""
+        return self.__actorname if self.__address is None else self.__address
+
+    @property
+    def _mq(self):
+        return self.__mq
+
+    @property
+    def _pausetime(self) -> Union[int, float]:
+        return self.__pausetime
+
+    @property
+    def _pausemode(self) -> PauseMode:
+        return self.__pausemode
+
+    @property
+    def _pollpolicy(self) -> Optional[PollPolicy]:
+        """How long the polls block in ADAPTIVE mode, None in the other modes"""
+        return self.__pollpolicy
+
+    @property
+    def _drainsize(self) -> Optional[int]:
+        return self.__drainsize
+
+    @property
+    def _metrics(self) -> Optional[ComponentMetrics]:
+        return self.__metrics
+
+    @property
+    def _timers(self) -> TimerWheel:
+        """Where the component schedules its timeouts, retries and other callbacks. It's the wheel shared by the
+        component's host, or one of its own built on first use and advanced by _pause"""
+        if self.__timers is None:
+            self.__timers = TimerWheel()
+        return self.__timers
+
+    @_timers.setter
+    def _timers(self, wheel: TimerWheel):
+        if not isinstance(wheel, TimerWheel):
+            raise TypeError()
+        self.__timers = wheel
+
+    @property
+    def _productive(self) -> bool:
+        """Whether the last poll handled something"""
+        return self.__productive
+
+    # --------------------
+    # ComponentSkeleton protected methods
+    # --------------------
+
+    def _startscore(self):
+        """Prepares the component right before its first pause"""
+        pass
+
+    def _endscore(self):
+        """Releases the component's resources once it stops running, for whatever reason"""
+        pass
+
+    def _metricssnapshot(self) -> Optional[dict]:
+        """A picklable copy of the component's metrics, or None if it doesn't record them"""
+        return None if self.__metrics is None else self.__metrics.snapshot()
+
+    def _recorddepth(self):
+        """Samples the inbox depth, at every pause end"""
+        if self.__metrics is None:
+            return
+        try:
+            self.__metrics.recorddepth(self.__mq.qsize())
+        except (AttributeError, NotImplementedError):  # No queue, or macOS
+            pass
+
+    def _recordpoll(self, productive: bool):
+        """Called after every poll, telling whether it handled something. The handled messages are acknowledged to
+        the journal of the queue, if it has one, and the poll is counted by the metrics"""
+        if productive:
+            self.__mq.acknowledge()
+        self.__productive = productive
+        if self.__metrics is not None:
+            self.__metrics.recordpoll(productive)
+
+    def _nextwait(self, remaining: float) -> float:
+        """Fires the timers due, than tells how long the next poll of a pause may block, remaining seconds at most:
+        till the next timer, or as long as the poll policy says. The policy learns how the poll went from
+        _recordwait"""
+        timers = self.__timers
+        if timers is not None:
+            timers.advance()
+            nexttimeout = timers.nexttimeout()
+            if nexttimeout is not None and nexttimeout < remaining:
+                remaining = nexttimeout
+        policy = self.__pollpolicy
+        if policy is not None:
+            wait = policy.nextwait()
+            if wait is not None and wait < remaining:
+                remaining = wait
+        return remaining
+
+    def _recordwait(self):
+        """Tells the poll policy, if any, whether the poll it timed handled something"""
+        if self.__pollpolicy is not None:
+            self.__pollpolicy.record(self.__productive)
+
+    def _advancetimers(self):
+        """Fires the timers due, if the component has any"""
+        if self.__timers is not None:
+            self.__timers.advance()
+
+
+class MusicianSkeleton(ComponentSkeleton):
+    """What BaseMusician and AsyncMusician share: the conductor's queue, the outbox in front of it and the answers
+    sent through it. The outbox never awaits, so the answers are the same for a thread and for an event loop"""
+    __slots__ = ('__conductorsq', '__starttime', '__outbox')
+
+    # --------------------
+    # MusicianSkeleton constructor
+    # --------------------
+
+    def __init__(self,
+                 name: str,
+                 mpq: ConsumerQueue,
+                 pausetime: Union[int, float],
+                 conductorq: ProducerQueue,
+                 *args,
+                 overflow: Overflow = Overflow.DROPOLDEST,
+                 outboxcapacity: int = OUTBOX_CAPACITY,
+                 **kwargs):
+        """
+        extends theather.core.components.skeleton.ComponentSkeleton
+        :param conductorq: The queue used by the Musician to send messages
+        :param overflow: What happens to a message when the conductor's queue is full, see Outbox
+        :param outboxcapacity: The maximum number of messages kept while the conductor's queue is full
+        """
+        super().__init__(name, mpq, pausetime, *args, **kwargs)
+        if conductorq and not isinstance(conductorq, ProducerQueue):
+            raise TypeError()
+        self.__conductorsq = conductorq
+        self.__starttime = datetime.now()
+        self.__outbox = Outbox(conductorq, overflow, outboxcapacity,
+                               ondrop=self.__dropped) if conductorq else None
+
+    # --------------------
+    # MusicianSkeleton protected properties
+    # --------------------
+
+    @property
+    def _conductorsq(self):
+        return self.__conductorsq
+
+    @property
+    def _starttime(self):
+        return self.__starttime
+
+    @property
+    def _outbox(self) -> Optional[Outbox]:
+        return self.__outbox
+
+    # --------------------
+    # MusicianSkeleton protected methods
+    # --------------------
+
+    def _answerbeat(self, msg: Message) -> Union[Signal, None]:
+        """It sends a BEAT message using the _conductorq if the message body is NONE or STATUS. The answer
+        depends on the body type of the incoming message"""
+        msgtype = msg.type
+        if msgtype is MsgType.NONE:
+            self._reply(msg, Signal.BEAT, MsgType.NONE, None, trusted=True)
+            return Signal.BEAT
+        elif msgtype is MsgType.STATUS:
+            newbody = Status.trusted(reqtime=msg.body.reqtime,
+                                     status="Running", time=datetime.now(),
+                                     statustime=self._starttime, statusmessage=None)
+            self._reply(msg, Signal.BEAT, MsgType.STATUS, newbody, trusted=True, extension=self._beatextension(msg))
+            return Signal.BEAT
+        else:
+            return None
+
+    def _answerinterrupt(self):
+        """Sends a detailed BEAT message, indicating that this Musician has been interrupted"""
+        now = datetime.now()
+        self._answerconductor(Signal.BEAT, MsgType.STATUS, Status.trusted(reqtime=None,
+                                                                          status=INTERRUPTED_STATUS,
+                                                                          time=now,
+                                                                          statustime=now,
+                                                                          statusmessage="End of actors execution"),
+                              trusted=True)
+
+    def _catchsendexception(self, exc: Exception):
+        """Called with a Full for every message the outbox drops"""
+        pass
+
+    def _beatextension(self, msg: Message) -> Optional[dict]:
+        """The extension of the answer to a STATUS beat: the metrics snapshot, if the beat asked for it"""
+        if not msg.extension.get(METRICS_KEY):
+            return None
+        snapshot = self._metricssnapshot()
+        if snapshot is not None and self.__outbox is not None:
+            snapshot['outbox'] = {'pending': self.__outbox.pending,
+                                  'dropped': self.__outbox.dropped,
+                                  'coalesced': self.__outbox.coalesced}
+        return {METRICS_KEY: snapshot}
+
+    def _flushoutbox(self):
+        """Ships the messages left pending by the outbox, before a poll"""
+        if self.__outbox is not None and self.__outbox.pending:
+            self.__outbox.flush()
+
+    def _endscore(self):
+        """extends ComponentSkeleton._endscore. It gives the pending messages a last chance, than drops them"""
+        super()._endscore()
+        if self.__outbox is not None:
+            self.__outbox.flush()
+            self.__outbox.close()
+
+    def _answerconductor(self, msgsignal: Signal, msgtype: MsgType, msgbody, trusted: bool = False,
+                         extension: Optional[dict] = None):
+        """Handles creation and shipping of a message toward the Musician's _conductorsq, through its outbox. A trusted
+        message skips validation, so only pass trusted=True when the body is known to match the type"""
+        if trusted:
+            msg = Message.trusted(sender=self._sender, signal=msgsignal, type=msgtype, body=msgbody,
+                                  extension=extension)
+        elif extension is None:
+            msg = Message(sender=self._sender,
+                          signal=msgsignal,
+                          type=msgtype,
+                          body=msgbody)
+        else:
+            msg = Message(sender=self._sender,
+                          signal=msgsignal,
+                          type=msgtype,
+                          body=msgbody,
+                          extension=extension)
+        self.__outbox.send(msg)
+
+    def _reply(self, request: Message, msgsignal: Signal, msgtype: MsgType, msgbody, trusted: bool = False,
+               extension: Optional[dict] = None):
+        """Like _answerconductor, but the message is a reply to request: if request carries a CORRELATION_KEY, the
+        reply carries it too, so that whoever asked gets it"""
+        correlation = request.extension.get(CORRELATION_KEY)
+        if correlation is not None:
+            extension = {CORRELATION_KEY: correlation} if extension is None else \
+                {**extension, CORRELATION_KEY: correlation}
+        self._answerconductor(msgsignal, msgtype, msgbody, trusted, extension)
+
+    # --------------------
+    # MusicianSkeleton private methods
+    # --------------------
+
+    def __dropped(self, _):
+        self._catchsendexception(Full())
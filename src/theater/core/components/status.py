@@ -0,0 +1,83 @@
+import collections
+import time
+from datetime import datetime, timedelta
+from typing import Optional, Union, List, Tuple
+
+from theater.core.components.constants import MusicianState, STATUS_HISTORY
+
+__all__ = ['StatusTracker']
+
+
+# --------------------
+# Module classes
+# --------------------
+
+
+class StatusTracker:
+    """Tracks the status of a musician as a state (a MusicianState or a custom string), an optional detail and the
+    time.monotonic_ns of its last change. Changing the state costs a clock read only when the state actually changes,
+    and nothing is rendered till a STATUS beat asks for it. The last transitions are kept in a bounded ring"""
+    __slots__ = ('__state', '__detail', '__since', '__history', '__wallorigin', '__monoorigin')
+
+    def __init__(self, state: Union[MusicianState, str] = MusicianState.IDLE, historysize: int = STATUS_HISTORY):
+        self.__wallorigin = datetime.now()
+        self.__monoorigin = time.monotonic_ns()
+        self.__state = state
+        self.__detail = None
+        self.__since = self.__monoorigin
+        self.__history = collections.deque(((state, self.__monoorigin),), maxlen=historysize)
+
+    # --------------------
+    # StatusTracker public properties
+    # --------------------
+
+    @property
+    def state(self) -> Union[MusicianState, str]:
+        return self.__state
+
+    @property
+    def detail(self) -> Optional[str]:
+        return self.__detail
+
+    @detail.setter
+    def detail(self, value: Optional[str]):
+        self.__detail = value
+
+    @property
+    def since(self) -> int:
+        """The time.monotonic_ns of the last state change"""
+        return self.__since
+
+    # --------------------
+    # StatusTracker public methods
+    # --------------------
+
+    def transition(self, state: Union[MusicianState, str]):
+        """Moves to state, keeping the detail. Moving to the current state does nothing, not even a clock read"""
+        if state is self.__state:
+            return
+        self.__state = state
+        self.__since = now = time.monotonic_ns()
+        self.__history.append((state, now))
+
+    def touch(self):
+        """Marks the current state as changed right now, without a transition"""
+        self.__since = time.monotonic_ns()
+
+    def status(self) -> str:
+        """The current state, rendered as a status string"""
+        state = self.__state
+        return state.value if isinstance(state, MusicianState) else state
+
+    def todatetime(self, monotonicns: int) -> datetime:
+        """Renders a time.monotonic_ns of this process as a wall clock datetime"""
+        return self.__wallorigin + timedelta(microseconds=(monotonicns - self.__monoorigin) // 1000)
+
+    def statustime(self) -> datetime:
+        """The wall clock time of the last state change"""
+        return self.todatetime(self.__since)
+
+    def history(self) -> List[Tuple[str, datetime]]:
+        """The last transitions, oldest first, rendered as status strings and wall clock datetimes"""
+        return [(state.value if isinstance(state, MusicianState) else state, self.todatetime(stamp))
+                for state, stamp in self.__history]
@@ -1,11 +1,39 @@
 import enum
 
-__all__ = ['Signal', 'MsgType']
+__all__ = ['Signal', 'MsgType', 'Transport', 'Overflow']
 
 # --------------------
 # Simple constants
 # --------------------
 
+# Messages an Outbox keeps in memory while its queue is full
+OUTBOX_CAPACITY = 1024
+# The highest actor address a Message can carry as its sender, an unsigned 32 bit int on the wire
+MAX_ADDRESS = 2 ** 32 - 1
+# Extension key of a request whose reply is awaited, and of the reply: its value pairs them, see Correlator
+CORRELATION_KEY = 'correlation'
+# Extension key of a Message queued on an inbox shared by many actors: its value is the address of the receiver, or a
+# tuple with the addresses of many receivers, see Demultiplexer. Messages without it go to every actor of the inbox
+DESTINATION_KEY = 'destination'
+# Messages a Demultiplexer moves from the shared inbox to the actors' queues at most, every dispatch
+DEMUX_DRAINSIZE = 256
+# Messages queued for an actor by a Demultiplexer at most, before it stops reading the shared inbox
+DEMUX_QUEUESIZE = 256
+# Seconds a Demultiplexer running in a thread of its own waits on the shared inbox, before checking if it was closed
+DEMUX_WAIT = 0.05
+# Messages a MessageBatcher collects before sending them as a MessageBatch
+BATCH_MAXSIZE = 64
+# Seconds a MessageBatcher holds a message waiting for others
+BATCH_MAXDELAY = 0.005
+# Size in bytes of a segment file of a Journal
+JOURNAL_SEGMENTSIZE = 1 << 26
+# Seconds between two syncs of the records appended to a Journal
+JOURNAL_SYNCINTERVAL = 0.005
+# Seconds in a tick of a TimerWheel
+TIMER_RESOLUTION = 0.001
+# Bits of slots of every level of a TimerWheel: 256 ticks, than 64 times as many at every level, about 49 days at 1 ms
+TIMER_LEVELS = (8, 6, 6, 6)
+
 # --------------------
 # Enumerative constants
 # --------------------
@@ -28,3 +56,18 @@ class MsgType(enum.Enum):
     MAP = "Map"
     STATUS = "Status"
     BYTES = "Bytes"
+
+
+class Transport(enum.Enum):
+    """Enum that contains all possible transports behind a ProducerQueue/ConsumerQueue pair"""
+    PIPE = "Pipe"
+    SHAREDMEMORY = "SharedMemory"
+    SOCKET = "Socket"
+
+
+class Overflow(enum.Enum):
+    """Enum that contains what an Outbox does with a message when its queue is full"""
+    BLOCK = "Block"
+    DROPOLDEST = "DropOldest"
+    COALESCE = "Coalesce"
+    SPILL = "Spill"
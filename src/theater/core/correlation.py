@@ -0,0 +1,133 @@
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import Future
+from typing import Optional, Dict, List, Tuple
+
+from theater.core.constants import CORRELATION_KEY
+from theater.core.messages import Message, ProducerQueue
+
+__all__ = ['Correlator']
+
+
+# --------------------
+# Module classes
+# --------------------
+
+
+class Correlator:
+    """Pairs requests with their replies. ask stamps a request with a new CORRELATION_KEY and returns a Future, that
+    resolves with the reply once the single reader of the replies hands it to dispatch. A request whose reply doesn't
+    come in time fails with a TimeoutError, when the reader calls expire. To await a reply, wrap its Future with
+    asyncio.wrap_future. Futures are marked as running when created, so they can't be cancelled"""
+    __slots__ = ('__pending', '__deadlines', '__counter', '__issued', '__lock', '__late')
+
+    def __init__(self):
+        self.__pending: Dict[int, Future] = {}
+        self.__deadlines: List[Tuple[float, int]] = []
+        self.__counter = itertools.count()
+        self.__issued = 0
+        self.__lock = threading.Lock()
+        self.__late = 0
+
+    # --------------------
+    # Correlator public properties
+    # --------------------
+
+    @property
+    def pending(self) -> int:
+        return len(self.__pending)
+
+    @property
+    def late(self) -> int:
+        """The replies that came in after their request expired"""
+        return self.__late
+
+    @property
+    def nextdeadline(self) -> Optional[float]:
+        """The time.monotonic at which the next request may expire, or None"""
+        deadlines = self.__deadlines
+        return deadlines[0][0] if deadlines else None
+
+    # --------------------
+    # Correlator public methods
+    # --------------------
+
+    def ask(self, queue: ProducerQueue, msg: Message, timeout: Optional[float] = None, block: bool = False) -> Future:
+        """Puts msg on queue, stamped with a new correlation id, and returns the Future of its reply
+        :param timeout: The seconds given to the reply. None waits forever
+        :param block: Whether to wait for room in a full queue. If the put fails the request is forgotten
+        """
+        correlation, future = self.open(timeout)
+        try:
+            queue.put(self.stamp(msg, correlation), block, timeout)
+        except BaseException:
+            with self.__lock:
+                del self.__pending[correlation]
+            raise
+        return future
+
+    def open(self, timeout: Optional[float] = None) -> Tuple[int, Future]:
+        """Registers a request, returning its correlation id and the Future of its reply. Meant for requests that ask
+        can't send, see stamp"""
+        future = Future()
+        future.set_running_or_notify_cancel()
+        with self.__lock:
+            correlation = next(self.__counter)
+            self.__issued = correlation + 1
+            self.__pending[correlation] = future
+            if timeout is not None:
+                heapq.heappush(self.__deadlines, (time.monotonic() + timeout, correlation))
+        return correlation, future
+
+    @staticmethod
+    def stamp(msg: Message, correlation: int) -> Message:
+        """A copy of msg carrying correlation as CORRELATION_KEY"""
+        return Message.trusted(sender=msg.sender, signal=msg.signal, type=msg.type, body=msg.body,
+                               extension={**msg.extension, CORRELATION_KEY: correlation})
+
+    def dispatch(self, msg) -> bool:
+        """Resolves the request msg replies to. Returns False if msg isn't a reply to any request of this correlator,
+        and should be handled by the caller. Late replies are swallowed"""
+        extension = msg.extension
+        if not extension:
+            return False
+        correlation = extension.get(CORRELATION_KEY)
+        if correlation.__class__ is not int or not 0 <= correlation < self.__issued:
+            return False
+        with self.__lock:
+            future = self.__pending.pop(correlation, None)
+        if future is None:
+            self.__late += 1
+        else:
+            future.set_result(msg)
+        return True
+
+    def expire(self, now: Optional[float] = None) -> int:
+        """Fails the requests whose time is up with a TimeoutError, returning how many they are"""
+        deadlines = self.__deadlines
+        if not deadlines:
+            return 0
+        now = time.monotonic() if now is None else now
+        if deadlines[0][0] > now:
+            return 0
+        expired = []
+        with self.__lock:
+            while deadlines and deadlines[0][0] <= now:
+                _, correlation = heapq.heappop(deadlines)
+                future = self.__pending.pop(correlation, None)
+                if future is not None:
+                    expired.append(future)
+        for future in expired:
+            future.set_exception(TimeoutError("No reply in time"))
+        return len(expired)
+
+    def failall(self, exc: BaseException):
+        """Fails every pending request with exc"""
+        with self.__lock:
+            futures = list(self.__pending.values())
+            self.__pending.clear()
+            self.__deadlines.clear()
+        for future in futures:
+            future.set_exception(exc)
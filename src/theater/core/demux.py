@@ -0,0 +1,184 @@
+import time
+from queue import Empty, Full
+from typing import Optional, Dict, List, Tuple
+
+from theater.core.constants import DESTINATION_KEY, DEMUX_DRAINSIZE, DEMUX_QUEUESIZE, DEMUX_WAIT
+from theater.core.errors import IllegalValueException
+from theater.core.messages import Message, WireMessage, ConsumerQueue, CONTROL_SIGNALS
+from theater.core.transport.local import LocalQueue
+
+__all__ = ['Demultiplexer']
+
+
+# --------------------
+# Module functions
+# --------------------
+
+
+def _urgent(obj) -> bool:
+    """Whether a message overtakes the data messages queued for its actor, like on a control lane"""
+    return isinstance(obj, (Message, WireMessage)) and obj.signal in CONTROL_SIGNALS
+
+
+# --------------------
+# Module classes
+# --------------------
+
+
+class Demultiplexer:
+    """Reads an inbox shared by many actors of the same process, and moves every message to the queue of its receiver,
+    picked by the address in its DESTINATION_KEY extension (see ProducerQueue.routed), or to the queues of all the
+    addresses it carries (see ProducerQueue.multicast). A message without one goes to every actor, so that a broadcast
+    is queued once per inbox instead of once per actor. Every actor gets a
+    ConsumerQueue over a LocalQueue, so that a score needs a single transport per process instead of one per actor:
+    a PIPE inbox with lanes takes 4 file descriptors, whatever the number of actors reading it. Messages for an
+    address that isn't there are dropped, and counted.
+    The actors' queues are bounded: a message whose receiver has a full queue is held, and the shared inbox isn't read
+    till it gets room. The shared inbox fills up meanwhile, so that its producers get Full and its credits run out,
+    like they would with a queue per actor"""
+    __slots__ = ('__inbox', '__queuesize', '__queues', '__consumers', '__addresses', '__held', '__dropped',
+                 '__closed')
+
+    def __init__(self, inbox: ConsumerQueue, queuesize: int = DEMUX_QUEUESIZE):
+        """
+        :param inbox: The shared inbox. If it has lanes, control messages overtake data messages in the actors' queues
+        too, and they're never held
+        :param queuesize: The messages queued for an actor at most, 0 or less for unbounded queues
+        """
+        if not isinstance(inbox, ConsumerQueue):
+            raise TypeError()
+        if not isinstance(queuesize, int):
+            raise TypeError()
+        self.__inbox = inbox
+        self.__queuesize = queuesize
+        self.__queues: Dict[int, LocalQueue] = {}
+        self.__consumers: Dict[int, ConsumerQueue] = {}
+        # The address of every consumer, by its id
+        self.__addresses: Dict[int, int] = {}
+        # The message waiting for room, with the addresses it has still to reach
+        self.__held: Optional[Tuple[object, List[int]]] = None
+        self.__dropped = 0
+        self.__closed = False
+
+    # --------------------
+    # Demultiplexer public properties
+    # --------------------
+
+    @property
+    def inbox(self) -> ConsumerQueue:
+        return self.__inbox
+
+    @property
+    def addresses(self) -> Tuple[int, ...]:
+        return tuple(self.__queues)
+
+    @property
+    def dropped(self) -> int:
+        """The messages whose address had no queue"""
+        return self.__dropped
+
+    @property
+    def stalled(self) -> bool:
+        """Whether a message is held, waiting for room in the queue of its receiver. The shared inbox isn't read
+        meanwhile, so its waitables shouldn't be waited on"""
+        return self.__held is not None
+
+    @property
+    def waitables(self) -> Optional[Tuple]:
+        """The waitables of the shared inbox, see ConsumerQueue.waitables"""
+        return self.__inbox.waitables
+
+    # --------------------
+    # Demultiplexer public methods
+    # --------------------
+
+    def add(self, address: int) -> ConsumerQueue:
+        """Builds the queue of the actor with the given address, that gets its messages from now on"""
+        if address.__class__ is not int or address < 0:
+            raise IllegalValueException(f"Can't demultiplex to address {address}")
+        if address in self.__queues:
+            raise IllegalValueException(f"Address {address} already has a queue")
+        queue = LocalQueue(_urgent if self.__inbox.lanes else None, self.__queuesize)
+        consumer = ConsumerQueue(queue)
+        self.__queues[address] = queue
+        self.__consumers[address] = consumer
+        self.__addresses[id(consumer)] = address
+        return consumer
+
+    def remove(self, consumer: ConsumerQueue) -> bool:
+        """Drops the queue of an actor that ended: its messages are dropped from now on. Returns False if consumer
+        wasn't built by add"""
+        address = self.__addresses.pop(id(consumer), None)
+        if address is None:
+            return False
+        del self.__queues[address]
+        del self.__consumers[address]
+        return True
+
+    def owns(self, consumer: ConsumerQueue) -> bool:
+        """Whether consumer was built by add, and wasn't removed"""
+        return id(consumer) in self.__addresses
+
+    def dispatch(self, timeout: float = 0) -> List[ConsumerQueue]:
+        """Moves up to DEMUX_DRAINSIZE messages from the shared inbox to the actors' queues, waiting at most timeout
+        seconds for the first one. A held message goes first, and while it's held the shared inbox isn't read. Returns
+        the queues that got something"""
+        fed: Dict[int, ConsumerQueue] = {}
+        if self.__held is not None:
+            msg, addresses = self.__held
+            self.__held = None
+            if not self.__forward(msg, addresses, fed):
+                return list(fed.values())
+        inbox = self.__inbox
+        try:
+            msg = inbox.get(True, timeout) if timeout > 0 else inbox.get_nowait()
+        except Empty:
+            return list(fed.values())
+        count = 1
+        while self.__route(msg, fed) and count < DEMUX_DRAINSIZE:
+            try:
+                msg = inbox.get_nowait()
+            except Empty:
+                break
+            count += 1
+        return list(fed.values())
+
+    def run(self):
+        """Dispatches till close is called, for actors that read their queues in threads of their own"""
+        while not self.__closed:
+            self.dispatch(DEMUX_WAIT)
+            if self.__held is not None:
+                time.sleep(DEMUX_WAIT)
+
+    def close(self):
+        """Makes run return, within DEMUX_WAIT seconds"""
+        self.__closed = True
+
+    # --------------------
+    # Demultiplexer private methods
+    # --------------------
+
+    def __route(self, msg, fed: Dict[int, ConsumerQueue]) -> bool:
+        destination = msg.extension.get(DESTINATION_KEY)
+        if destination is None:
+            return self.__forward(msg, list(self.__queues), fed)
+        if destination.__class__ is not tuple:
+            destination = (destination,)
+        addresses = [address for address in destination if address in self.__queues]
+        self.__dropped += len(destination) - len(addresses)
+        return self.__forward(msg, addresses, fed)
+
+    def __forward(self, msg, addresses: List[int], fed: Dict[int, ConsumerQueue]) -> bool:
+        """Queues msg for every address that's still there. If a queue is full, msg is held for the addresses left
+        and it returns False"""
+        for i, address in enumerate(addresses):
+            queue = self.__queues.get(address)
+            if queue is None:
+                continue
+            try:
+                queue.put_nowait(msg)
+            except Full:
+                self.__held = (msg, addresses[i:])
+                return False
+            fed[address] = self.__consumers[address]
+        return True
@@ -3,14 +3,14 @@ import attr
 
 @attr.s(auto_exc=True)
 class IllegalValueException(Exception):
-    pass
+    message = attr.ib(default=None)
 
 
 @attr.s(auto_exc=True)
 class IllegalActionException(Exception):
-    pass
+    message = attr.ib(default=None)
 
 
 @attr.s(auto_exc=True)
 class ScoreEnd(Exception):
-    pass
+    message = attr.ib(default=None)
@@ -0,0 +1,397 @@
+import bisect
+import mmap
+import os
+import pickle
+import struct
+import threading
+import zlib
+from typing import Optional, Iterator, Tuple, List
+
+from theater.core.constants import JOURNAL_SEGMENTSIZE, JOURNAL_SYNCINTERVAL
+from theater.core.errors import IllegalActionException, IllegalValueException
+
+__all__ = ['Journal', 'JournalCursor']
+
+# Length of the payload (with the raw flag) and crc32 of the payload. A zero length word ends a segment
+_RECORD = struct.Struct('<II')
+_RAWFLAG = 0x80000000
+_OFFSET = struct.Struct('<Q')
+_SEGMENTSUFFIX = '.journal'
+# Bytes zeroed at once, past the last valid record of a reopened segment
+_ZEROCHUNK = 1 << 20
+_OFFSETSUFFIX = '.offset'
+
+
+# --------------------
+# Segments
+# --------------------
+
+
+def _segmentpath(directory: str, base: int) -> str:
+    return os.path.join(directory, f"{base:020d}{_SEGMENTSUFFIX}")
+
+
+def _syncdirectory(directory: str):
+    """Makes the creation of a file in directory durable, where the platform allows it"""
+    if os.name != 'posix':
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _scan(buf, size: int) -> Tuple[int, int]:
+    """The number of valid records at the start of a segment, and where they end. A torn record, left by a process
+    that died while appending it, fails its checksum and ends the segment"""
+    position = count = 0
+    while position + _RECORD.size <= size:
+        word, crc = _RECORD.unpack_from(buf, position)
+        if not word:
+            break
+        start = position + _RECORD.size
+        end = start + (word & ~_RAWFLAG)
+        if end > size or zlib.crc32(buf[start:end]) != crc:
+            break
+        position = end
+        count += 1
+    return count, position
+
+
+class _Segment:
+    """The segment being appended to: a preallocated file mapped in memory"""
+    __slots__ = ('base', 'file', 'map', 'size', 'count', 'position', 'synced')
+
+    def __init__(self, path: str, base: int, size: int, create: bool):
+        self.base = base
+        self.file = open(path, 'x+b' if create else 'r+b')
+        if create:
+            self.file.truncate(size)
+        self.size = os.fstat(self.file.fileno()).st_size
+        self.map = mmap.mmap(self.file.fileno(), self.size)
+        self.count, self.position = (0, 0) if create else _scan(self.map, self.size)
+        self.synced = self.position
+        if not create:
+            self.clear()
+
+    def clear(self):
+        """Zeroes what follows the last valid record, and writes it to the disk. What a torn record left there could
+        otherwise pass for a valid record once the following appends end right where it starts"""
+        buf, start = self.map, self.position
+        zeroes = bytes(_ZEROCHUNK)
+        cleared = False
+        while start < self.size:
+            end = min(start + _ZEROCHUNK, self.size)
+            if buf[start:end] != zeroes[:end - start]:
+                buf[start:end] = zeroes[:end - start]
+                cleared = True
+            start = end
+        if cleared:
+            start = self.position - self.position % mmap.ALLOCATIONGRANULARITY
+            self.map.flush(start, self.size - start)
+
+    def flush(self):
+        """Writes the records appended since the last flush to the disk"""
+        # Records may be appended meanwhile: the position is read once
+        position = self.position
+        start = self.synced - self.synced % mmap.ALLOCATIONGRANULARITY
+        if position > start:
+            self.map.flush(start, position - start)
+        self.synced = position
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+
+# --------------------
+# Module classes
+# --------------------
+
+
+class Journal:
+    """A durable, append-only log of queue items, in the segment files of a directory. Every record has an offset, its
+    sequence number, and is appended with a memory copy in the mapped segment: it survives the death of the process
+    right away, and a crash of the machine once synced. A syncer thread syncs the appended records every syncinterval
+    seconds, and on request: the records appended meanwhile share a single sync (group commit). A segment full of
+    records is synced and closed, and the following records go to a new one.
+    Consumers commit the offset of the first record they didn't handle yet through a JournalCursor, which a restarted
+    consumer replays from. Segments that every consumer handled can be deleted with trim.
+    A journal has a single writer, the process that opened it"""
+    __slots__ = ('__directory', '__segmentsize', '__syncinterval', '__bases', '__active', '__end', '__synced',
+                 '__requested', '__lock', '__synclock', '__condition', '__syncer', '__closed', '__syncs')
+
+    def __init__(self, directory: str, segmentsize: int = JOURNAL_SEGMENTSIZE,
+                 syncinterval: Optional[float] = JOURNAL_SYNCINTERVAL):
+        """
+        Opens the journal in directory, creating it if needed. The records of the last segment are checked, so that
+        appending resumes after the last valid one
+        :param segmentsize: The size in bytes of a new segment file, and the maximum size of a record
+        :param syncinterval: The seconds between two syncs of the appended records. None syncs only on request
+        """
+        if segmentsize < 2 * _RECORD.size:
+            raise IllegalValueException(f"A segment of {segmentsize} bytes can't hold any record")
+        os.makedirs(directory, exist_ok=True)
+        self.__directory = directory
+        self.__segmentsize = segmentsize
+        self.__syncinterval = syncinterval
+        self.__bases: List[int] = sorted(int(name[:-len(_SEGMENTSUFFIX)]) for name in os.listdir(directory)
+                                         if name.endswith(_SEGMENTSUFFIX))
+        if self.__bases:
+            self.__active = _Segment(_segmentpath(directory, self.__bases[-1]), self.__bases[-1], segmentsize, False)
+        else:
+            self.__bases.append(0)
+            self.__active = _Segment(_segmentpath(directory, 0), 0, segmentsize, True)
+            _syncdirectory(directory)
+        self.__end = self.__synced = self.__requested = self.__active.base + self.__active.count
+        self.__lock = threading.Lock()
+        self.__synclock = threading.Lock()
+        self.__condition = threading.Condition()
+        self.__closed = False
+        self.__syncs = 0
+        self.__syncer = threading.Thread(target=self.__sync, name='JournalSyncer', daemon=True)
+        self.__syncer.start()
+
+    def __getstate__(self):
+        raise IllegalActionException("A journal stays in the process that writes it")
+
+    # --------------------
+    # Journal public properties
+    # --------------------
+
+    @property
+    def directory(self) -> str:
+        return self.__directory
+
+    @property
+    def start(self) -> int:
+        """The offset of the oldest record kept"""
+        return self.__bases[0]
+
+    @property
+    def end(self) -> int:
+        """The offset the next record gets"""
+        return self.__end
+
+    @property
+    def durable(self) -> int:
+        """The records before this offset survive a crash of the machine"""
+        return self.__synced
+
+    @property
+    def segments(self) -> int:
+        return len(self.__bases)
+
+    @property
+    def syncs(self) -> int:
+        """The syncs made so far. Far fewer than the records, when many are appended in between"""
+        return self.__syncs
+
+    # --------------------
+    # Journal public methods
+    # --------------------
+
+    def append(self, item) -> int:
+        """Appends a record, returning its offset. Raw bytes (e.g. a frame of an encoded queue) are kept as they are,
+        anything else is pickled"""
+        if isinstance(item, bytes):
+            payload, flag = item, _RAWFLAG
+        else:
+            payload, flag = pickle.dumps(item, pickle.HIGHEST_PROTOCOL), 0
+        length = len(payload)
+        if _RECORD.size + length > self.__segmentsize or length & _RAWFLAG:
+            raise IllegalValueException(f"A record of {length} bytes doesn't fit a segment")
+        with self.__lock:
+            if self.__closed:
+                raise IllegalActionException("Can't append to a closed journal")
+            active = self.__active
+            if active.position + _RECORD.size + length > active.size:
+                active = self.__rotate()
+            position = active.position
+            start = position + _RECORD.size
+            buf = active.map
+            buf[start:start + length] = payload
+            _RECORD.pack_into(buf, position, length | flag, zlib.crc32(payload))
+            active.position = start + length
+            active.count += 1
+            offset = self.__end
+            self.__end = offset + 1
+        return offset
+
+    def sync(self, timeout: Optional[float] = None) -> bool:
+        """Waits till every record appended so far is durable. Returns False if they aren't after timeout seconds"""
+        with self.__condition:
+            target = self.__end
+            if self.__synced >= target:
+                return True
+            self.__requested = max(self.__requested, target)
+            self.__condition.notify_all()
+            return self.__condition.wait_for(lambda: self.__synced >= target or self.__closed, timeout) \
+                and self.__synced >= target
+
+    def read(self, offset: int) -> Iterator[Tuple[int, object]]:
+        """Yields the offset and the item of every record from offset to the end of the journal, as it is when
+        reading starts"""
+        bases = self.__bases[:]
+        end = self.__end
+        if offset < bases[0]:
+            raise IllegalValueException(f"The records before {bases[0]} have been trimmed, can't read from {offset}")
+        index = bisect.bisect_right(bases, offset) - 1
+        while offset < end:
+            last = bases[index + 1] if index + 1 < len(bases) else end
+            with open(_segmentpath(self.__directory, bases[index]), 'rb') as file, \
+                    mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                position = 0
+                for sequence in range(bases[index], last):
+                    word, _ = _RECORD.unpack_from(buf, position)
+                    start = position + _RECORD.size
+                    position = start + (word & ~_RAWFLAG)
+                    if sequence >= offset:
+                        yield sequence, buf[start:position] if word & _RAWFLAG else pickle.loads(buf[start:position])
+            offset = last
+            index += 1
+
+    def committed(self, name: str) -> int:
+        """The offset committed by a consumer, or the oldest record kept if it never committed one"""
+        try:
+            with open(self.__offsetpath(name), 'rb') as file:
+                offset, = _OFFSET.unpack(file.read(_OFFSET.size))
+        except (FileNotFoundError, struct.error):
+            return self.__bases[0]
+        return max(offset, self.__bases[0])
+
+    def cursor(self, name: str) -> 'JournalCursor':
+        """A cursor of a consumer, at the offset it committed"""
+        return JournalCursor(self.__offsetpath(name), self.committed(name))
+
+    def trim(self) -> int:
+        """Deletes the segments whose records every consumer handled, returning how many. Without consumers nothing
+        is deleted"""
+        offsets = [self.committed(name[:-len(_OFFSETSUFFIX)]) for name in os.listdir(self.__directory)
+                   if name.endswith(_OFFSETSUFFIX)]
+        if not offsets:
+            return 0
+        handled = min(offsets)
+        with self.__lock:
+            trimmed = 0
+            # The active segment is never deleted
+            while len(self.__bases) > 1 and self.__bases[1] <= handled:
+                os.unlink(_segmentpath(self.__directory, self.__bases.pop(0)))
+                trimmed += 1
+        return trimmed
+
+    def close(self):
+        """Syncs the appended records and closes the journal"""
+        with self.__lock:
+            if self.__closed:
+                return
+            self.__closed = True
+        with self.__condition:
+            self.__condition.notify_all()
+        self.__syncer.join()
+        with self.__synclock:
+            self.__active.flush()
+            self.__active.close()
+        with self.__condition:
+            self.__synced = self.__end
+            self.__condition.notify_all()
+
+    # --------------------
+    # Journal private methods
+    # --------------------
+
+    def __offsetpath(self, name: str) -> str:
+        if not name or os.sep in name or (os.altsep and os.altsep in name):
+            raise IllegalValueException(f"A consumer name must be a plain file name, got {name}")
+        return os.path.join(self.__directory, name + _OFFSETSUFFIX)
+
+    def __rotate(self) -> _Segment:
+        """Closes the full segment and starts a new one. Called holding the append lock"""
+        with self.__synclock:
+            self.__active.flush()
+            self.__active.close()
+            base = self.__end
+            self.__active = _Segment(_segmentpath(self.__directory, base), base, self.__segmentsize, True)
+        self.__bases.append(base)
+        _syncdirectory(self.__directory)
+        return self.__active
+
+    def __sync(self):
+        condition = self.__condition
+        while 1:
+            with condition:
+                condition.wait_for(lambda: self.__requested > self.__synced or self.__closed, self.__syncinterval)
+                if self.__closed:
+                    return
+                target = self.__end
+            if target <= self.__synced:
+                continue
+            with self.__synclock:
+                self.__active.flush()
+            with condition:
+                self.__synced = target
+                self.__syncs += 1
+                condition.notify_all()
+
+
+class JournalCursor:
+    """The position of a consumer in a Journal: the offset of the first record it didn't handle yet. It travels with
+    the ConsumerQueue to the consumer's process, where commit writes it in the journal directory. A committed offset
+    survives the death of the consumer's process, not a crash of the machine: at worst some records are replayed
+    twice"""
+    __slots__ = ('__path', '__offset', '__committed', '__fd', '__pid')
+
+    def __init__(self, path: str, offset: int):
+        """
+        :param path: The file where the offset is committed
+        :param offset: The offset of the first record not handled yet
+        """
+        self.__path = path
+        self.__offset = self.__committed = offset
+        self.__fd = None
+        self.__pid = None
+
+    def __getstate__(self):
+        return self.__path, self.__offset, self.__committed
+
+    def __setstate__(self, state):
+        self.__path, self.__offset, self.__committed = state
+        self.__fd = None
+        self.__pid = None
+
+    # --------------------
+    # JournalCursor public properties
+    # --------------------
+
+    @property
+    def offset(self) -> int:
+        return self.__offset
+
+    @property
+    def committed(self) -> int:
+        return self.__committed
+
+    # --------------------
+    # JournalCursor public methods
+    # --------------------
+
+    def advance(self, records: int = 1):
+        """Moves past records handed to the consumer"""
+        self.__offset += records
+
+    def commit(self):
+        """Writes the offset, if it moved since the last commit"""
+        if self.__offset == self.__committed:
+            return
+        if self.__fd is None or self.__pid != os.getpid():
+            self.__fd = os.open(self.__path, os.O_RDWR | os.O_CREAT, 0o644)
+            self.__pid = os.getpid()
+        os.lseek(self.__fd, 0, os.SEEK_SET)
+        os.write(self.__fd, _OFFSET.pack(self.__offset))
+        self.__committed = self.__offset
+
+    def close(self):
+        if self.__fd is not None and self.__pid == os.getpid():
+            os.close(self.__fd)
+        self.__fd = None
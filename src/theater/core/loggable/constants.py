@@ -4,3 +4,11 @@ LOGCONSOLE: str = 'logconsole'
 LOGFILE: str = 'logfile'
 LOGFORMAT: str = 'logformat'
 LOGDATEFMT: str = 'logdatefmt'
+# 'True' to format and write records on a listener thread of the process, instead of the logging thread
+LOGQUEUED: str = 'logqueued'
+# A queue (e.g. a multiprocessing.Queue) read by a LogListener shared among processes. It takes over the other keys
+LOGQUEUE: str = 'logqueue'
+# Maximum number of records a LogListener handles before flushing its handlers
+LOG_BATCHSIZE: int = 512
+# Seconds a LogListener waits for a record before checking again
+LOG_WAIT: float = 0.5
@@ -0,0 +1,171 @@
+import logging
+import logging.handlers
+import multiprocessing.util
+import os
+import queue
+import threading
+from typing import Callable, List, Dict, Tuple, Optional
+
+from theater.core.loggable.constants import LOG_BATCHSIZE, LOG_WAIT
+
+__all__ = ['LogListener', 'LazyQueueHandler', 'BatchStreamHandler', 'BatchFileHandler', 'locallistener']
+
+# Records are never None, so None tells the listener to stop even after crossing a process boundary
+_STOP = None
+# Listeners of this process, by configuration. A forked child finds its parent's listeners here, without threads
+_LISTENERS: Dict[Tuple, Tuple[int, 'LogListener']] = {}
+_LISTENERSLOCK = threading.Lock()
+
+
+# --------------------
+# Module classes
+# --------------------
+
+
+class BatchStreamHandler(logging.StreamHandler):
+    """A StreamHandler that doesn't flush after every record: its LogListener flushes it once per batch"""
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            self.stream.write(self.format(record) + self.terminator)
+        except Exception:
+            self.handleError(record)
+
+
+class BatchFileHandler(logging.FileHandler):
+    """A FileHandler that doesn't flush after every record: its LogListener flushes it once per batch"""
+
+    def emit(self, record: logging.LogRecord):
+        if self.stream is None:
+            self.stream = self._open()
+        try:
+            self.stream.write(self.format(record) + self.terminator)
+        except Exception:
+            self.handleError(record)
+
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """Puts records on a queue leaving their formatting to the listener. On a queue that stays in the process the
+    record travels as it is, so msg % args is computed by the listener thread. On a multiprocessing queue the record
+    must be pickled: its message is merged with its args first, as cheaply as possible"""
+
+    def __init__(self, logqueue, reopen: Optional[Callable[[], 'LogListener']] = None):
+        """
+        :param logqueue: Where the records are put
+        :param reopen: Called in a forked child, where the listener of logqueue isn't running, to get a new one
+        """
+        super().__init__(logqueue)
+        self.__local = isinstance(logqueue, (queue.SimpleQueue, queue.Queue))
+        self.__reopen = reopen
+        self.__pid = os.getpid()
+
+    def enqueue(self, record: logging.LogRecord):
+        if self.__reopen is not None and self.__pid != os.getpid():
+            self.queue = self.__reopen().queue
+            self.__pid = os.getpid()
+        super().enqueue(record)
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if self.__local:
+            return record
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class LogListener:
+    """Hands the records found on a queue to its handlers, on a daemon thread. Records are taken in batches of at most
+    batchsize, and every handler is flushed once per batch instead of once per record. A handler only gets the records
+    passing its level. The queue may be a multiprocessing one, so that many processes share a single listener"""
+    __slots__ = ('__queue', '__handlers', '__batchsize', '__thread')
+
+    def __init__(self, logqueue, handlers: List[logging.Handler], batchsize: int = LOG_BATCHSIZE):
+        self.__queue = logqueue
+        self.__handlers = list(handlers)
+        self.__batchsize = batchsize
+        self.__thread = None
+
+    # --------------------
+    # LogListener public properties
+    # --------------------
+
+    @property
+    def queue(self):
+        return self.__queue
+
+    @property
+    def running(self) -> bool:
+        return self.__thread is not None and self.__thread.is_alive()
+
+    # --------------------
+    # LogListener public methods
+    # --------------------
+
+    def start(self):
+        self.__thread = threading.Thread(target=self.__run, name='LogListener', daemon=True)
+        self.__thread.start()
+
+    def stop(self, timeout: float = None):
+        """Handles every record queued so far, then stops the thread"""
+        if self.running:
+            self.__queue.put_nowait(_STOP)
+            self.__thread.join(timeout)
+        self.__thread = None
+
+    # --------------------
+    # LogListener private methods
+    # --------------------
+
+    def __run(self):
+        stopping = False
+        while not stopping:
+            try:
+                batch = [self.__queue.get(True, LOG_WAIT)]
+            except queue.Empty:
+                continue
+            while len(batch) < self.__batchsize:
+                try:
+                    batch.append(self.__queue.get_nowait())
+                except queue.Empty:
+                    break
+            for record in batch:
+                if record is _STOP:
+                    stopping = True
+                    continue
+                for handler in self.__handlers:
+                    if record.levelno >= handler.level:
+                        handler.handle(record)
+            for handler in self.__handlers:
+                handler.flush()
+
+
+# --------------------
+# Module functions
+# --------------------
+
+
+def locallistener(key: Tuple, handlers: Callable[[], List[logging.Handler]]) -> LogListener:
+    """Returns the listener of this process for a configuration key, starting it on first use with the handlers
+    built by the given factory. A process forked after the listener started gets a new one"""
+    with _LISTENERSLOCK:
+        pid, listener = _LISTENERS.get(key, (None, None))
+        if pid != os.getpid():
+            listener = LogListener(queue.SimpleQueue(), handlers())
+            listener.start()
+            # Unlike atexit, multiprocessing finalizers also run when a worker process ends
+            multiprocessing.util.Finalize(None, listener.stop, args=(1.0,), exitpriority=0)
+            _LISTENERS[key] = os.getpid(), listener
+        return listener
+
+
+def _resetlock():
+    # The lock may have been held by another thread of the parent, that doesn't exist in the child
+    global _LISTENERSLOCK
+    _LISTENERSLOCK = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_resetlock)
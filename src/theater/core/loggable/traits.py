@@ -1,7 +1,9 @@
 import logging
 from abc import ABC, abstractmethod
 
-from theater.core.loggable.constants import LOGNAME, LOGLEVEL, LOGCONSOLE, LOGFILE, LOGFORMAT, LOGDATEFMT
+from theater.core.loggable.constants import LOGNAME, LOGLEVEL, LOGCONSOLE, LOGFILE, LOGFORMAT, LOGDATEFMT, \
+    LOGQUEUED, LOGQUEUE
+from theater.core.loggable.queued import LazyQueueHandler, BatchStreamHandler, BatchFileHandler, locallistener
 
 
 class Loggable(ABC):
@@ -22,40 +24,61 @@ class Loggable(ABC):
         pass
 
     def _initlogger(self, logconf: dict):
+        """Configures the logger. By default records are written by the thread that logs them. With LOGQUEUED they
+        are only queued, and a listener thread of the process formats and writes them in batches. With LOGQUEUE they
+        are queued for a listener living elsewhere, see LogListener. Queued loggers don't propagate their records, or
+        the handlers of the ancestors would write them on the logging thread anyway"""
         name = logconf.get(LOGNAME)
         level = logconf.get(LOGLEVEL)
         console = logconf.get(LOGCONSOLE)
         file = logconf.get(LOGFILE)
         logfmt = logconf.get(LOGFORMAT)
         timefmt = logconf.get(LOGDATEFMT)
+        queued = logconf.get(LOGQUEUED) == 'True'
+        logqueue = logconf.get(LOGQUEUE)
+
+        def buildhandlers():
+            handlers = []
+            if console == 'True':
+                handlers.append(BatchStreamHandler() if queued else logging.StreamHandler())
+            if file:
+                handlers.append(BatchFileHandler(file, 'a+', 'utf-8') if queued else
+                                logging.FileHandler(file, 'a+', 'utf-8'))
+            if level:
+                for handler in handlers:
+                    handler.setLevel(logging.getLevelName(level))
+            if logfmt:
+                for handler in handlers:
+                    handler.setFormatter(logging.Formatter(fmt=logfmt, datefmt=timefmt))
+            return handlers
 
-        handlers = []
-        if console == 'True':
-            handlers.append(logging.StreamHandler())
-        if file:
-            handlers.append(logging.FileHandler(file, 'a+', 'utf-8'))
-        if level:
-            for handler in handlers:
-                handler.setLevel(logging.getLevelName(level))
-        if logfmt:
-            for handler in handlers:
-                handler.setFormatter(logging.Formatter(fmt=logfmt, datefmt=timefmt))
         self._logger = logging.getLogger(name)
-        for handler in handlers:
-            self._logger.addHandler(handler)
+        if level:
+            # Records below the level are discarded by the logger, before being built
+            self._logger.setLevel(logging.getLevelName(level))
+        self._logger.propagate = logqueue is None and not queued
+        if logqueue is not None:
+            self._logger.addHandler(LazyQueueHandler(logqueue))
+        elif queued:
+            key = (name, level, console, file, logfmt, timefmt)
+            self._logger.addHandler(LazyQueueHandler(locallistener(key, buildhandlers).queue,
+                                                     lambda: locallistener(key, buildhandlers)))
+        else:
+            for handler in buildhandlers():
+                self._logger.addHandler(handler)
 
     def _error(self, msg, *args):
         if self._logger:
-            self._logger.error(msg, args)
+            self._logger.error(msg, *args)
 
     def _warn(self, msg, *args):
         if self._logger:
-            self._logger.warning(msg, args)
+            self._logger.warning(msg, *args)
 
     def _info(self, msg, *args):
         if self._logger:
-            self._logger.info(msg, args)
+            self._logger.info(msg, *args)
 
     def _debug(self, msg, *args):
         if self._logger:
-            self._logger.debug(msg, args)
+            self._logger.debug(msg, *args)
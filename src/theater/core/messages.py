@@ -1,16 +1,76 @@
+import enum
 import multiprocessing.queues
-from datetime import datetime
-from typing import Optional, Tuple
+import pickle
+import struct
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from multiprocessing.connection import wait
+from queue import Empty
+from typing import Optional, Tuple, Union, Iterable
 
 import attr
 
-from theater.core.constants import Signal, MsgType
-from theater.core.errors import IllegalActionException
-
-__all__ = ['Message', 'Status', 'generatequeues']
-
-
-@attr.s(kw_only=True, frozen=True)
+from theater.core.constants import Signal, MsgType, Transport, DESTINATION_KEY
+from theater.core.errors import IllegalActionException, IllegalValueException
+from theater.core.journal import Journal, JournalCursor
+from theater.core.transport.local import LocalQueue
+from theater.core.transport.shm import SharedRingQueue, exportbytes, importbytes, releasebytes
+from theater.core.transport.sockets import SocketSender, SocketReceiver
+
+__all__ = ['Message', 'Status', 'WireMessage', 'SharedMessage', 'MessageBatch', 'encodemessage', 'decodemessage',
+           'encodebatch', 'decodebatch', 'encodestatus', 'decodestatus', 'generatequeues']
+
+# --------------------
+# Wire codec constants
+# --------------------
+
+CODEC_VERSION = 1
+# The position of a member is its code on the wire: only append new members
+_SIGNALS = (Signal.CREATE, Signal.INTERRUPT, Signal.BEAT, Signal.KILL, Signal.UPDATE, Signal.TRIGGER)
+_MSGTYPES = (MsgType.NONE, MsgType.TEXT, MsgType.MAP, MsgType.STATUS, MsgType.BYTES)
+_SIGNALCODES = {signal: code for code, signal in enumerate(_SIGNALS)}
+# The code of a signal that isn't a Signal: the signal follows the sender, pickled and prefixed by its length
+_CUSTOMSIGNAL = 0xFF
+_MSGTYPECODES = {msgtype: code for code, msgtype in enumerate(_MSGTYPES)}
+# version, signal, type, flags, sender length
+_HEADER = struct.Struct('<BBBBH')
+_LENGTH = struct.Struct('<I')
+# presence/awareness mask, reqtime, time, statustime
+_STATUSHEADER = struct.Struct('<Hqqq')
+# size of an out of band body, followed by its segment name
+_OUTOFBAND = struct.Struct('<Q')
+_FLAG_EXTENSION = 0x01
+_FLAG_OUTOFBAND = 0x02
+# The sender is an actor address, encoded as _ADDRESS, instead of an utf-8 name
+_FLAG_ADDRESS = 0x04
+# A batch frame starts with a marker that no codec version uses, followed by the number of messages. Every message
+# frame follows, prefixed by its length as _LENGTH
+_BATCHMARKER = 0xFF
+_BATCHHEADER = struct.Struct('<BI')
+_ADDRESS = struct.Struct('<I')
+_EPOCH = datetime(1970, 1, 1)
+_EPOCH_UTC = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_new = object.__new__
+_setattr = object.__setattr__
+
+# --------------------
+# Queue constants
+# --------------------
+
+# The transports a ProducerQueue/ConsumerQueue can wrap
+_INNERQUEUES = (multiprocessing.queues.Queue, SharedRingQueue, SocketSender, SocketReceiver, LocalQueue)
+# The signals that travel on the control lane of a queue pair with lanes, overtaking any data message
+CONTROL_SIGNALS = (Signal.INTERRUPT, Signal.KILL, Signal.BEAT)
+# Lower and upper bound in seconds of the sleeps used waiting on lanes that can't be waited on
+_LANE_MINWAIT = 0.0005
+_LANE_MAXWAIT = 0.05
+# The SOCKET transport arguments that go to the SocketSender, the others go to the SocketReceiver
+_SENDERKWARGS = ('batchsize', 'buffersize', 'pool')
+
+
+@attr.s(kw_only=True, frozen=True, slots=True)
 class Status:
     reqtime = attr.ib(type=Optional[datetime],
                       validator=attr.validators.optional(attr.validators.instance_of(datetime)))
@@ -23,11 +83,31 @@ class Status:
     statusmessage = attr.ib(type=Optional[str],
                             validator=attr.validators.optional(attr.validators.instance_of(str)))
 
-
-@attr.s(kw_only=True, frozen=True)
+    @classmethod
+    def trusted(cls, *,
+                reqtime: Optional[datetime],
+                status: Optional[str],
+                time: Optional[datetime],
+                statustime: Optional[datetime],
+                statusmessage: Optional[str]) -> 'Status':
+        """Builds a Status skipping every validator. Meant for internal code that already knows its values are
+        well typed"""
+        out = _new(cls)
+        _setattr(out, 'reqtime', reqtime)
+        _setattr(out, 'status', status)
+        _setattr(out, 'time', time)
+        _setattr(out, 'statustime', statustime)
+        _setattr(out, 'statusmessage', statusmessage)
+        return out
+
+
+@attr.s(kw_only=True, frozen=True, slots=True)
 class Message:
-    sender = attr.ib(type=str, validator=attr.validators.instance_of(str))
-    signal = attr.ib(type=Signal, validator=attr.validators.instance_of(Signal))
+    """The unit of communication between actors. The sender is either the name of an actor or its compact int address
+    in the ActorRegistry of the score. The signal is a Signal, or a member of any other Enum for the custom signals
+    handled by @handles: those must be importable by the receiver"""
+    sender = attr.ib(type=Union[str, int], validator=attr.validators.instance_of((str, int)))
+    signal = attr.ib(type=enum.Enum, validator=attr.validators.instance_of(enum.Enum))
     type = attr.ib(type=MsgType, validator=attr.validators.instance_of(MsgType))
     extension = attr.ib(default={}, type=dict, validator=attr.validators.instance_of(dict))
     body = attr.ib()
@@ -43,8 +123,8 @@ class Message:
             if not isinstance(instance, Status):
                 raise TypeError("A type STATUS requires a dict body")
         elif self.type is MsgType.BYTES:
-            if not isinstance(instance, bytes):
-                raise TypeError("A type BYTES requires a bytes body")
+            if not isinstance(instance, (bytes, memoryview)):
+                raise TypeError("A type BYTES requires a bytes or memoryview body")
         elif self.type is MsgType.MAP:
             if not isinstance(instance, dict):
                 raise TypeError("A type MAP requires a dict body")
@@ -54,38 +134,505 @@ class Message:
         else:
             raise ValueError("This type of message isn't supported")
 
+    @classmethod
+    def trusted(cls, *,
+                sender: Union[str, int],
+                signal: enum.Enum,
+                type: MsgType,
+                body,
+                extension: Optional[dict] = None) -> 'Message':
+        """Builds a Message skipping every validator, the body one included. Meant for internal senders and decoders
+        that already know their fields are consistent"""
+        out = _new(cls)
+        _setattr(out, 'sender', sender)
+        _setattr(out, 'signal', signal)
+        _setattr(out, 'type', type)
+        _setattr(out, 'extension', _DEFAULT_EXTENSION if extension is None else extension)
+        _setattr(out, 'body', body)
+        return out
+
+
+# The same empty dict attrs gives to every Message built without an extension
+_DEFAULT_EXTENSION = attr.fields(Message).extension.default
+
+# --------------------
+# Wire codec
+# --------------------
+
+
+def _datetimetons(value: datetime) -> int:
+    delta = value - (_EPOCH_UTC if value.tzinfo else _EPOCH)
+    return (delta.days * 86400 + delta.seconds) * 1000000000 + delta.microseconds * 1000
+
+
+def _nstodatetime(value: int, aware: bool) -> datetime:
+    return (_EPOCH_UTC if aware else _EPOCH) + timedelta(microseconds=value // 1000)
+
+
+def encodestatus(status: Status) -> bytes:
+    """Encodes a Status as a fixed header with int64 epoch-nanoseconds timestamps, followed by its strings.
+    Timezone aware timestamps are decoded as UTC"""
+    mask = 0
+    stamps = []
+    for position, value in enumerate((status.reqtime, status.time, status.statustime)):
+        if value is not None:
+            mask |= 1 << position
+            if value.tzinfo:
+                mask |= 1 << (position + 3)
+            stamps.append(_datetimetons(value))
+        else:
+            stamps.append(0)
+    strings = []
+    for position, value in enumerate((status.status, status.statusmessage)):
+        if value is not None:
+            mask |= 1 << (position + 6)
+            encoded = value.encode('utf-8')
+            strings.append(_LENGTH.pack(len(encoded)))
+            strings.append(encoded)
+    return _STATUSHEADER.pack(mask, *stamps) + b''.join(strings)
+
+
+def decodestatus(frame: Union[bytes, memoryview]) -> Status:
+    """Decodes a Status encoded by encodestatus"""
+    mask, *stamps = _STATUSHEADER.unpack_from(frame)
+    times = [_nstodatetime(stamp, bool(mask & (1 << (position + 3)))) if mask & (1 << position) else None
+             for position, stamp in enumerate(stamps)]
+    offset = _STATUSHEADER.size
+    strings = []
+    for position in range(2):
+        if mask & (1 << (position + 6)):
+            length, = _LENGTH.unpack_from(frame, offset)
+            offset += _LENGTH.size
+            strings.append(bytes(frame[offset:offset + length]).decode('utf-8'))
+            offset += length
+        else:
+            strings.append(None)
+    return Status.trusted(reqtime=times[0], time=times[1], statustime=times[2],
+                          status=strings[0], statusmessage=strings[1])
+
+
+def encodemessage(msg: Message, oobthreshold: Optional[int] = None) -> bytes:
+    """Encodes a Message for the wire: a versioned header with Signal and MsgType as small ints, the sender (a 4 bytes
+    address or an utf-8 name), a custom signal (pickled), the pickled extension (only if not empty) and a compact
+    body. BYTES bodies longer than oobthreshold are moved in a shared memory segment, and only its name is encoded"""
+    if msg.sender.__class__ is int:
+        sender = _ADDRESS.pack(msg.sender)
+        flags = _FLAG_ADDRESS
+    else:
+        sender = msg.sender.encode('utf-8')
+        flags = 0
+    parts = [b'', sender]
+    signalcode = _SIGNALCODES.get(msg.signal)
+    if signalcode is None:
+        signalcode = _CUSTOMSIGNAL
+        signal = pickle.dumps(msg.signal, pickle.HIGHEST_PROTOCOL)
+        parts.append(_LENGTH.pack(len(signal)))
+        parts.append(signal)
+    if msg.extension:
+        flags |= _FLAG_EXTENSION
+        extension = pickle.dumps(msg.extension, pickle.HIGHEST_PROTOCOL)
+        parts.append(_LENGTH.pack(len(extension)))
+        parts.append(extension)
+    msgtype = msg.type
+    if msgtype is MsgType.TEXT:
+        parts.append(msg.body.encode('utf-8'))
+    elif msgtype is MsgType.BYTES:
+        if oobthreshold is not None and len(msg.body) > oobthreshold:
+            flags |= _FLAG_OUTOFBAND
+            parts.append(_OUTOFBAND.pack(len(msg.body)))
+            parts.append(exportbytes(msg.body).encode('utf-8'))
+        else:
+            parts.append(msg.body)
+    elif msgtype is MsgType.STATUS:
+        parts.append(encodestatus(msg.body))
+    elif msgtype is MsgType.MAP:
+        parts.append(pickle.dumps(msg.body, pickle.HIGHEST_PROTOCOL))
+    parts[0] = _HEADER.pack(CODEC_VERSION, signalcode, _MSGTYPECODES[msgtype], flags, len(sender))
+    return b''.join(parts)
+
+
+def decodemessage(frame: bytes) -> 'WireMessage':
+    """Decodes the header of a frame built by encodemessage. Sender, extension and body are decoded on access"""
+    return WireMessage(frame)
+
+
+def encodebatch(batch: 'MessageBatch', oobthreshold: Optional[int] = None) -> bytes:
+    """Encodes every message of a batch with encodemessage, in a single frame"""
+    parts = [_BATCHHEADER.pack(_BATCHMARKER, len(batch))]
+    for msg in batch:
+        frame = encodemessage(msg, oobthreshold)
+        parts.append(_LENGTH.pack(len(frame)))
+        parts.append(frame)
+    return b''.join(parts)
+
+
+def decodebatch(frame: bytes) -> 'MessageBatch':
+    """Splits a frame built by encodebatch in the frames of its messages, decoded as WireMessages"""
+    return MessageBatch([WireMessage(message) for message in _splitbatch(frame)])
+
+
+def _splitbatch(frame: bytes) -> Iterable[bytes]:
+    """Yields the message frames of a frame built by encodebatch, without decoding them"""
+    _, count = _BATCHHEADER.unpack_from(frame)
+    offset = _BATCHHEADER.size
+    for _ in range(count):
+        length, = _LENGTH.unpack_from(frame, offset)
+        offset += _LENGTH.size
+        yield frame[offset:offset + length]
+        offset += length
+
+
+def _framesegment(frame: bytes) -> Optional[str]:
+    """The name of the segment holding the out of band body of a message frame, without mapping it. None if the body
+    is in band"""
+    _, signal, _, flags, senderlength = _HEADER.unpack_from(frame)
+    if not flags & _FLAG_OUTOFBAND:
+        return None
+    offset = _HEADER.size + senderlength
+    for present in (signal == _CUSTOMSIGNAL, flags & _FLAG_EXTENSION):
+        if present:
+            length, = _LENGTH.unpack_from(frame, offset)
+            offset += _LENGTH.size + length
+    return frame[offset + _OUTOFBAND.size:].decode('utf-8')
+
+
+class WireMessage:
+    """A lazily decoded Message. Signal and type are read with the header, while sender, extension and body are
+    decoded (and cached) the first time they are accessed. An out of band body is mapped right away, as a memoryview
+    on its shared memory segment"""
+    __slots__ = ('__frame', '__flags', '__senderlength', '__sender', '__extension', '__extensionoffset', '__body',
+                 '__bodyoffset', 'signal', 'type')
+
+    def __init__(self, frame: bytes):
+        version, signal, msgtype, flags, senderlength = _HEADER.unpack_from(frame)
+        if version != CODEC_VERSION:
+            raise IllegalValueException(f"Unsupported codec version {version}")
+        self.__frame = frame
+        self.__flags = flags
+        self.__senderlength = senderlength
+        self.__sender = None
+        self.__extension = None
+        self.__body = ...
+        self.__bodyoffset = None
+        self.__extensionoffset = _HEADER.size + senderlength
+        if signal == _CUSTOMSIGNAL:
+            length, = _LENGTH.unpack_from(frame, self.__extensionoffset)
+            start = self.__extensionoffset + _LENGTH.size
+            self.signal = pickle.loads(frame[start:start + length])
+            self.__extensionoffset = start + length
+        else:
+            self.signal = _SIGNALS[signal]
+        self.type = _MSGTYPES[msgtype]
+        if flags & _FLAG_OUTOFBAND:
+            self.__decodeextension()
+            size, = _OUTOFBAND.unpack_from(frame, self.__bodyoffset)
+            self.__body = importbytes(frame[self.__bodyoffset + _OUTOFBAND.size:].decode('utf-8'), size)
+
+    @property
+    def frame(self) -> bytes:
+        return self.__frame
+
+    @property
+    def sender(self) -> Union[str, int]:
+        if self.__sender is None:
+            if self.__flags & _FLAG_ADDRESS:
+                self.__sender, = _ADDRESS.unpack_from(self.__frame, _HEADER.size)
+            else:
+                self.__sender = self.__frame[_HEADER.size:_HEADER.size + self.__senderlength].decode('utf-8')
+        return self.__sender
+
+    @property
+    def extension(self) -> dict:
+        if self.__extension is None:
+            self.__decodeextension()
+        return self.__extension
+
+    @property
+    def body(self):
+        if self.__body is ...:
+            if self.__bodyoffset is None:
+                self.__decodeextension()
+            raw = memoryview(self.__frame)[self.__bodyoffset:]
+            msgtype = self.type
+            if msgtype is MsgType.TEXT:
+                self.__body = str(raw, 'utf-8')
+            elif msgtype is MsgType.BYTES:
+                self.__body = bytes(raw)
+            elif msgtype is MsgType.STATUS:
+                self.__body = decodestatus(raw)
+            elif msgtype is MsgType.MAP:
+                self.__body = pickle.loads(raw)
+            else:
+                self.__body = None
+        return self.__body
+
+    def __decodeextension(self):
+        offset = self.__extensionoffset
+        if self.__flags & _FLAG_EXTENSION:
+            length, = _LENGTH.unpack_from(self.__frame, offset)
+            offset += _LENGTH.size
+            self.__extension = pickle.loads(self.__frame[offset:offset + length])
+            offset += length
+        else:
+            self.__extension = {}
+        self.__bodyoffset = offset
 
-class ProducerQueue(multiprocessing.queues.Queue):
-    __slots__ = ('__innerq',)
+    def tomessage(self) -> Message:
+        """Fully decodes the frame into a Message. The frame was built from a valid Message, so it isn't validated
+        again"""
+        return Message.trusted(sender=self.sender, signal=self.signal, type=self.type,
+                               extension=self.extension, body=self.body)
+
+    def __eq__(self, other):
+        if isinstance(other, WireMessage):
+            return self.__frame == other.frame
+        if isinstance(other, Message):
+            return self.tomessage() == other
+        return NotImplemented
+
+    def __repr__(self):
+        return f"WireMessage(sender={self.sender!r}, signal={self.signal}, type={self.type})"
+
+
+@attr.s(frozen=True, slots=True)
+class _OutOfBandMessage:
+    """Stands for a BYTES Message on a queue, while its body travels in a shared memory segment"""
+    message = attr.ib(type=Message)
+    segment = attr.ib(type=str)
+    size = attr.ib(type=int)
+
+    @classmethod
+    def export(cls, msg: Message) -> '_OutOfBandMessage':
+        return cls(attr.evolve(msg, body=b''), exportbytes(msg.body), len(msg.body))
+
+    def resolve(self) -> Message:
+        return attr.evolve(self.message, body=importbytes(self.segment, self.size))
+
+
+class _Pickled:
+    """Stands for an object pickled in advance: pickling it again only copies the payload, and unpickling it gives
+    back the original object, so that the consumer never sees the difference"""
+    __slots__ = ('payload',)
+
+    def __init__(self, payload: bytes):
+        self.payload = payload
+
+    def __reduce__(self):
+        return pickle.loads, (self.payload,)
+
+
+class SharedMessage:
+    """A Message put on many queues, that is serialized at most once for each form it can travel in: a wire frame for
+    encoded queues, a pickle for the others. See ProducerQueue.putshared"""
+    __slots__ = ('__message', '__frame', '__pickled')
+
+    def __init__(self, msg: Message):
+        if not isinstance(msg, Message):
+            raise TypeError()
+        self.__message = msg
+        self.__frame = None
+        self.__pickled = None
+
+    @property
+    def message(self) -> Message:
+        return self.__message
+
+    @property
+    def frame(self) -> bytes:
+        """The message encoded with encodemessage, every body in band"""
+        if self.__frame is None:
+            self.__frame = encodemessage(self.__message)
+        return self.__frame
 
-    def __init__(self, innerq: multiprocessing.queues.Queue):
-        if not isinstance(innerq, multiprocessing.queues.Queue):
+    @property
+    def pickled(self) -> _Pickled:
+        if self.__pickled is None:
+            self.__pickled = _Pickled(pickle.dumps(self.__message, pickle.HIGHEST_PROTOCOL))
+        return self.__pickled
+
+
+class MessageBatch:
+    """An envelope carrying many messages, in order, as a single queue item: they're pickled (or encoded) and written
+    at once. A ConsumerQueue hands out the messages of a batch one by one, as if they had been put separately. See
+    MessageBatcher"""
+    __slots__ = ('__messages',)
+
+    def __init__(self, messages: Iterable[Union[Message, WireMessage]]):
+        self.__messages = tuple(messages)
+        if not self.__messages:
+            raise IllegalValueException("A batch must carry at least a message")
+
+    def __reduce__(self):
+        return MessageBatch, (self.__messages,)
+
+    @property
+    def messages(self) -> Tuple[Union[Message, WireMessage], ...]:
+        return self.__messages
+
+    def __len__(self):
+        return len(self.__messages)
+
+    def __iter__(self):
+        return iter(self.__messages)
+
+    def __eq__(self, other):
+        if isinstance(other, MessageBatch):
+            return self.__messages == other.messages
+        return NotImplemented
+
+    def __repr__(self):
+        return f"MessageBatch({len(self.__messages)} messages)"
+
+
+# --------------------
+# Queues
+# --------------------
+
+
+class ProducerQueue(multiprocessing.queues.Queue):
+    __slots__ = ('__innerq', '__encoded', '__oobthreshold', '__controlq', '__journal', '__journallock',
+                 '__destination', '__maxsize')
+
+    def __init__(self,
+                 innerq: Union[multiprocessing.queues.Queue, SharedRingQueue],
+                 encoded: bool = False,
+                 oobthreshold: Optional[int] = None,
+                 controlq: Union[multiprocessing.queues.Queue, SharedRingQueue, None] = None,
+                 journal: Optional[Journal] = None,
+                 maxsize: int = 0):
+        """
+        Write-only view of a queue
+        :param encoded: If True, every Message is encoded with encodemessage before being queued
+        :param oobthreshold: BYTES bodies longer than this travel out of band, in a shared memory segment that the
+        consumer maps without copying. None keeps every body in band
+        :param controlq: The control lane. If given, the messages with a signal among CONTROL_SIGNALS go there, while
+        innerq only carries data
+        :param journal: Where every item but the control messages is appended, in the same order it's queued. A
+        journaled queue can't leave its process, nor send bodies out of band
+        :param maxsize: The maxsize innerq was built with, 0 or less if it's unbounded or unknown. It's what credits
+        are counted from, for the transports that can't tell
+        """
+        if not isinstance(innerq, _INNERQUEUES) or (controlq is not None and not isinstance(controlq, _INNERQUEUES)):
             raise TypeError
+        if journal is not None and oobthreshold is not None:
+            raise IllegalValueException("Out of band bodies can't be journaled")
         self.__innerq = innerq
-
-    def put(self, obj, block: bool = ..., timeout: Optional[float] = ...) -> None:
-        self.__innerq.put(obj, block, timeout)
+        self.__encoded = encoded
+        self.__oobthreshold = oobthreshold
+        self.__controlq = controlq
+        self.__journal = journal
+        self.__journallock = None if journal is None else threading.Lock()
+        self.__destination = None
+        self.__maxsize = max(maxsize, 0)
+
+    def __getstate__(self):
+        if self.__journal is not None:
+            raise IllegalActionException("A journaled queue stays in the process that writes its journal")
+        return self.__innerq, self.__encoded, self.__oobthreshold, self.__controlq, self.__destination, self.__maxsize
+
+    def __setstate__(self, state):
+        self.__innerq, self.__encoded, self.__oobthreshold, self.__controlq, self.__destination, self.__maxsize = state
+        self.__journal = self.__journallock = None
+
+    @property
+    def encoded(self) -> bool:
+        return self.__encoded
+
+    @property
+    def lanes(self) -> bool:
+        return self.__controlq is not None
+
+    @property
+    def credits(self) -> Optional[int]:
+        """How many more data items the queue accepts before being full. None if the queue is unbounded or the
+        platform can't tell its size"""
+        return _credits(self.__innerq, self.__maxsize)
+
+    @property
+    def journal(self) -> Optional[Journal]:
+        return self.__journal
+
+    @property
+    def destination(self) -> Union[int, Tuple[int, ...], None]:
+        """The address, or the addresses, stamped on every message by a routed view. None for a plain queue"""
+        return self.__destination
+
+    @property
+    def transport(self):
+        """What carries the data items: the same object for a queue and all its routed views"""
+        return self.__innerq
+
+    def routed(self, address: int) -> 'ProducerQueue':
+        """A view of the same queue that stamps address on every message, as their DESTINATION_KEY extension, so
+        that many actors can share a single inbox read by a Demultiplexer. Only messages and batches of messages can
+        be put on it, and its credits are the ones of the whole inbox"""
+        if address.__class__ is not int or address < 0:
+            raise IllegalValueException(f"Can't route to address {address}")
+        return self.__routedview(address)
+
+    def multicast(self, addresses: Iterable[int]) -> 'ProducerQueue':
+        """Like routed, but every message goes to all the given addresses: it's queued once, and the Demultiplexer
+        hands it to each of them"""
+        addresses = tuple(addresses)
+        if not addresses or any(address.__class__ is not int or address < 0 for address in addresses):
+            raise IllegalValueException(f"Can't route to addresses {addresses}")
+        return self.__routedview(addresses)
+
+    def put(self, obj, block: bool = True, timeout: Optional[float] = None) -> None:
+        if self.__destination is not None:
+            obj = self.__route(obj)
+        if self.__journal is None:
+            self.__putitem(self.__lane(obj), self.__prepare(obj), block, timeout)
+        else:
+            self.__putjournaled(obj, self.__prepare(obj), block, timeout)
 
     def qsize(self) -> int:
-        return self.__innerq.qsize()
+        return sum(lane.qsize() for lane in self.__lanes())
 
     def empty(self) -> bool:
-        return self.__innerq.empty()
+        return all(lane.empty() for lane in self.__lanes())
 
     def full(self) -> bool:
         return self.__innerq.full()
 
     def put_nowait(self, item) -> None:
-        self.__innerq.put_nowait(item)
+        if self.__destination is not None:
+            item = self.__route(item)
+        if self.__journal is None:
+            self.__putitem(self.__lane(item), self.__prepare(item), False, None)
+        else:
+            self.__putjournaled(item, self.__prepare(item), False, None)
+
+    def putshared(self, shared: SharedMessage, block: bool = True, timeout: Optional[float] = None) -> None:
+        """Puts the message of shared, reusing its serialized form instead of serializing it again. Bodies that
+        travel out of band still get a segment per queue, since every consumer releases its own. A routed view
+        serializes the message again, stamped with its destination: a multicast view reaches many actors of an inbox
+        with that single serialization"""
+        if self.__destination is not None:
+            shared = SharedMessage(self.__route(shared.message))
+        msg = shared.message
+        if self.__oobthreshold is not None and msg.type is MsgType.BYTES and len(msg.body) > self.__oobthreshold:
+            item = self.__prepare(msg)
+        elif self.__encoded:
+            item = shared.frame
+        else:
+            item = shared.pickled
+        if self.__journal is None:
+            self.__putitem(self.__lane(msg), item, block, timeout)
+        else:
+            self.__putjournaled(msg, item, block, timeout)
 
     def close(self) -> None:
-        self.__innerq.close()
+        for lane in self.__lanes():
+            lane.close()
 
     def join_thread(self) -> None:
-        self.__innerq.join_thread()
+        for lane in self.__lanes():
+            lane.join_thread()
 
     def cancel_join_thread(self) -> None:
-        self.__innerq.cancel_join_thread()
+        for lane in self.__lanes():
+            lane.cancel_join_thread()
 
     def join(self) -> None:
         self.__innerq.join()
@@ -93,29 +640,152 @@ class ProducerQueue(multiprocessing.queues.Queue):
     def task_done(self) -> None:
         self.__innerq.task_done()
 
-    def get(self, block: bool = ..., timeout: Optional[float] = ...):
+    def get(self, block: bool = True, timeout: Optional[float] = None):
         raise IllegalActionException()
 
     def get_nowait(self):
         raise IllegalActionException()
 
+    def __lanes(self):
+        return (self.__innerq,) if self.__controlq is None else (self.__controlq, self.__innerq)
+
+    def __lane(self, obj):
+        """Picks the inner queue an object travels on"""
+        if self.__controlq is not None and isinstance(obj, (Message, WireMessage)) and obj.signal in CONTROL_SIGNALS:
+            return self.__controlq
+        return self.__innerq
+
+    def __putitem(self, lane, item, block: bool, timeout: Optional[float]):
+        """Puts a prepared item on a lane. If it can't be queued (the lane is full, or the item can't be pickled), the
+        segments of its out of band bodies are destroyed, since no consumer is going to import them"""
+        if self.__oobthreshold is None:
+            lane.put(item, block, timeout)
+            return
+        try:
+            lane.put(item, block, timeout)
+        except BaseException:
+            for name in _segments(item):
+                releasebytes(name)
+            raise
+
+    def __putjournaled(self, obj, item, block: bool, timeout: Optional[float]):
+        """Queues item, the prepared form of obj, then appends it to the journal. Items are appended in the order
+        they're queued, and only if they're queued"""
+        lane = self.__lane(obj)
+        if not _journaled(obj):
+            lane.put(item, block, timeout)
+            return
+        with self.__journallock:
+            lane.put(item, block, timeout)
+            self.__journal.append(item)
+
+    def __routedview(self, destination: Union[int, Tuple[int, ...]]) -> 'ProducerQueue':
+        out = _new(ProducerQueue)
+        out.__innerq = self.__innerq
+        out.__encoded = self.__encoded
+        out.__oobthreshold = self.__oobthreshold
+        out.__controlq = self.__controlq
+        out.__journal = self.__journal
+        out.__journallock = self.__journallock
+        out.__destination = destination
+        out.__maxsize = self.__maxsize
+        return out
+
+    def __route(self, obj):
+        """Stamps the destination of a routed view on a message, or on every message of a batch"""
+        if obj.__class__ is MessageBatch:
+            return MessageBatch(self.__route(msg) for msg in obj)
+        if obj.__class__ is WireMessage:
+            obj = obj.tomessage()
+        elif obj.__class__ is not Message:
+            raise IllegalValueException(f"Only messages can be routed, got {obj.__class__.__name__}")
+        return Message.trusted(sender=obj.sender, signal=obj.signal, type=obj.type, body=obj.body,
+                               extension={**obj.extension, DESTINATION_KEY: self.__destination})
+
+    def __prepare(self, obj):
+        """Turns an object in what actually travels on the inner queue"""
+        if obj.__class__ is MessageBatch:
+            if self.__encoded:
+                return encodebatch(obj, self.__oobthreshold)
+            if self.__oobthreshold is not None:
+                return MessageBatch(self.__export(msg) for msg in obj)
+            return obj
+        if self.__encoded:
+            return encodemessage(obj, self.__oobthreshold)
+        if self.__oobthreshold is not None:
+            return self.__export(obj)
+        return obj
+
+    def __export(self, obj):
+        if isinstance(obj, Message) and obj.type is MsgType.BYTES and len(obj.body) > self.__oobthreshold:
+            return _OutOfBandMessage.export(obj)
+        return obj
 
-class ConsumerQueue(multiprocessing.queues.Queue):
-    __slots__ = ('__innerq',)
 
-    def __init__(self, innerq: multiprocessing.queues.Queue):
-        if not isinstance(innerq, multiprocessing.queues.Queue):
+class ConsumerQueue(multiprocessing.queues.Queue):
+    __slots__ = ('__innerq', '__encoded', '__controlq', '__unpacked', '__cursor', '__replayed')
+
+    def __init__(self,
+                 innerq: Union[multiprocessing.queues.Queue, SharedRingQueue],
+                 encoded: bool = False,
+                 controlq: Union[multiprocessing.queues.Queue, SharedRingQueue, None] = None,
+                 cursor: Optional[JournalCursor] = None,
+                 replayed: Iterable = ()):
+        """
+        Read-only view of a queue. The messages of a MessageBatch are returned one by one, in order
+        :param encoded: If True, every item is decoded with decodemessage before being returned
+        :param controlq: The control lane. If given, it's always emptied before reading innerq
+        :param cursor: The position of the consumer in the journal of the queue, moved past every journaled item
+        once it's returned (past a batch once all its messages are), and committed by acknowledge
+        :param replayed: Items read back from the journal, as the producer prepared them. They're returned before
+        anything queued on innerq, and they travel with the view instead of filling the transport
+        """
+        if not isinstance(innerq, _INNERQUEUES) or (controlq is not None and not isinstance(controlq, _INNERQUEUES)):
             raise TypeError
         self.__innerq = innerq
-
-    def put(self, obj, block: bool = ..., timeout: Optional[float] = ...) -> None:
+        self.__encoded = encoded
+        self.__controlq = controlq
+        self.__unpacked = deque()
+        self.__cursor = cursor
+        self.__replayed = deque(replayed)
+
+    def __getstate__(self):
+        return self.__innerq, self.__encoded, self.__controlq, self.__cursor, self.__replayed
+
+    def __setstate__(self, state):
+        self.__innerq, self.__encoded, self.__controlq, self.__cursor, self.__replayed = state
+        self.__unpacked = deque()
+
+    @property
+    def encoded(self) -> bool:
+        return self.__encoded
+
+    @property
+    def lanes(self) -> bool:
+        return self.__controlq is not None
+
+    @property
+    def cursor(self) -> Optional[JournalCursor]:
+        return self.__cursor
+
+    @property
+    def waitables(self) -> Optional[Tuple]:
+        """The connections that become readable when the queue has data, for multiprocessing.connection.wait or an
+        event loop. None if the transport has no such thing and must be polled, or while replayed items are left,
+        since they never make a connection readable"""
+        if self.__replayed or not all(isinstance(lane, multiprocessing.queues.Queue) for lane in self.__lanes()):
+            return None
+        return tuple(lane._reader for lane in self.__lanes())
+
+    def put(self, obj, block: bool = True, timeout: Optional[float] = None) -> None:
         raise IllegalActionException()
 
     def qsize(self) -> int:
-        return self.__innerq.qsize()
+        """The items queued, plus the messages of a batch and the replayed items not returned yet"""
+        return len(self.__unpacked) + len(self.__replayed) + sum(lane.qsize() for lane in self.__lanes())
 
     def empty(self) -> bool:
-        return self.__innerq.empty()
+        return not self.__unpacked and not self.__replayed and all(lane.empty() for lane in self.__lanes())
 
     def full(self) -> bool:
         return self.__innerq.full()
@@ -124,13 +794,16 @@ class ConsumerQueue(multiprocessing.queues.Queue):
         raise IllegalActionException()
 
     def close(self) -> None:
-        self.__innerq.close()
+        for lane in self.__lanes():
+            lane.close()
 
     def join_thread(self) -> None:
-        self.__innerq.join_thread()
+        for lane in self.__lanes():
+            lane.join_thread()
 
     def cancel_join_thread(self) -> None:
-        self.__innerq.cancel_join_thread()
+        for lane in self.__lanes():
+            lane.cancel_join_thread()
 
     def join(self) -> None:
         self.__innerq.join()
@@ -138,13 +811,181 @@ class ConsumerQueue(multiprocessing.queues.Queue):
     def task_done(self) -> None:
         self.__innerq.task_done()
 
-    def get(self, block: bool = ..., timeout: Optional[float] = ...):
-        return self.__innerq.get(block, timeout)
+    def get(self, block: bool = True, timeout: Optional[float] = None):
+        unpacked = self.__unpacked
+        if unpacked:
+            if self.__controlq is not None:
+                # The rest of a batch is data: the control lane still overtakes it
+                try:
+                    return self.__receive(self.__controlq.get_nowait())
+                except Empty:
+                    pass
+            msg = unpacked.popleft()
+            if not unpacked and self.__cursor is not None:
+                self.__cursor.advance()
+            return msg
+        if self.__replayed:
+            if self.__controlq is not None:
+                try:
+                    return self.__receive(self.__controlq.get_nowait())
+                except Empty:
+                    pass
+            return self.__receive(self.__replayed.popleft())
+        if self.__controlq is None:
+            return self.__receive(self.__innerq.get(block, timeout))
+        return self.__receive(self.__getlanes(block, timeout))
 
     def get_nowait(self):
-        return self.__innerq.get_nowait()
-
-
-def generatequeues() -> Tuple[ProducerQueue, ConsumerQueue]:
-    innerq = multiprocessing.Queue()
-    return ProducerQueue(innerq), ConsumerQueue(innerq)
+        return self.get(False)
+
+    def acknowledge(self):
+        """Tells the journal of the queue that the items returned so far have been handled, committing the cursor.
+        After a restart, the items not acknowledged are replayed. Without a cursor it does nothing"""
+        if self.__cursor is not None:
+            self.__cursor.commit()
+
+    def __lanes(self):
+        return (self.__innerq,) if self.__controlq is None else (self.__controlq, self.__innerq)
+
+    def __getlanes(self, block: bool, timeout: Optional[float]):
+        """Returns the oldest item of the control lane or, if it's empty, the oldest of the data lane"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        backoff = _LANE_MINWAIT
+        while 1:
+            for lane in (self.__controlq, self.__innerq):
+                try:
+                    return lane.get_nowait()
+                except Empty:
+                    pass
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if not block or (remaining is not None and remaining <= 0):
+                raise Empty
+            waitables = self.waitables
+            if waitables is not None:
+                wait(waitables, remaining)
+            else:
+                time.sleep(backoff if remaining is None else min(backoff, remaining))
+                backoff = min(backoff * 2, _LANE_MAXWAIT)
+
+    def __receive(self, item):
+        """Turns what travelled on the inner queue back in the object that was put. A batch is unpacked: its first
+        message is returned, and the others are kept for the following gets"""
+        if self.__encoded:
+            item = decodemessage(item) if item[0] != _BATCHMARKER else decodebatch(item)
+        if item.__class__ is MessageBatch:
+            unpacked = self.__unpacked
+            unpacked.extend(_resolve(msg) for msg in item)
+            msg = unpacked.popleft()
+            if not unpacked and self.__cursor is not None:
+                self.__cursor.advance()
+            return msg
+        if self.__cursor is not None and _journaled(item):
+            self.__cursor.advance()
+        return _resolve(item)
+
+
+def generatequeues(encoded: bool = False,
+                   transport: Transport = Transport.PIPE,
+                   oobthreshold: Optional[int] = None,
+                   lanes: bool = False,
+                   maxsize: int = 0,
+                   journal: Optional[Journal] = None,
+                   journalname: str = 'consumer',
+                   context=None,
+                   **transportkwargs) -> Tuple[ProducerQueue, ConsumerQueue]:
+    """
+    Builds a write-only and a read-only view of the same queue
+    :param encoded: If True, messages travel encoded with the wire codec instead of being pickled
+    :param oobthreshold: BYTES bodies longer than this travel out of band, see ProducerQueue
+    :param transport: What carries the messages. PIPE is a multiprocessing.Queue, SHAREDMEMORY a SharedRingQueue, that
+    supports a single consumer, SOCKET a SocketSender writing to a SocketReceiver, that supports a single consumer too.
+    Out of band bodies need the consumer on the same host
+    :param lanes: If True, the messages with a signal among CONTROL_SIGNALS travel on a second transport, that the
+    consumer empties first, overtaking any queued data message
+    :param maxsize: The maximum number of data items in the queue, 0 or less for no limit. The control lane is never
+    bounded, so that an overloaded consumer can still be stopped
+    :param journal: Where the producer appends the data items. The items that journalname didn't acknowledge yet, e.g.
+    before its process died, are handed to the consumer view, so that a queue pair rebuilt on the same journal replays
+    them before any new item. They don't go through the transport, so a backlog larger than maxsize can't fill it
+    :param journalname: The name the consumer commits its position in the journal with
+    :param context: The multiprocessing context the PIPE queues and the SHAREDMEMORY locks are built with, that must
+    match the one that starts the processes using them. Defaults to multiprocessing's default one
+    :param transportkwargs: Passed to the transport constructor, e.g. size and multiproducer for SHAREDMEMORY. For
+    SOCKET, address and backlog go to the receiver, batchsize, buffersize and pool to the sender, authkey to both. The
+    control lane listens on the same host with a free port, or on the address path followed by .control
+    """
+    producerq, consumerq = _buildtransport(transport, dict(transportkwargs, maxsize=maxsize), context)
+    producerc, consumerc = _buildtransport(transport, _controlkwargs(transport, transportkwargs), context) if lanes \
+        else (None, None)
+    producer = ProducerQueue(producerq, encoded, oobthreshold, producerc, journal, maxsize)
+    if journal is None:
+        return producer, ConsumerQueue(consumerq, encoded, consumerc)
+    cursor = journal.cursor(journalname)
+    replayed = [item for _, item in journal.read(cursor.offset)]
+    return producer, ConsumerQueue(consumerq, encoded, consumerc, cursor, replayed)
+
+
+def _journaled(obj) -> bool:
+    """Whether an item is appended to the journal of its queue: control messages aren't, since they would be stale
+    by the time they're replayed"""
+    return not (isinstance(obj, (Message, WireMessage)) and obj.signal in CONTROL_SIGNALS)
+
+
+def _segments(item) -> Iterable[str]:
+    """The names of the segments holding the out of band bodies of an item prepared by a ProducerQueue"""
+    if item.__class__ is _OutOfBandMessage:
+        yield item.segment
+    elif item.__class__ is MessageBatch:
+        for msg in item:
+            yield from _segments(msg)
+    elif item.__class__ is bytes:
+        for frame in _splitbatch(item) if item[0] == _BATCHMARKER else (item,):
+            name = _framesegment(frame)
+            if name is not None:
+                yield name
+
+
+def _resolve(item):
+    """Maps the body of a message that travelled out of band"""
+    return item.resolve() if isinstance(item, _OutOfBandMessage) else item
+
+
+def _credits(innerq, maxsize: int) -> Optional[int]:
+    if isinstance(innerq, SharedRingQueue):
+        return innerq.credits
+    if isinstance(innerq, SocketSender):
+        # The receiver is on the other end of a connection
+        return None
+    if isinstance(innerq, LocalQueue):
+        return None
+    if not maxsize:
+        return None
+    try:
+        return max(maxsize - innerq.qsize(), 0)
+    except NotImplementedError:  # macOS
+        return None
+
+
+def _buildtransport(transport: Transport, transportkwargs: dict, context=None) -> tuple:
+    """Builds the producer and the consumer end of a transport, which are the same object unless it's a SOCKET.
+    Sockets don't depend on the start method, so context only matters to the others"""
+    if transport is Transport.PIPE:
+        innerq = (context or multiprocessing).Queue(**transportkwargs)
+        return innerq, innerq
+    elif transport is Transport.SHAREDMEMORY:
+        innerq = SharedRingQueue(context=context, **transportkwargs)
+        return innerq, innerq
+    elif transport is Transport.SOCKET:
+        senderkwargs = {key: transportkwargs.pop(key) for key in _SENDERKWARGS if key in transportkwargs}
+        senderkwargs['authkey'] = transportkwargs.get('authkey')
+        receiver = SocketReceiver(**transportkwargs)
+        return SocketSender(receiver.address, **senderkwargs), receiver
+    raise IllegalValueException(f"Unknown transport {transport}")
+
+
+def _controlkwargs(transport: Transport, transportkwargs: dict) -> dict:
+    """The transport arguments of the control lane, that can't listen where the data lane does"""
+    address = transportkwargs.get('address')
+    if transport is not Transport.SOCKET or address is None:
+        return dict(transportkwargs)
+    return dict(transportkwargs, address=address + '.control' if isinstance(address, str) else (address[0], 0))
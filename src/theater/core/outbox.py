@@ -0,0 +1,213 @@
+import collections
+import pickle
+import tempfile
+from queue import Full
+from typing import Optional, Callable
+
+from theater.core.components.constants import INTERRUPTED_STATUS
+from theater.core.constants import Overflow, OUTBOX_CAPACITY, CORRELATION_KEY
+from theater.core.errors import IllegalValueException
+from theater.core.messages import Message, ProducerQueue, Status
+
+__all__ = ['Outbox', 'coalescekey']
+
+
+# --------------------
+# Module functions
+# --------------------
+
+
+def coalescekey(obj):
+    """The default coalescing key: a pending message replaces the older one with the same sender, signal and type.
+    Replies (carrying a CORRELATION_KEY) and interruption notices are never replaced, someone is waiting for each"""
+    if isinstance(obj, Message) and CORRELATION_KEY not in obj.extension and \
+            not (isinstance(obj.body, Status) and obj.body.status == INTERRUPTED_STATUS):
+        return obj.sender, obj.signal, obj.type
+    return id(obj)
+
+
+# --------------------
+# Module classes
+# --------------------
+
+
+class Outbox:
+    """Sends objects on a ProducerQueue without blocking (unless told to) and without growing unbounded. When the
+    queue is full, the overflow policy decides what happens:
+    BLOCK waits for room, for at most timeout seconds, then drops the object;
+    DROPOLDEST keeps up to capacity pending objects, dropping the oldest;
+    COALESCE keeps up to capacity pending objects, a newer one replacing the pending one with the same key;
+    SPILL keeps up to capacity pending objects in memory and pickles the others to a temporary file.
+    Pending objects are shipped in order, before any newer one, by flush and send. Every drop is counted"""
+    __slots__ = ('__queue', '__overflow', '__capacity', '__timeout', '__key', '__ondrop', '__pending', '__spill',
+                 '__spilled', '__readoffset', '__dropped', '__coalesced')
+
+    # --------------------
+    # Outbox constructor
+    # --------------------
+
+    def __init__(self,
+                 queue: ProducerQueue,
+                 overflow: Overflow = Overflow.DROPOLDEST,
+                 capacity: int = OUTBOX_CAPACITY,
+                 timeout: Optional[float] = None,
+                 key: Callable = coalescekey,
+                 ondrop: Optional[Callable] = None):
+        """
+        Builds an empty Outbox
+        :param queue: The queue the objects are sent on
+        :param overflow: What to do with an object when the queue is full
+        :param capacity: The maximum number of objects kept in memory while the queue is full
+        :param timeout: The seconds BLOCK waits for room. None waits forever
+        :param key: Maps an object to its coalescing key, for COALESCE
+        :param ondrop: Called with every dropped object
+        """
+        if not isinstance(queue, ProducerQueue) or not isinstance(overflow, Overflow):
+            raise TypeError()
+        if not isinstance(capacity, int) or capacity < 1:
+            raise IllegalValueException(f"An outbox must hold at least a message, got {capacity}")
+        self.__queue = queue
+        self.__overflow = overflow
+        self.__capacity = capacity
+        self.__timeout = timeout
+        self.__key = key
+        self.__ondrop = ondrop
+        self.__pending = {} if overflow is Overflow.COALESCE else collections.deque()
+        self.__spill = None
+        self.__spilled = 0
+        self.__readoffset = 0
+        self.__dropped = 0
+        self.__coalesced = 0
+
+    # --------------------
+    # Outbox public properties
+    # --------------------
+
+    @property
+    def queue(self) -> ProducerQueue:
+        return self.__queue
+
+    @property
+    def overflow(self) -> Overflow:
+        return self.__overflow
+
+    @property
+    def pending(self) -> int:
+        """The objects waiting for room in the queue, spilled ones included"""
+        return len(self.__pending) + self.__spilled
+
+    @property
+    def dropped(self) -> int:
+        return self.__dropped
+
+    @property
+    def coalesced(self) -> int:
+        """The pending objects replaced by a newer one with the same key"""
+        return self.__coalesced
+
+    @property
+    def credits(self) -> Optional[int]:
+        """How many more objects the queue accepts right now, see ProducerQueue.credits"""
+        return self.__queue.credits
+
+    # --------------------
+    # Outbox public methods
+    # --------------------
+
+    def send(self, obj) -> bool:
+        """Sends obj, or keeps it pending if the queue is full. Returns False if obj got dropped"""
+        if self.pending and not self.flush():
+            return self.__hold(obj)
+        try:
+            self.__queue.put_nowait(obj)
+            return True
+        except Full:
+            pass
+        if self.__overflow is Overflow.BLOCK:
+            try:
+                self.__queue.put(obj, True, self.__timeout)
+                return True
+            except Full:
+                self.__drop(obj)
+                return False
+        return self.__hold(obj)
+
+    def flush(self) -> bool:
+        """Ships the pending objects till the queue is full. Returns True if nothing is left pending"""
+        while self.pending:
+            obj = self.__peek()
+            try:
+                self.__queue.put_nowait(obj)
+            except Full:
+                return False
+            self.__pop()
+        return True
+
+    def close(self):
+        """Forgets the pending objects, dropping them"""
+        for _ in range(self.pending):
+            self.__drop(self.__pop())
+        if self.__spill is not None:
+            self.__spill.close()
+            self.__spill = None
+
+    # --------------------
+    # Outbox private methods
+    # --------------------
+
+    def __drop(self, obj):
+        self.__dropped += 1
+        if self.__ondrop is not None:
+            self.__ondrop(obj)
+
+    def __hold(self, obj) -> bool:
+        """Keeps obj pending according to the overflow policy. Returns False if obj got dropped"""
+        if self.__overflow is Overflow.COALESCE:
+            key = self.__key(obj)
+            if self.__pending.pop(key, None) is not None:
+                self.__coalesced += 1
+            elif len(self.__pending) >= self.__capacity:
+                self.__drop(self.__pending.pop(next(iter(self.__pending))))
+            self.__pending[key] = obj
+        elif self.__overflow is Overflow.SPILL and (self.__spilled or len(self.__pending) >= self.__capacity):
+            # Once something is spilled, newer objects are spilled too, so that the file stays in order
+            if self.__spill is None:
+                self.__spill = tempfile.TemporaryFile()
+            self.__spill.seek(0, 2)
+            pickle.dump(obj, self.__spill, pickle.HIGHEST_PROTOCOL)
+            self.__spilled += 1
+        elif self.__overflow is Overflow.BLOCK:
+            # BLOCK holds objects only when they're sent behind pending ones, which BLOCK never leaves
+            self.__drop(obj)
+            return False
+        else:
+            if len(self.__pending) >= self.__capacity:
+                self.__drop(self.__pending.popleft())
+            self.__pending.append(obj)
+        return True
+
+    def __peek(self):
+        if self.__pending:
+            return next(iter(self.__pending.values())) if self.__overflow is Overflow.COALESCE else self.__pending[0]
+        # The pending deque is empty: the oldest object is the first one left in the spill file
+        obj = self.__unspill()
+        self.__pending.append(obj)
+        return obj
+
+    def __pop(self):
+        if self.__overflow is Overflow.COALESCE:
+            return self.__pending.pop(next(iter(self.__pending)))
+        if not self.__pending:
+            self.__pending.append(self.__unspill())
+        return self.__pending.popleft()
+
+    def __unspill(self):
+        self.__spill.seek(self.__readoffset)
+        obj = pickle.load(self.__spill)
+        self.__readoffset = self.__spill.tell()
+        self.__spilled -= 1
+        if not self.__spilled:
+            self.__spill.seek(0)
+            self.__spill.truncate()
+            self.__readoffset = 0
+        return obj
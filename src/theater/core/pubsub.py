@@ -0,0 +1,117 @@
+import threading
+from queue import Full
+from typing import Dict, List, Tuple, Union, Optional
+
+from theater.core.errors import IllegalValueException
+from theater.core.messages import Message, SharedMessage, ProducerQueue
+
+__all__ = ['Topics']
+
+
+# --------------------
+# Module classes
+# --------------------
+
+
+class Topics:
+    """Publishes messages to the queues subscribed to a topic. A message is serialized once per publish, however many
+    the subscribers are, see SharedMessage. Routed views of the same inbox get a single multicast message, serialized
+    once for that inbox and fanned out by its Demultiplexer. Queues can subscribe and unsubscribe at any time, even while another
+    thread publishes: the subscribers of a topic are an immutable tuple, replaced on every change"""
+    __slots__ = ('__subscribers', '__lock', '__dropped')
+
+    def __init__(self):
+        self.__subscribers: Dict[str, Tuple[ProducerQueue, ...]] = {}
+        self.__lock = threading.Lock()
+        self.__dropped = 0
+
+    # --------------------
+    # Topics public properties
+    # --------------------
+
+    @property
+    def topics(self) -> Tuple[str, ...]:
+        """The topics with at least a subscriber"""
+        return tuple(self.__subscribers)
+
+    @property
+    def dropped(self) -> int:
+        """The deliveries skipped because a subscriber queue was full"""
+        return self.__dropped
+
+    # --------------------
+    # Topics public methods
+    # --------------------
+
+    def subscribers(self, topic: str) -> Tuple[ProducerQueue, ...]:
+        return self.__subscribers.get(topic, ())
+
+    def subscribe(self, topic: str, queue: ProducerQueue) -> bool:
+        """Adds queue to the subscribers of topic. Returns False if it was subscribed already"""
+        if not topic or not isinstance(topic, str):
+            raise IllegalValueException(f"A topic must be a non empty str, got {topic!r}")
+        if not isinstance(queue, ProducerQueue):
+            raise TypeError()
+        with self.__lock:
+            subscribers = self.__subscribers.get(topic, ())
+            if any(subscriber is queue for subscriber in subscribers):
+                return False
+            self.__subscribers[topic] = subscribers + (queue,)
+            return True
+
+    def unsubscribe(self, topic: str, queue: ProducerQueue) -> bool:
+        """Removes queue from the subscribers of topic. Returns False if it wasn't subscribed"""
+        with self.__lock:
+            subscribers = self.__subscribers.get(topic, ())
+            remaining = tuple(subscriber for subscriber in subscribers if subscriber is not queue)
+            if len(remaining) == len(subscribers):
+                return False
+            if remaining:
+                self.__subscribers[topic] = remaining
+            else:
+                del self.__subscribers[topic]
+            return True
+
+    def unsubscribeall(self, queue: ProducerQueue) -> int:
+        """Removes queue from every topic, returning how many it left"""
+        return sum(self.unsubscribe(topic, queue) for topic in self.topics)
+
+    def publish(self, topic: str, msg: Union[Message, SharedMessage], block: bool = False,
+                timeout: Optional[float] = None) -> int:
+        """Puts msg on every queue subscribed to topic, returning how many got it. A full queue is skipped, and counted
+        as dropped
+        :param block: Whether to wait for room in a full queue, for at most timeout seconds
+        """
+        shared = msg if isinstance(msg, SharedMessage) else SharedMessage(msg)
+        delivered = 0
+        for queue, receivers in self.__targets(topic):
+            try:
+                queue.putshared(shared, block, timeout)
+                delivered += receivers
+            except Full:
+                self.__dropped += receivers
+        return delivered
+
+    # --------------------
+    # Topics private methods
+    # --------------------
+
+    def __targets(self, topic: str) -> List[Tuple[ProducerQueue, int]]:
+        """The queues a message of topic is put on, each with the number of subscribers it reaches. The routed views
+        of an inbox are merged in a multicast view of it"""
+        targets = []
+        routed: Dict[int, List[ProducerQueue]] = {}
+        for queue in self.__subscribers.get(topic, ()):
+            if queue.destination is None:
+                targets.append((queue, 1))
+            else:
+                routed.setdefault(id(queue.transport), []).append(queue)
+        for views in routed.values():
+            if len(views) == 1:
+                targets.append((views[0], 1))
+            else:
+                addresses = [address for view in views
+                             for address in (view.destination if view.destination.__class__ is tuple
+                                             else (view.destination,))]
+                targets.append((views[0].multicast(addresses), len(views)))
+        return targets
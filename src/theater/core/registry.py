@@ -0,0 +1,123 @@
+from typing import Optional, Union, List, Dict, Tuple
+
+from theater.core.constants import MAX_ADDRESS
+from theater.core.errors import IllegalValueException
+from theater.core.messages import ProducerQueue
+
+__all__ = ['ActorRegistry', 'installregistry', 'actorname']
+
+# The registry shared by the conductor with this process, see installregistry
+_INSTALLED: Optional['ActorRegistry'] = None
+
+
+# --------------------
+# Module classes
+# --------------------
+
+
+class ActorRegistry:
+    """The routing table of a score: every actor gets a compact int address when registered, in registration order,
+    and optionally the queue its messages are sent on. Resolving an address is a list lookup, so that messages can
+    carry it as their sender in place of the name. A registry is picklable and can be shared with the workers"""
+    __slots__ = ('__names', '__addresses', '__queues')
+
+    def __init__(self):
+        self.__names: List[str] = []
+        self.__addresses: Dict[str, int] = {}
+        self.__queues: List[Optional[ProducerQueue]] = []
+
+    # --------------------
+    # ActorRegistry public properties
+    # --------------------
+
+    @property
+    def names(self) -> Tuple[str, ...]:
+        """The registered names, in address order"""
+        return tuple(self.__names)
+
+    # --------------------
+    # ActorRegistry public methods
+    # --------------------
+
+    def register(self, name: str, queue: Optional[ProducerQueue] = None) -> int:
+        """Adds an actor to the table, returning its address
+        :param name: The name of the actor. It must be unique in the registry
+        :param queue: The queue the actor receives messages on, if it can be routed to
+        """
+        if not name or not isinstance(name, str):
+            raise IllegalValueException("Can't register an unnamed actor")
+        if name in self.__addresses:
+            raise IllegalValueException(f"An actor named {name} is already registered")
+        if queue is not None and not isinstance(queue, ProducerQueue):
+            raise TypeError()
+        address = len(self.__names)
+        if address > MAX_ADDRESS:
+            raise IllegalValueException(f"No address left for {name}")
+        self.__names.append(name)
+        self.__addresses[name] = address
+        self.__queues.append(queue)
+        return address
+
+    def namesonly(self) -> 'ActorRegistry':
+        """A copy of the registry with the names and addresses only, e.g. for workers that resolve senders but never
+        route on the queues"""
+        out = ActorRegistry()
+        out.__names = list(self.__names)
+        out.__addresses = dict(self.__addresses)
+        out.__queues = [None] * len(self.__names)
+        return out
+
+    def address(self, name: str) -> int:
+        address = self.__addresses.get(name)
+        if address is None:
+            raise IllegalValueException(f"No actor named {name}")
+        return address
+
+    def name(self, sender: Union[str, int]) -> str:
+        """The name of a Message sender, that is either an address or a name already"""
+        if sender.__class__ is not int:
+            return sender
+        if not 0 <= sender < len(self.__names):
+            raise IllegalValueException(f"No actor at address {sender}")
+        return self.__names[sender]
+
+    def queue(self, target: Union[str, int]) -> Optional[ProducerQueue]:
+        """The queue of the actor with the given address or name, or None if there's no such actor or it has no
+        queue"""
+        if target.__class__ is not int:
+            target = self.__addresses.get(target)
+            if target is None:
+                return None
+        elif not 0 <= target < len(self.__queues):
+            return None
+        return self.__queues[target]
+
+    def __contains__(self, target: Union[str, int]) -> bool:
+        if target.__class__ is int:
+            return 0 <= target < len(self.__names)
+        return target in self.__addresses
+
+    def __len__(self) -> int:
+        return len(self.__names)
+
+
+# --------------------
+# Module functions
+# --------------------
+
+
+def installregistry(registry: Optional[ActorRegistry]):
+    """Makes registry the one actorname resolves addresses with, in this process. None uninstalls it"""
+    global _INSTALLED
+    if registry is not None and not isinstance(registry, ActorRegistry):
+        raise TypeError()
+    _INSTALLED = registry
+
+
+def actorname(sender: Union[str, int]) -> str:
+    """The name of a Message sender, resolved with the installed registry when the sender is an address"""
+    if sender.__class__ is not int:
+        return sender
+    if _INSTALLED is None:
+        raise IllegalValueException(f"No registry installed to resolve address {sender}")
+    return _INSTALLED.name(sender)
@@ -0,0 +1,251 @@
+import math
+import threading
+import time
+from typing import Callable, Optional, List
+
+from theater.core.constants import TIMER_RESOLUTION, TIMER_LEVELS
+from theater.core.errors import IllegalValueException
+
+__all__ = ['Timer', 'TimerWheel']
+
+# Fraction of a tick ignored when converting a time to ticks
+_TICK_TOLERANCE = 1e-6
+
+
+# --------------------
+# Module classes
+# --------------------
+
+
+class Timer:
+    """A callback scheduled on a TimerWheel, once or periodically. It's only built by TimerWheel.schedule"""
+    __slots__ = ('_wheel', '_deadline', '_period', '_callback', '_args', '_bucket', '_level', '_cancelled')
+
+    def __init__(self, wheel: 'TimerWheel', deadline: int, period: Optional[int], callback: Callable, args: tuple):
+        self._wheel = wheel
+        self._deadline = deadline
+        self._period = period
+        self._callback = callback
+        self._args = args
+        self._bucket = None
+        self._level = 0
+        self._cancelled = False
+
+    # --------------------
+    # Timer public properties
+    # --------------------
+
+    @property
+    def active(self) -> bool:
+        """Whether the timer will fire again"""
+        return self._bucket is not None
+
+    @property
+    def periodic(self) -> bool:
+        return self._period is not None
+
+    # --------------------
+    # Timer public methods
+    # --------------------
+
+    def cancel(self) -> bool:
+        """Stops the timer, see TimerWheel.cancel"""
+        return self._wheel.cancel(self)
+
+
+class TimerWheel:
+    """A hierarchical timing wheel: a ring of slots per level, where a slot of the first level lasts a tick and a slot
+    of a higher level lasts a whole turn of the level below. A timer is put in the slot of the lowest level that
+    reaches its deadline, and falls to the lower levels as the time passes. Scheduling and cancelling are O(1), and
+    advancing skips the slots that can't hold anything due. Timers never fire before their delay, and at most a tick
+    after it once advance is called.
+    The wheel doesn't run by itself: whoever drives it calls advance, sleeping for at most nexttimeout in between.
+    Callbacks run in the driving thread, while timers can be scheduled and cancelled from any thread"""
+    __slots__ = ('__resolution', '__clock', '__origin', '__current', '__levels', '__shifts', '__masks', '__counts',
+                 '__lock')
+
+    def __init__(self, resolution: float = TIMER_RESOLUTION, clock: Callable[[], float] = time.monotonic):
+        """
+        :param resolution: The seconds in a tick
+        :param clock: Where the time is read, in seconds
+        """
+        if resolution <= 0:
+            raise IllegalValueException(f"A tick must last some time, got {resolution}")
+        self.__resolution = resolution
+        self.__clock = clock
+        self.__origin = clock()
+        # The last tick processed by advance
+        self.__current = 0
+        self.__levels: List[List[dict]] = [[{} for _ in range(1 << bits)] for bits in TIMER_LEVELS]
+        self.__shifts = [sum(TIMER_LEVELS[:level]) for level in range(len(TIMER_LEVELS))]
+        self.__masks = [(1 << bits) - 1 for bits in TIMER_LEVELS]
+        self.__counts = [0] * len(TIMER_LEVELS)
+        self.__lock = threading.Lock()
+
+    # --------------------
+    # TimerWheel public properties
+    # --------------------
+
+    @property
+    def resolution(self) -> float:
+        return self.__resolution
+
+    @property
+    def pending(self) -> int:
+        """The timers that will fire"""
+        return sum(self.__counts)
+
+    # --------------------
+    # TimerWheel public methods
+    # --------------------
+
+    def schedule(self, delay: float, callback: Callable, *args, period: Optional[float] = None) -> Timer:
+        """Calls callback(*args) after delay seconds and, if period is given, every period seconds after that
+        :param period: The seconds between two calls of a periodic timer. A late call doesn't make the following ones
+        come sooner
+        """
+        if period is not None and period <= 0:
+            raise IllegalValueException(f"A periodic timer needs a positive period, got {period}")
+        ticks = max(math.ceil(delay / self.__resolution - _TICK_TOLERANCE), 0)
+        # The current tick started up to a tick ago: one more tick makes sure the timer never fires early
+        timer = Timer(self, self.__totick(self.__clock()) + ticks + 1,
+                      None if period is None else max(round(period / self.__resolution), 1), callback, args)
+        with self.__lock:
+            self.__place(timer)
+        return timer
+
+    def cancel(self, timer: Timer) -> bool:
+        """Stops timer, even while its callback runs. Returns False if it wasn't going to fire again"""
+        with self.__lock:
+            timer._cancelled = True
+            bucket = timer._bucket
+            if bucket is None:
+                return False
+            del bucket[timer]
+            timer._bucket = None
+            self.__counts[timer._level] -= 1
+            return True
+
+    def advance(self, now: Optional[float] = None) -> int:
+        """Fires the timers due by now, in deadline order, returning how many fired. If a callback raises, the others
+        still fire and the first exception is raised afterwards"""
+        target = self.__totick(self.__clock() if now is None else now)
+        fired = 0
+        error = None
+        while self.__current < target:
+            with self.__lock:
+                tick = self.__nexttick(target)
+                if tick & self.__masks[0] == 0:
+                    # Cascaded timers are placed as if tick was still to come, since they may be due right at tick
+                    self.__current = tick - 1
+                    self.__cascade(tick)
+                self.__current = tick
+                due = self.__expire(tick, target)
+            for timer in due:
+                if timer._cancelled:
+                    continue
+                fired += 1
+                try:
+                    timer._callback(*timer._args)
+                except BaseException as e:
+                    if error is None:
+                        error = e
+        if error is not None:
+            raise error
+        return fired
+
+    def nexttimeout(self, now: Optional[float] = None) -> Optional[float]:
+        """The seconds advance can wait without firing a timer late, or None if there's no timer. It may be shorter
+        than the delay of the next timer, when a timer has to fall to a lower level first"""
+        with self.__lock:
+            tick = self.__nextdue()
+        if tick is None:
+            return None
+        now = self.__clock() if now is None else now
+        return max(self.__origin + tick * self.__resolution - now, 0.0)
+
+    # --------------------
+    # TimerWheel private methods
+    # --------------------
+
+    def __totick(self, now: float) -> int:
+        # The tolerance keeps float errors from leaving a tick boundary, as told by nexttimeout, in the previous tick
+        return int((now - self.__origin) / self.__resolution + _TICK_TOLERANCE)
+
+    def __place(self, timer: Timer):
+        """Puts timer in the slot of the lowest level that reaches its deadline. Far timers wait in the last slot
+        reachable, and are placed again when it's cascaded"""
+        deadline = max(timer._deadline, self.__current + 1)
+        start = self.__current + 1
+        last = len(self.__levels) - 1
+        for level, shift in enumerate(self.__shifts):
+            mask = self.__masks[level]
+            if (deadline >> shift) - (start >> shift) <= mask or level == last:
+                slot = min(deadline >> shift, (start >> shift) + mask) & mask
+                bucket = self.__levels[level][slot]
+                bucket[timer] = None
+                timer._bucket = bucket
+                timer._level = level
+                self.__counts[level] += 1
+                return
+
+    def __nexttick(self, target: int) -> int:
+        """The next tick that may fire or cascade something, not beyond target"""
+        current = self.__current
+        for level, count in enumerate(self.__counts):
+            if count:
+                shift = self.__shifts[level]
+                break
+        else:
+            return target
+        if not shift:
+            return current + 1
+        return min(((current >> shift) + 1) << shift, target)
+
+    def __cascade(self, tick: int):
+        """Moves the timers of the higher levels whose slot starts at tick one level down, or more, the highest
+        level first"""
+        for level in range(len(self.__levels) - 1, 0, -1):
+            shift = self.__shifts[level]
+            if tick & ((1 << shift) - 1):
+                continue
+            slot = (tick >> shift) & self.__masks[level]
+            bucket = self.__levels[level][slot]
+            if not bucket:
+                continue
+            self.__levels[level][slot] = {}
+            self.__counts[level] -= len(bucket)
+            for timer in bucket:
+                self.__place(timer)
+
+    def __expire(self, tick: int, now: int) -> List[Timer]:
+        """Takes the timers due at tick out of the wheel, placing again the periodic ones. A periodic timer fired late,
+        when now is past tick, isn't placed before now"""
+        slot = tick & self.__masks[0]
+        bucket = self.__levels[0][slot]
+        if not bucket:
+            return []
+        self.__levels[0][slot] = {}
+        self.__counts[0] -= len(bucket)
+        due = list(bucket)
+        for timer in due:
+            timer._bucket = None
+            if timer._period is not None:
+                timer._deadline = max(timer._deadline + timer._period, now + 1)
+                self.__place(timer)
+        return due
+
+    def __nextdue(self) -> Optional[int]:
+        counts = self.__counts
+        current = self.__current
+        if counts[0]:
+            mask = self.__masks[0]
+            slots = self.__levels[0]
+            for tick in range(current + 1, current + mask + 2):
+                if slots[tick & mask]:
+                    return tick
+        for level in range(1, len(counts)):
+            if counts[level]:
+                shift = self.__shifts[level]
+                return ((current >> shift) + 1) << shift
+        return None
@@ -0,0 +1,26 @@
+# Default size in bytes of the data region of a shared memory ring
+RING_SIZE: int = 1 << 20
+# Records are aligned to this many bytes, so a wrap marker always fits at the end of the ring
+RING_ALIGNMENT: int = 8
+# Record length that tells the consumer to jump back at the start of the ring
+RING_WRAP: int = 0xFFFFFFFF
+# Record length flag telling that the payload is raw bytes instead of a pickle
+RING_RAWFLAG: int = 0x80000000
+# Lower and upper bound in seconds of the sleeps used while waiting on a ring
+RING_MINWAIT: float = 0.00005
+RING_MAXWAIT: float = 0.001
+# Frame length flag telling that the payload of a socket frame is raw bytes instead of a pickle
+SOCKET_RAWFLAG: int = 0x80000000
+# Bytes a SocketSender joins in a single write, at most. A larger frame is written alone
+SOCKET_BATCHSIZE: int = 1 << 16
+# Bytes a SocketSender keeps waiting for the writer before put blocks
+SOCKET_BUFFER: int = 1 << 22
+# Bytes a SocketReceiver reads from a connection at once
+SOCKET_READSIZE: int = 1 << 16
+# Pending connections a SocketReceiver accepts before refusing new ones
+SOCKET_BACKLOG: int = 64
+# Lower and upper bound in seconds of the waits between two reconnection attempts of a ConnectionPool
+SOCKET_MINWAIT: float = 0.01
+SOCKET_MAXWAIT: float = 1.0
+# Seconds a connection attempt may take
+SOCKET_CONNECTTIMEOUT: float = 5.0
@@ -0,0 +1,108 @@
+import threading
+from collections import deque
+from queue import Empty, Full
+from typing import Optional, Callable
+
+from theater.core.errors import IllegalActionException
+
+__all__ = ['LocalQueue']
+
+
+# --------------------
+# Module classes
+# --------------------
+
+
+class LocalQueue:
+    """A queue between the threads of a single process, that never pickles what it carries. The objects for which
+    urgent returns True overtake every other object, keeping their relative order, like a control lane without a
+    second queue. Meant for the actors of a worker, fed by the Demultiplexer of their shared inbox"""
+    __slots__ = ('__urgent', '__maxsize', '__urgentitems', '__items', '__notempty', '__notfull')
+
+    def __init__(self, urgent: Optional[Callable[[object], bool]] = None, maxsize: int = 0):
+        """
+        :param urgent: Tells whether an object overtakes the queued ones. None if no object does
+        :param maxsize: The maximum number of objects queued, 0 or less for an unbounded queue. Urgent objects don't
+        count, and they're never refused, so that a full queue doesn't keep an INTERRUPT out
+        """
+        if urgent is not None and not callable(urgent):
+            raise TypeError()
+        if not isinstance(maxsize, int):
+            raise TypeError()
+        self.__urgent = urgent
+        self.__maxsize = maxsize
+        self.__urgentitems = deque()
+        self.__items = deque()
+        lock = threading.Lock()
+        self.__notempty = threading.Condition(lock)
+        self.__notfull = threading.Condition(lock)
+
+    def __getstate__(self):
+        raise IllegalActionException("A LocalQueue can't leave its process")
+
+    # --------------------
+    # LocalQueue public methods
+    # --------------------
+
+    def put(self, obj, block: bool = True, timeout: Optional[float] = None) -> None:
+        """Queues obj, waiting at most timeout seconds for room if the queue is full and block is True. Raises Full
+        if there's still no room"""
+        with self.__notfull:
+            if self.__urgent is not None and self.__urgent(obj):
+                self.__urgentitems.append(obj)
+            else:
+                if self.__isfull() and not (block and self.__notfull.wait_for(self.__hasroom, timeout)):
+                    raise Full
+                self.__items.append(obj)
+            self.__notempty.notify()
+
+    def put_nowait(self, obj) -> None:
+        self.put(obj, False)
+
+    def get(self, block: bool = True, timeout: Optional[float] = None):
+        with self.__notempty:
+            if block and not self.__urgentitems and not self.__items:
+                self.__notempty.wait_for(self.__ready, timeout)
+            if self.__urgentitems:
+                return self.__urgentitems.popleft()
+            if self.__items:
+                item = self.__items.popleft()
+                self.__notfull.notify()
+                return item
+        raise Empty
+
+    def get_nowait(self):
+        return self.get(False)
+
+    def qsize(self) -> int:
+        return len(self.__urgentitems) + len(self.__items)
+
+    def empty(self) -> bool:
+        return not self.__urgentitems and not self.__items
+
+    def full(self) -> bool:
+        """Whether the queue refuses objects that aren't urgent"""
+        with self.__notfull:
+            return self.__isfull()
+
+    def close(self) -> None:
+        pass
+
+    def join_thread(self) -> None:
+        pass
+
+    def cancel_join_thread(self) -> None:
+        pass
+
+    # --------------------
+    # LocalQueue private methods
+    # --------------------
+
+    def __ready(self) -> bool:
+        return bool(self.__urgentitems or self.__items)
+
+    def __isfull(self) -> bool:
+        return 0 < self.__maxsize <= len(self.__items)
+
+    def __hasroom(self) -> bool:
+        return not self.__isfull()
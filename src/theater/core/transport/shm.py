@@ -0,0 +1,297 @@
+import ctypes
+import multiprocessing
+import os
+import pickle
+import struct
+import time
+import weakref
+from queue import Empty, Full
+from typing import Optional
+
+from theater.core.errors import IllegalActionException, IllegalValueException
+from theater.core.transport.constants import RING_SIZE, RING_ALIGNMENT, RING_WRAP, RING_RAWFLAG, RING_MINWAIT, \
+    RING_MAXWAIT
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:  # Python < 3.8
+    shared_memory = None
+
+__all__ = ['SharedRingQueue', 'exportbytes', 'importbytes', 'releasebytes']
+
+# --------------------
+# Ring layout
+# --------------------
+
+_COUNTER = struct.Struct('<Q')
+_RECORD = struct.Struct('<I')
+# Consumer owned cache line: read position and number of records read
+_HEAD = 0
+_GETS = 8
+# Written once by the creator: data size and maximum number of records (0 for no limit)
+_SIZE = 16
+_MAXSIZE = 24
+# Producers owned cache line: write position and number of records written
+_TAIL = 64
+_PUTS = 72
+_DATA = 128
+_NOTHING = object()
+
+
+def _align(length: int) -> int:
+    return (length + RING_ALIGNMENT - 1) & ~(RING_ALIGNMENT - 1)
+
+
+def _destroy(shm):
+    try:
+        shm.close()
+        shm.unlink()
+    except (BufferError, FileNotFoundError):
+        pass
+
+
+# --------------------
+# Out of band buffers
+# --------------------
+
+
+def exportbytes(data) -> str:
+    """Copies data in a new shared memory segment and returns its name. The segment is left for the receiver,
+    which destroys it in importbytes"""
+    if shared_memory is None:
+        raise IllegalActionException("Shared memory transports require Python 3.8 or newer")
+    shm = shared_memory.SharedMemory(create=True, size=max(len(data), 1))
+    try:
+        shm.buf[:len(data)] = data
+    finally:
+        shm.close()
+    return shm.name
+
+
+def importbytes(name: str, size: int) -> memoryview:
+    """Maps a segment created by exportbytes and returns a read-write memoryview of its first size bytes, without
+    copying them. The segment name is removed right away, while the mapping lives as long as the memoryview"""
+    shm = shared_memory.SharedMemory(name=name)
+    if os.name != 'nt':
+        shm.unlink()
+    # The ctypes array owns the mapping without exporting shm.buf, and every view handed out derives from it. Its
+    # finalizer keeps shm alive till the last view is released, than closes the segment
+    holder = (ctypes.c_char * size).from_address(ctypes.addressof(ctypes.c_char.from_buffer(shm.buf)))
+    finalizer = weakref.finalize(holder, shm.close)
+    # At exit the views may still be around, and the mapping goes with the process anyway
+    finalizer.atexit = False
+    return memoryview(holder).cast('B')
+
+
+def releasebytes(name: str):
+    """Destroys a segment created by exportbytes that won't be imported, e.g. because the message carrying its name
+    couldn't be queued"""
+    try:
+        shm = shared_memory.SharedMemory(name=name)
+    except FileNotFoundError:
+        return
+    _destroy(shm)
+
+
+# --------------------
+# Module classes
+# --------------------
+
+
+class SharedRingQueue:
+    """A queue backed by a ring buffer in shared memory. Every record is a length prefixed pickle (or raw bytes,
+    which are stored as they are). The consumer never locks, since it's the only one moving the head of the ring,
+    and neither does a single producer. Multiple producers serialize on a lock among themselves. Only a single
+    process may consume from the ring. The segment is destroyed when the creator's ring is unlinked or garbage
+    collected"""
+    __slots__ = ('__shm', '__buf', '__size', '__maxsize', '__lock', '__finalizer', '__weakref__')
+
+    def __init__(self, size: int = RING_SIZE, multiproducer: bool = True, maxsize: int = 0, context=None):
+        """
+        Creates a new ring in a shared memory segment
+        :param size: The size in bytes of the data region of the ring. It's rounded up to the record alignment
+        :param multiproducer: Whether more than a process (or thread) can put on the ring
+        :param maxsize: The maximum number of records the ring holds, besides its size. 0 or less means no limit
+        :param context: The multiprocessing context the producers' lock is built with. Defaults to multiprocessing's
+        default one
+        """
+        if shared_memory is None:
+            raise IllegalActionException("Shared memory transports require Python 3.8 or newer")
+        if size < 2 * RING_ALIGNMENT:
+            raise IllegalValueException(f"A ring of {size} bytes can't hold any record")
+        self.__size = _align(size)
+        self.__shm = shared_memory.SharedMemory(create=True, size=_DATA + self.__size)
+        self.__buf = self.__shm.buf
+        self.__buf[:_DATA] = bytes(_DATA)
+        self.__maxsize = max(maxsize, 0)
+        _COUNTER.pack_into(self.__buf, _SIZE, self.__size)
+        _COUNTER.pack_into(self.__buf, _MAXSIZE, self.__maxsize)
+        self.__lock = (context or multiprocessing).Lock() if multiproducer else None
+        self.__finalizer = weakref.finalize(self, _destroy, self.__shm)
+
+    def __getstate__(self):
+        return self.__shm.name, self.__lock
+
+    def __setstate__(self, state):
+        name, lock = state
+        self.__shm = shared_memory.SharedMemory(name=name)
+        self.__buf = self.__shm.buf
+        self.__size, = _COUNTER.unpack_from(self.__buf, _SIZE)
+        self.__maxsize, = _COUNTER.unpack_from(self.__buf, _MAXSIZE)
+        self.__lock = lock
+        self.__finalizer = None
+
+    # --------------------
+    # SharedRingQueue public properties
+    # --------------------
+
+    @property
+    def name(self) -> str:
+        return self.__shm.name
+
+    @property
+    def size(self) -> int:
+        return self.__size
+
+    @property
+    def maxsize(self) -> int:
+        return self.__maxsize
+
+    @property
+    def credits(self) -> Optional[int]:
+        """How many more records the ring accepts before being full, or None if only its size limits it"""
+        return max(self.__maxsize - self.qsize(), 0) if self.__maxsize else None
+
+    # --------------------
+    # SharedRingQueue public methods
+    # --------------------
+
+    def put(self, obj, block: bool = True, timeout: Optional[float] = None) -> None:
+        if isinstance(obj, bytes):
+            payload, flag = obj, RING_RAWFLAG
+        else:
+            payload, flag = pickle.dumps(obj, pickle.HIGHEST_PROTOCOL), 0
+        if _align(_RECORD.size + len(payload)) > self.__size - RING_ALIGNMENT:
+            raise IllegalValueException(f"A record of {len(payload)} bytes doesn't fit the ring")
+        if self.__lock is None:
+            self.__put(payload, flag, block, timeout)
+        else:
+            with self.__lock:
+                self.__put(payload, flag, block, timeout)
+
+    def put_nowait(self, obj) -> None:
+        self.put(obj, False)
+
+    def get(self, block: bool = True, timeout: Optional[float] = None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        wait = RING_MINWAIT
+        while 1:
+            item = self.__read()
+            if item is not _NOTHING:
+                return item
+            if not block or (deadline is not None and time.monotonic() >= deadline):
+                raise Empty
+            time.sleep(wait if deadline is None else max(0.0, min(wait, deadline - time.monotonic())))
+            wait = min(wait * 2, RING_MAXWAIT)
+
+    def get_nowait(self):
+        return self.get(False)
+
+    def qsize(self) -> int:
+        puts, = _COUNTER.unpack_from(self.__buf, _PUTS)
+        gets, = _COUNTER.unpack_from(self.__buf, _GETS)
+        return puts - gets
+
+    def empty(self) -> bool:
+        return self.__head() == self.__tail()
+
+    def full(self) -> bool:
+        if self.__maxsize and self.qsize() >= self.__maxsize:
+            return True
+        return self.__size - (self.__tail() - self.__head()) < 2 * RING_ALIGNMENT
+
+    def close(self) -> None:
+        """Detaches this process from the ring. The segment survives till its creator unlinks it"""
+        if self.__buf is not None:
+            self.__buf.release()
+            self.__buf = None
+            self.__shm.close()
+
+    def unlink(self) -> None:
+        """Destroys the shared memory segment. Only the process that created the ring should call it"""
+        if self.__finalizer is None:
+            raise IllegalActionException("Only the creator of a ring can unlink it")
+        self.close()
+        self.__finalizer()
+
+    def join_thread(self) -> None:
+        pass
+
+    def cancel_join_thread(self) -> None:
+        pass
+
+    # --------------------
+    # SharedRingQueue private methods
+    # --------------------
+
+    def __head(self) -> int:
+        return _COUNTER.unpack_from(self.__buf, _HEAD)[0]
+
+    def __tail(self) -> int:
+        return _COUNTER.unpack_from(self.__buf, _TAIL)[0]
+
+    def __put(self, payload: bytes, flag: int, block: bool, timeout: Optional[float]):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        wait = RING_MINWAIT
+        while not self.__write(payload, flag):
+            if not block or (deadline is not None and time.monotonic() >= deadline):
+                raise Full
+            time.sleep(wait)
+            wait = min(wait * 2, RING_MAXWAIT)
+
+    def __write(self, payload: bytes, flag: int) -> bool:
+        """Writes a record if there's enough room for it. The tail is published only after the record is complete,
+        so the consumer never sees a partial write"""
+        buf = self.__buf
+        size = self.__size
+        tail = self.__tail()
+        index = tail % size
+        length = len(payload)
+        record = _align(_RECORD.size + length)
+        padding = size - index if index + record > size else 0
+        if tail + padding + record - self.__head() > size:
+            return False
+        if self.__maxsize and self.qsize() >= self.__maxsize:
+            return False
+        if padding:
+            _RECORD.pack_into(buf, _DATA + index, RING_WRAP)
+            index = 0
+        start = _DATA + index + _RECORD.size
+        buf[start:start + length] = payload
+        _RECORD.pack_into(buf, _DATA + index, length | flag)
+        _COUNTER.pack_into(buf, _PUTS, _COUNTER.unpack_from(buf, _PUTS)[0] + 1)
+        _COUNTER.pack_into(buf, _TAIL, tail + padding + record)
+        return True
+
+    def __read(self):
+        """Reads the oldest record, if any. The head is moved only after the record has been copied out"""
+        buf = self.__buf
+        size = self.__size
+        head = self.__head()
+        tail = self.__tail()
+        while head != tail:
+            index = head % size
+            length, = _RECORD.unpack_from(buf, _DATA + index)
+            if length == RING_WRAP:
+                head += size - index
+                continue
+            start = _DATA + index + _RECORD.size
+            if length & RING_RAWFLAG:
+                length &= ~RING_RAWFLAG
+                item = bytes(buf[start:start + length])
+            else:
+                item = pickle.loads(buf[start:start + length])
+            _COUNTER.pack_into(buf, _GETS, _COUNTER.unpack_from(buf, _GETS)[0] + 1)
+            _COUNTER.pack_into(buf, _HEAD, head + _align(_RECORD.size + length))
+            return item
+        return _NOTHING
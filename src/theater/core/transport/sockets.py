@@ -0,0 +1,699 @@
+import collections
+import logging
+import multiprocessing
+import os
+import pickle
+import queue
+import select
+import selectors
+import socket
+import struct
+import threading
+import time
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import answer_challenge, deliver_challenge
+from queue import Full
+from typing import Optional, Union, Tuple, List, Dict
+
+from theater.core.errors import IllegalActionException, IllegalValueException
+from theater.core.transport.constants import SOCKET_RAWFLAG, SOCKET_BATCHSIZE, SOCKET_BUFFER, SOCKET_READSIZE, \
+    SOCKET_BACKLOG, SOCKET_MINWAIT, SOCKET_MAXWAIT, SOCKET_CONNECTTIMEOUT
+
+__all__ = ['ConnectionPool', 'SocketSender', 'SocketReceiver', 'FrameDecoder', 'encodeframe', 'defaultpool']
+
+# A (host, port) pair for TCP, a filesystem path for Unix domain sockets
+Address = Union[Tuple[str, int], str]
+
+_FRAME = struct.Struct('<I')
+# The length prefix of the handshake messages, the same of a multiprocessing Connection
+_HANDSHAKE = struct.Struct('!i')
+# The longest handshake message, like in multiprocessing.connection
+_HANDSHAKEMAX = 256
+_MAXFRAME = SOCKET_RAWFLAG - 1
+# The pool of this process, see defaultpool
+_POOL: Optional[Tuple[int, 'ConnectionPool']] = None
+_POOLLOCK = threading.Lock()
+_LOGGER = logging.getLogger(__name__)
+
+
+# --------------------
+# Framing
+# --------------------
+
+
+def encodeframe(obj) -> bytes:
+    """A length prefixed frame carrying obj: raw bytes are sent as they are, anything else is pickled"""
+    if isinstance(obj, bytes):
+        payload, flag = obj, SOCKET_RAWFLAG
+    else:
+        payload, flag = pickle.dumps(obj, pickle.HIGHEST_PROTOCOL), 0
+    if len(payload) > _MAXFRAME:
+        raise IllegalValueException(f"A frame can't carry {len(payload)} bytes")
+    return _FRAME.pack(len(payload) | flag) + payload
+
+
+class FrameDecoder:
+    """Rebuilds the objects of a stream of frames, however the stream is split in chunks. A frame that can't be
+    unpickled breaks the stream: the frames after it can't be trusted, so the decoder stops there, see failed"""
+    __slots__ = ('__buffer', '__failed')
+
+    def __init__(self):
+        self.__buffer = bytearray()
+        self.__failed = None
+
+    @property
+    def pending(self) -> int:
+        """The bytes of an incomplete frame, waiting for the rest of it"""
+        return len(self.__buffer)
+
+    @property
+    def failed(self) -> Optional[Exception]:
+        """Why a frame couldn't be decoded, None while the stream is sound"""
+        return self.__failed
+
+    def feed(self, data) -> List:
+        """Adds a chunk of the stream, returning the objects of the frames it completes. If a frame can't be decoded,
+        the objects before it are returned, and the rest of the stream is discarded from then on"""
+        if self.__failed is not None:
+            return []
+        buffer = self.__buffer
+        buffer += data
+        items = []
+        offset = 0
+        with memoryview(buffer) as view:
+            while len(buffer) - offset >= _FRAME.size:
+                length, = _FRAME.unpack_from(buffer, offset)
+                start = offset + _FRAME.size
+                end = start + (length & _MAXFRAME)
+                if end > len(buffer):
+                    break
+                if length & SOCKET_RAWFLAG:
+                    items.append(bytes(view[start:end]))
+                else:
+                    try:
+                        items.append(pickle.loads(view[start:end]))
+                    except Exception as e:
+                        self.__failed = e
+                        offset = len(buffer)
+                        break
+                offset = end
+        del buffer[:offset]
+        return items
+
+
+# --------------------
+# Connections
+# --------------------
+
+
+class _Handshake:
+    """Just enough of a multiprocessing Connection over a socket for deliver_challenge and answer_challenge, with the
+    same framing"""
+    __slots__ = ('__socket',)
+
+    def __init__(self, sock: socket.socket):
+        self.__socket = sock
+
+    def send_bytes(self, data: bytes):
+        self.__socket.sendall(_HANDSHAKE.pack(len(data)) + data)
+
+    def recv_bytes(self, maxlength: Optional[int] = None) -> bytes:
+        length, = _HANDSHAKE.unpack(self.__recvexactly(_HANDSHAKE.size))
+        if length < 0 or (maxlength is not None and length > maxlength):
+            raise OSError("Bad handshake message length")
+        return self.__recvexactly(length)
+
+    def __recvexactly(self, size: int) -> bytes:
+        data = bytearray()
+        while len(data) < size:
+            chunk = self.__socket.recv(size - len(data))
+            if not chunk:
+                raise EOFError
+            data += chunk
+        return bytes(data)
+
+
+def _authkey(authkey: Optional[bytes]) -> bytes:
+    """The key a connection is authenticated with: the authkey of the process unless another one is given"""
+    return multiprocessing.current_process().authkey if authkey is None else authkey
+
+
+def _listen(address: Address, backlog: int) -> socket.socket:
+    if isinstance(address, str):
+        if not hasattr(socket, 'AF_UNIX'):
+            raise IllegalActionException("Unix domain sockets aren't available on this platform")
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    else:
+        family, _, _, _, address = socket.getaddrinfo(address[0], address[1], 0, socket.SOCK_STREAM, 0,
+                                                      socket.AI_PASSIVE)[0]
+        sock = socket.socket(family, socket.SOCK_STREAM)
+    try:
+        if not isinstance(address, str) and os.name not in ('nt', 'cygwin'):
+            # A receiver can listen again on the port of one that just closed
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind(address)
+        sock.listen(backlog)
+    except BaseException:
+        sock.close()
+        raise
+    return sock
+
+
+def _connect(address: Address, timeout: float, authkey: Optional[bytes] = None) -> socket.socket:
+    """Connects to a SocketReceiver, answering its challenge with authkey"""
+    if isinstance(address, str):
+        if not hasattr(socket, 'AF_UNIX'):
+            raise IllegalActionException("Unix domain sockets aren't available on this platform")
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.settimeout(timeout)
+            sock.connect(address)
+        except BaseException:
+            sock.close()
+            raise
+    else:
+        sock = socket.create_connection(address, timeout)
+        # Writes are already batched by the senders
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    try:
+        answer_challenge(_Handshake(sock), _authkey(authkey))
+    except AuthenticationError as e:
+        sock.close()
+        raise AuthenticationError(f"{address} refused the authentication key") from e
+    except EOFError as e:
+        sock.close()
+        raise ConnectionResetError(f"{address} closed the connection during the handshake") from e
+    except BaseException:
+        sock.close()
+        raise
+    sock.settimeout(None)
+    return sock
+
+
+def _accept(listener: socket.socket, authkey: Optional[bytes]) -> Optional[socket.socket]:
+    """Accepts a connection from a SocketSender, that must first answer a challenge with authkey. None if it
+    didn't"""
+    sock, _ = listener.accept()
+    try:
+        sock.settimeout(SOCKET_CONNECTTIMEOUT)
+        deliver_challenge(_Handshake(sock), _authkey(authkey))
+        sock.settimeout(None)
+    except (OSError, EOFError, AuthenticationError):
+        sock.close()
+        return None
+    return sock
+
+
+class _Connection:
+    """The connection to an address, made again when it fails. Its lock serializes the writes"""
+    __slots__ = ('socket', 'lock')
+
+    def __init__(self):
+        self.socket: Optional[socket.socket] = None
+        self.lock = threading.Lock()
+
+
+class ConnectionPool:
+    """Keeps a persistent connection per address, shared by every sender of the process that writes there. A write
+    is never interleaved with another one on the same connection. A connection that fails, or that the peer closed,
+    is made again, waiting longer and longer between the attempts"""
+    __slots__ = ('__connections', '__lock', '__minwait', '__maxwait', '__connecttimeout', '__reconnects')
+
+    def __init__(self, minwait: float = SOCKET_MINWAIT, maxwait: float = SOCKET_MAXWAIT,
+                 connecttimeout: float = SOCKET_CONNECTTIMEOUT):
+        """
+        :param minwait: The seconds waited after the first failed attempt, doubled at every following one
+        :param maxwait: The longest wait between two attempts
+        :param connecttimeout: The seconds a connection attempt may take
+        """
+        if not 0 < minwait <= maxwait:
+            raise IllegalValueException(f"Waits must be positive and ordered, got {minwait} and {maxwait}")
+        self.__connections: Dict[Address, _Connection] = {}
+        self.__lock = threading.Lock()
+        self.__minwait = minwait
+        self.__maxwait = maxwait
+        self.__connecttimeout = connecttimeout
+        self.__reconnects = 0
+
+    # --------------------
+    # ConnectionPool public properties
+    # --------------------
+
+    @property
+    def connections(self) -> int:
+        """The open connections"""
+        return sum(connection.socket is not None for connection in list(self.__connections.values()))
+
+    @property
+    def reconnects(self) -> int:
+        """The connections closed after a failure"""
+        return self.__reconnects
+
+    # --------------------
+    # ConnectionPool public methods
+    # --------------------
+
+    def send(self, address: Address, data: Union[bytes, List[bytes]], timeout: Optional[float] = None,
+             authkey: Optional[bytes] = None):
+        """Writes data on the connection to address, connecting first if needed. data is a frame, or a list of frames
+        written at once. If the write fails, the frames it didn't hand whole to the connection are written again on a
+        new connection, so that the receiver never gets a frame twice: it drops the frame left incomplete. Raises a
+        ConnectionError if data couldn't be written in timeout seconds, None retries forever. A new connection is
+        authenticated with authkey, the authkey of the process by default: an AuthenticationError, that retrying
+        can't fix, is raised right away"""
+        with self.__lock:
+            connection = self.__connections.get(address)
+            if connection is None:
+                connection = self.__connections[address] = _Connection()
+        frames = [data] if isinstance(data, (bytes, bytearray, memoryview)) else list(data)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        wait = self.__minwait
+        while 1:
+            with connection.lock:
+                try:
+                    if connection.socket is not None and select.select([connection.socket], [], [], 0)[0]:
+                        # Receivers never write: a readable connection has been closed by the peer
+                        self.__discard(connection)
+                    if connection.socket is None:
+                        connection.socket = _connect(address, self.__connecttimeout, authkey)
+                    remaining = self.__write(connection.socket, frames)
+                    if not remaining:
+                        return
+                    # The receiver drops the frame cut by the failure along with the connection
+                    frames = remaining
+                    self.__discard(connection)
+                    error = ConnectionResetError(f"The connection to {address} failed during a write")
+                except OSError as e:
+                    self.__discard(connection)
+                    error = e
+            if deadline is not None and time.monotonic() + wait > deadline:
+                raise ConnectionError(f"Couldn't write to {address}") from error
+            time.sleep(wait)
+            wait = min(wait * 2, self.__maxwait)
+
+    def close(self):
+        """Closes every connection. The pool can still be used, connecting again"""
+        with self.__lock:
+            connections = list(self.__connections.values())
+            self.__connections.clear()
+        for connection in connections:
+            with connection.lock:
+                if connection.socket is not None:
+                    connection.socket.close()
+                    connection.socket = None
+
+    # --------------------
+    # ConnectionPool private methods
+    # --------------------
+
+    @staticmethod
+    def __write(sock: socket.socket, frames: List[bytes]) -> List[bytes]:
+        """Writes the frames in a single buffer. If the write fails midway, it returns the frames not written whole:
+        the socket can't be written anymore, since the receiver would take the following bytes for the rest of the
+        frame that was cut"""
+        data = frames[0] if len(frames) == 1 else b''.join(frames)
+        sent = 0
+        try:
+            with memoryview(data) as view:
+                while sent < len(data):
+                    sent += sock.send(view[sent:])
+        except OSError:
+            if not sent:
+                raise
+            written = 0
+            for i, frame in enumerate(frames):
+                written += len(frame)
+                if written > sent:
+                    return frames[i:]
+            return []
+        return []
+
+    def __discard(self, connection: _Connection):
+        if connection.socket is not None:
+            connection.socket.close()
+            connection.socket = None
+            self.__reconnects += 1
+
+
+def defaultpool() -> ConnectionPool:
+    """The pool of this process, used by the senders that aren't given one. A forked child gets a pool of its own,
+    since it can't share the connections of its parent"""
+    global _POOL
+    with _POOLLOCK:
+        if _POOL is None or _POOL[0] != os.getpid():
+            _POOL = os.getpid(), ConnectionPool()
+        return _POOL[1]
+
+
+def _resetlock():
+    # The lock may have been held by another thread of the parent, that doesn't exist in the child
+    global _POOLLOCK
+    _POOLLOCK = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_resetlock)
+
+
+# --------------------
+# Module classes
+# --------------------
+
+
+class SocketSender:
+    """The producer end of a socket transport, writing to the SocketReceiver listening on address. put frames an
+    object and returns, while a writer thread joins the queued frames in writes of up to batchsize bytes on the pooled
+    connection to address, reconnecting as needed. The frames of a sender arrive in order, and a write interrupted by
+    a failure only sends again the frames it cut or didn't reach. If the writer fails for good, e.g. because the
+    receiver refuses the authkey, the frames pending are dropped and the error is raised by the following put and
+    flush. A sender travels to other processes as its address: there, it writes through the pool of that process"""
+    __slots__ = ('__address', '__batchsize', '__buffersize', '__pool', '__authkey', '__pending', '__pendingbytes',
+                 '__writes', '__condition', '__thread', '__pid', '__closed', '__joinable', '__error')
+
+    def __init__(self, address: Address, batchsize: int = SOCKET_BATCHSIZE, buffersize: int = SOCKET_BUFFER,
+                 pool: Optional[ConnectionPool] = None, authkey: Optional[bytes] = None):
+        """
+        :param address: Where the receiver listens: a (host, port) pair for TCP, a path for a Unix domain socket
+        :param batchsize: The bytes of frames joined in a single write, at most
+        :param buffersize: The bytes of frames waiting for the writer before put blocks
+        :param pool: Where the connection is taken from. The pool of the process by default
+        :param authkey: The key the receiver was given. None for the authkey of the process, that the processes it
+        starts inherit. A given key travels with the pickled sender
+        """
+        if batchsize < 1 or buffersize < 1:
+            raise IllegalValueException(f"Batches and buffers need some room, got {batchsize} and {buffersize}")
+        self.__address = address if isinstance(address, str) else tuple(address)
+        self.__batchsize = batchsize
+        self.__buffersize = buffersize
+        self.__pool = pool
+        self.__authkey = None if authkey is None else bytes(authkey)
+        self.__reset()
+
+    def __getstate__(self):
+        return self.__address, self.__batchsize, self.__buffersize, self.__authkey
+
+    def __setstate__(self, state):
+        self.__address, self.__batchsize, self.__buffersize, self.__authkey = state
+        self.__pool = None
+        self.__reset()
+
+    # --------------------
+    # SocketSender public properties
+    # --------------------
+
+    @property
+    def address(self) -> Address:
+        return self.__address
+
+    @property
+    def pending(self) -> int:
+        """The frames not written yet"""
+        return len(self.__pending)
+
+    @property
+    def writes(self) -> int:
+        """The writes made so far, each carrying a batch of frames"""
+        return self.__writes
+
+    # --------------------
+    # SocketSender public methods
+    # --------------------
+
+    def put(self, obj, block: bool = True, timeout: Optional[float] = None) -> None:
+        frame = encodeframe(obj)
+        if self.__pid != os.getpid():
+            self.__reset()
+        with self.__condition:
+            if self.__error is not None:
+                raise self.__error
+            if self.__closed:
+                raise IllegalActionException("Can't put on a closed sender")
+            if self.__pendingbytes >= self.__buffersize:
+                if not block or not self.__condition.wait_for(self.__hasroom, timeout):
+                    raise Full
+                if self.__error is not None:
+                    raise self.__error
+            self.__pending.append(frame)
+            self.__pendingbytes += len(frame)
+            if self.__thread is None:
+                self.__thread = threading.Thread(target=self.__write, name='SocketSender', daemon=True)
+                self.__thread.start()
+            self.__condition.notify_all()
+
+    def put_nowait(self, obj) -> None:
+        self.put(obj, False)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Waits till every queued frame is written. Returns False if some are still pending after timeout seconds.
+        Raises the error of a writer that failed"""
+        with self.__condition:
+            flushed = self.__condition.wait_for(lambda: not self.__pendingbytes, timeout)
+            if self.__error is not None:
+                raise self.__error
+            return flushed
+
+    def qsize(self) -> int:
+        raise NotImplementedError("The size of a remote queue can't be known")
+
+    def empty(self) -> bool:
+        raise NotImplementedError("The size of a remote queue can't be known")
+
+    def full(self) -> bool:
+        return self.__pendingbytes >= self.__buffersize
+
+    def close(self) -> None:
+        """Stops accepting objects. The writer thread ends once the pending frames are written"""
+        with self.__condition:
+            self.__closed = True
+            self.__condition.notify_all()
+
+    def join_thread(self) -> None:
+        """Waits for the writer thread, after close"""
+        if not self.__closed:
+            raise IllegalActionException("Can't join a sender that's still open")
+        if self.__joinable and self.__thread is not None:
+            self.__thread.join()
+
+    def cancel_join_thread(self) -> None:
+        self.__joinable = False
+
+    # --------------------
+    # SocketSender private methods
+    # --------------------
+
+    def __reset(self):
+        """Starts afresh in a new process: the frames and the thread of the parent aren't there"""
+        self.__pending = collections.deque()
+        self.__pendingbytes = 0
+        self.__writes = 0
+        self.__condition = threading.Condition()
+        self.__thread = None
+        self.__pid = os.getpid()
+        self.__closed = False
+        self.__joinable = True
+        self.__error = None
+
+    def __hasroom(self) -> bool:
+        return self.__pendingbytes < self.__buffersize or self.__closed or self.__error is not None
+
+    def __write(self):
+        pool = self.__pool or defaultpool()
+        pending = self.__pending
+        condition = self.__condition
+        while 1:
+            with condition:
+                condition.wait_for(lambda: pending or self.__closed)
+                if not pending:
+                    return
+                batch = [pending.popleft()]
+                size = len(batch[0])
+                while pending and size + len(pending[0]) <= self.__batchsize:
+                    frame = pending.popleft()
+                    batch.append(frame)
+                    size += len(frame)
+            try:
+                pool.send(self.__address, batch, authkey=self.__authkey)
+            except Exception as e:
+                with condition:
+                    dropped = len(batch) + len(pending)
+                    self.__error = e
+                    pending.clear()
+                    self.__pendingbytes = 0
+                    condition.notify_all()
+                _LOGGER.error("The writer to %s failed, dropping %d frames: %r", self.__address, dropped, e)
+                return
+            with condition:
+                self.__pendingbytes -= size
+                self.__writes += 1
+                condition.notify_all()
+
+
+class SocketReceiver:
+    """The consumer end of a socket transport: a socket listening on a (host, port) pair for TCP, or on a path for a
+    Unix domain socket. A reader thread accepts any number of SocketSender connections and decodes their frames in a
+    local queue, in order for every connection. The thread starts at the first get, in the process that consumes:
+    like a SharedRingQueue, a receiver supports a single consumer process, that it can be pickled to when it's
+    started. With a maxsize, the reader stops reading while the local queue is full, so that the senders block.
+    Frames are unpickled, and unpickling runs code: anyone able to send frames could run code in the consumer. So every
+    connection must answer the challenge of multiprocessing.connection with authkey before its frames are read. The
+    challenge doesn't encrypt anything, and a peer that doesn't answer stalls the reader for SOCKET_CONNECTTIMEOUT
+    seconds at most: across untrusted networks, tunnel the connections instead of listening on a public address"""
+    __slots__ = ('__listener', '__address', '__path', '__maxsize', '__authkey', '__items', '__thread', '__pid',
+                 '__creator', '__wakeup', '__connections', '__closed')
+
+    def __init__(self, address: Address = ('127.0.0.1', 0), backlog: int = SOCKET_BACKLOG, maxsize: int = 0,
+                 authkey: Optional[bytes] = None):
+        """
+        Starts listening on address
+        :param address: A (host, port) pair, port 0 picking a free one, or the path of a Unix domain socket
+        :param backlog: The connections waiting to be accepted before new ones are refused
+        :param maxsize: The maximum number of objects read and not consumed, 0 or less for no limit
+        :param authkey: The key the senders must know. None for the authkey of the consumer process, that a process
+        inherits from the one that starts it
+        """
+        self.__listener = _listen(address if isinstance(address, str) else tuple(address), backlog)
+        self.__path = address if isinstance(address, str) else None
+        self.__address = self.__listener.getsockname()
+        self.__maxsize = max(maxsize, 0)
+        self.__authkey = None if authkey is None else bytes(authkey)
+        self.__pid = self.__creator = os.getpid()
+        self.__closed = False
+        self.__reset()
+
+    def __getstate__(self):
+        """Only the listening socket and the settings travel: the reader thread and its queue are started again by
+        the first get of the consumer. The socket can only be pickled while starting a process"""
+        if self.__closed:
+            raise IllegalActionException("Can't pickle a closed receiver")
+        return self.__listener, self.__path, self.__maxsize, self.__authkey, self.__creator
+
+    def __setstate__(self, state):
+        self.__listener, self.__path, self.__maxsize, self.__authkey, self.__creator = state
+        self.__address = self.__listener.getsockname()
+        self.__pid = os.getpid()
+        self.__closed = False
+        self.__reset()
+
+    # --------------------
+    # SocketReceiver public properties
+    # --------------------
+
+    @property
+    def address(self) -> Address:
+        """Where the receiver listens, with the actual port if it was picked by the system"""
+        return self.__address if self.__path is not None else tuple(self.__address[:2])
+
+    @property
+    def connections(self) -> int:
+        """The senders connected right now"""
+        return self.__connections
+
+    # --------------------
+    # SocketReceiver public methods
+    # --------------------
+
+    def get(self, block: bool = True, timeout: Optional[float] = None):
+        if self.__thread is None or self.__pid != os.getpid():
+            self.__start()
+        return self.__items.get(block, timeout)
+
+    def get_nowait(self):
+        return self.get(False)
+
+    def qsize(self) -> int:
+        return self.__items.qsize()
+
+    def empty(self) -> bool:
+        return self.__items.empty()
+
+    def full(self) -> bool:
+        return self.__items.full()
+
+    def close(self) -> None:
+        """Stops listening and drops every connection. The objects already read can still be consumed"""
+        if self.__closed:
+            return
+        self.__closed = True
+        if self.__wakeup is not None and self.__pid == os.getpid():
+            self.__wakeup[1].send(b'\0')
+        else:
+            self.__listener.close()
+        if self.__path is not None and self.__creator == os.getpid():
+            try:
+                os.unlink(self.__path)
+            except FileNotFoundError:
+                pass
+
+    def join_thread(self) -> None:
+        if self.__thread is not None and self.__pid == os.getpid():
+            self.__thread.join()
+
+    def cancel_join_thread(self) -> None:
+        pass
+
+    # --------------------
+    # SocketReceiver private methods
+    # --------------------
+
+    def __start(self):
+        if self.__closed:
+            raise IllegalActionException("Can't read from a closed receiver")
+        if self.__pid != os.getpid():
+            # A forked consumer: only the listening socket is inherited
+            self.__reset()
+            self.__pid = os.getpid()
+        self.__wakeup = socket.socketpair()
+        self.__thread = threading.Thread(target=self.__read, name='SocketReceiver', daemon=True)
+        self.__thread.start()
+
+    def __read(self):
+        selector = selectors.DefaultSelector()
+        selector.register(self.__listener, selectors.EVENT_READ, None)
+        selector.register(self.__wakeup[0], selectors.EVENT_READ, self.__wakeup)
+        try:
+            while not self.__closed:
+                for key, _ in selector.select():
+                    if key.data is None:
+                        connection = _accept(self.__listener, self.__authkey)
+                        if connection is not None:
+                            selector.register(connection, selectors.EVENT_READ, FrameDecoder())
+                            self.__connections += 1
+                    elif key.data is not self.__wakeup:
+                        self.__receive(selector, key.fileobj, key.data)
+        finally:
+            for key in list(selector.get_map().values()):
+                key.fileobj.close()
+            selector.close()
+            self.__wakeup[1].close()
+            self.__connections = 0
+
+    def __reset(self):
+        """Starts afresh in a new process: the reader thread of the parent and what it read aren't there"""
+        self.__items = queue.Queue(self.__maxsize)
+        self.__thread = None
+        self.__wakeup = None
+        self.__connections = 0
+
+    def __receive(self, selector: selectors.BaseSelector, connection: socket.socket, decoder: FrameDecoder):
+        try:
+            data = connection.recv(SOCKET_READSIZE)
+        except OSError:
+            data = b''
+        if not data:
+            # A frame left incomplete by a failed sender is dropped: the sender writes it again
+            selector.unregister(connection)
+            connection.close()
+            self.__connections -= 1
+            return
+        for item in decoder.feed(data):
+            while not self.__closed:
+                try:
+                    self.__items.put(item, True, SOCKET_MAXWAIT)
+                    break
+                except Full:
+                    pass
+        if decoder.failed is not None:
+            _LOGGER.warning("%s drops a connection with an undecodable frame: %r", self.address, decoder.failed)
+            selector.unregister(connection)
+            connection.close()
+            self.__connections -= 1
@@ -0,0 +1,2 @@
+__author__ = 'Francesco Calcagnini'
+__email__ = 'francesco@calcagnini.it'
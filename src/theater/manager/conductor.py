@@ -0,0 +1,433 @@
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime
+from queue import Empty, Full
+from typing import Callable, Optional, List, Dict, Tuple, Union
+
+import attr
+
+from theater.core.components.constants import METRICS_KEY
+from theater.core.components.scheduler import MultiplexScheduler
+from theater.core.constants import Signal, MsgType
+from theater.core.correlation import Correlator
+from theater.core.demux import Demultiplexer
+from theater.core.errors import IllegalActionException, IllegalValueException, ScoreEnd
+from theater.core.loggable.traits import Loggable
+from theater.core.messages import Message, Status, SharedMessage, ProducerQueue, ConsumerQueue, generatequeues
+from theater.core.pubsub import Topics
+from theater.core.registry import ActorRegistry, installregistry
+from theater.manager.constants import ROUTE_KEY, SUBSCRIBE_KEY, UNSUBSCRIBE_KEY, STOP_TIMEOUT, ASK_TIMEOUT, \
+    Hosting
+
+__all__ = ['Conductor', 'MusicianSpec']
+
+
+# --------------------
+# Module classes
+# --------------------
+
+
+@attr.s(kw_only=True, frozen=True, slots=True)
+class MusicianSpec:
+    """Everything a worker process needs to build a musician. The factory is called as
+    factory(name, mq, pausetime, conductorq, *args, **kwargs), like a BaseMusician constructor. An address, if any, is
+    passed as the address keyword. The mq of a musician reading the inbox shared by its worker is None: the worker
+    gives it a queue of its Demultiplexer"""
+    name = attr.ib(type=str, validator=attr.validators.instance_of(str))
+    factory = attr.ib(type=Callable)
+    pausetime = attr.ib(type=Union[int, float])
+    mq = attr.ib(type=Optional[ConsumerQueue], default=None,
+                 validator=attr.validators.optional(attr.validators.instance_of(ConsumerQueue)))
+    conductorq = attr.ib(type=ProducerQueue, validator=attr.validators.instance_of(ProducerQueue))
+    args = attr.ib(type=tuple, default=())
+    kwargs = attr.ib(type=dict, factory=dict)
+    address = attr.ib(type=Optional[int], default=None)
+
+    def build(self):
+        if self.address is None:
+            return self.factory(self.name, self.mq, self.pausetime, self.conductorq, *self.args, **self.kwargs)
+        return self.factory(self.name, self.mq, self.pausetime, self.conductorq, *self.args, address=self.address,
+                            **self.kwargs)
+
+
+class Conductor(Loggable):
+    """Supervises a score of musicians. It spreads them on a bounded number of worker processes, fans in their
+    answers on a single queue and routes messages by musician name or address. By default the musicians of a worker
+    share an inbox, demultiplexed by address in the worker, and a single thread of the worker multiplexes all of
+    them. Names, addresses and inboxes are kept in an ActorRegistry, that the workers get a copy of without the
+    queues. Musicians can also subscribe to topics, and get whatever is published on them. Requests sent with ask are
+    answered through a Future, resolved by poll.
+    Every queue pair takes file descriptors in the conductor and in the workers: a PIPE one takes 2 per lane, so an
+    inbox with its control lane takes 4. With shared inboxes a score takes 4 per worker, whatever the number of
+    musicians. Without them it takes 4 per musician, and the default limit of 1024 descriptors (see ulimit -n) caps a
+    score at about 250 musicians. Hosting.THREAD also takes an OS thread per musician"""
+    __slots__ = ('__name', '__workers', '__context', '__hosting', '__addressed', '__sharedinbox', '__queuekwargs',
+                 '__specs', '__registry', '__inboxes', '__workerinboxes', '__topics', '__correlator', '__sender',
+                 '__conductorp', '__conductorc', '__processes', '__lastbeats', '__metrics', '__logger')
+
+    # --------------------
+    # Conductor constructor
+    # --------------------
+
+    def __init__(self,
+                 name: str,
+                 workers: Optional[int] = None,
+                 context=None,
+                 logconf: Optional[dict] = None,
+                 hosting: Hosting = Hosting.MULTIPLEX,
+                 addressed: bool = False,
+                 sharedinbox: bool = True,
+                 **queuekwargs):
+        """
+        Builds a Conductor without musicians
+        :param name: The name used as sender of the conductor's messages
+        :param workers: The maximum number of worker processes. Defaults to the number of CPUs
+        :param context: The multiprocessing context used to spawn the workers and to build their queues. Defaults to
+        multiprocessing's default
+        :param logconf: An optional Loggable configuration
+        :param hosting: Whether a worker runs a thread per musician or multiplexes all of them on a single thread
+        :param addressed: Whether messages carry the int address of their sender instead of its name. Names are
+        resolved on demand, see actorname
+        :param sharedinbox: Whether the musicians of a worker share a single inbox, or each one gets a queue pair of
+        its own. A shared inbox is bounded as a whole, by the maxsize of queuekwargs, and in the worker every musician
+        queues DEMUX_QUEUESIZE messages at most: past that, the shared inbox waits for the musician to catch up
+        :param queuekwargs: Passed to generatequeues for every queue the conductor creates
+        """
+        super().__init__()
+        if not name:
+            raise IllegalValueException("Can't create an unnamed conductor")
+        self.__name = name
+        self.__workers = workers or os.cpu_count() or 1
+        if self.__workers < 1:
+            raise IllegalValueException(f"A conductor needs at least a worker, got {workers}")
+        self.__context = context or multiprocessing.get_context()
+        if not isinstance(hosting, Hosting):
+            raise TypeError()
+        self.__hosting = hosting
+        self.__addressed = addressed
+        self.__sharedinbox = sharedinbox
+        self.__queuekwargs = queuekwargs
+        self.__specs: List[MusicianSpec] = []
+        # What a broadcast is sent on: the inbox of every worker if they're shared, of every musician otherwise
+        self.__inboxes: List[ProducerQueue] = []
+        # The consumer end of the inbox of every worker, if they're shared
+        self.__workerinboxes: List[ConsumerQueue] = []
+        self.__topics = Topics()
+        self.__correlator = Correlator()
+        self.__conductorp, self.__conductorc = generatequeues(context=self.__context, **queuekwargs)
+        # The conductor is the first actor of its registry, with the fan-in queue as inbox
+        self.__registry = ActorRegistry()
+        address = self.__registry.register(name, self.__conductorp)
+        self.__sender = address if addressed else name
+        self.__processes = []
+        self.__lastbeats: Dict[str, float] = {}
+        self.__metrics: Dict[str, dict] = {}
+        if logconf:
+            self._initlogger(logconf)
+
+    # --------------------
+    # Conductor protected properties
+    # --------------------
+
+    @property
+    def _logger(self) -> logging.Logger:
+        return self.__logger
+
+    @_logger.setter
+    def _logger(self, new_logger: logging.Logger):
+        self.__logger = new_logger
+
+    # --------------------
+    # Conductor public properties
+    # --------------------
+
+    @property
+    def name(self) -> str:
+        return self.__name
+
+    @property
+    def musicians(self) -> Tuple[str, ...]:
+        return self.__registry.names[1:]
+
+    @property
+    def registry(self) -> ActorRegistry:
+        return self.__registry
+
+    @property
+    def running(self) -> bool:
+        return any(process.is_alive() for process in self.__processes)
+
+    # --------------------
+    # Conductor public methods
+    # --------------------
+
+    def register(self, name: str, factory: Callable, pausetime: Union[int, float], *args, **kwargs):
+        """Adds a musician to the score. It'll be built in a worker by factory, see MusicianSpec"""
+        if self.__processes:
+            raise IllegalActionException("Musicians must be registered before the score starts")
+        if name in self.__registry:
+            raise IllegalValueException(f"A musician named {name} is already registered")
+        if self.__sharedinbox:
+            # Musicians go to the workers round robin, see start, and the first musician of a worker builds its inbox
+            worker = len(self.__specs) % self.__workers
+            if worker == len(self.__workerinboxes):
+                inboxp, inboxc = self.__newinbox()
+                self.__inboxes.append(inboxp)
+                self.__workerinboxes.append(inboxc)
+            inboxp, inboxc = self.__inboxes[worker].routed(len(self.__registry)), None
+        else:
+            inboxp, inboxc = self.__newinbox()
+            self.__inboxes.append(inboxp)
+        address = self.__registry.register(name, inboxp)
+        self.__specs.append(MusicianSpec(name=name, factory=factory, pausetime=pausetime, mq=inboxc,
+                                         conductorq=self.__conductorp, args=args, kwargs=kwargs,
+                                         address=address if self.__addressed else None))
+
+    def start(self):
+        """Spreads the registered musicians on at most workers processes, round robin, and starts them"""
+        if self.__processes:
+            raise IllegalActionException("The score already started")
+        workers = min(self.__workers, len(self.__specs))
+        # Workers only resolve names: they never get the queues of the musicians of other workers
+        registry = self.__registry.namesonly()
+        for worker in range(workers):
+            inbox = self.__workerinboxes[worker] if self.__sharedinbox else None
+            process = self.__context.Process(target=_runmusicians,
+                                             args=(self.__specs[worker::workers], self.__hosting,
+                                                   registry, inbox),
+                                             name=f"{self.__name}-worker-{worker}",
+                                             daemon=True)
+            process.start()
+            self.__processes.append(process)
+        self._info("%s started %d musicians on %d workers", self.__name, len(self.__specs), workers)
+
+    def send(self, name: Union[str, int], signal: Signal, msgtype: MsgType = MsgType.NONE, body=None,
+             extension: Optional[dict] = None):
+        """Sends a message to the musician registered with name, or with the given address"""
+        self.__inbox(name).put_nowait(self.__message(signal, msgtype, body, extension))
+
+    def broadcast(self, signal: Signal, msgtype: MsgType = MsgType.NONE, body=None,
+                  extension: Optional[dict] = None) -> int:
+        """Sends the same message to every musician. It's serialized once, whatever the number of musicians. The
+        musicians whose inbox is full miss it, the others still get it. Returns how many inboxes got it"""
+        shared = SharedMessage(self.__message(signal, msgtype, body, extension))
+        delivered = 0
+        for inbox in self.__inboxes:
+            try:
+                inbox.putshared(shared, False)
+                delivered += 1
+            except Full:
+                pass
+        if delivered < len(self.__inboxes):
+            self._warn("%s broadcast %s to %d inboxes out of %d, the others are full", self.__name, signal.name,
+                       delivered, len(self.__inboxes))
+        return delivered
+
+    def subscribe(self, topic: str, name: Union[str, int]) -> bool:
+        """Subscribes a musician to topic. Returns False if it was subscribed already"""
+        return self.__topics.subscribe(topic, self.__inbox(name))
+
+    def unsubscribe(self, topic: str, name: Union[str, int]) -> bool:
+        """Unsubscribes a musician from topic. Returns False if it wasn't subscribed"""
+        return self.__topics.unsubscribe(topic, self.__inbox(name))
+
+    def publish(self, topic: str, signal: Signal, msgtype: MsgType = MsgType.NONE, body=None,
+                extension: Optional[dict] = None) -> int:
+        """Sends the same message to every musician subscribed to topic, serializing it once per inbox: the
+        subscribers sharing an inbox get a single multicast message. A musician whose inbox is full misses it. Returns
+        how many musicians got it"""
+        return self.__topics.publish(topic, self.__message(signal, msgtype, body, extension))
+
+    def ask(self, name: Union[str, int], signal: Signal, msgtype: MsgType = MsgType.NONE, body=None,
+            extension: Optional[dict] = None, timeout: Optional[float] = ASK_TIMEOUT) -> Future:
+        """Sends a message to a musician and returns the Future of its reply, that fails with a TimeoutError after
+        timeout seconds. Replies are matched by poll, so someone must keep polling: the Future can be waited on from
+        another thread, or awaited after asyncio.wrap_future. The musician has to answer with _reply"""
+        return self.__correlator.ask(self.__inbox(name), self.__message(signal, msgtype, body, extension), timeout)
+
+    def askstatus(self, name: Union[str, int], metrics: bool = False,
+                  timeout: Optional[float] = ASK_TIMEOUT) -> Future:
+        """Asks a musician for a STATUS beat, with a snapshot of its metrics if metrics is True. See ask"""
+        return self.ask(name, Signal.BEAT, MsgType.STATUS,
+                        Status(reqtime=datetime.now(), status=None, time=None, statustime=None, statusmessage=None),
+                        extension={METRICS_KEY: True} if metrics else None, timeout=timeout)
+
+    def credits(self, name: Union[str, int]) -> Optional[int]:
+        """How many more data messages the inbox of a musician accepts, or None if it's unbounded. A shared inbox
+        counts the messages of every musician of the worker"""
+        return self.__inbox(name).credits
+
+    def actorname(self, sender: Union[str, int]) -> str:
+        """The name of a message sender, that may be an address"""
+        return self.__registry.name(sender)
+
+    def beat(self, msgtype: MsgType = MsgType.NONE, body=None):
+        """Asks every musician for a heartbeat"""
+        self.broadcast(Signal.BEAT, msgtype, body)
+
+    def poll(self, timeout: float = 0) -> Optional[Message]:
+        """Reads the fan-in queue, waiting at most timeout seconds. Heartbeats are recorded and messages with a
+        ROUTE_KEY extension are forwarded to the musician with that name or address, while the ones with a
+        SUBSCRIBE_KEY or UNSUBSCRIBE_KEY extension make their sender join or leave a topic. Replies to ask resolve
+        their Future, and expired asks fail. It returns the first message left to the caller, or None"""
+        correlator = self.__correlator
+        deadline = time.monotonic() + timeout
+        while 1:
+            now = time.monotonic()
+            correlator.expire(now)
+            remaining = deadline - now
+            nextdeadline = correlator.nextdeadline
+            # Wake up in time to expire the next ask, without returning before the deadline of the caller
+            wakeup = remaining if nextdeadline is None else min(remaining, nextdeadline - now)
+            try:
+                msg = self.__conductorc.get(True, wakeup) if wakeup > 0 else self.__conductorc.get_nowait()
+            except Empty:
+                if time.monotonic() < deadline:
+                    continue
+                return None
+            if msg.signal is Signal.BEAT:
+                sender = self.__registry.name(msg.sender)
+                self.__lastbeats[sender] = time.monotonic()
+                metrics = msg.extension.get(METRICS_KEY)
+                if metrics is not None:
+                    self.__metrics[sender] = metrics
+            extension = msg.extension
+            if extension and (SUBSCRIBE_KEY in extension or UNSUBSCRIBE_KEY in extension):
+                self.__handlesubscription(msg)
+                continue
+            destination = extension.get(ROUTE_KEY)
+            if destination is None:
+                if correlator.dispatch(msg):
+                    continue
+                return msg
+            inbox = self.__registry.queue(destination)
+            if inbox is None or inbox is self.__conductorp:
+                self._warn("%s can't route a message from %s to %s", self.__name, msg.sender, destination)
+            else:
+                inbox.put_nowait(msg)
+
+    def requestmetrics(self):
+        """Asks every musician for a STATUS beat carrying a snapshot of its metrics, see lastmetrics"""
+        self.broadcast(Signal.BEAT, MsgType.STATUS,
+                       Status(reqtime=datetime.now(), status=None, time=None, statustime=None, statusmessage=None),
+                       extension={METRICS_KEY: True})
+
+    def lastmetrics(self, name: str) -> Optional[dict]:
+        """The last metrics snapshot received from a musician, or None"""
+        return self.__metrics.get(name)
+
+    def lastbeat(self, name: str) -> Optional[float]:
+        """The time.monotonic of the last BEAT received from a musician, or None"""
+        return self.__lastbeats.get(name)
+
+    def stale(self, maxage: float) -> List[str]:
+        """The musicians that didn't send a BEAT in the last maxage seconds"""
+        threshold = time.monotonic() - maxage
+        return [name for name in self.musicians if self.__lastbeats.get(name, float('-inf')) < threshold]
+
+    def stop(self, timeout: float = STOP_TIMEOUT) -> List[Message]:
+        """Interrupts every musician and waits for the workers to end, terminating them after timeout seconds.
+        Returns whatever reached the fan-in queue meanwhile"""
+        self.broadcast(Signal.INTERRUPT)
+        leftovers = []
+        deadline = time.monotonic() + timeout
+        # The fan-in queue is drained while waiting, or the workers' feeder threads could never flush
+        while self.running and time.monotonic() < deadline:
+            msg = self.poll(0.05)
+            if msg is not None:
+                leftovers.append(msg)
+        for process in self.__processes:
+            if process.is_alive():
+                self._warn("%s terminates %s", self.__name, process.name)
+                process.terminate()
+            process.join()
+        msg = self.poll()
+        while msg is not None:
+            leftovers.append(msg)
+            msg = self.poll()
+        self.__correlator.failall(ScoreEnd("The score ended before the reply"))
+        return leftovers
+
+    def __enter__(self) -> 'Conductor':
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # --------------------
+    # Conductor private methods
+    # --------------------
+
+    def __handlesubscription(self, msg: Message):
+        inbox = self.__registry.queue(msg.sender)
+        if inbox is None or inbox is self.__conductorp:
+            self._warn("%s can't subscribe unknown actor %s", self.__name, msg.sender)
+            return
+        topic = msg.extension.get(SUBSCRIBE_KEY)
+        if topic is not None:
+            self.__topics.subscribe(topic, inbox)
+        topic = msg.extension.get(UNSUBSCRIBE_KEY)
+        if topic is not None:
+            self.__topics.unsubscribe(topic, inbox)
+
+    def __newinbox(self) -> Tuple[ProducerQueue, ConsumerQueue]:
+        # Inboxes get a control lane unless told otherwise, so that INTERRUPTs and BEATs overtake any backlog
+        return generatequeues(context=self.__context, **{'lanes': True, **self.__queuekwargs})
+
+    def __inbox(self, name: Union[str, int]) -> ProducerQueue:
+        inbox = self.__registry.queue(name)
+        if inbox is None or inbox is self.__conductorp:
+            raise IllegalValueException(f"No musician named {name}")
+        return inbox
+
+    def __message(self, signal: Signal, msgtype: MsgType, body, extension: Optional[dict]) -> Message:
+        if extension is None:
+            return Message(sender=self.__sender, signal=signal, type=msgtype, body=body)
+        return Message(sender=self.__sender, signal=signal, type=msgtype, body=body, extension=extension)
+
+
+# --------------------
+# Module functions
+# --------------------
+
+
+def _perform(musician):
+    try:
+        musician.run()
+    except ScoreEnd:
+        pass
+
+
+def _runmusicians(specs: List[MusicianSpec], hosting: Hosting = Hosting.MULTIPLEX,
+                  registry: Optional[ActorRegistry] = None, inbox: Optional[ConsumerQueue] = None):
+    """Worker process entry point: every musician runs in a thread of its own, or all of them share a
+    MultiplexScheduler, till the score ends. The registry of the score is installed for actorname. If the musicians
+    share inbox, a Demultiplexer gives each one a queue, by its address in the registry: the scheduler dispatches it,
+    or a thread of its own does"""
+    installregistry(registry)
+    demux = None
+    if inbox is not None:
+        demux = Demultiplexer(inbox)
+        specs = [attr.evolve(spec, mq=demux.add(registry.address(spec.name))) for spec in specs]
+    if hosting is Hosting.MULTIPLEX:
+        MultiplexScheduler((spec.build() for spec in specs), demux=demux).run()
+        return
+    threads = []
+    for spec in specs:
+        thread = threading.Thread(target=_perform, args=(spec.build(),), name=spec.name, daemon=True)
+        thread.start()
+        threads.append(thread)
+    dispatcher = None
+    if demux is not None:
+        dispatcher = threading.Thread(target=demux.run, name="Demultiplexer", daemon=True)
+        dispatcher.start()
+    for thread in threads:
+        thread.join()
+    if dispatcher is not None:
+        demux.close()
+        dispatcher.join()
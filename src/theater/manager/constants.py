@@ -0,0 +1,17 @@
+import enum
+
+# Extension key of a Message a musician wants the conductor to forward to another musician, by name
+ROUTE_KEY: str = 'route'
+# Extension keys of a Message a musician sends to join, or leave, the topic named by their value
+SUBSCRIBE_KEY: str = 'subscribe'
+UNSUBSCRIBE_KEY: str = 'unsubscribe'
+# Seconds given to the workers to end after an INTERRUPT, before they get terminated
+STOP_TIMEOUT: float = 10.0
+# Seconds a musician is given to reply to Conductor.ask
+ASK_TIMEOUT: float = 10.0
+
+
+class Hosting(enum.Enum):
+    """Enum that contains the ways a worker process can host its musicians"""
+    THREAD = 'Thread'
+    MULTIPLEX = 'Multiplex'
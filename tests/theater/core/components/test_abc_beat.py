@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime
+
+from theater.core.components.abc import BaseMusician, DelegatingMusician
+from theater.core.components.constants import IDLE_STATUS
+from theater.core.constants import Signal, MsgType, CORRELATION_KEY
+from theater.core.messages import Message, Status, generatequeues
+
+
+class SimpleMusician(BaseMusician):
+    def _onpauseend(self, *args, **kwargs):
+        pass
+
+
+class SimpleDelegatingMusician(DelegatingMusician):
+    def _onpauseend(self, executor=None, *args, **kwargs):
+        pass
+
+
+def _beat(msgtype: MsgType) -> Message:
+    body = None
+    if msgtype is MsgType.STATUS:
+        body = Status(reqtime=datetime.now(), status=None, time=None, statustime=None, statusmessage=None)
+    return Message(sender="Conductor", signal=Signal.BEAT, type=msgtype, body=body)
+
+
+class TestBeat:
+    def test_nonebeat(self):
+        _, consumer = generatequeues()
+        conductorp, conductorc = generatequeues()
+        musician = SimpleMusician("Musician", consumer, 1, conductorp)
+        assert musician._handlemessage(_beat(MsgType.NONE)) is Signal.BEAT
+        answer = conductorc.get(True, 1.0)
+        assert answer == Message(sender="Musician", signal=Signal.BEAT, type=MsgType.NONE, body=None)
+
+    def test_addressednonebeat(self):
+        _, consumer = generatequeues()
+        conductorp, conductorc = generatequeues()
+        musician = SimpleMusician("Musician", consumer, 1, conductorp, address=5)
+        musician._handlemessage(_beat(MsgType.NONE))
+        assert conductorc.get(True, 1.0).sender == 5
+
+    def test_correlatedbeat(self):
+        _, consumer = generatequeues()
+        conductorp, conductorc = generatequeues()
+        musician = SimpleDelegatingMusician("Musician", consumer, 1, conductorp)
+        request = _beat(MsgType.STATUS)
+        musician._handlemessage(Message(sender="Conductor", signal=Signal.BEAT, type=MsgType.STATUS,
+                                        body=request.body, extension={CORRELATION_KEY: 7}))
+        assert conductorc.get(True, 1.0).extension == {CORRELATION_KEY: 7}
+
+    def test_statusbeat(self):
+        _, consumer = generatequeues()
+        conductorp, conductorc = generatequeues()
+        musician = SimpleMusician("Musician", consumer, 1, conductorp)
+        request = _beat(MsgType.STATUS)
+        musician._handlemessage(request)
+        answer = conductorc.get(True, 1.0)
+        assert answer.sender == "Musician"
+        assert answer.body.reqtime == request.body.reqtime
+        assert answer.body.status == "Running"
+        assert answer.body.statustime == musician._starttime
+
+    def test_delegatingstatusbeat(self):
+        _, consumer = generatequeues()
+        conductorp, conductorc = generatequeues()
+        musician = SimpleDelegatingMusician("Musician", consumer, 1, conductorp)
+        musician._status = IDLE_STATUS
+        musician._handlemessage(_beat(MsgType.STATUS))
+        answer = conductorc.get(True, 1.0)
+        assert answer.body.status == IDLE_STATUS
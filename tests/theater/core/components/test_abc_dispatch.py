@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+import enum
+
+from theater.core.components.abc import BaseComponent, handles
+from theater.core.constants import Signal, MsgType
+from theater.core.messages import Message, Status, generatequeues, encodemessage, decodemessage
+
+
+class DefaultComponent(BaseComponent):
+    def _onpauseend(self, *args, **kwargs):
+        pass
+
+
+class OverridingComponent(DefaultComponent):
+    def _handletrigger(self, msg: Message):
+        return msg.body
+
+
+class RoutingComponent(DefaultComponent):
+    @handles(Signal.UPDATE, Signal.CREATE)
+    def _handleconfig(self, msg: Message):
+        return "config"
+
+    @handles(Signal.BEAT, msgtype=MsgType.STATUS)
+    def _handlestatusbeat(self, msg: Message):
+        return msg.body.status
+
+
+class CustomSignal(enum.Enum):
+    RELOAD = 'RELOAD'
+
+
+class CustomComponent(DefaultComponent):
+    @handles(CustomSignal.RELOAD)
+    def _handlereload(self, msg):
+        return CustomSignal.RELOAD
+
+
+def _component(cls):
+    _, consumer = generatequeues()
+    return cls("Test", consumer, 1)
+
+
+def _message(signal: enum.Enum, msgtype: MsgType = MsgType.NONE, body=None) -> Message:
+    return Message(sender="Test", signal=signal, type=msgtype, body=body)
+
+
+class TestDispatchTable:
+    def test_defaults(self):
+        component = _component(DefaultComponent)
+        for signal in Signal:
+            assert component._handlemessage(_message(signal)) is signal
+
+    def test_override(self):
+        component = _component(OverridingComponent)
+        assert component._handlemessage(_message(Signal.TRIGGER, MsgType.TEXT, "Overridden")) == "Overridden"
+        assert component._handlemessage(_message(Signal.BEAT)) is Signal.BEAT
+
+    def test_decorated(self):
+        component = _component(RoutingComponent)
+        assert component._handlemessage(_message(Signal.UPDATE)) == "config"
+        assert component._handlemessage(_message(Signal.CREATE)) == "config"
+        assert component._handlemessage(_message(Signal.KILL)) is Signal.KILL
+
+    def test_msgtyperoute(self):
+        component = _component(RoutingComponent)
+        status = Status(reqtime=None, status="Routed", time=None, statustime=None, statusmessage=None)
+        assert component._handlemessage(_message(Signal.BEAT, MsgType.STATUS, status)) == "Routed"
+        assert component._handlemessage(_message(Signal.BEAT)) is Signal.BEAT
+
+    def test_tableperclass(self):
+        assert RoutingComponent._dispatchtable is not DefaultComponent._dispatchtable
+        assert DefaultComponent._dispatchtable[Signal.UPDATE] is BaseComponent._handleupdate
+
+    def test_customsignal(self):
+        component = _component(CustomComponent)
+        assert component._handlemessage(_message(CustomSignal.RELOAD)) is CustomSignal.RELOAD
+        assert component._handlemessage(decodemessage(encodemessage(_message(CustomSignal.RELOAD)))) \
+            is CustomSignal.RELOAD
+
+    def test_unhandledsignal(self):
+        component = _component(DefaultComponent)
+        assert component._handlemessage(_message(CustomSignal.RELOAD)) is None
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+import time
+
+import pytest
+
+from theater.core.components.abc import BaseComponent, DelegatingMusician
+from theater.core.constants import Signal, MsgType
+from theater.core.errors import IllegalValueException
+from theater.core.messages import Message, generatequeues
+
+
+class CountingComponent(BaseComponent):
+    __slots__ = ('handled',)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.handled = []
+
+    def _handletrigger(self, msg: Message):
+        self.handled.append(msg.body)
+        return Signal.TRIGGER
+
+    def _onpauseend(self, *args, **kwargs):
+        pass
+
+
+class CountingMusician(DelegatingMusician):
+    __slots__ = ('handled',)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.handled = []
+
+    def _handletrigger(self, msg: Message):
+        self.handled.append(msg.body)
+        return Signal.TRIGGER
+
+    def _onpauseend(self, executor=None, *args, **kwargs):
+        pass
+
+
+def _fill(producer, count: int, interruptat: int = None):
+    for i in range(count):
+        if i == interruptat:
+            producer.put_nowait(Message(sender="Test", signal=Signal.INTERRUPT, type=MsgType.NONE, body=None))
+        else:
+            producer.put_nowait(Message(sender="Test", signal=Signal.TRIGGER, type=MsgType.TEXT, body=str(i)))
+    # Gives the feeder thread the time to flush everything in the pipe
+    time.sleep(0.1)
+
+
+class TestDrain:
+    def test_wrongdrainsize(self):
+        _, consumer = generatequeues()
+        with pytest.raises(IllegalValueException):
+            _ = CountingComponent("Test", consumer, 1, drainsize=0)
+
+    def test_onebypoll(self):
+        producer, consumer = generatequeues()
+        component = CountingComponent("Test", consumer, 1)
+        _fill(producer, 3)
+        assert component._poll() is Signal.TRIGGER
+        assert component.handled == ['0']
+
+    def test_boundeddrain(self):
+        producer, consumer = generatequeues()
+        component = CountingComponent("Test", consumer, 1, drainsize=4)
+        _fill(producer, 10)
+        component._poll()
+        assert component.handled == ['0', '1', '2', '3']
+        component._poll()
+        assert component.handled == ['0', '1', '2', '3', '4', '5', '6', '7']
+
+    def test_fulldrain(self):
+        producer, consumer = generatequeues()
+        component = CountingComponent("Test", consumer, 1, drainsize=None)
+        _fill(producer, 50)
+        assert component._poll() is Signal.TRIGGER
+        assert component.handled == [str(i) for i in range(50)]
+        assert component._poll() is None
+
+    def test_interruptinbatch(self):
+        producer, consumer = generatequeues()
+        component = CountingComponent("Test", consumer, 1, drainsize=None)
+        _fill(producer, 10, interruptat=3)
+        assert component._poll() is Signal.INTERRUPT
+        assert component.handled == ['0', '1', '2']
+        assert consumer.get(True, 1.0).body == '4'
+
+    def test_delegatingdrain(self):
+        producer, consumer = generatequeues()
+        conductorp, _ = generatequeues()
+        musician = CountingMusician("Test", consumer, 1, conductorp, drainsize=None)
+        _fill(producer, 10, interruptat=5)
+        assert musician._poll() is Signal.INTERRUPT
+        assert musician.handled == ['0', '1', '2', '3', '4']
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from datetime import datetime
+
+import pytest
+
+from theater.core.components.abc import DelegatingMusician
+from theater.core.components.constants import ExecutorKind, DELEGATING_STATUS, IDLE_STATUS
+from theater.core.components.executors import TrackingExecutor
+from theater.core.constants import Signal, MsgType
+from theater.core.errors import IllegalValueException
+from theater.core.messages import Message, Status, generatequeues
+
+
+class WaitingMusician(DelegatingMusician):
+    def _onpauseend(self, executor=None, *args, **kwargs):
+        pass
+
+
+def _musician(**kwargs):
+    _, consumer = generatequeues()
+    conductorp, conductorc = generatequeues()
+    return WaitingMusician("Musician", consumer, 1, conductorp, **kwargs), conductorc
+
+
+def _statusbeat() -> Message:
+    return Message(sender="Conductor", signal=Signal.BEAT, type=MsgType.STATUS,
+                   body=Status(reqtime=datetime.now(), status=None, time=None, statustime=None, statusmessage=None))
+
+
+class TestExecutors:
+    def test_wrongworkers(self):
+        with pytest.raises(IllegalValueException):
+            _musician(maxworkers=0)
+        with pytest.raises(TypeError):
+            _musician(executor="Executor")
+
+    def test_threadpool(self):
+        musician, _ = _musician(maxworkers=4)
+        executor = musician._openexecutor()
+        barrier = threading.Barrier(4, timeout=5)
+        futures = [executor.submit(barrier.wait) for _ in range(4)]
+        assert sorted(future.result(5) for future in futures) == [0, 1, 2, 3]
+        musician._closeexecutor()
+        assert musician._executor is None
+
+    def test_processpool(self):
+        musician, _ = _musician(executorkind=ExecutorKind.PROCESS, maxworkers=2)
+        executor = musician._openexecutor()
+        assert isinstance(executor.executor, ProcessPoolExecutor)
+        assert executor.submit(os.getpid).result(10) != os.getpid()
+        musician._closeexecutor()
+
+    def test_sharedexecutor(self):
+        shared = ThreadPoolExecutor(max_workers=2)
+        first, _ = _musician(executor=shared)
+        second, _ = _musician(executor=shared)
+        assert first._openexecutor().executor is shared
+        assert second._openexecutor().executor is shared
+        first._closeexecutor()
+        assert shared.submit(int, "42").result(5) == 42
+        second._closeexecutor()
+        shared.shutdown()
+
+
+class TestInflightStatus:
+    def test_tracking(self):
+        executor = TrackingExecutor(ThreadPoolExecutor(max_workers=2), owned=True)
+        event = threading.Event()
+        futures = [executor.submit(event.wait, 5) for _ in range(3)]
+        assert executor.inflight == 3
+        assert executor.oldest <= time.monotonic()
+        event.set()
+        for future in futures:
+            future.result(5)
+        executor.shutdown()
+        assert executor.inflight == 0
+        assert executor.oldest is None
+
+    def test_statusbeat(self):
+        musician, conductorc = _musician(maxworkers=3)
+        musician._status = IDLE_STATUS
+        executor = musician._openexecutor()
+        event = threading.Event()
+        for _ in range(3):
+            executor.submit(event.wait, 5)
+        musician._handlemessage(_statusbeat())
+        answer = conductorc.get(True, 1.0)
+        assert answer.body.status == DELEGATING_STATUS
+        assert "3 tasks in flight" in answer.body.statusmessage
+        event.set()
+        musician._closeexecutor()
+        musician._handlemessage(_statusbeat())
+        assert conductorc.get(True, 1.0).body.status == IDLE_STATUS
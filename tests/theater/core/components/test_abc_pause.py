@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+import time
+
+import pytest
+
+from theater.core.components.abc import BaseComponent
+from theater.core.components.constants import PauseMode
+from theater.core.components.polling import AdaptivePollPolicy
+from theater.core.constants import Signal, MsgType
+from theater.core.errors import IllegalValueException, ScoreEnd
+from theater.core.messages import Message, generatequeues
+
+
+class RecordingComponent(BaseComponent):
+    __slots__ = ('triggers', 'pauseends')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.triggers = []
+        self.pauseends = 0
+
+    def _handletrigger(self, msg: Message):
+        self.triggers.append(time.monotonic())
+        return Signal.TRIGGER
+
+    def _onpauseend(self, *args, **kwargs):
+        self.pauseends += 1
+
+
+def _message(signal: Signal) -> Message:
+    return Message(sender="Test", signal=signal, type=MsgType.NONE, body=None)
+
+
+class TestDeadlinePause:
+    def test_wrongmode(self):
+        _, consumer = generatequeues()
+        with pytest.raises(IllegalValueException):
+            _ = RecordingComponent("Test", consumer, 1, pausemode="Deadline")
+
+    def test_emptywindow(self):
+        _, consumer = generatequeues()
+        component = RecordingComponent("Test", consumer, 0.2, pausemode=PauseMode.DEADLINE)
+        start = time.monotonic()
+        component._pause()
+        elapsed = time.monotonic() - start
+        assert 0.2 <= elapsed < 0.5
+        assert component.triggers == []
+
+    def test_timers(self):
+        _, consumer = generatequeues()
+        component = RecordingComponent("Test", consumer, 0.2, pausemode=PauseMode.DEADLINE)
+        fired = []
+        component._timers.schedule(0.05, lambda: fired.append(time.monotonic()))
+        start = time.monotonic()
+        component._pause()
+        assert len(fired) == 1
+        assert 0.05 <= fired[0] - start < 0.15
+
+    def test_interrupt(self):
+        producer, consumer = generatequeues()
+        component = RecordingComponent("Test", consumer, 5, pausemode=PauseMode.DEADLINE)
+        producer.put_nowait(_message(Signal.INTERRUPT))
+        start = time.monotonic()
+        with pytest.raises(ScoreEnd):
+            component._pause()
+        assert time.monotonic() - start < 1
+
+    def test_messagesinwindow(self):
+        producer, consumer = generatequeues()
+        component = RecordingComponent("Test", consumer, 0.5, pausemode=PauseMode.DEADLINE)
+        for _ in range(5):
+            producer.put_nowait(_message(Signal.TRIGGER))
+        component._pause()
+        assert len(component.triggers) == 5
+        assert component.triggers[-1] - component.triggers[0] < 0.4
+
+
+class TestTickPause:
+    def test_interrupt(self):
+        producer, consumer = generatequeues()
+        component = RecordingComponent("Test", consumer, 3)
+        assert component._pausemode is PauseMode.TICK
+        producer.put_nowait(_message(Signal.INTERRUPT))
+        time.sleep(0.1)
+        with pytest.raises(ScoreEnd):
+            component._pause()
+
+    def test_fractionalpause(self):
+        producer, consumer = generatequeues()
+        # The seconds a multiplexed component pauses, rounded up to a tick
+        component = RecordingComponent("Test", consumer, 0.2)
+        producer.put_nowait(_message(Signal.INTERRUPT))
+        time.sleep(0.1)
+        with pytest.raises(ScoreEnd):
+            component._pause()
+
+    def test_wrongpausetime(self):
+        _, consumer = generatequeues()
+        for pausetime in (-1, "1", None):
+            with pytest.raises(IllegalValueException):
+                _ = RecordingComponent("Test", consumer, pausetime)
+
+
+class TestAdaptivePause:
+    def test_wrongpolicy(self):
+        _, consumer = generatequeues()
+        with pytest.raises(IllegalValueException):
+            _ = RecordingComponent("Test", consumer, 1, pausemode=PauseMode.DEADLINE,
+                                   pollpolicy=AdaptivePollPolicy())
+
+    def test_idlewindow(self):
+        _, consumer = generatequeues()
+        component = RecordingComponent("Test", consumer, 0.3, pausemode=PauseMode.ADAPTIVE,
+                                       pollpolicy=AdaptivePollPolicy(spins=10, minwait=0.001, maxwait=0.01))
+        start = time.monotonic()
+        component._pause()
+        assert 0.3 <= time.monotonic() - start < 0.6
+        # The spins, the bounded waits from 1 to 8 ms, then a single poll blocking till the end
+        assert component._metrics.emptypolls <= 20
+        assert component._pollpolicy.nextwait() is None
+
+    def test_messagesinwindow(self):
+        producer, consumer = generatequeues()
+        component = RecordingComponent("Test", consumer, 0.3, pausemode=PauseMode.ADAPTIVE)
+        assert isinstance(component._pollpolicy, AdaptivePollPolicy)
+        for _ in range(5):
+            producer.put_nowait(_message(Signal.TRIGGER))
+        component._pause()
+        assert len(component.triggers) == 5
+        assert component._metrics.productivepolls == 5
+
+    def test_interrupt(self):
+        producer, consumer = generatequeues()
+        component = RecordingComponent("Test", consumer, 5, pausemode=PauseMode.ADAPTIVE)
+        producer.put_nowait(_message(Signal.INTERRUPT))
+        start = time.monotonic()
+        with pytest.raises(ScoreEnd):
+            component._pause()
+        assert time.monotonic() - start < 1
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import sys
+import threading
+import time
+from datetime import datetime
+from queue import Empty
+
+import pytest
+
+from theater.core.components.aio import AsyncConsumer, AsyncComponent, AsyncMusician, perform
+from theater.core.components.abc import handles
+from theater.core.components.constants import INTERRUPTED_STATUS, METRICS_KEY, PauseMode
+from theater.core.components.polling import AdaptivePollPolicy
+from theater.core.constants import Signal, MsgType, Transport
+from theater.core.errors import ScoreEnd
+from theater.core.messages import Message, Status, generatequeues
+
+_SHAREDMEMORY = pytest.param(Transport.SHAREDMEMORY,
+                             marks=pytest.mark.skipif(sys.version_info < (3, 8), reason="Requires shared memory"))
+
+
+class SleepyMusician(AsyncMusician):
+    """Answers a TEXT trigger after awaiting, so that concurrent musicians overlap their handlers"""
+    __slots__ = ('pauseends',)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pauseends = 0
+
+    async def _handletrigger(self, msg: Message):
+        await asyncio.sleep(0.05)
+        self._answerconductor(Signal.TRIGGER, MsgType.TEXT, f"{self._actorname}:{msg.body}")
+        return Signal.TRIGGER
+
+    @handles(Signal.UPDATE)
+    def _handleconfig(self, msg: Message):
+        return "sync"
+
+    async def _onpauseend(self, *args, **kwargs):
+        self.pauseends += 1
+
+
+def _message(signal: Signal, msgtype: MsgType = MsgType.NONE, body=None) -> Message:
+    return Message(sender="Conductor", signal=signal, type=msgtype, body=body)
+
+
+class TestAsyncConsumer:
+    @pytest.mark.parametrize('transport', [Transport.PIPE, _SHAREDMEMORY])
+    def test_wakeup(self, transport):
+        producer, consumer = generatequeues(transport=transport)
+        reader = AsyncConsumer(consumer)
+
+        async def scenario():
+            threading.Timer(0.05, producer.put_nowait, ("Late",)).start()
+            start = time.monotonic()
+            out = await reader.get(2.0)
+            return out, time.monotonic() - start
+
+        out, elapsed = asyncio.run(scenario())
+        assert out == "Late"
+        assert elapsed < 1.0
+
+    def test_timeout(self):
+        _, consumer = generatequeues()
+        with pytest.raises(Empty):
+            asyncio.run(AsyncConsumer(consumer).get(0.05))
+
+
+class TestAsyncMusician:
+    def test_sharedloop(self):
+        conductorp, conductorc = generatequeues()
+        inboxes = []
+        musicians = []
+        for i in range(20):
+            producer, consumer = generatequeues()
+            inboxes.append(producer)
+            musicians.append(SleepyMusician(f"Musician{i}", consumer, 0.1, conductorp))
+        for inbox in inboxes:
+            inbox.put_nowait(_message(Signal.TRIGGER, MsgType.TEXT, "Hello"))
+        threading.Timer(0.5, lambda: [inbox.put_nowait(_message(Signal.INTERRUPT)) for inbox in inboxes]).start()
+        start = time.monotonic()
+        assert asyncio.run(perform(musicians)) == []
+        assert time.monotonic() - start < 2.0
+        answers = [conductorc.get(True, 1.0) for _ in range(40)]
+        assert sorted(msg.body for msg in answers if msg.type is MsgType.TEXT) == \
+            sorted(f"Musician{i}:Hello" for i in range(20))
+        assert [msg.body.status for msg in answers if msg.type is MsgType.STATUS] == [INTERRUPTED_STATUS] * 20
+        assert all(musician.pauseends > 0 for musician in musicians)
+
+    def test_handlers(self):
+        conductorp, conductorc = generatequeues()
+        _, consumer = generatequeues()
+        musician = SleepyMusician("Musician", consumer, 1, conductorp)
+        assert asyncio.run(musician._handlemessage(_message(Signal.UPDATE))) == "sync"
+        assert asyncio.run(musician._handlemessage(_message(Signal.BEAT))) is Signal.BEAT
+        assert conductorc.get(True, 1.0).sender == "Musician"
+
+    def test_interrupt(self):
+        producer, consumer = generatequeues()
+        conductorp, _ = generatequeues()
+        musician = SleepyMusician("Musician", consumer, 5, conductorp)
+        producer.put_nowait(_message(Signal.INTERRUPT))
+        with pytest.raises(ScoreEnd):
+            asyncio.run(musician._pause())
+
+    def test_metrics(self):
+        producer, consumer = generatequeues()
+        conductorp, conductorc = generatequeues()
+        musician = SleepyMusician("Musician", consumer, 1, conductorp)
+        producer.put_nowait(_message(Signal.TRIGGER, MsgType.TEXT, "Hello"))
+
+        async def scenario():
+            await musician._poll(1.0)
+            await musician._poll()
+            await musician._endpause()
+
+        asyncio.run(scenario())
+        conductorc.get(True, 1.0)
+        beat = Message(sender="Conductor", signal=Signal.BEAT, type=MsgType.STATUS,
+                       body=Status(reqtime=datetime.now(), status=None, time=None, statustime=None,
+                                   statusmessage=None),
+                       extension={METRICS_KEY: True})
+        asyncio.run(musician._handlemessage(beat))
+        snapshot = conductorc.get(True, 1.0).extension[METRICS_KEY]
+        assert snapshot['handled']['TRIGGER']['count'] == 1
+        assert snapshot['handled']['TRIGGER']['total'] >= 5 * 10 ** 7
+        assert snapshot['polls'] == {'empty': 1, 'productive': 1}
+        assert snapshot['pauseend']['count'] == 1
+        assert snapshot['outbox'] == {'pending': 0, 'dropped': 0, 'coalesced': 0}
+        assert musician.pauseends == 1
+
+    def test_timers(self):
+        _, consumer = generatequeues()
+        musician = SleepyMusician("Musician", consumer, 0.3, None)
+        fired = []
+        musician._timers.schedule(0.05, lambda: fired.append(time.monotonic()))
+        start = time.monotonic()
+        asyncio.run(musician._pause())
+        assert len(fired) == 1
+        assert fired[0] - start < 0.25
+
+    def test_pollpolicy(self):
+        _, consumer = generatequeues()
+        policy = AdaptivePollPolicy(spins=0, minwait=0.01, maxwait=0.04)
+        musician = SleepyMusician("Musician", consumer, 0.2, None, pausemode=PauseMode.ADAPTIVE, pollpolicy=policy)
+        assert musician._pollpolicy is policy
+        asyncio.run(musician._pause())
+        assert policy.idle > 1
+        assert musician._metrics.emptypolls == policy.idle
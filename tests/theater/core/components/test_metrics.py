@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+import pickle
+import threading
+import time
+from datetime import datetime
+
+from theater.core.components.abc import BaseMusician, DelegatingMusician
+from theater.core.components.constants import METRICS_KEY
+from theater.core.components.metrics import Histogram
+from theater.core.constants import Signal, MsgType
+from theater.core.messages import Message, Status, generatequeues
+
+
+class SleepyMusician(BaseMusician):
+    def _handletrigger(self, msg: Message):
+        time.sleep(0.01)
+        return Signal.TRIGGER
+
+    def _onpauseend(self, *args, **kwargs):
+        time.sleep(0.01)
+
+
+class BusyMusician(DelegatingMusician):
+    def _onpauseend(self, executor=None, *args, **kwargs):
+        pass
+
+
+def _message(signal: Signal) -> Message:
+    return Message(sender="Conductor", signal=signal, type=MsgType.NONE, body=None)
+
+
+def _metricsbeat() -> Message:
+    return Message(sender="Conductor", signal=Signal.BEAT, type=MsgType.STATUS,
+                   body=Status(reqtime=datetime.now(), status=None, time=None, statustime=None, statusmessage=None),
+                   extension={METRICS_KEY: True})
+
+
+class TestHistogram:
+    def test_buckets(self):
+        histogram = Histogram()
+        for ns in (0, 1, 3, 1000, 1000):
+            histogram.record(ns)
+        snapshot = histogram.snapshot()
+        assert snapshot['count'] == 5
+        assert snapshot['total'] == 2004
+        assert snapshot['max'] == 1000
+        assert snapshot['buckets'] == {1: 1, 2: 1, 4: 1, 1024: 2}
+
+    def test_quantile(self):
+        histogram = Histogram()
+        assert histogram.quantile(0.5) == 0
+        for ns in range(1, 101):
+            histogram.record(ns * 1000)
+        assert 50000 <= histogram.quantile(0.5) <= 65536
+        assert histogram.quantile(0.99) == 100000
+        assert histogram.quantile(1) == histogram.max
+
+
+class TestComponentMetrics:
+    def test_handling(self):
+        producer, consumer = generatequeues()
+        conductorp, _ = generatequeues()
+        musician = SleepyMusician("Musician", consumer, 1, conductorp, drainsize=None)
+        musician._poll()
+        for _ in range(3):
+            producer.put(_message(Signal.TRIGGER))
+        producer.put(_message(Signal.BEAT))
+        time.sleep(0.1)
+        musician._poll()
+        metrics = musician._metrics
+        assert metrics.handled(Signal.TRIGGER).count == 3
+        assert metrics.handled(Signal.TRIGGER).total >= 3 * 10 ** 7
+        assert metrics.handled(Signal.BEAT).count == 1
+        assert metrics.handled(Signal.UPDATE) is None
+        assert (metrics.emptypolls, metrics.productivepolls) == (1, 1)
+
+    def test_pauseend(self):
+        producer, consumer = generatequeues()
+        conductorp, _ = generatequeues()
+        musician = SleepyMusician("Musician", consumer, 1, conductorp)
+        producer.put(_message(Signal.TRIGGER))
+        time.sleep(0.1)
+        musician._endpause()
+        snapshot = musician._metricssnapshot()
+        assert snapshot['pauseend']['count'] == 1
+        assert snapshot['pauseend']['total'] >= 10 ** 7
+        assert [depth for _, depth in snapshot['depth']['samples']] == [1]
+        assert snapshot['depth']['max'] == 1
+
+    def test_disabled(self):
+        _, consumer = generatequeues()
+        conductorp, conductorc = generatequeues()
+        musician = SleepyMusician("Musician", consumer, 1, conductorp, metrics=False)
+        musician._handlemessage(_message(Signal.TRIGGER))
+        assert musician._metrics is None
+        musician._handlemessage(_metricsbeat())
+        assert conductorc.get(True, 1).extension == {METRICS_KEY: None}
+
+    def test_beat(self):
+        _, consumer = generatequeues()
+        conductorp, conductorc = generatequeues()
+        musician = SleepyMusician("Musician", consumer, 1, conductorp)
+        musician._handlemessage(_message(Signal.TRIGGER))
+        musician._handlemessage(_metricsbeat())
+        answer = conductorc.get(True, 1)
+        snapshot = answer.extension[METRICS_KEY]
+        assert snapshot['handled']['TRIGGER']['count'] == 1
+        assert snapshot['outbox'] == {'pending': 0, 'dropped': 0, 'coalesced': 0}
+        assert pickle.loads(pickle.dumps(snapshot)) == snapshot
+        musician._handlemessage(Message(sender="Conductor", signal=Signal.BEAT, type=MsgType.STATUS,
+                                        body=_metricsbeat().body))
+        assert conductorc.get(True, 1).extension == {}
+
+    def test_executor(self):
+        _, consumer = generatequeues()
+        conductorp, conductorc = generatequeues()
+        musician = BusyMusician("Musician", consumer, 1, conductorp, maxworkers=1)
+        executor = musician._openexecutor()
+        release = threading.Event()
+        executor.submit(release.wait, 5)
+        waiting = executor.submit(time.sleep, 0)
+        time.sleep(0.05)
+        release.set()
+        waiting.result(5)
+        # Done callbacks run right after the result is set
+        time.sleep(0.05)
+        musician._handlemessage(_metricsbeat())
+        snapshot = conductorc.get(True, 1).extension[METRICS_KEY]
+        assert snapshot['executor']['queuewait']['count'] == 2
+        assert snapshot['executor']['queuewait']['max'] >= 5 * 10 ** 7
+        musician._closeexecutor()
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from theater.core.components.polling import AdaptivePollPolicy
+from theater.core.errors import IllegalValueException
+
+
+class TestAdaptivePollPolicy:
+    def test_wrongwaits(self):
+        with pytest.raises(IllegalValueException):
+            AdaptivePollPolicy(spins=-1)
+        with pytest.raises(IllegalValueException):
+            AdaptivePollPolicy(minwait=0)
+        with pytest.raises(IllegalValueException):
+            AdaptivePollPolicy(minwait=0.1, maxwait=0.01)
+
+    def test_backoff(self):
+        policy = AdaptivePollPolicy(spins=2, minwait=0.001, maxwait=0.004)
+        waits = []
+        for _ in range(7):
+            waits.append(policy.nextwait())
+            policy.record(False)
+        assert waits == [0, 0, 0.001, 0.002, 0.004, None, None]
+        assert policy.idle == 7
+
+    def test_activity(self):
+        policy = AdaptivePollPolicy(spins=1, minwait=0.001, maxwait=0.001)
+        for _ in range(5):
+            policy.record(False)
+        assert policy.nextwait() is None
+        policy.record(True)
+        assert policy.idle == 0
+        assert policy.nextwait() == 0
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+import sys
+import threading
+import time
+
+import pytest
+
+from theater.core.components.abc import BaseComponent, DelegatingMusician
+from theater.core.components.scheduler import MultiplexScheduler
+from theater.core.constants import Signal, MsgType, Transport
+from theater.core.demux import Demultiplexer
+from theater.core.messages import Message, generatequeues
+
+
+class CountingComponent(BaseComponent):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.triggers = []
+        self.pauseends = 0
+
+    def _handletrigger(self, msg: Message):
+        self.triggers.append(msg.body)
+        return Signal.TRIGGER
+
+    def _onpauseend(self, *args, **kwargs):
+        self.pauseends += 1
+
+
+class FailingComponent(CountingComponent):
+    def _onpauseend(self, *args, **kwargs):
+        raise RuntimeError("Failure")
+
+
+class ExecutorMusician(DelegatingMusician):
+    def _onpauseend(self, executor=None, *args, **kwargs):
+        executor.submit(time.sleep, 0)
+
+
+def _component(name: str, cls=CountingComponent, pausetime: float = 60, **queuekwargs):
+    producer, consumer = generatequeues(**queuekwargs)
+    return cls(name, consumer, pausetime), producer
+
+
+def _message(signal: Signal, body=None) -> Message:
+    return Message(sender="Conductor", signal=signal, type=MsgType.TEXT if body else MsgType.NONE, body=body)
+
+
+def _interrupt(producers):
+    for producer in producers:
+        producer.put(_message(Signal.INTERRUPT))
+
+
+class TestMultiplexScheduler:
+    def test_wrongcomponent(self):
+        with pytest.raises(TypeError):
+            MultiplexScheduler(["Component"])
+
+    def test_manycomponents(self):
+        pairs = [_component(f"Component{i}") for i in range(50)]
+        scheduler = MultiplexScheduler(component for component, _ in pairs)
+        thread = threading.Thread(target=scheduler.run, daemon=True)
+        thread.start()
+        for i, (_, producer) in enumerate(pairs):
+            producer.put(_message(Signal.TRIGGER, f"Hello{i}"))
+        _interrupt(producer for _, producer in pairs)
+        thread.join(10)
+        assert not thread.is_alive()
+        assert [component.triggers for component, _ in pairs] == [[f"Hello{i}"] for i in range(50)]
+        assert scheduler.components == ()
+        assert scheduler.failures == []
+
+    def test_pauseend(self):
+        component, producer = _component("Component", pausetime=0.05)
+        scheduler = MultiplexScheduler([component])
+        deadline = time.monotonic() + 0.5
+        while time.monotonic() < deadline:
+            scheduler.step()
+        assert 5 <= component.pauseends <= 11
+        _interrupt([producer])
+        scheduler.run()
+
+    @pytest.mark.skipif(sys.version_info < (3, 8), reason="Requires shared memory")
+    def test_sharedmemory(self):
+        pipe, pipep = _component("Pipe")
+        ring, ringp = _component("Ring", transport=Transport.SHAREDMEMORY)
+        scheduler = MultiplexScheduler([pipe, ring])
+        pipep.put(_message(Signal.TRIGGER, "Pipe"))
+        ringp.put(_message(Signal.TRIGGER, "Ring"))
+        _interrupt([pipep, ringp])
+        scheduler.run()
+        assert pipe.triggers == ["Pipe"]
+        assert ring.triggers == ["Ring"]
+
+    def test_failure(self):
+        failing, _ = _component("Failing", FailingComponent, pausetime=0.01)
+        healthy, producer = _component("Healthy")
+        scheduler = MultiplexScheduler([failing, healthy])
+        scheduler.step(0.1)
+        scheduler.step(0.1)
+        assert scheduler.components == (healthy,)
+        producer.put(_message(Signal.TRIGGER, "Still here"))
+        _interrupt([producer])
+        failures = scheduler.run()
+        assert healthy.triggers == ["Still here"]
+        assert [(component, type(exc)) for component, exc in failures] == [(failing, RuntimeError)]
+
+    def test_executorlifecycle(self):
+        producer, consumer = generatequeues()
+        conductorp, _ = generatequeues()
+        musician = ExecutorMusician("Musician", consumer, 0.01, conductorp)
+        scheduler = MultiplexScheduler([musician])
+        assert musician._executor is not None
+        scheduler.step(0.1)
+        scheduler.step(0.1)
+        _interrupt([producer])
+        scheduler.run()
+        assert musician._executor is None
+
+    def test_sharedtimers(self):
+        first, firstp = _component("First")
+        second, secondp = _component("Second")
+        scheduler = MultiplexScheduler([first, second])
+        assert first._timers is second._timers is scheduler.timers
+        fired = []
+        first._timers.schedule(0.02, fired.append, "First")
+        second._timers.schedule(0.04, fired.append, "Second")
+        start = time.monotonic()
+        while len(fired) < 2 and time.monotonic() - start < 1.0:
+            scheduler.step()
+        assert fired == ["First", "Second"]
+        assert time.monotonic() - start < 0.5
+        _interrupt([firstp, secondp])
+        scheduler.run()
+
+    def test_demultiplexed(self):
+        producer, inbox = generatequeues(lanes=True)
+        demux = Demultiplexer(inbox)
+        components = [CountingComponent(f"Component{i}", demux.add(i), 60, drainsize=1) for i in range(20)]
+        scheduler = MultiplexScheduler(components, demux=demux)
+        thread = threading.Thread(target=scheduler.run, daemon=True)
+        thread.start()
+        for i in range(20):
+            producer.routed(i).put(_message(Signal.TRIGGER, f"Hello{i}"))
+            producer.routed(i).put(_message(Signal.TRIGGER, f"Again{i}"))
+        producer.put(_message(Signal.TRIGGER, "Everybody"))
+        # Every component still gets its triggers, since the INTERRUPT is queued after them on its local queue
+        time.sleep(0.2)
+        _interrupt([producer])
+        thread.join(10)
+        assert not thread.is_alive()
+        assert [component.triggers for component in components] == \
+               [[f"Hello{i}", f"Again{i}", "Everybody"] for i in range(20)]
+        assert scheduler.failures == []
+        assert demux.addresses == ()
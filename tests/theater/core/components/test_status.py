@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+import time
+from datetime import datetime, timedelta
+
+from theater.core.components.abc import DelegatingMusician
+from theater.core.components.constants import MusicianState, IDLE_STATUS, MSGHANDLING_STATUS
+from theater.core.components.status import StatusTracker
+from theater.core.constants import Signal, MsgType
+from theater.core.messages import Message, generatequeues
+
+
+class SimpleDelegatingMusician(DelegatingMusician):
+    def _onpauseend(self, executor=None, *args, **kwargs):
+        pass
+
+
+class TestStatusTracker:
+    def test_transition(self):
+        tracker = StatusTracker()
+        assert tracker.state is MusicianState.IDLE
+        assert tracker.status() == IDLE_STATUS
+        tracker.transition(MusicianState.HANDLING)
+        assert tracker.status() == MSGHANDLING_STATUS
+        tracker.transition("Customized status")
+        assert tracker.status() == "Customized status"
+        assert [status for status, _ in tracker.history()] == [IDLE_STATUS, MSGHANDLING_STATUS, "Customized status"]
+
+    def test_samestate(self):
+        tracker = StatusTracker()
+        tracker.transition(MusicianState.HANDLING)
+        since = tracker.since
+        time.sleep(0.01)
+        tracker.transition(MusicianState.HANDLING)
+        assert tracker.since == since
+        assert len(tracker.history()) == 2
+
+    def test_boundedhistory(self):
+        tracker = StatusTracker(historysize=4)
+        for _ in range(10):
+            tracker.transition(MusicianState.HANDLING)
+            tracker.transition(MusicianState.IDLE)
+        history = tracker.history()
+        assert len(history) == 4
+        assert [status for status, _ in history] == [MSGHANDLING_STATUS, IDLE_STATUS] * 2
+        assert all(older <= newer for (_, older), (_, newer) in zip(history, history[1:]))
+
+    def test_statustime(self):
+        before = datetime.now()
+        tracker = StatusTracker()
+        time.sleep(0.01)
+        tracker.transition(MusicianState.HANDLING)
+        after = datetime.now()
+        assert before + timedelta(seconds=0.01) <= tracker.statustime() <= after + timedelta(milliseconds=1)
+
+
+class TestMusicianStatus:
+    def test_idlepollkeepsstatus(self):
+        producer, consumer = generatequeues()
+        conductorp, _ = generatequeues()
+        musician = SimpleDelegatingMusician("Musician", consumer, 1, conductorp)
+        musician._startscore()
+        try:
+            since = musician._statustracker.since
+            for _ in range(3):
+                musician._poll()
+                musician._endpause()
+            assert musician._statustracker.since == since
+            assert len(musician._statustracker.history()) == 1
+        finally:
+            musician._endscore()
+
+    def test_handlingtransitions(self):
+        producer, consumer = generatequeues()
+        conductorp, _ = generatequeues()
+        musician = SimpleDelegatingMusician("Musician", consumer, 1, conductorp)
+        musician._startscore()
+        try:
+            for _ in range(3):
+                producer.put(Message(sender="Conductor", signal=Signal.BEAT, type=MsgType.NONE, body=None))
+            time.sleep(0.1)
+            musician._poll()
+            assert musician._status == IDLE_STATUS
+            # The three messages were handled in a single burst
+            assert [status for status, _ in musician._statustracker.history()] == [IDLE_STATUS, MSGHANDLING_STATUS,
+                                                                                   IDLE_STATUS]
+        finally:
+            musician._endscore()
+
+    def test_detail(self):
+        _, consumer = generatequeues()
+        conductorp, _ = generatequeues()
+        musician = SimpleDelegatingMusician("Musician", consumer, 1, conductorp)
+        assert musician._statusdetail == f"Running since {musician._starttime}"
+        musician._status = "Customized status"
+        musician._statusdetail = "Doing something"
+        assert musician._status == "Customized status"
+        assert musician._statusdetail == "Doing something"
+        musician._resetstatus()
+        assert musician._status == IDLE_STATUS
+        assert musician._statusdetail == f"Running since {musician._starttime}"
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+import logging
+import multiprocessing
+import threading
+import time
+
+import pytest
+
+from theater.core.loggable.constants import LOGNAME, LOGLEVEL, LOGFILE, LOGFORMAT, LOGQUEUED, LOGQUEUE
+from theater.core.loggable.queued import LogListener, BatchFileHandler
+from theater.core.loggable.traits import Loggable
+
+_FORK = pytest.mark.skipif('fork' not in multiprocessing.get_all_start_methods(), reason="Requires fork")
+
+
+class Logger(Loggable):
+    __slots__ = ('__logger',)
+
+    @property
+    def _logger(self) -> logging.Logger:
+        return self.__logger
+
+    @_logger.setter
+    def _logger(self, new_logger: logging.Logger):
+        self.__logger = new_logger
+
+
+class Spy:
+    """Records the threads that turned it into a string"""
+
+    def __init__(self):
+        self.threads = []
+
+    def __str__(self):
+        self.threads.append(threading.current_thread().name)
+        return "Spy"
+
+
+def _logger(name: str, **logconf) -> Logger:
+    logger = Logger()
+    logger._initlogger(dict({LOGNAME: name, LOGLEVEL: 'INFO', LOGFORMAT: '%(message)s'}, **logconf))
+    return logger
+
+
+def _read(path, lines: int, timeout: float = 5.0) -> list:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        content = path.read_text().splitlines() if path.exists() else []
+        if len(content) >= lines:
+            return content
+        time.sleep(0.01)
+    return path.read_text().splitlines() if path.exists() else []
+
+
+def _childlog(logqueue):
+    _logger("test.shared.child", **{LOGQUEUE: logqueue})._info("From %s", "the child")
+
+
+def _forkedlog(logger: Logger):
+    logger._info("From %s", "a fork")
+
+
+class TestQueued:
+    def test_args(self, tmp_path):
+        logfile = tmp_path / 'plain.log'
+        logger = _logger("test.plain", **{LOGFILE: str(logfile)})
+        logger._info("%s and %d", "Lazy", 1)
+        logger._warn("No args")
+        assert logfile.read_text().splitlines() == ["Lazy and 1", "No args"]
+
+    def test_queued(self, tmp_path):
+        logfile = tmp_path / 'queued.log'
+        logger = _logger("test.queued", **{LOGFILE: str(logfile), LOGQUEUED: 'True'})
+        spy = Spy()
+        logger._info("Message %s", spy)
+        logger._debug("Discarded %s", spy)
+        assert _read(logfile, 1) == ["Message Spy"]
+        assert spy.threads == ['LogListener']
+
+    def test_sharedlistener(self, tmp_path):
+        logfile = tmp_path / 'shared.log'
+        handler = BatchFileHandler(str(logfile), 'a+', 'utf-8')
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        listener = LogListener(multiprocessing.Queue(), [handler])
+        listener.start()
+        try:
+            _logger("test.shared.parent", **{LOGQUEUE: listener.queue})._info("From %s", "the parent")
+            process = multiprocessing.Process(target=_childlog, args=(listener.queue,))
+            process.start()
+            process.join(5)
+            assert sorted(_read(logfile, 2)) == ["From the child", "From the parent"]
+        finally:
+            listener.stop(5)
+        assert not listener.running
+
+    @_FORK
+    def test_fork(self, tmp_path):
+        logfile = tmp_path / 'forked.log'
+        logger = _logger("test.forked", **{LOGFILE: str(logfile), LOGQUEUED: 'True'})
+        logger._info("From the parent")
+        process = multiprocessing.get_context('fork').Process(target=_forkedlog, args=(logger,))
+        process.start()
+        process.join(5)
+        assert sorted(_read(logfile, 2)) == ["From a fork", "From the parent"]
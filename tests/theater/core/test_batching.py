@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+import pickle
+import sys
+import time
+from queue import Empty
+
+import pytest
+
+from theater.core.batching import MessageBatcher
+from theater.core.components.abc import BaseComponent
+from theater.core.constants import Signal, MsgType, Transport
+from theater.core.errors import IllegalValueException
+from theater.core.messages import Message, MessageBatch, WireMessage, generatequeues, encodebatch, decodebatch
+from theater.core.timers import TimerWheel
+
+
+class RecordingComponent(BaseComponent):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.updates = []
+
+    def _handleupdate(self, msg: Message):
+        self.updates.append(msg.body)
+        return Signal.UPDATE
+
+    def _onpauseend(self, *args, **kwargs):
+        pass
+
+
+def _update(body: str) -> Message:
+    return Message(sender="Test", signal=Signal.UPDATE, type=MsgType.TEXT, body=body)
+
+
+def _drain(consumer) -> list:
+    out = []
+    while 1:
+        try:
+            out.append(consumer.get(True, 0.2))
+        except Empty:
+            return out
+
+
+class TestMessageBatch:
+    def test_empty(self):
+        with pytest.raises(IllegalValueException):
+            MessageBatch([])
+
+    def test_pickling(self):
+        batch = MessageBatch(_update(str(i)) for i in range(3))
+        assert pickle.loads(pickle.dumps(batch)) == batch
+        assert len(batch) == 3
+
+    def test_encoding(self):
+        batch = MessageBatch(_update(str(i)) for i in range(3))
+        decoded = decodebatch(encodebatch(batch))
+        assert all(isinstance(msg, WireMessage) for msg in decoded)
+        assert [msg.body for msg in decoded] == ['0', '1', '2']
+
+
+class TestUnpacking:
+    @pytest.mark.parametrize('encoded', (False, True))
+    def test_order(self, encoded: bool):
+        producer, consumer = generatequeues(encoded=encoded)
+        producer.put(MessageBatch(_update(str(i)) for i in range(3)))
+        producer.put(_update('3'))
+        producer.put(MessageBatch(_update(str(i)) for i in range(4, 6)))
+        assert [msg.body for msg in _drain(consumer)] == [str(i) for i in range(6)]
+
+    def test_lanes(self):
+        producer, consumer = generatequeues(lanes=True)
+        producer.put(MessageBatch(_update(str(i)) for i in range(3)))
+        time.sleep(0.1)
+        assert consumer.get(True, 1.0).body == '0'
+        assert consumer.qsize() == 2
+        producer.put(Message(sender="Test", signal=Signal.INTERRUPT, type=MsgType.NONE, body=None))
+        time.sleep(0.1)
+        # The control lane overtakes the rest of the batch
+        assert [msg.signal for msg in _drain(consumer)] == [Signal.INTERRUPT, Signal.UPDATE, Signal.UPDATE]
+
+    @pytest.mark.skipif(sys.version_info < (3, 8), reason="Requires shared memory")
+    def test_outofband(self):
+        producer, consumer = generatequeues(oobthreshold=8)
+        producer.put(MessageBatch([Message(sender="Test", signal=Signal.UPDATE, type=MsgType.BYTES, body=b'x' * 64),
+                                   _update('Small')]))
+        first, second = _drain(consumer)
+        assert bytes(first.body) == b'x' * 64
+        assert second.body == 'Small'
+
+    def test_handledonebyone(self):
+        producer, consumer = generatequeues()
+        component = RecordingComponent("Test", consumer, 1, drainsize=2)
+        producer.put(MessageBatch(_update(str(i)) for i in range(5)))
+        time.sleep(0.1)
+        component._poll()
+        assert component.updates == ['0', '1']
+        component._poll()
+        component._poll()
+        assert component.updates == [str(i) for i in range(5)]
+
+
+class TestMessageBatcher:
+    def test_wrongsize(self):
+        producer, _ = generatequeues()
+        with pytest.raises(IllegalValueException):
+            MessageBatcher(producer, maxsize=0)
+        with pytest.raises(TypeError):
+            MessageBatcher("Queue")
+
+    def test_fullbatch(self):
+        producer, consumer = generatequeues()
+        batcher = MessageBatcher(producer, maxsize=4, maxdelay=60)
+        for i in range(10):
+            batcher.send(_update(str(i)))
+        assert batcher.pending == 2
+        assert batcher.batches == 2
+        assert batcher.flush() == 2
+        assert [msg.body for msg in _drain(consumer)] == [str(i) for i in range(10)]
+        assert batcher.batches == 3
+
+    def test_single(self):
+        producer, consumer = generatequeues()
+        batcher = MessageBatcher(producer, maxdelay=60)
+        batcher.send(_update('Alone'))
+        batcher.flush()
+        assert batcher.batches == 0
+        assert consumer.get(True, 1.0) == _update('Alone')
+
+    def test_delay(self):
+        producer, consumer = generatequeues()
+        batcher = MessageBatcher(producer, maxdelay=0.02)
+        batcher.send(_update('0'))
+        time.sleep(0.03)
+        batcher.send(_update('1'))
+        assert batcher.pending == 0
+        assert [msg.body for msg in _drain(consumer)] == ['0', '1']
+
+    def test_timer(self):
+        producer, consumer = generatequeues()
+        wheel = TimerWheel()
+        batcher = MessageBatcher(producer, maxdelay=0.02, timers=wheel)
+        batcher.send(_update('0'))
+        batcher.send(_update('1'))
+        assert wheel.pending == 1
+        time.sleep(0.03)
+        wheel.advance()
+        assert batcher.pending == 0
+        assert wheel.pending == 0
+        assert [msg.body for msg in _drain(consumer)] == ['0', '1']
+
+    def test_control(self):
+        producer, consumer = generatequeues()
+        batcher = MessageBatcher(producer, maxdelay=60)
+        batcher.send(_update('0'))
+        batcher.send(Message(sender="Test", signal=Signal.INTERRUPT, type=MsgType.NONE, body=None))
+        assert batcher.pending == 0
+        assert [msg.signal for msg in _drain(consumer)] == [Signal.UPDATE, Signal.INTERRUPT]
+
+    @pytest.mark.skipif(sys.version_info < (3, 8), reason="Requires shared memory")
+    def test_sharedmemory(self):
+        producer, consumer = generatequeues(encoded=True, transport=Transport.SHAREDMEMORY, size=1 << 16)
+        batcher = MessageBatcher(producer, maxsize=8, maxdelay=60)
+        for i in range(20):
+            batcher.send(_update(str(i)))
+        batcher.flush()
+        assert [msg.body for msg in _drain(consumer)] == [str(i) for i in range(20)]
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import time
+
+import pytest
+
+from theater.core.constants import Signal, MsgType, CORRELATION_KEY
+from theater.core.correlation import Correlator
+from theater.core.messages import Message, generatequeues
+
+
+def _request() -> Message:
+    return Message(sender="Conductor", signal=Signal.TRIGGER, type=MsgType.TEXT, body="Hello")
+
+
+def _reply(request: Message, body: str = "World") -> Message:
+    return Message(sender="Musician", signal=Signal.TRIGGER, type=MsgType.TEXT, body=body,
+                   extension={CORRELATION_KEY: request.extension[CORRELATION_KEY]})
+
+
+class TestCorrelator:
+    def test_ask(self):
+        correlator = Correlator()
+        producer, consumer = generatequeues()
+        first = correlator.ask(producer, _request())
+        second = correlator.ask(producer, _request())
+        firstrequest, secondrequest = consumer.get(True, 1.0), consumer.get(True, 1.0)
+        assert firstrequest.extension[CORRELATION_KEY] != secondrequest.extension[CORRELATION_KEY]
+        assert correlator.pending == 2
+        assert correlator.dispatch(_reply(secondrequest, "Second"))
+        assert second.result(0).body == "Second"
+        assert not first.done()
+        assert correlator.dispatch(_reply(firstrequest, "First"))
+        assert first.result(0).body == "First"
+        assert correlator.pending == 0
+
+    def test_notareply(self):
+        correlator = Correlator()
+        assert not correlator.dispatch(_request())
+        assert not correlator.dispatch(Message(sender="Musician", signal=Signal.TRIGGER, type=MsgType.NONE,
+                                               body=None, extension={CORRELATION_KEY: 42}))
+
+    def test_expire(self):
+        correlator = Correlator()
+        producer, consumer = generatequeues()
+        future = correlator.ask(producer, _request(), timeout=0.05)
+        lasting = correlator.ask(producer, _request(), timeout=None)
+        request = consumer.get(True, 1.0)
+        assert correlator.expire() == 0
+        time.sleep(0.06)
+        assert correlator.nextdeadline <= time.monotonic()
+        assert correlator.expire() == 1
+        with pytest.raises(TimeoutError):
+            future.result(0)
+        assert not lasting.done()
+        # The late reply is swallowed
+        assert correlator.dispatch(_reply(request))
+        assert correlator.late == 1
+
+    def test_failedput(self):
+        correlator = Correlator()
+        producer, consumer = generatequeues(maxsize=1)
+        correlator.ask(producer, _request())
+        time.sleep(0.1)
+        with pytest.raises(Exception):
+            correlator.ask(producer, _request())
+        assert correlator.pending == 1
+        producer.cancel_join_thread()
+
+    def test_awaitable(self):
+        correlator = Correlator()
+        producer, consumer = generatequeues()
+        future = correlator.ask(producer, _request())
+
+        async def _await():
+            loop = asyncio.get_running_loop()
+            loop.call_soon(correlator.dispatch, _reply(consumer.get(True, 1.0)))
+            return await asyncio.wrap_future(future)
+
+        assert asyncio.run(_await()).body == "World"
+
+    def test_failall(self):
+        correlator = Correlator()
+        producer, _ = generatequeues()
+        future = correlator.ask(producer, _request(), timeout=10)
+        correlator.failall(RuntimeError("End"))
+        with pytest.raises(RuntimeError):
+            future.result(0)
+        assert correlator.nextdeadline is None
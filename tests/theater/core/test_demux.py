@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+import copy
+import threading
+import time
+from queue import Empty, Full
+
+import pytest
+
+from theater.core.constants import Signal, MsgType, DESTINATION_KEY, DEMUX_DRAINSIZE
+from theater.core.demux import Demultiplexer
+from theater.core.errors import IllegalValueException
+from theater.core.messages import Message, MessageBatch, SharedMessage, generatequeues
+
+
+def _message(signal: Signal, body=None) -> Message:
+    return Message(sender="Conductor", signal=signal, type=MsgType.TEXT if body else MsgType.NONE, body=body)
+
+
+def _drain(consumer) -> list:
+    out = []
+    while 1:
+        try:
+            out.append(consumer.get_nowait())
+        except Empty:
+            return out
+
+
+def _dispatch(demux: Demultiplexer, timeout: float = 1.0):
+    """Dispatches till the shared inbox is empty, the first time waiting for the feeder thread of the pipe"""
+    fed = demux.dispatch(timeout)
+    more = demux.dispatch()
+    while more:
+        fed.extend(more)
+        more = demux.dispatch()
+    return fed
+
+
+class TestRoutedQueue:
+    @pytest.mark.parametrize('encoded', (False, True))
+    def test_stamped(self, encoded: bool):
+        producer, consumer = generatequeues(encoded=encoded)
+        routed = producer.routed(3)
+        assert routed.destination == 3 and producer.destination is None
+        routed.put(_message(Signal.TRIGGER, "Put"))
+        routed.put_nowait(Message(sender="Conductor", signal=Signal.TRIGGER, type=MsgType.TEXT, body="Extended",
+                                  extension={'key': 'value'}))
+        routed.put(MessageBatch(_message(Signal.TRIGGER, f"Batch{i}") for i in range(2)))
+        routed.putshared(SharedMessage(_message(Signal.TRIGGER, "Shared")))
+        producer.put(_message(Signal.TRIGGER, "Plain"))
+        received = [consumer.get(True, 1.0) for _ in range(6)]
+        assert [msg.body for msg in received] == ["Put", "Extended", "Batch0", "Batch1", "Shared", "Plain"]
+        assert [msg.extension.get(DESTINATION_KEY) for msg in received] == [3, 3, 3, 3, 3, None]
+        assert received[1].extension['key'] == 'value'
+
+    def test_wronguse(self):
+        producer, _ = generatequeues()
+        with pytest.raises(IllegalValueException):
+            producer.routed(-1)
+        with pytest.raises(IllegalValueException):
+            producer.routed("First")
+        with pytest.raises(IllegalValueException):
+            producer.routed(1).put("Not a message")
+
+    def test_pickling(self):
+        producer, consumer = generatequeues()
+        # A copy goes through the same state as a pickle, without the inheritance check of the pipe
+        routed = copy.copy(producer.routed(5))
+        assert routed.destination == 5
+        routed.put(_message(Signal.TRIGGER, "Pickled"))
+        assert consumer.get(True, 1.0).extension[DESTINATION_KEY] == 5
+
+
+class TestDemultiplexer:
+    def test_routing(self):
+        producer, inbox = generatequeues()
+        demux = Demultiplexer(inbox)
+        first, second = demux.add(1), demux.add(2)
+        assert demux.addresses == (1, 2)
+        producer.routed(2).put(_message(Signal.TRIGGER, "Second"))
+        producer.routed(1).put(_message(Signal.TRIGGER, "First"))
+        producer.routed(7).put(_message(Signal.TRIGGER, "Nobody"))
+        producer.put(_message(Signal.TRIGGER, "Everybody"))
+        time.sleep(0.1)
+        fed = _dispatch(demux)
+        assert {id(consumer) for consumer in fed} == {id(first), id(second)}
+        assert [msg.body for msg in _drain(first)] == ["First", "Everybody"]
+        assert [msg.body for msg in _drain(second)] == ["Second", "Everybody"]
+        assert demux.dropped == 1
+        with pytest.raises(IllegalValueException):
+            demux.add(1)
+        with pytest.raises(TypeError):
+            Demultiplexer(producer)
+
+    def test_multicast(self):
+        producer, inbox = generatequeues()
+        demux = Demultiplexer(inbox)
+        first, second, third = demux.add(1), demux.add(2), demux.add(3)
+        producer.multicast((1, 3, 9)).put(_message(Signal.TRIGGER, "Some"))
+        time.sleep(0.1)
+        _dispatch(demux)
+        assert [msg.body for msg in _drain(first)] == ["Some"]
+        assert [msg.body for msg in _drain(third)] == ["Some"]
+        assert _drain(second) == []
+        assert demux.dropped == 1
+        with pytest.raises(IllegalValueException):
+            producer.multicast(())
+
+    def test_remove(self):
+        producer, inbox = generatequeues()
+        demux = Demultiplexer(inbox)
+        first = demux.add(1)
+        assert demux.owns(first)
+        assert demux.remove(first)
+        assert not demux.owns(first) and not demux.remove(first)
+        producer.routed(1).put(_message(Signal.TRIGGER, "Late"))
+        assert _dispatch(demux) == []
+        assert demux.dropped == 1
+
+    def test_controllane(self):
+        producer, inbox = generatequeues(lanes=True)
+        demux = Demultiplexer(inbox)
+        consumer = demux.add(1)
+        routed = producer.routed(1)
+        routed.put(_message(Signal.TRIGGER, "Data"))
+        time.sleep(0.1)
+        _dispatch(demux)
+        routed.put(_message(Signal.INTERRUPT))
+        _dispatch(demux)
+        assert [msg.signal for msg in _drain(consumer)] == [Signal.INTERRUPT, Signal.TRIGGER]
+
+    def test_drainsize(self):
+        producer, inbox = generatequeues()
+        demux = Demultiplexer(inbox, queuesize=0)
+        consumer = demux.add(1)
+        routed = producer.routed(1)
+        routed.put(MessageBatch(_message(Signal.TRIGGER, str(i)) for i in range(DEMUX_DRAINSIZE + 1)))
+        demux.dispatch(1.0)
+        assert consumer.qsize() == DEMUX_DRAINSIZE
+        demux.dispatch()
+        assert [msg.body for msg in _drain(consumer)] == [str(i) for i in range(DEMUX_DRAINSIZE + 1)]
+
+    def test_backpressure(self):
+        producer, inbox = generatequeues(maxsize=8)
+        demux = Demultiplexer(inbox, queuesize=4)
+        stuck, other = demux.add(1), demux.add(2)
+        dispatcher = threading.Thread(target=demux.run, daemon=True)
+        dispatcher.start()
+        routed = producer.routed(1)
+        sent = 0
+        with pytest.raises(Full):
+            # The musician of address 1 never polls: the shared inbox has to fill up
+            while sent < 100:
+                routed.put(_message(Signal.TRIGGER, str(sent)), True, 0.5)
+                sent += 1
+        assert demux.stalled
+        assert stuck.qsize() == 4
+        assert sent <= 4 + 1 + 8
+        assert producer.credits == 0
+        # Once the musician reads its queue, the held message and the shared inbox follow
+        assert [stuck.get(True, 1.0).body for _ in range(sent)] == [str(i) for i in range(sent)]
+        producer.routed(2).put(_message(Signal.TRIGGER, "Other"))
+        assert other.get(True, 1.0).body == "Other"
+        demux.close()
+        dispatcher.join()
+
+    def test_heldbroadcast(self):
+        producer, inbox = generatequeues()
+        demux = Demultiplexer(inbox, queuesize=1)
+        first, second = demux.add(1), demux.add(2)
+        producer.routed(2).put(_message(Signal.TRIGGER, "Second"))
+        producer.put(_message(Signal.TRIGGER, "Everybody"))
+        time.sleep(0.1)
+        _dispatch(demux)
+        assert demux.stalled
+        assert [msg.body for msg in _drain(first)] == ["Everybody"]
+        assert [msg.body for msg in _drain(second)] == ["Second"]
+        _dispatch(demux)
+        assert not demux.stalled
+        assert [msg.body for msg in _drain(second)] == ["Everybody"]
@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+import os
+import pickle
+import struct
+import time
+from queue import Empty
+
+import pytest
+
+from theater.core.components.abc import BaseComponent
+from theater.core.constants import Signal, MsgType
+from theater.core.errors import IllegalActionException, IllegalValueException
+from theater.core.journal import Journal
+from theater.core.messages import Message, MessageBatch, generatequeues
+
+
+class RecordingComponent(BaseComponent):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.updates = []
+
+    def _handleupdate(self, msg: Message):
+        self.updates.append(msg.body)
+        return Signal.UPDATE
+
+    def _onpauseend(self, *args, **kwargs):
+        pass
+
+
+def _update(body: str) -> Message:
+    return Message(sender="Test", signal=Signal.UPDATE, type=MsgType.TEXT, body=body)
+
+
+def _drain(consumer) -> list:
+    out = []
+    while 1:
+        try:
+            out.append(consumer.get(True, 0.2))
+        except Empty:
+            return out
+
+
+@pytest.fixture
+def journal(tmp_path):
+    out = Journal(str(tmp_path / 'journal'), segmentsize=1 << 12)
+    yield out
+    out.close()
+
+
+class TestJournal:
+    def test_appendread(self, journal):
+        assert [journal.append(item) for item in (b'Raw', {'key': 'value'}, _update('Message'))] == [0, 1, 2]
+        assert list(journal.read(0)) == [(0, b'Raw'), (1, {'key': 'value'}), (2, _update('Message'))]
+        assert [sequence for sequence, _ in journal.read(2)] == [2]
+        assert journal.end == 3
+
+    def test_reopen(self, tmp_path):
+        directory = str(tmp_path / 'journal')
+        journal = Journal(directory)
+        for i in range(3):
+            journal.append(f"Test{i}")
+        journal.close()
+        with pytest.raises(IllegalActionException):
+            journal.append("Closed")
+        # A record torn by a process that died while appending it
+        segment = os.path.join(directory, os.listdir(directory)[0])
+        with open(segment, 'r+b') as file:
+            file.seek(sum(8 + len(pickle.dumps(f"Test{i}", pickle.HIGHEST_PROTOCOL)) for i in range(3)))
+            file.write(struct.pack('<II', 10, 0) + b'Torn')
+        journal = Journal(directory)
+        try:
+            assert journal.end == 3
+            assert journal.append("Test3") == 3
+            assert [item for _, item in journal.read(0)] == [f"Test{i}" for i in range(4)]
+        finally:
+            journal.close()
+
+    def test_staletail(self, tmp_path):
+        directory = str(tmp_path / 'journal')
+        journal = Journal(directory)
+        for item in (b'a' * 10, b'b' * 10, b'c' * 10):
+            journal.append(item)
+        journal.close()
+        # The second record is torn: the third one is still valid, 18 bytes after its start
+        segment = os.path.join(directory, os.listdir(directory)[0])
+        with open(segment, 'r+b') as file:
+            file.seek(18 + 8)
+            file.write(b'x')
+        journal = Journal(directory)
+        try:
+            assert journal.end == 1
+            # The new record ends exactly where the stale third one starts
+            journal.append(b'd' * 10)
+        finally:
+            journal.close()
+        journal = Journal(directory)
+        try:
+            assert [item for _, item in journal.read(0)] == [b'a' * 10, b'd' * 10]
+        finally:
+            journal.close()
+
+    def test_rotation(self, journal):
+        for i in range(200):
+            journal.append(b'x' * 100)
+        assert journal.segments > 1
+        assert len(os.listdir(journal.directory)) == journal.segments
+        assert [sequence for sequence, _ in journal.read(150)] == list(range(150, 200))
+        with pytest.raises(IllegalValueException):
+            journal.append(b'x' * (1 << 12))
+
+    def test_groupcommit(self, tmp_path):
+        journal = Journal(str(tmp_path / 'journal'), syncinterval=None)
+        try:
+            for i in range(100):
+                journal.append(i)
+            assert journal.durable == 0
+            assert journal.sync(5.0)
+            assert journal.durable == 100
+            assert journal.syncs == 1
+            assert journal.sync(5.0)
+            assert journal.syncs == 1
+        finally:
+            journal.close()
+
+    def test_cursor(self, journal):
+        for i in range(5):
+            journal.append(i)
+        cursor = journal.cursor('reader')
+        assert cursor.offset == 0
+        cursor.advance(3)
+        assert journal.committed('reader') == 0
+        cursor.commit()
+        assert journal.committed('reader') == 3
+        cursor = pickle.loads(pickle.dumps(cursor))
+        cursor.advance()
+        cursor.commit()
+        cursor.close()
+        assert journal.cursor('reader').offset == 4
+        with pytest.raises(IllegalValueException):
+            journal.cursor('../reader')
+
+    def test_trim(self, journal):
+        for i in range(200):
+            journal.append(b'x' * 100)
+        segments = journal.segments
+        assert journal.trim() == 0
+        cursor = journal.cursor('reader')
+        cursor.advance(150)
+        cursor.commit()
+        assert journal.trim() > 0
+        assert journal.segments < segments
+        assert journal.start <= 150
+        assert [sequence for sequence, _ in journal.read(150)] == list(range(150, 200))
+        with pytest.raises(IllegalValueException):
+            list(journal.read(0))
+
+    def test_pickling(self, journal):
+        with pytest.raises(IllegalActionException):
+            pickle.dumps(journal)
+
+
+class TestJournaledQueues:
+    @pytest.mark.parametrize('encoded', (False, True))
+    def test_replay(self, tmp_path, encoded: bool):
+        directory = str(tmp_path / 'journal')
+        journal = Journal(directory)
+        producer, consumer = generatequeues(encoded=encoded, journal=journal)
+        for i in range(5):
+            producer.put(_update(str(i)))
+        producer.put(Message(sender="Test", signal=Signal.INTERRUPT, type=MsgType.NONE, body=None))
+        assert journal.end == 5
+        assert [consumer.get(True, 1.0).body for _ in range(2)] == ['0', '1']
+        consumer.acknowledge()
+        consumer.get(True, 1.0)
+        journal.close()
+        # The consumer died before acknowledging the third message
+        journal = Journal(directory)
+        try:
+            producer, consumer = generatequeues(encoded=encoded, journal=journal)
+            producer.put(_update('5'))
+            assert [msg.body for msg in _drain(consumer)] == ['2', '3', '4', '5']
+        finally:
+            journal.close()
+
+    def test_replaybeyondmaxsize(self, tmp_path):
+        directory = str(tmp_path / 'journal')
+        journal = Journal(directory)
+        producer, consumer = generatequeues(maxsize=5, journal=journal)
+        for i in range(5):
+            producer.put(_update(str(i)))
+        assert [consumer.get(True, 1.0).body for _ in range(5)] == [str(i) for i in range(5)]
+        for i in range(5, 10):
+            producer.put(_update(str(i)))
+        journal.close()
+        # The consumer died holding 10 items it didn't acknowledge, twice the maxsize of the transport
+        journal = Journal(directory)
+        try:
+            producer, consumer = generatequeues(maxsize=5, journal=journal)
+            assert consumer.qsize() == 10 and consumer.waitables is None
+            producer.put(_update('10'), True, 1.0)
+            assert [msg.body for msg in _drain(consumer)] == [str(i) for i in range(11)]
+            assert consumer.cursor.offset == 11
+        finally:
+            journal.close()
+
+    def test_batches(self, journal):
+        producer, consumer = generatequeues(journal=journal)
+        producer.put(MessageBatch(_update(str(i)) for i in range(3)))
+        producer.put(_update('3'))
+        consumer.get(True, 1.0)
+        consumer.get(True, 1.0)
+        assert consumer.cursor.offset == 0
+        consumer.get(True, 1.0)
+        assert consumer.cursor.offset == 1
+        consumer.get(True, 1.0)
+        assert consumer.cursor.offset == 2
+
+    def test_nooutofband(self, journal):
+        with pytest.raises(IllegalValueException):
+            generatequeues(oobthreshold=8, journal=journal)
+        producer, _ = generatequeues(journal=journal)
+        with pytest.raises(IllegalActionException):
+            pickle.dumps(producer)
+
+    def test_acknowledgedpoll(self, journal):
+        producer, consumer = generatequeues(journal=journal, journalname='component')
+        component = RecordingComponent("Test", consumer, 1, drainsize=2)
+        for i in range(3):
+            producer.put(_update(str(i)))
+        time.sleep(0.1)
+        component._poll()
+        assert component.updates == ['0', '1']
+        assert journal.committed('component') == 2
+        component._poll()
+        assert journal.committed('component') == 3
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+import enum
+import pickle
+from datetime import datetime, timezone, timedelta
+
+import pytest
+
+from theater.core.constants import Signal, MsgType
+from theater.core.errors import IllegalValueException
+from theater.core.messages import Message, Status, WireMessage, encodemessage, decodemessage, encodestatus, \
+    decodestatus, generatequeues
+
+
+class CustomSignal(enum.Enum):
+    RELOAD = 'RELOAD'
+
+
+def _roundtrip(msg: Message) -> WireMessage:
+    return decodemessage(encodemessage(msg))
+
+
+class TestMessage:
+    def test_msgtypenone(self):
+        rick = Message(sender="Test", type=MsgType.NONE, signal=Signal.BEAT, body=None)
+        wirerick = _roundtrip(rick)
+
+        assert wirerick == rick
+        assert wirerick.sender == "Test"
+        assert wirerick.type == MsgType.NONE
+        assert wirerick.signal == Signal.BEAT
+        assert wirerick.body is None
+
+    def test_msgtypetext(self):
+        rick = Message(sender="Tèst", type=MsgType.TEXT, signal=Signal.TRIGGER, body="Test bödy")
+        wirerick = _roundtrip(rick)
+
+        assert wirerick == rick
+        assert wirerick.sender == "Tèst"
+        assert wirerick.body == "Test bödy"
+
+    def test_msgtypestatus(self):
+        dtnow = datetime.now()
+        statusbody = Status(reqtime=dtnow, status="Test", time=dtnow, statustime=None, statusmessage="Test status")
+        rick = Message(sender="Test", type=MsgType.STATUS, signal=Signal.BEAT, body=statusbody)
+        wirerick = _roundtrip(rick)
+
+        assert wirerick == rick
+        assert wirerick.body == statusbody
+
+    def test_msgtypebytes(self):
+        rick = Message(sender="Test", type=MsgType.BYTES, signal=Signal.KILL, body=b'Test message')
+        wirerick = _roundtrip(rick)
+
+        assert wirerick == rick
+        assert wirerick.body == b'Test message'
+
+    def test_msgtypemap(self):
+        rick = Message(sender="Test", type=MsgType.MAP, signal=Signal.UPDATE, body={"Test": "Map"})
+        wirerick = _roundtrip(rick)
+
+        assert wirerick == rick
+        assert wirerick.body == {"Test": "Map"}
+
+    def test_extension(self):
+        rick = Message(sender="Test", type=MsgType.TEXT, signal=Signal.CREATE, extension={"id": 42}, body="Test")
+        wirerick = _roundtrip(rick)
+
+        assert wirerick.extension == {"id": 42}
+        assert wirerick.body == "Test"
+        assert wirerick.tomessage() == rick
+
+    def test_customsignal(self):
+        rick = Message(sender=42, type=MsgType.TEXT, signal=CustomSignal.RELOAD, extension={"id": 42}, body="Test")
+        wirerick = _roundtrip(rick)
+
+        assert wirerick.signal is CustomSignal.RELOAD
+        assert wirerick.sender == 42
+        assert wirerick.extension == {"id": 42}
+        assert wirerick.tomessage() == rick
+
+    def test_lazy(self):
+        rick = Message(sender="Test", type=MsgType.MAP, signal=Signal.UPDATE, body={"Test": "Map"})
+        wirerick = _roundtrip(rick)
+
+        assert wirerick.signal is Signal.UPDATE
+        assert wirerick._WireMessage__body is ...
+        assert wirerick.body is wirerick.body
+
+    def test_wiresize(self):
+        dtnow = datetime.now()
+        statusbody = Status(reqtime=dtnow, status="Running", time=dtnow, statustime=dtnow, statusmessage=None)
+        rick = Message(sender="Musician", type=MsgType.STATUS, signal=Signal.BEAT, body=statusbody)
+
+        assert len(encodemessage(rick)) < len(pickle.dumps(rick, pickle.HIGHEST_PROTOCOL)) / 4
+
+    def test_wrongversion(self):
+        frame = bytearray(encodemessage(Message(sender="Test", type=MsgType.NONE, signal=Signal.BEAT, body=None)))
+        frame[0] = 255
+        with pytest.raises(IllegalValueException):
+            _ = decodemessage(bytes(frame))
+
+
+class TestStatus:
+    def test_fullstatus(self):
+        nowdt = datetime.now()
+        rick = Status(reqtime=nowdt, status="Test", statusmessage="Test", time=nowdt, statustime=nowdt)
+        assert decodestatus(encodestatus(rick)) == rick
+
+    def test_nonestatus(self):
+        rick = Status(reqtime=None, status=None, statusmessage=None, time=None, statustime=None)
+        assert decodestatus(encodestatus(rick)) == rick
+
+    def test_awarestatus(self):
+        awaredt = datetime.now(timezone(timedelta(hours=2)))
+        rick = Status(reqtime=awaredt, status=None, statusmessage=None, time=datetime(1900, 1, 1), statustime=None)
+        wirerick = decodestatus(encodestatus(rick))
+        assert wirerick == rick
+        assert wirerick.reqtime.tzinfo is timezone.utc
+
+
+class TestEncodedQueues:
+    def test_production(self):
+        producer, consumer = generatequeues(encoded=True)
+        rick = Message(sender="Test", type=MsgType.TEXT, signal=Signal.TRIGGER, body="Hello")
+        producer.put_nowait(rick)
+        wirerick = consumer.get(True, 1.0)
+        assert isinstance(wirerick, WireMessage)
+        assert wirerick == rick
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+import multiprocessing
+import sys
+import threading
+import time
+from queue import Empty
+
+import pytest
+
+from theater.core.components.abc import BaseComponent
+from theater.core.constants import Signal, MsgType, Transport
+from theater.core.messages import Message, generatequeues
+
+_TRANSPORTS = [Transport.PIPE,
+               pytest.param(Transport.SHAREDMEMORY,
+                            marks=pytest.mark.skipif(sys.version_info < (3, 8), reason="Requires shared memory"))]
+
+
+class CountingComponent(BaseComponent):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.triggers = 0
+
+    def _handletrigger(self, msg: Message):
+        self.triggers += 1
+        return Signal.TRIGGER
+
+    def _onpauseend(self, *args, **kwargs):
+        pass
+
+
+def _message(signal: Signal, body: str = None) -> Message:
+    return Message(sender="Test", signal=signal, type=MsgType.TEXT if body else MsgType.NONE, body=body)
+
+
+def _drain(consumer, count: int) -> list:
+    return [consumer.get(True, 5) for _ in range(count)]
+
+
+def _produce(producer):
+    producer.put(_message(Signal.TRIGGER, "Data"))
+    producer.put(_message(Signal.KILL))
+
+
+class TestLanes:
+    def test_nolanes(self):
+        producer, consumer = generatequeues()
+        assert not producer.lanes and not consumer.lanes
+        assert len(consumer.waitables) == 1
+
+    @pytest.mark.parametrize('transport', _TRANSPORTS)
+    def test_overtake(self, transport):
+        producer, consumer = generatequeues(transport=transport, lanes=True)
+        for i in range(100):
+            producer.put(_message(Signal.TRIGGER, str(i)))
+        producer.put(_message(Signal.INTERRUPT))
+        producer.put(_message(Signal.BEAT))
+        time.sleep(0.1)
+        assert consumer.qsize() == 102
+        received = _drain(consumer, 102)
+        assert [msg.signal for msg in received[:2]] == [Signal.INTERRUPT, Signal.BEAT]
+        assert [msg.body for msg in received[2:]] == [str(i) for i in range(100)]
+        assert consumer.empty()
+        with pytest.raises(Empty):
+            consumer.get_nowait()
+
+    def test_otherobjects(self):
+        producer, consumer = generatequeues(lanes=True)
+        producer.put("Not a message")
+        assert consumer.get(True, 5) == "Not a message"
+
+    def test_encoded(self):
+        producer, consumer = generatequeues(encoded=True, lanes=True)
+        producer.put(_message(Signal.UPDATE, "Data"))
+        producer.put(_message(Signal.KILL))
+        time.sleep(0.1)
+        assert [msg.signal for msg in _drain(consumer, 2)] == [Signal.KILL, Signal.UPDATE]
+
+    @pytest.mark.parametrize('transport', _TRANSPORTS)
+    def test_blockingget(self, transport):
+        producer, consumer = generatequeues(transport=transport, lanes=True)
+        timer = threading.Timer(0.1, producer.put, (_message(Signal.INTERRUPT),))
+        timer.start()
+        assert consumer.get(True, 5).signal is Signal.INTERRUPT
+        with pytest.raises(Empty):
+            consumer.get(True, 0.05)
+
+    @pytest.mark.skipif('fork' not in multiprocessing.get_all_start_methods(), reason="Requires fork")
+    def test_otherprocess(self):
+        producer, consumer = generatequeues(lanes=True)
+        process = multiprocessing.get_context('fork').Process(target=_produce, args=(producer,))
+        process.start()
+        process.join(5)
+        time.sleep(0.1)
+        assert [msg.signal for msg in _drain(consumer, 2)] == [Signal.KILL, Signal.TRIGGER]
+
+    @pytest.mark.parametrize('transport', _TRANSPORTS)
+    def test_backloggedcomponent(self, transport):
+        producer, consumer = generatequeues(transport=transport, lanes=True, **(
+            {'size': 1 << 20} if transport is Transport.SHAREDMEMORY else {}))
+        component = CountingComponent("Component", consumer, 1)
+        for _ in range(1000):
+            producer.put(_message(Signal.TRIGGER, "Backlog"))
+        producer.put(_message(Signal.INTERRUPT))
+        time.sleep(0.1)
+        assert component._poll(1) is Signal.INTERRUPT
+        assert component.triggers == 0
+        # The backlog is left in the pipe: the feeder thread must not wait for it to be read
+        producer.cancel_join_thread()
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+import gc
+import multiprocessing
+import sys
+from queue import Full
+
+import pytest
+
+from theater.core.constants import Signal, MsgType, Transport
+from theater.core.messages import Message, MessageBatch, generatequeues
+from theater.core.transport import shm
+from theater.core.transport.shm import exportbytes, importbytes, releasebytes
+
+_PAYLOAD = bytes(range(256)) * 4096
+
+
+def _bytesmessage(body) -> Message:
+    return Message(sender="Test", signal=Signal.TRIGGER, type=MsgType.BYTES, body=body)
+
+
+def _produce(producer):
+    producer.put(_bytesmessage(_PAYLOAD))
+
+
+@pytest.mark.skipif(sys.version_info < (3, 8), reason="Requires shared memory")
+class TestSegments:
+    def test_roundtrip(self):
+        view = importbytes(exportbytes(b'Test segment'), 12)
+        assert isinstance(view, memoryview)
+        assert view == b'Test segment'
+
+    def test_lifetime(self):
+        view = importbytes(exportbytes(_PAYLOAD), len(_PAYLOAD))
+        sliced = view[1024:2048]
+        del view
+        gc.collect()
+        assert sliced == _PAYLOAD[1024:2048]
+
+    def test_consumedonce(self):
+        name = exportbytes(b'Test')
+        _ = importbytes(name, 4)
+        with pytest.raises(FileNotFoundError):
+            _ = importbytes(name, 4)
+
+    def test_released(self):
+        name = exportbytes(b'Test')
+        releasebytes(name)
+        releasebytes(name)
+        with pytest.raises(FileNotFoundError):
+            _ = importbytes(name, 4)
+
+
+class TestOutOfBandQueues:
+    @pytest.mark.skipif(sys.version_info < (3, 8), reason="Requires shared memory")
+    @pytest.mark.parametrize('encoded', [False, True])
+    def test_threshold(self, encoded):
+        producer, consumer = generatequeues(encoded=encoded, oobthreshold=1024)
+        producer.put_nowait(_bytesmessage(b'Small'))
+        producer.put_nowait(_bytesmessage(_PAYLOAD))
+        small = consumer.get(True, 1.0)
+        large = consumer.get(True, 1.0)
+        assert isinstance(small.body, bytes)
+        assert small.body == b'Small'
+        assert isinstance(large.body, memoryview)
+        assert large.body == _PAYLOAD
+        assert large.signal is Signal.TRIGGER
+
+    def test_disabled(self):
+        producer, consumer = generatequeues()
+        producer.put_nowait(_bytesmessage(_PAYLOAD))
+        assert isinstance(consumer.get(True, 1.0).body, bytes)
+
+    @pytest.mark.skipif(sys.version_info < (3, 8), reason="Requires shared memory")
+    @pytest.mark.skipif('fork' not in multiprocessing.get_all_start_methods(), reason="Requires fork")
+    @pytest.mark.parametrize('transport', [Transport.PIPE, Transport.SHAREDMEMORY])
+    def test_crossprocess(self, transport):
+        producer, consumer = generatequeues(transport=transport, oobthreshold=1024)
+        process = multiprocessing.get_context('fork').Process(target=_produce, args=(producer,))
+        process.start()
+        msg = consumer.get(True, 5.0)
+        process.join()
+        assert msg.body == _PAYLOAD
+
+    @pytest.mark.skipif(sys.version_info < (3, 8), reason="Requires shared memory")
+    @pytest.mark.parametrize('encoded', [False, True])
+    @pytest.mark.parametrize('batched', [False, True])
+    def test_notqueued(self, monkeypatch, encoded, batched):
+        exported = []
+
+        def recordingexport(data) -> str:
+            exported.append(exportbytes(data))
+            return exported[-1]
+
+        monkeypatch.setattr(shm, 'exportbytes', recordingexport)
+        monkeypatch.setattr('theater.core.messages.exportbytes', recordingexport)
+        producer, consumer = generatequeues(encoded=encoded, oobthreshold=1024, maxsize=1)
+        producer.put_nowait(_bytesmessage(b'Small'))
+        msg = _bytesmessage(_PAYLOAD)
+        with pytest.raises(Full):
+            producer.put_nowait(MessageBatch([msg, msg]) if batched else msg)
+        assert len(exported) == (2 if batched else 1)
+        for name in exported:
+            with pytest.raises(FileNotFoundError):
+                _ = importbytes(name, len(_PAYLOAD))
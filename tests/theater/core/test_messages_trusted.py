@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+import pickle
+from datetime import datetime
+
+import pytest
+
+from theater.core.constants import Signal, MsgType
+from theater.core.messages import Message, Status
+
+
+class TestSlots:
+    def test_nodict(self):
+        status = Status(reqtime=None, status=None, statusmessage=None, time=None, statustime=None)
+        msg = Message(sender="Test", type=MsgType.STATUS, signal=Signal.BEAT, body=status)
+        assert not hasattr(status, '__dict__')
+        assert not hasattr(msg, '__dict__')
+
+    def test_frozen(self):
+        msg = Message(sender="Test", type=MsgType.NONE, signal=Signal.BEAT, body=None)
+        with pytest.raises(AttributeError):
+            msg.sender = "Other"
+
+
+class TestTrusted:
+    def test_trustedmessage(self):
+        dtnow = datetime.now()
+        status = Status.trusted(reqtime=dtnow, status="Test", statusmessage=None, time=dtnow, statustime=None)
+        msg = Message.trusted(sender="Test", type=MsgType.STATUS, signal=Signal.BEAT, body=status)
+
+        assert status == Status(reqtime=dtnow, status="Test", statusmessage=None, time=dtnow, statustime=None)
+        assert msg == Message(sender="Test", type=MsgType.STATUS, signal=Signal.BEAT, body=status)
+        assert msg.extension == {}
+
+    def test_skipsvalidation(self):
+        msg = Message.trusted(sender="Test", type=MsgType.NONE, signal=Signal.BEAT, body="Not validated")
+        assert msg.body == "Not validated"
+
+    def test_pickling(self):
+        msg = Message.trusted(sender="Test", type=MsgType.TEXT, signal=Signal.TRIGGER, body="Test",
+                              extension={"Test": 1})
+        picklemsg = pickle.loads(pickle.dumps(msg))
+        assert picklemsg == msg
+        assert picklemsg.extension == {"Test": 1}
@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+import multiprocessing
+import sys
+import threading
+from datetime import datetime
+from queue import Empty
+
+import attr
+import pytest
+
+from theater.core.components.abc import BaseMusician
+from theater.core.components.constants import INTERRUPTED_STATUS
+from theater.core.constants import Signal, MsgType, Transport, Overflow, CORRELATION_KEY
+from theater.core.errors import IllegalValueException
+from theater.core.messages import Message, ProducerQueue, Status, generatequeues
+from theater.core.outbox import Outbox, coalescekey
+
+_SHAREDMEMORY = pytest.param(Transport.SHAREDMEMORY,
+                             marks=pytest.mark.skipif(sys.version_info < (3, 8), reason="Requires shared memory"))
+
+
+class SilentMusician(BaseMusician):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.sendexceptions = 0
+
+    def _catchsendexception(self, exc: Exception):
+        self.sendexceptions += 1
+
+    def _onpauseend(self, *args, **kwargs):
+        pass
+
+
+def _message(body: str, sender: str = "Test") -> Message:
+    return Message(sender=sender, signal=Signal.TRIGGER, type=MsgType.TEXT, body=body)
+
+
+def _bounded(maxsize: int = 2, **kwargs):
+    return generatequeues(transport=Transport.SHAREDMEMORY, maxsize=maxsize, **kwargs)
+
+
+def _drain(consumer) -> list:
+    out = []
+    while 1:
+        try:
+            out.append(consumer.get_nowait().body)
+        except Empty:
+            return out
+
+
+class TestCredits:
+    def test_unbounded(self):
+        producer, _ = generatequeues()
+        assert producer.credits is None
+
+    @pytest.mark.parametrize('transport', [Transport.PIPE, _SHAREDMEMORY])
+    def test_bounded(self, transport):
+        producer, consumer = generatequeues(transport=transport, maxsize=3, lanes=True)
+        assert producer.credits == 3
+        producer.put_nowait(_message("First"))
+        producer.put_nowait(Message(sender="Test", signal=Signal.INTERRUPT, type=MsgType.NONE, body=None))
+        assert producer.credits == 2
+        consumer.get(True, 5)
+        consumer.get(True, 5)
+        assert producer.credits == 3
+
+    def test_wrapped(self):
+        innerq = multiprocessing.Queue(3)
+        # Credits are counted from the maxsize given to the wrapper, never from the internals of the queue
+        assert ProducerQueue(innerq).credits is None
+        producer = ProducerQueue(innerq, maxsize=3)
+        producer.put_nowait(_message("First"))
+        assert producer.credits == 2
+        assert producer.routed(1).credits == 2
+
+
+@pytest.mark.skipif(sys.version_info < (3, 8), reason="Requires shared memory")
+class TestOutbox:
+    def test_wrongargs(self):
+        producer, _ = _bounded()
+        with pytest.raises(TypeError):
+            Outbox("Queue")
+        with pytest.raises(IllegalValueException):
+            Outbox(producer, capacity=0)
+
+    def test_dropoldest(self):
+        producer, consumer = _bounded()
+        dropped = []
+        outbox = Outbox(producer, Overflow.DROPOLDEST, capacity=3, ondrop=dropped.append)
+        for i in range(8):
+            assert outbox.send(_message(str(i)))
+        assert outbox.pending == 3
+        assert outbox.dropped == 3
+        assert [msg.body for msg in dropped] == ["2", "3", "4"]
+        assert _drain(consumer) == ["0", "1"]
+        assert outbox.flush() is False
+        assert _drain(consumer) == ["5", "6"]
+        assert outbox.flush() is True
+        assert _drain(consumer) == ["7"]
+
+    def test_ordering(self):
+        producer, consumer = _bounded()
+        outbox = Outbox(producer, Overflow.DROPOLDEST)
+        for i in range(3):
+            outbox.send(_message(str(i)))
+        consumer.get_nowait()
+        # Room is back, but the new message must not overtake the pending one
+        outbox.send(_message("3"))
+        assert _drain(consumer) == ["1", "2"]
+        outbox.flush()
+        assert _drain(consumer) == ["3"]
+
+    def test_coalesce(self):
+        producer, consumer = _bounded(maxsize=1)
+        outbox = Outbox(producer, Overflow.COALESCE, capacity=2)
+        outbox.send(_message("Sent"))
+        outbox.send(_message("A1", "A"))
+        outbox.send(_message("B1", "B"))
+        outbox.send(_message("A2", "A"))
+        assert outbox.coalesced == 1 and outbox.dropped == 0
+        outbox.send(_message("C1", "C"))
+        assert outbox.dropped == 1
+        assert outbox.pending == 2
+        received = []
+        while outbox.pending or len(received) < 3:
+            received.extend(_drain(consumer))
+            outbox.flush()
+        assert received + _drain(consumer) == ["Sent", "A2", "C1"]
+
+    def test_coalescekey(self):
+        replies = [Message(sender="Test", signal=Signal.BEAT, type=MsgType.TEXT, body=str(i),
+                           extension={CORRELATION_KEY: i}) for i in range(2)]
+        now = datetime.now()
+        interrupted = Message(sender="Test", signal=Signal.BEAT, type=MsgType.STATUS,
+                              body=Status.trusted(reqtime=None, status=INTERRUPTED_STATUS, time=now, statustime=now,
+                                                  statusmessage=None))
+        beat = Message(sender="Test", signal=Signal.BEAT, type=MsgType.STATUS,
+                       body=Status.trusted(reqtime=None, status='Running', time=now, statustime=now,
+                                           statusmessage=None))
+        # Every reply has its own waiting ask, an interruption notice must not be replaced by a later beat
+        assert coalescekey(replies[0]) != coalescekey(replies[1])
+        assert coalescekey(interrupted) != coalescekey(beat)
+        assert coalescekey(beat) == coalescekey(attr.evolve(beat))
+        producer, consumer = _bounded(maxsize=1)
+        outbox = Outbox(producer, Overflow.COALESCE, capacity=4)
+        outbox.send(_message("Sent"))
+        for msg in replies:
+            outbox.send(msg)
+        assert outbox.coalesced == 0 and outbox.pending == 2
+
+    def test_spill(self):
+        producer, consumer = _bounded()
+        outbox = Outbox(producer, Overflow.SPILL, capacity=2)
+        for i in range(20):
+            assert outbox.send(_message(str(i)))
+        assert outbox.pending == 18 and outbox.dropped == 0
+        received = []
+        while len(received) < 20:
+            received.extend(_drain(consumer))
+            outbox.flush()
+        assert received == [str(i) for i in range(20)]
+        outbox.send(_message("Again"))
+        assert _drain(consumer) == ["Again"]
+        outbox.close()
+
+    def test_block(self):
+        producer, consumer = _bounded(maxsize=1)
+        outbox = Outbox(producer, Overflow.BLOCK, timeout=0.05)
+        outbox.send(_message("First"))
+        assert outbox.send(_message("Second")) is False
+        assert outbox.dropped == 1
+        threading.Timer(0.1, consumer.get_nowait).start()
+        outbox = Outbox(producer, Overflow.BLOCK, timeout=5)
+        assert outbox.send(_message("Third")) is True
+        assert _drain(consumer) == ["Third"]
+
+    def test_musician(self):
+        inboxp, inboxc = generatequeues()
+        conductorp, conductorc = _bounded(maxsize=1)
+        musician = SilentMusician("Musician", inboxc, 1, conductorp, outboxcapacity=1)
+        for _ in range(3):
+            musician._answerconductor(Signal.BEAT, MsgType.NONE, None)
+        assert musician._outbox.dropped == 1
+        assert musician.sendexceptions == 1
+        conductorc.get_nowait()
+        musician._poll()
+        assert musician._outbox.pending == 0
+        assert conductorc.get_nowait().signal is Signal.BEAT
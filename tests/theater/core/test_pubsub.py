@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+import pickle
+import sys
+import time
+
+import pytest
+
+from theater.core.constants import Signal, MsgType, Transport, DESTINATION_KEY
+from theater.core.errors import IllegalValueException
+from theater.core.messages import Message, SharedMessage, WireMessage, generatequeues
+from theater.core.pubsub import Topics
+
+_UPDATE = Message(sender="Conductor", signal=Signal.UPDATE, type=MsgType.MAP, body={'key': 'value'})
+
+
+class TestSharedMessage:
+    def test_serializedonce(self):
+        shared = SharedMessage(_UPDATE)
+        assert shared.pickled is shared.pickled
+        assert shared.frame is shared.frame
+        assert pickle.loads(pickle.dumps(shared.pickled)) == _UPDATE
+
+    def test_wronguse(self):
+        with pytest.raises(TypeError):
+            SharedMessage("Hello")
+
+    @pytest.mark.parametrize('encoded', (False, True))
+    def test_putshared(self, encoded: bool):
+        producer, consumer = generatequeues(encoded=encoded, lanes=True)
+        shared = SharedMessage(_UPDATE)
+        producer.putshared(shared)
+        producer.putshared(SharedMessage(Message(sender="Conductor", signal=Signal.BEAT, type=MsgType.NONE,
+                                                 body=None)))
+        # Both lanes must be fed before the first get, for the lane order to show
+        time.sleep(0.1)
+        first, second = consumer.get(True, 1.0), consumer.get(True, 1.0)
+        # The BEAT took the control lane
+        assert first.signal is Signal.BEAT
+        assert second == _UPDATE
+        assert isinstance(second, WireMessage) is encoded
+
+    @pytest.mark.skipif(sys.version_info < (3, 8), reason="Requires shared memory")
+    def test_putsharedring(self):
+        producer, consumer = generatequeues(transport=Transport.SHAREDMEMORY, size=1 << 16)
+        producer.putshared(SharedMessage(_UPDATE))
+        assert consumer.get(True, 1.0) == _UPDATE
+
+    @pytest.mark.skipif(sys.version_info < (3, 8), reason="Requires shared memory")
+    def test_outofband(self):
+        producer, consumer = generatequeues(oobthreshold=16)
+        msg = Message(sender="Conductor", signal=Signal.UPDATE, type=MsgType.BYTES, body=b'x' * 64)
+        producer.putshared(SharedMessage(msg))
+        assert bytes(consumer.get(True, 1.0).body) == b'x' * 64
+
+
+class TestTopics:
+    def test_publish(self):
+        topics = Topics()
+        queues = [generatequeues() for _ in range(3)]
+        for producer, _ in queues[:2]:
+            assert topics.subscribe("config", producer)
+        assert not topics.subscribe("config", queues[0][0])
+        assert topics.publish("config", _UPDATE) == 2
+        assert [consumer.get(True, 1.0) for _, consumer in queues[:2]] == [_UPDATE, _UPDATE]
+        assert queues[2][1].empty()
+        assert topics.publish("other", _UPDATE) == 0
+
+    def test_unsubscribe(self):
+        topics = Topics()
+        first, _ = generatequeues()
+        second, _ = generatequeues()
+        topics.subscribe("config", first)
+        topics.subscribe("config", second)
+        topics.subscribe("beat", first)
+        assert topics.unsubscribe("config", first)
+        assert not topics.unsubscribe("config", first)
+        assert topics.subscribers("config") == (second,)
+        assert topics.unsubscribeall(first) == 1
+        assert topics.topics == ("config",)
+
+    def test_full(self):
+        topics = Topics()
+        producer, consumer = generatequeues(maxsize=1)
+        topics.subscribe("config", producer)
+        assert topics.publish("config", _UPDATE) == 1
+        consumer.get(True, 1.0)
+        producer.put(_UPDATE)
+        assert topics.publish("config", _UPDATE) == 0
+        assert topics.dropped == 1
+
+    def test_wronguse(self):
+        topics = Topics()
+        producer, _ = generatequeues()
+        with pytest.raises(IllegalValueException):
+            topics.subscribe("", producer)
+        with pytest.raises(TypeError):
+            topics.subscribe("config", object())
+
+    def test_multicast(self):
+        topics = Topics()
+        producer, consumer = generatequeues()
+        other, otherconsumer = generatequeues()
+        for address in (1, 2, 3):
+            topics.subscribe("config", producer.routed(address))
+        topics.subscribe("config", other.routed(4))
+        assert topics.publish("config", _UPDATE) == 4
+        # The three routed views of the first inbox share a single message
+        assert consumer.get(True, 1.0).extension[DESTINATION_KEY] == (1, 2, 3)
+        assert otherconsumer.get(True, 1.0).extension[DESTINATION_KEY] == 4
+        time.sleep(0.1)
+        assert consumer.empty()
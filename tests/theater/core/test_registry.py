@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+import pickle
+
+import pytest
+
+from theater.core.constants import Signal, MsgType
+from theater.core.errors import IllegalValueException
+from theater.core.messages import Message, encodemessage, decodemessage, generatequeues
+from theater.core.registry import ActorRegistry, installregistry, actorname
+
+
+class TestActorRegistry:
+    def test_register(self):
+        registry = ActorRegistry()
+        assert registry.register("Conductor") == 0
+        assert registry.register("First") == 1
+        assert registry.register("Second") == 2
+        assert registry.names == ("Conductor", "First", "Second")
+        assert len(registry) == 3
+        assert registry.address("Second") == 2
+        assert registry.name(1) == "First"
+        assert registry.name("First") == "First"
+        assert "First" in registry and 2 in registry
+        assert "Third" not in registry and 3 not in registry
+
+    def test_wronguse(self):
+        registry = ActorRegistry()
+        registry.register("First")
+        with pytest.raises(IllegalValueException):
+            registry.register("First")
+        with pytest.raises(IllegalValueException):
+            registry.register("")
+        with pytest.raises(IllegalValueException):
+            registry.address("Second")
+        with pytest.raises(IllegalValueException):
+            registry.name(1)
+        with pytest.raises(TypeError):
+            registry.register("Second", object())
+
+    def test_queues(self):
+        registry = ActorRegistry()
+        producer, _ = generatequeues()
+        registry.register("Conductor")
+        registry.register("First", producer)
+        assert registry.queue("First") is producer
+        assert registry.queue(1) is producer
+        assert registry.queue("Conductor") is None
+        assert registry.queue("Second") is None
+        assert registry.queue(7) is None
+
+    def test_pickling(self):
+        registry = ActorRegistry()
+        registry.register("First")
+        registry.register("Second")
+        copy = pickle.loads(pickle.dumps(registry))
+        assert copy.names == registry.names
+        assert copy.address("Second") == 1
+
+    def test_namesonly(self):
+        registry = ActorRegistry()
+        producer, _ = generatequeues()
+        registry.register("Conductor", producer)
+        registry.register("First", producer)
+        copy = pickle.loads(pickle.dumps(registry.namesonly()))
+        assert copy.names == ("Conductor", "First")
+        assert copy.address("First") == 1
+        assert copy.queue("First") is None and copy.queue(0) is None
+        assert registry.queue("First") is producer
+
+    def test_installed(self):
+        registry = ActorRegistry()
+        registry.register("First")
+        installregistry(registry)
+        try:
+            assert actorname(0) == "First"
+            assert actorname("Other") == "Other"
+        finally:
+            installregistry(None)
+        with pytest.raises(IllegalValueException):
+            actorname(0)
+
+
+class TestAddressedMessage:
+    def test_codec(self):
+        msg = Message(sender=3, signal=Signal.TRIGGER, type=MsgType.TEXT, body="Hello")
+        frame = encodemessage(msg)
+        assert len(frame) < len(encodemessage(Message(sender="Musician3", signal=Signal.TRIGGER, type=MsgType.TEXT,
+                                                      body="Hello")))
+        wire = decodemessage(frame)
+        assert wire.sender == 3
+        assert wire.body == "Hello"
+        assert wire == msg
+
+    def test_pickling(self):
+        msg = Message(sender=3, signal=Signal.BEAT, type=MsgType.NONE, body=None)
+        assert pickle.loads(pickle.dumps(msg)) == msg
+
+    def test_wrongsender(self):
+        with pytest.raises(TypeError):
+            _ = Message(sender=3.0, signal=Signal.BEAT, type=MsgType.NONE, body=None)
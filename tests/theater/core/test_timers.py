@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+import random
+
+import pytest
+
+from theater.core.errors import IllegalValueException
+from theater.core.timers import TimerWheel
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _wheel():
+    clock = FakeClock()
+    return TimerWheel(clock=clock), clock
+
+
+class TestTimerWheel:
+    def test_oneshot(self):
+        wheel, clock = _wheel()
+        fired = []
+        timer = wheel.schedule(0.05, fired.append, "Timer")
+        assert timer.active and not timer.periodic
+        clock.now += 0.049
+        assert wheel.advance() == 0
+        clock.now += 0.003
+        assert wheel.advance() == 1
+        assert fired == ["Timer"]
+        assert not timer.active
+        assert wheel.pending == 0
+
+    def test_periodic(self):
+        wheel, clock = _wheel()
+        fired = []
+        wheel.schedule(0.01, fired.append, "Tick", period=0.01)
+        for _ in range(100):
+            clock.now += 0.001
+            wheel.advance()
+        assert 9 <= len(fired) <= 10
+        # A late advance fires once, without catching up
+        clock.now += 1.0
+        wheel.advance()
+        assert 10 <= len(fired) <= 11
+
+    def test_cancel(self):
+        wheel, clock = _wheel()
+        fired = []
+        timer = wheel.schedule(0.01, fired.append, "First")
+        wheel.schedule(0.01, fired.append, "Second")
+        assert timer.cancel()
+        assert not timer.cancel()
+        clock.now += 0.1
+        wheel.advance()
+        assert fired == ["Second"]
+
+    def test_cancelincallback(self):
+        wheel, clock = _wheel()
+        fired = []
+        timers = []
+
+        def _callback(name):
+            fired.append(name)
+            for timer in timers:
+                timer.cancel()
+
+        timers.append(wheel.schedule(0.01, _callback, "First", period=0.01))
+        timers.append(wheel.schedule(0.01, _callback, "Second"))
+        clock.now += 0.1
+        wheel.advance()
+        assert fired == ["First"]
+        assert wheel.pending == 0
+
+    def test_levels(self):
+        wheel, clock = _wheel()
+        fired = []
+        delays = [0.001, 0.2, 0.3, 5.0, 17.0, 300.0, 20000.0, 5000000.0]
+        for delay in delays:
+            wheel.schedule(delay, fired.append, delay)
+        while wheel.pending:
+            clock.now += wheel.nexttimeout()
+            wheel.advance()
+        assert fired == delays
+
+    def test_ontime(self):
+        wheel, clock = _wheel()
+        rng = random.Random(7)
+        late = []
+        for _ in range(2000):
+            delay = rng.choice((rng.uniform(0, 0.3), rng.uniform(0, 30), rng.uniform(0, 3000)))
+            deadline = clock.now + delay
+            wheel.schedule(delay, lambda d=deadline: late.append(clock.now - d))
+        while wheel.pending:
+            clock.now += wheel.nexttimeout()
+            wheel.advance()
+        assert len(late) == 2000
+        assert 0 <= min(late) and max(late) <= 2 * wheel.resolution
+
+    def test_nexttimeout(self):
+        wheel, clock = _wheel()
+        assert wheel.nexttimeout() is None
+        wheel.schedule(0.1, lambda: None)
+        assert 0.1 <= wheel.nexttimeout() <= 0.102
+
+    def test_callbackerror(self):
+        wheel, clock = _wheel()
+        fired = []
+
+        def _fail():
+            raise RuntimeError("Failure")
+
+        wheel.schedule(0.01, _fail)
+        wheel.schedule(0.01, fired.append, "Other")
+        clock.now += 0.1
+        with pytest.raises(RuntimeError):
+            wheel.advance()
+        assert fired == ["Other"]
+
+    def test_wronguse(self):
+        with pytest.raises(IllegalValueException):
+            TimerWheel(resolution=0)
+        wheel, _ = _wheel()
+        with pytest.raises(IllegalValueException):
+            wheel.schedule(1, lambda: None, period=0)
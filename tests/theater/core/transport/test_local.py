@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+import pickle
+import threading
+import time
+from queue import Empty, Full
+
+import pytest
+
+from theater.core.errors import IllegalActionException
+from theater.core.transport.local import LocalQueue
+
+
+class TestLocalQueue:
+    def test_fifo(self):
+        queue = LocalQueue()
+        for i in range(5):
+            queue.put(f"Test{i}")
+        assert queue.qsize() == 5
+        assert not queue.full()
+        assert [queue.get_nowait() for _ in range(5)] == [f"Test{i}" for i in range(5)]
+        assert queue.empty()
+        with pytest.raises(Empty):
+            queue.get_nowait()
+
+    def test_urgent(self):
+        queue = LocalQueue(lambda obj: obj.startswith("Urgent"))
+        for item in ("Data0", "Urgent0", "Data1", "Urgent1"):
+            queue.put(item)
+        assert [queue.get_nowait() for _ in range(4)] == ["Urgent0", "Urgent1", "Data0", "Data1"]
+        with pytest.raises(TypeError):
+            LocalQueue("Urgent")
+
+    def test_maxsize(self):
+        queue = LocalQueue(lambda obj: obj.startswith("Urgent"), 2)
+        queue.put("Data0")
+        queue.put("Data1")
+        assert queue.full()
+        with pytest.raises(Full):
+            queue.put_nowait("Data2")
+        with pytest.raises(Full):
+            queue.put("Data2", True, 0.05)
+        queue.put_nowait("Urgent0")
+        assert queue.qsize() == 3
+        assert queue.get_nowait() == "Urgent0"
+        timer = threading.Timer(0.05, queue.get)
+        timer.start()
+        queue.put("Data2", True, 5.0)
+        timer.join()
+        assert [queue.get_nowait() for _ in range(2)] == ["Data1", "Data2"]
+
+    def test_blockingget(self):
+        queue = LocalQueue()
+        start = time.monotonic()
+        with pytest.raises(Empty):
+            queue.get(True, 0.05)
+        assert time.monotonic() - start >= 0.05
+        timer = threading.Timer(0.05, queue.put, ("Late",))
+        timer.start()
+        assert queue.get(True, 5.0) == "Late"
+        timer.join()
+
+    def test_pickling(self):
+        with pytest.raises(IllegalActionException):
+            pickle.dumps(LocalQueue())
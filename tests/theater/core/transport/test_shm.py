@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+import multiprocessing
+import pickle
+import sys
+import threading
+from queue import Empty, Full
+
+import pytest
+
+from theater.core.constants import Transport, Signal, MsgType
+from theater.core.errors import IllegalActionException, IllegalValueException
+from theater.core.messages import Message, ProducerQueue, ConsumerQueue, WireMessage, generatequeues
+from theater.core.transport.shm import SharedRingQueue
+
+pytestmark = pytest.mark.skipif(sys.version_info < (3, 8), reason="Requires shared memory")
+
+
+@pytest.fixture
+def ring():
+    out = SharedRingQueue(size=256)
+    yield out
+    out.close()
+    out.unlink()
+
+
+def _produce(producer: ProducerQueue, name: str, count: int):
+    for i in range(count):
+        producer.put(Message(sender=name, signal=Signal.TRIGGER, type=MsgType.TEXT, body=str(i)), True, 5.0)
+
+
+class TestSharedRingQueue:
+    def test_fifo(self, ring):
+        for i in range(5):
+            ring.put_nowait(f"Test{i}")
+        assert ring.qsize() == 5
+        assert [ring.get_nowait() for _ in range(5)] == [f"Test{i}" for i in range(5)]
+        assert ring.empty()
+        with pytest.raises(Empty):
+            ring.get_nowait()
+
+    def test_rawbytes(self, ring):
+        ring.put_nowait(b'Raw')
+        ring.put_nowait(bytearray(b'Pickled'))
+        assert ring.get_nowait() == b'Raw'
+        assert ring.get_nowait() == bytearray(b'Pickled')
+
+    def test_wraparound(self, ring):
+        for i in range(200):
+            ring.put_nowait(b'x' * (i % 37))
+            assert ring.get_nowait() == b'x' * (i % 37)
+        assert ring.qsize() == 0
+
+    def test_full(self, ring):
+        with pytest.raises(Full):
+            while 1:
+                ring.put_nowait(b'x' * 40)
+        with pytest.raises(Full):
+            ring.put(b'x' * 40, True, 0.01)
+        ring.get_nowait()
+        ring.put_nowait(b'x' * 40)
+
+    def test_oversized(self, ring):
+        with pytest.raises(IllegalValueException):
+            ring.put_nowait(b'x' * 256)
+
+    def test_timeout(self, ring):
+        with pytest.raises(Empty):
+            ring.get(True, 0.05)
+
+    def test_blockingget(self, ring):
+        timer = threading.Timer(0.05, ring.put_nowait, ("Late",))
+        timer.start()
+        assert ring.get(True, 2.0) == "Late"
+
+    def test_attach(self):
+        ring = SharedRingQueue(size=256, multiproducer=False)
+        attached = pickle.loads(pickle.dumps(ring))
+        attached.put_nowait("Attached")
+        assert ring.get_nowait() == "Attached"
+        with pytest.raises(IllegalActionException):
+            attached.unlink()
+        attached.close()
+        ring.close()
+        ring.unlink()
+
+    def test_fullring(self):
+        ring = SharedRingQueue(size=64, multiproducer=False)
+        for _ in range(4):
+            ring.put_nowait(b'x' * 12)
+        assert ring.full()
+        ring.close()
+        ring.unlink()
+
+
+class TestSharedMemoryQueues:
+    def test_production(self):
+        producer, consumer = generatequeues(transport=Transport.SHAREDMEMORY)
+        assert isinstance(producer, ProducerQueue)
+        assert isinstance(consumer, ConsumerQueue)
+        producer.put_nowait("Hello")
+        assert consumer.get(True, 1.0) == "Hello"
+        with pytest.raises(IllegalActionException):
+            consumer.put_nowait("_")
+        with pytest.raises(IllegalActionException):
+            producer.get_nowait()
+
+    def test_encoded(self):
+        producer, consumer = generatequeues(encoded=True, transport=Transport.SHAREDMEMORY, multiproducer=False)
+        producer.put_nowait(Message(sender="Test", signal=Signal.BEAT, type=MsgType.NONE, body=None))
+        out = consumer.get(True, 1.0)
+        assert isinstance(out, WireMessage)
+        assert out.sender == "Test"
+
+    @pytest.mark.skipif('fork' not in multiprocessing.get_all_start_methods(), reason="Requires fork")
+    def test_multiproducer(self):
+        context = multiprocessing.get_context('fork')
+        producer, consumer = generatequeues(transport=Transport.SHAREDMEMORY, size=4096)
+        processes = [context.Process(target=_produce, args=(producer, f"P{p}", 300)) for p in range(3)]
+        for process in processes:
+            process.start()
+        received = {f"P{p}": [] for p in range(3)}
+        for _ in range(900):
+            msg = consumer.get(True, 5.0)
+            received[msg.sender].append(msg.body)
+        for process in processes:
+            process.join()
+        for bodies in received.values():
+            assert bodies == [str(i) for i in range(300)]
@@ -0,0 +1,323 @@
+# -*- coding: utf-8 -*-
+import multiprocessing
+import multiprocessing.connection
+import os
+import pickle
+import socket
+import struct
+import threading
+import time
+from multiprocessing import AuthenticationError
+from queue import Empty
+
+import pytest
+
+from theater.core.constants import Transport, Signal, MsgType
+from theater.core.errors import IllegalActionException
+from theater.core.messages import Message, WireMessage, generatequeues
+from theater.core.transport.sockets import ConnectionPool, SocketSender, SocketReceiver, FrameDecoder, encodeframe
+
+_FRAME = struct.Struct('<I')
+
+
+def _listener(port: int = 0) -> socket.socket:
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind(('127.0.0.1', port))
+    listener.listen(8)
+    return listener
+
+
+class StandInServer:
+    """A bare listening socket that challenges every connection like multiprocessing does, then decodes its frames.
+    It can be stopped and started again on the same port"""
+
+    def __init__(self, port: int = 0):
+        self.items = []
+        self.accepted = 0
+        self.__listener = _listener(port)
+        self.address = self.__listener.getsockname()
+        self.__connections = []
+        self.__thread = threading.Thread(target=self.__accept, daemon=True)
+        self.__thread.start()
+
+    def stop(self):
+        # Shutting down wakes the accepting thread, that would keep the socket listening otherwise
+        for sock in [self.__listener] + self.__connections:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            sock.close()
+        self.__connections = []
+        self.__thread.join(1)
+
+    def waitfor(self, count: int, timeout: float = 5.0):
+        deadline = time.monotonic() + timeout
+        while len(self.items) < count and time.monotonic() < deadline:
+            time.sleep(0.005)
+        return self.items
+
+    def __accept(self):
+        while 1:
+            try:
+                connection, _ = self.__listener.accept()
+            except OSError:
+                return
+            self.accepted += 1
+            self.__connections.append(connection)
+            threading.Thread(target=self.__read, args=(connection,), daemon=True).start()
+
+    def __read(self, connection: socket.socket):
+        with multiprocessing.connection.Connection(os.dup(connection.fileno())) as handshake:
+            multiprocessing.connection.deliver_challenge(handshake, multiprocessing.current_process().authkey)
+        decoder = FrameDecoder()
+        while 1:
+            try:
+                data = connection.recv(4096)
+            except OSError:
+                return
+            if not data:
+                return
+            self.items.extend(decoder.feed(data))
+
+
+@pytest.fixture
+def server():
+    out = StandInServer()
+    yield out
+    out.stop()
+
+
+def _message(body: str) -> Message:
+    return Message(sender="Test", signal=Signal.TRIGGER, type=MsgType.TEXT, body=body)
+
+
+def _consume(consumer, count: int, results):
+    results.put([consumer.get(True, 5.0).body for _ in range(count)])
+
+
+class TestFrameDecoder:
+    def test_chunks(self):
+        stream = b''.join(encodeframe(obj) for obj in (b'Raw', {'key': 'value'}, b'', "Text"))
+        decoder = FrameDecoder()
+        items = []
+        for i in range(len(stream)):
+            items.extend(decoder.feed(stream[i:i + 1]))
+        assert items == [b'Raw', {'key': 'value'}, b'', "Text"]
+        assert decoder.pending == 0
+
+    def test_incomplete(self):
+        frame = encodeframe(b'Incomplete')
+        decoder = FrameDecoder()
+        assert decoder.feed(frame[:-1]) == []
+        assert decoder.pending == len(frame) - 1
+        assert decoder.feed(frame[-1:]) == [b'Incomplete']
+
+
+    def test_undecodable(self):
+        decoder = FrameDecoder()
+        stream = encodeframe("Before") + _FRAME.pack(3) + b'bad' + encodeframe("After")
+        assert decoder.feed(stream) == ["Before"]
+        assert isinstance(decoder.failed, Exception)
+        assert decoder.feed(encodeframe("Later")) == []
+        assert decoder.pending == 0
+
+
+class TestSocketSender:
+    def test_batchedwrites(self, server):
+        sender = SocketSender(server.address, pool=ConnectionPool())
+        for i in range(1000):
+            sender.put(f"Test{i}")
+        assert sender.flush(5.0)
+        assert server.waitfor(1000) == [f"Test{i}" for i in range(1000)]
+        assert sender.writes < 1000
+
+    def test_sharedconnection(self, server):
+        pool = ConnectionPool()
+        senders = [SocketSender(server.address, pool=pool) for _ in range(3)]
+        for i, sender in enumerate(senders):
+            sender.put(i)
+            assert sender.flush(5.0)
+        assert sorted(server.waitfor(3)) == [0, 1, 2]
+        assert pool.connections == 1
+        assert server.accepted == 1
+
+    def test_reconnect(self, server):
+        pool = ConnectionPool(minwait=0.005, maxwait=0.05)
+        sender = SocketSender(server.address, pool=pool)
+        sender.put("Before")
+        assert sender.flush(5.0)
+        assert server.waitfor(1) == ["Before"]
+        server.stop()
+        sender.put("During")
+        time.sleep(0.1)
+        restarted = StandInServer(server.address[1])
+        try:
+            sender.put("After")
+            assert sender.flush(5.0)
+            assert restarted.waitfor(2) == ["During", "After"]
+            assert pool.reconnects >= 1
+        finally:
+            restarted.stop()
+
+    def test_sendtimeout(self):
+        with _listener() as listener:
+            address = listener.getsockname()
+        with pytest.raises(ConnectionError):
+            ConnectionPool(minwait=0.01, maxwait=0.01).send(address, encodeframe("Lost"), 0.05)
+
+    def test_partialwrite(self):
+        class BreakingSocket:
+            """Takes the first bytes of a write, than fails"""
+            def __init__(self, accepted: int):
+                self.accepted = accepted
+
+            def send(self, data) -> int:
+                if not self.accepted:
+                    raise ConnectionResetError
+                sent, self.accepted = min(len(data), self.accepted), 0
+                return sent
+
+        frames = [encodeframe(f"Frame{i}") for i in range(3)]
+        write = ConnectionPool._ConnectionPool__write
+        # The first frame got through whole, the second one was cut
+        assert write(BreakingSocket(len(frames[0]) + 2), frames) == frames[1:]
+        assert write(BreakingSocket(len(frames[0]) + len(frames[1])), frames) == frames[2:]
+        with pytest.raises(ConnectionResetError):
+            write(BreakingSocket(0), frames)
+
+    def test_failedwriter(self):
+        receiver = SocketReceiver(authkey=b'Secret')
+        try:
+            with pytest.raises(Empty):
+                receiver.get(True, 0.05)
+            sender = SocketSender(receiver.address, pool=ConnectionPool(), authkey=b'Wrong')
+            sender.put("Refused")
+            with pytest.raises(AuthenticationError):
+                sender.flush(5.0)
+            with pytest.raises(AuthenticationError):
+                sender.put("Later")
+        finally:
+            receiver.close()
+
+    def test_closed(self, server):
+        sender = SocketSender(server.address, pool=ConnectionPool())
+        sender.put("Last")
+        sender.close()
+        sender.join_thread()
+        assert server.waitfor(1) == ["Last"]
+        with pytest.raises(IllegalActionException):
+            sender.put("Late")
+
+    def test_pickling(self, server):
+        sender = pickle.loads(pickle.dumps(SocketSender(server.address, pool=ConnectionPool())))
+        sender.put("Unpickled")
+        assert server.waitfor(1) == ["Unpickled"]
+
+
+class TestSocketReceiver:
+    def test_manysenders(self):
+        receiver = SocketReceiver()
+        try:
+            senders = [SocketSender(receiver.address, pool=ConnectionPool()) for _ in range(4)]
+            for i in range(50):
+                for j, sender in enumerate(senders):
+                    sender.put((j, i))
+            items = [receiver.get(True, 5.0) for _ in range(200)]
+            for j in range(4):
+                assert [i for sender, i in items if sender == j] == list(range(50))
+            with pytest.raises(Empty):
+                receiver.get(True, 0.05)
+        finally:
+            receiver.close()
+
+    def test_authentication(self):
+        receiver = SocketReceiver(authkey=b'Secret')
+        try:
+            # The reader starts at the first get
+            with pytest.raises(Empty):
+                receiver.get(True, 0.05)
+            # A wrong key isn't retried, even without a timeout
+            with pytest.raises(AuthenticationError):
+                ConnectionPool(minwait=0.01, maxwait=0.01).send(receiver.address, encodeframe("Wrong key"),
+                                                                authkey=b'Wrong')
+            # A peer that skips the challenge doesn't get its frames unpickled
+            with socket.create_connection(receiver.address) as intruder:
+                intruder.sendall(encodeframe("No key"))
+                with pytest.raises(Empty):
+                    receiver.get(True, 0.2)
+            SocketSender(receiver.address, pool=ConnectionPool(), authkey=b'Secret').put("Right key")
+            assert receiver.get(True, 5.0) == "Right key"
+            assert receiver.connections == 1
+        finally:
+            receiver.close()
+
+    def test_undecodable(self):
+        receiver = SocketReceiver()
+        try:
+            with pytest.raises(Empty):
+                receiver.get(True, 0.05)
+            pool = ConnectionPool()
+            pool.send(receiver.address, [encodeframe("Before"), _FRAME.pack(3) + b'bad', encodeframe("Dropped")])
+            assert receiver.get(True, 5.0) == "Before"
+            with pytest.raises(Empty):
+                receiver.get(True, 0.2)
+            # The reader survived, and the sender connects again
+            assert receiver.connections == 0
+            SocketSender(receiver.address, pool=pool).put("After")
+            assert receiver.get(True, 5.0) == "After"
+        finally:
+            receiver.close()
+
+    def test_unixsocket(self, tmp_path):
+        path = str(tmp_path / 'receiver.sock')
+        receiver = SocketReceiver(path)
+        try:
+            assert receiver.address == path
+            SocketSender(path, pool=ConnectionPool()).put(b'Unix')
+            assert receiver.get(True, 5.0) == b'Unix'
+        finally:
+            receiver.close()
+        assert not (tmp_path / 'receiver.sock').exists()
+
+
+class TestSocketQueues:
+    @pytest.mark.parametrize('encoded', (False, True))
+    def test_roundtrip(self, encoded: bool):
+        producer, consumer = generatequeues(encoded=encoded, transport=Transport.SOCKET, lanes=True)
+        try:
+            assert producer.credits is None
+            for i in range(5):
+                producer.put(_message(str(i)))
+            producer.put(Message(sender="Test", signal=Signal.UPDATE, type=MsgType.BYTES, body=b'Payload'))
+            received = [consumer.get(True, 5.0) for _ in range(6)]
+            assert [msg.body for msg in received] == ['0', '1', '2', '3', '4', b'Payload']
+            assert all(isinstance(msg, WireMessage) is encoded for msg in received)
+        finally:
+            consumer.close()
+
+    def test_forkedconsumer(self):
+        context = multiprocessing.get_context('fork')
+        producer, consumer = generatequeues(transport=Transport.SOCKET)
+        results = context.Queue()
+        process = context.Process(target=_consume, args=(consumer, 20, results), daemon=True)
+        process.start()
+        for i in range(20):
+            producer.put(_message(str(i)))
+        assert results.get(True, 10.0) == [str(i) for i in range(20)]
+        process.join(5)
+        consumer.close()
+
+    def test_spawnedconsumer(self):
+        context = multiprocessing.get_context('spawn')
+        producer, consumer = generatequeues(transport=Transport.SOCKET, lanes=True)
+        results = context.Queue()
+        # The receivers travel as their listening sockets, the reader threads start again in the child
+        process = context.Process(target=_consume, args=(consumer, 20, results), daemon=True)
+        process.start()
+        for i in range(20):
+            producer.put(_message(str(i)))
+        assert results.get(True, 30.0) == [str(i) for i in range(20)]
+        process.join(5)
+        consumer.close()
@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+import multiprocessing
+import os
+import pickle
+import sys
+import time
+
+import pytest
+
+from theater.core.components.abc import BaseMusician
+from theater.core.components.constants import PauseMode, INTERRUPTED_STATUS
+from theater.core.constants import Signal, MsgType, Transport
+from theater.core.errors import IllegalActionException, IllegalValueException
+from theater.core.messages import Message
+from theater.core.registry import actorname
+from theater.manager.conductor import Conductor
+from theater.manager.constants import ROUTE_KEY, SUBSCRIBE_KEY, UNSUBSCRIBE_KEY, Hosting
+
+pytestmark = pytest.mark.skipif('fork' not in multiprocessing.get_all_start_methods(), reason="Requires fork")
+
+
+class EchoMusician(BaseMusician):
+    """Answers every TEXT trigger. A body like 'to:Name' is relayed to the named musician through the conductor, while
+    'join:Topic' and 'leave:Topic' subscribe and unsubscribe the musician"""
+
+    def _handletrigger(self, msg: Message):
+        if msg.body.startswith(("join:", "leave:")):
+            action, topic = msg.body.split(":")
+            self._conductorsq.put_nowait(Message(sender=self._actorname, signal=Signal.UPDATE, type=MsgType.NONE,
+                                                 body=None,
+                                                 extension={SUBSCRIBE_KEY if action == "join" else UNSUBSCRIBE_KEY:
+                                                            topic}))
+            self._answerconductor(Signal.TRIGGER, MsgType.TEXT, f"{self._actorname}:{msg.body}")
+        elif msg.body.startswith("to:"):
+            self._conductorsq.put_nowait(Message(sender=self._actorname, signal=Signal.TRIGGER, type=MsgType.TEXT,
+                                                 body="relay", extension={ROUTE_KEY: msg.body[3:]}))
+        else:
+            self._answerconductor(Signal.TRIGGER, MsgType.TEXT, f"{self._actorname}:{msg.body}")
+        return Signal.TRIGGER
+
+    def _onpauseend(self, *args, **kwargs):
+        pass
+
+
+class SilentMusician(BaseMusician):
+    """Never answers a trigger"""
+
+    def _handletrigger(self, msg: Message):
+        return Signal.TRIGGER
+
+    def _onpauseend(self, *args, **kwargs):
+        pass
+
+
+class WhoAmIMusician(BaseMusician):
+    """Answers every TEXT trigger with the name of its sender, resolved with the registry of the worker"""
+
+    def _handletrigger(self, msg: Message):
+        self._answerconductor(Signal.TRIGGER, MsgType.TEXT, actorname(msg.sender))
+        return Signal.TRIGGER
+
+    def _onpauseend(self, *args, **kwargs):
+        pass
+
+
+def _conductor(**kwargs) -> Conductor:
+    return Conductor("Conductor", context=multiprocessing.get_context('fork'), **kwargs)
+
+
+def _collect(conductor: Conductor, count: int, timeout: float = 10.0):
+    out = []
+    deadline = time.monotonic() + timeout
+    while len(out) < count and time.monotonic() < deadline:
+        msg = conductor.poll(0.1)
+        if msg is not None:
+            out.append(msg)
+    return out
+
+
+class TestConductor:
+    def test_register(self):
+        conductor = _conductor()
+        conductor.register("First", EchoMusician, 1)
+        with pytest.raises(IllegalValueException):
+            conductor.register("First", EchoMusician, 1)
+        with pytest.raises(IllegalValueException):
+            conductor.send("Second", Signal.BEAT)
+        assert conductor.musicians == ("First",)
+
+    def test_fanin(self):
+        conductor = _conductor(workers=3)
+        names = [f"Musician{i}" for i in range(12)]
+        for name in names:
+            conductor.register(name, EchoMusician, 1, pausemode=PauseMode.DEADLINE)
+        with conductor:
+            with pytest.raises(IllegalActionException):
+                conductor.register("Late", EchoMusician, 1)
+            conductor.beat()
+            beats = _collect(conductor, len(names))
+            assert sorted(msg.sender for msg in beats) == sorted(names)
+            assert conductor.stale(60) == []
+            assert conductor.lastbeat("Musician0") is not None
+
+    def test_routing(self):
+        conductor = _conductor(workers=2)
+        conductor.register("First", EchoMusician, 1, pausemode=PauseMode.DEADLINE)
+        conductor.register("Second", EchoMusician, 1, pausemode=PauseMode.DEADLINE)
+        conductor.start()
+        conductor.send("First", Signal.TRIGGER, MsgType.TEXT, "to:Second")
+        answers = _collect(conductor, 1)
+        assert [msg.body for msg in answers] == ["Second:relay"]
+        leftovers = conductor.stop()
+        assert not conductor.running
+        statuses = [msg.body.status for msg in leftovers if msg.type is MsgType.STATUS]
+        assert statuses == [INTERRUPTED_STATUS, INTERRUPTED_STATUS]
+
+    @pytest.mark.skipif(sys.version_info < (3, 8), reason="Requires shared memory")
+    def test_sharedmemory(self):
+        conductor = _conductor(workers=2, transport=Transport.SHAREDMEMORY)
+        for i in range(4):
+            conductor.register(f"Musician{i}", EchoMusician, 1, pausemode=PauseMode.DEADLINE)
+        with conductor:
+            conductor.send("Musician2", Signal.TRIGGER, MsgType.TEXT, "Hello")
+            answer = _collect(conductor, 1)[0]
+            assert answer.body == "Musician2:Hello"
+
+    @pytest.mark.parametrize('transport', (Transport.PIPE, pytest.param(
+        Transport.SHAREDMEMORY, marks=pytest.mark.skipif(sys.version_info < (3, 8), reason="Requires shared memory"))))
+    def test_spawn(self, transport: Transport):
+        # The queues must be built for the start method of the workers, not for multiprocessing's default one
+        conductor = Conductor("Conductor", workers=2, context=multiprocessing.get_context('spawn'), transport=transport)
+        for i in range(2):
+            conductor.register(f"Musician{i}", EchoMusician, 1, pausemode=PauseMode.DEADLINE)
+        with conductor:
+            conductor.send("Musician1", Signal.TRIGGER, MsgType.TEXT, "Hello")
+            answer = _collect(conductor, 1, 30.0)[0]
+            assert answer.body == "Musician1:Hello"
+
+    def test_multiplexhosting(self):
+        conductor = _conductor(workers=2, hosting=Hosting.MULTIPLEX)
+        names = [f"Musician{i}" for i in range(20)]
+        for name in names:
+            conductor.register(name, EchoMusician, 1)
+        with conductor:
+            conductor.broadcast(Signal.TRIGGER, MsgType.TEXT, "Hello")
+            answers = _collect(conductor, len(names))
+            assert sorted(msg.body for msg in answers) == sorted(f"{name}:Hello" for name in names)
+
+    @pytest.mark.parametrize('sharedinbox', (True, False))
+    @pytest.mark.parametrize('hosting', (Hosting.THREAD, Hosting.MULTIPLEX))
+    def test_inboxes(self, sharedinbox: bool, hosting: Hosting):
+        conductor = _conductor(workers=2, hosting=hosting, sharedinbox=sharedinbox)
+        names = [f"Musician{i}" for i in range(5)]
+        for name in names:
+            conductor.register(name, EchoMusician, 1, pausemode=PauseMode.DEADLINE)
+        conductor.start()
+        conductor.send("Musician3", Signal.TRIGGER, MsgType.TEXT, "Hello")
+        assert [msg.body for msg in _collect(conductor, 1)] == ["Musician3:Hello"]
+        conductor.broadcast(Signal.TRIGGER, MsgType.TEXT, "All")
+        answers = _collect(conductor, len(names))
+        assert sorted(msg.body for msg in answers) == sorted(f"{name}:All" for name in names)
+        leftovers = conductor.stop()
+        assert not conductor.running
+        assert [msg.body.status for msg in leftovers if msg.type is MsgType.STATUS] == [INTERRUPTED_STATUS] * 5
+
+    def test_fullbroadcast(self):
+        conductor = _conductor(sharedinbox=False, maxsize=1)
+        for i in range(3):
+            conductor.register(f"Musician{i}", SilentMusician, 1)
+        conductor.send("Musician0", Signal.TRIGGER, MsgType.TEXT, "Backlog")
+        # The first inbox is full, the others still get the broadcast
+        assert conductor.broadcast(Signal.TRIGGER, MsgType.TEXT, "All") == 2
+        assert conductor.broadcast(Signal.TRIGGER, MsgType.TEXT, "Again") == 0
+
+    @pytest.mark.skipif(not os.path.isdir('/proc/self/fd'), reason="Requires /proc")
+    def test_sharedinbox(self):
+        conductor = _conductor(workers=2)
+        descriptors = len(os.listdir('/proc/self/fd'))
+        names = [f"Musician{i}" for i in range(300)]
+        for name in names:
+            conductor.register(name, EchoMusician, 1)
+        # An inbox with its control lane per worker, whatever the number of musicians
+        assert len(os.listdir('/proc/self/fd')) - descriptors <= 8
+        with conductor:
+            conductor.broadcast(Signal.TRIGGER, MsgType.TEXT, "Hello")
+            answers = _collect(conductor, len(names))
+            assert len(answers) == len(names)
+            conductor.send("Musician299", Signal.TRIGGER, MsgType.TEXT, "to:Musician0")
+            assert [msg.body for msg in _collect(conductor, 1)] == ["Musician0:relay"]
+
+    def test_metrics(self):
+        conductor = _conductor(workers=1)
+        conductor.register("First", EchoMusician, 1, pausemode=PauseMode.DEADLINE)
+        with conductor:
+            conductor.send("First", Signal.TRIGGER, MsgType.TEXT, "Hello")
+            _collect(conductor, 1)
+            conductor.requestmetrics()
+            _collect(conductor, 1)
+            metrics = conductor.lastmetrics("First")
+            assert metrics['handled']['TRIGGER']['count'] == 1
+            assert conductor.lastmetrics("Second") is None
+
+    def test_addressed(self):
+        conductor = _conductor(workers=2, addressed=True)
+        conductor.register("First", EchoMusician, 1, pausemode=PauseMode.DEADLINE)
+        conductor.register("Second", WhoAmIMusician, 1, pausemode=PauseMode.DEADLINE)
+        assert conductor.registry.address("Second") == 2
+        with conductor:
+            conductor.send(1, Signal.TRIGGER, MsgType.TEXT, "Hello")
+            conductor.send("Second", Signal.TRIGGER, MsgType.TEXT, "Hello")
+            answers = _collect(conductor, 2)
+            assert sorted((msg.sender, msg.body) for msg in answers) == [(1, "First:Hello"), (2, "Conductor")]
+            assert conductor.actorname(1) == "First"
+            conductor.beat()
+            beats = _collect(conductor, 2)
+            assert sorted(conductor.actorname(msg.sender) for msg in beats) == ["First", "Second"]
+            assert conductor.stale(60) == []
+
+    def test_publish(self):
+        conductor = _conductor(workers=2)
+        for name in ("First", "Second", "Third"):
+            conductor.register(name, EchoMusician, 1, pausemode=PauseMode.DEADLINE)
+        with conductor:
+            conductor.subscribe("news", "First")
+            conductor.send("Second", Signal.TRIGGER, MsgType.TEXT, "join:news")
+            # The join is handled by poll, before the musician's answer
+            assert [msg.body for msg in _collect(conductor, 1)] == ["Second:join:news"]
+            assert conductor.publish("news", Signal.TRIGGER, MsgType.TEXT, "Hello") == 2
+            answers = _collect(conductor, 2)
+            assert sorted(msg.body for msg in answers) == ["First:Hello", "Second:Hello"]
+            conductor.send("Second", Signal.TRIGGER, MsgType.TEXT, "leave:news")
+            _collect(conductor, 1)
+            assert conductor.unsubscribe("news", "First")
+            assert conductor.publish("news", Signal.TRIGGER, MsgType.TEXT, "Hello") == 0
+
+    def test_publishshared(self, monkeypatch):
+        conductor = _conductor(workers=1, sharedinbox=True)
+        names = ("First", "Second", "Third")
+        for name in names:
+            conductor.register(name, EchoMusician, 1, pausemode=PauseMode.DEADLINE)
+        with conductor:
+            for name in names:
+                conductor.subscribe("news", name)
+            dumps = pickle.dumps
+            serialized = []
+
+            def _countingdumps(obj, *args, **kwargs):
+                if isinstance(obj, Message):
+                    serialized.append(obj)
+                return dumps(obj, *args, **kwargs)
+
+            monkeypatch.setattr(pickle, 'dumps', _countingdumps)
+            assert conductor.publish("news", Signal.TRIGGER, MsgType.TEXT, "Hello") == 3
+            monkeypatch.undo()
+            # A single multicast message reaches the three musicians of the worker
+            assert len(serialized) == 1
+            answers = _collect(conductor, 3)
+            assert sorted(msg.body for msg in answers) == [f"{name}:Hello" for name in sorted(names)]
+
+    def test_ask(self):
+        conductor = _conductor(workers=2)
+        conductor.register("First", EchoMusician, 1, pausemode=PauseMode.DEADLINE)
+        conductor.register("Silent", SilentMusician, 1, pausemode=PauseMode.DEADLINE)
+        with conductor:
+            status = conductor.askstatus("First", metrics=True)
+            silent = conductor.ask("Silent", Signal.TRIGGER, MsgType.TEXT, "Hello", timeout=0.2)
+            # Replies are consumed by poll, never returned
+            assert conductor.poll(1.0) is None
+            reply = status.result(0)
+            assert reply.type is MsgType.STATUS
+            assert 'metrics' in reply.extension
+            with pytest.raises(TimeoutError):
+                silent.result(0)